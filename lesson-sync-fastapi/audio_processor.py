@@ -1,55 +1,308 @@
-import tensorflow as tf
-import tensorflow_hub as hub
+import logging
+import os
+import threading
+from functools import cached_property, lru_cache
 import numpy as np
-import pandas as pd
-import whisper
-import torch
+from config import settings
+from inference_backends import (WHISPER_BACKENDS, YAMNET_BACKENDS, check_backend, load_tflite_yamnet,
+                                quantize_whisper)
+from metrics import SPEECH_SEGMENTS, YAMNET_FRAMES, stage, timed
+from segment_classifier import SegmentClassifier
+from silence_gate import active_frames
+
+logger = logging.getLogger(__name__)
+
+YAMNET_HANDLE = 'https://tfhub.dev/google/yamnet/1'
+
+# YAMNet 프레임 설정 (16kHz 기준): 0.975초 창을 0.48초 간격으로 이동
+FRAME_HOP = 0.48
+FRAME_HOP_SAMPLES = 7680
+FRAME_WINDOW_SAMPLES = 15600
+
+# 음성 구간 분할 설정 (값을 바꾸면 SEGMENTER_VERSION도 올려서 캐시된 구간을 무효화)
+SEGMENTER_VERSION = "3"
+SPEECH_CLASS = "Speech"
+SPEECH_HOLD_THRESHOLD = 0.2  # 시작된 음성 구간을 유지하는 최소 Speech 점수 (히스테리시스)
+MIN_SEGMENT_GAP = 1.0        # 이보다 짧은 비음성 간격은 앞뒤 구간을 하나로 합침 (초)
+MIN_SEGMENT_DURATION = 1.0   # 이보다 짧은 구간은 만들지 않음 (초)
+
+# whisper.transcribe()의 기본 fallback 기준값
+_COMPRESSION_RATIO_THRESHOLD = 2.4
+_LOGPROB_THRESHOLD = -1.0
+_NO_SPEECH_THRESHOLD = 0.6
+
+# 모델 로드는 프로세스당 한 번만 (여러 스레드가 동시에 처음 요청해도 한 번만 로드)
+_load_lock = threading.RLock()
+
+
+def yamnet_handle() -> str:
+    """MODEL_DIR/yamnet에 SavedModel이 있으면 그 경로를, 없으면 TF Hub 주소를 사용합니다."""
+    local_path = os.path.join(settings.MODEL_DIR, "yamnet") if settings.MODEL_DIR else ""
+    if local_path and os.path.isdir(local_path):
+        return local_path
+    if local_path:
+        logger.warning(f"{local_path}에 YAMNet 모델이 없어 TF Hub에서 내려받습니다")
+    return YAMNET_HANDLE
+
+
+def whisper_download_root():
+    """MODEL_DIR가 지정되면 MODEL_DIR/whisper에서 체크포인트를 찾습니다. (없으면 그 위치로 내려받음)"""
+    return os.path.join(settings.MODEL_DIR, "whisper") if settings.MODEL_DIR else None
+
+
+@lru_cache(maxsize=None)
+def _load_yamnet(handle: str):
+    # TensorFlow는 임포트만으로 수 초와 수백 MB가 들기 때문에 YAMNet을 처음 사용할 때 임포트
+    import tensorflow_hub as hub
+    logger.info(f"YAMNet 로드: {handle}")
+    return hub.load(handle)
+
+
+@lru_cache(maxsize=None)
+def _load_whisper(name: str, download_root, backend: str = "torch"):
+    # torch/whisper도 임포트 비용이 크므로 Whisper를 처음 사용할 때 임포트
+    import torch
+    import whisper
+    # int8 동적 양자화는 CPU에서만 실행됨
+    device = "cuda" if torch.cuda.is_available() and backend == "torch" else "cpu"
+    logger.info(f"Whisper 로드: {name} ({device}, {backend})")
+    model = whisper.load_model(name, device=device, download_root=download_root)
+    if backend == "torch-int8":
+        model = quantize_whisper(model)
+    return model
+
 
 class AudioProcessor:
-    def __init__(self):
-        # YAMNet 초기화
-        self.yamnet_model = hub.load('https://tfhub.dev/google/yamnet/1')
-        self.class_names = self._load_class_names()
-        
-        # Whisper 초기화
-        self.whisper_model = self._init_whisper()
+    """
+    YAMNet/Whisper 모델은 생성 시점이 아니라 처음 사용할 때 로드합니다.
+    (/parse-directives만 사용하는 배포나 테스트에서는 모델을 로드하지 않음)
+    로드된 모델은 프로세스 안에서 공유되므로 AudioProcessor를 여러 개 만들어도 가중치는 한 벌만 유지됩니다.
+    모델을 실행하는 방식은 YAMNET_BACKEND, WHISPER_BACKEND 설정으로 고릅니다. (inference_backends 참고)
+    """
+
+    @cached_property
+    def yamnet_model(self):
+        with _load_lock:
+            if check_backend(settings.YAMNET_BACKEND, YAMNET_BACKENDS) == "tflite":
+                return load_tflite_yamnet(settings.MODEL_DIR)
+            return _load_yamnet(yamnet_handle())
+
+    @cached_property
+    def class_names(self):
+        return self._load_class_names()
+
+    @cached_property
+    def whisper_model(self):
+        with _load_lock:
+            return _load_whisper(settings.WHISPER_MODEL, whisper_download_root(),
+                                 check_backend(settings.WHISPER_BACKEND, WHISPER_BACKENDS))
+
+    def whisper_for(self, name=None):
+        """name 모델 (None이면 WHISPER_MODEL). 티어 모델은 처음 요청할 때 로드되어 프로세스 안에서 공유됩니다."""
+        if name is None or name == settings.WHISPER_MODEL:
+            return self.whisper_model
+        with _load_lock:
+            return _load_whisper(name, whisper_download_root(),
+                                 check_backend(settings.WHISPER_BACKEND, WHISPER_BACKENDS))
+
+    @cached_property
+    def _silence_output(self):
+        """무음 파형 프레임 하나에 대한 YAMNet (점수, 임베딩 또는 None). 무음 게이트가 건너뛴 프레임에 사용"""
+        scores, embeddings, _ = self.yamnet_model(np.zeros(FRAME_WINDOW_SAMPLES, dtype=np.float32))
+        return _as_numpy(scores)[0], _as_numpy(embeddings)[0] if embeddings is not None else None
 
     def _load_class_names(self):
-        class_map_path = self.yamnet_model.class_map_path().numpy().decode('utf-8')
+        class_map_path = self.yamnet_model.class_map_path()
+        if hasattr(class_map_path, "numpy"):
+            class_map_path = class_map_path.numpy().decode('utf-8')
+        import pandas as pd
         return list(pd.read_csv(class_map_path)['display_name'])
 
-    def _init_whisper(self):
-        device = "cuda" if torch.cuda.is_available() else "cpu"
-        # print(f"device: {device}")
-        return whisper.load_model("tiny", device=device)
+    def warm_up(self):
+        """첫 요청이 모델 로드를 기다리지 않도록 미리 로드합니다."""
+        self.class_names
+        self.whisper_model
 
+    @timed("speech_detection")
     def extract_speech_segments(self, waveform, sr):
-        waveform_tf = tf.convert_to_tensor(waveform, dtype=tf.float32)
-        scores, _, _ = self.yamnet_model(waveform_tf)
-        return self._process_scores(scores.numpy(), sr)
-
-    def _process_scores(self, scores, sr):
-        top_class_indices = np.argmax(scores, axis=1)
-        top_classes = [self.class_names[i] for i in top_class_indices]
-        
-        frame_hop = 0.48
-        segments = []
-        cur_start = None
-        
-        for i, cls in enumerate(top_classes):
-            if cls == "Speech":
-                if cur_start is None:
-                    cur_start = i * frame_hop
+        waveform = np.asarray(waveform, dtype=np.float32)
+        count = 1 + max(0, -(-(len(waveform) - FRAME_WINDOW_SAMPLES) // FRAME_HOP_SAMPLES))
+        scores, _ = self._gated_yamnet(waveform, count)
+        return self._process_scores(scores, sr)
+
+    def extract_speech_segments_stream(self, waveform, sr, window_seconds=60.0):
+        """
+        긴 녹음을 일정 길이 창으로 나누어 YAMNet을 실행합니다.
+        창의 시작을 프레임 간격의 배수로 맞추고 (창 길이 - 간격)만큼 겹쳐 읽기 때문에
+        전체 파형을 한 번에 넣었을 때와 같은 프레임이 만들어집니다.
+        waveform은 슬라이싱을 지원하는 객체(numpy 배열, SpooledWaveform 등)입니다.
+        """
+        return list(self.iter_speech_segments_stream(waveform, sr, window_seconds))
+
+    def iter_speech_segments_stream(self, waveform, sr, window_seconds=60.0, classify=False):
+        """
+        extract_speech_segments_stream과 같은 구간을, 녹음 전체를 다 보기 전에 확정되는 대로 내보내는 제너레이터.
+        구간 끝 뒤로 MIN_SEGMENT_GAP 이상의 프레임을 이미 확인했다면 이후 프레임과 합쳐지거나 늘어날 수 없으므로
+        그 구간은 전체 녹음을 처리한 결과와 같습니다. (STT가 검출과 겹쳐 실행될 수 있도록 함)
+        classify=True이면 같은 YAMNet 출력으로 구간을 분류해 "label"을 붙입니다. (segment_classifier 참고)
+        """
+        classifier = SegmentClassifier(self.class_names) if classify else None
+        top_class_indices, speech_scores, features, feature_starts = [], [], [], []
+        frames, emitted, segments = 0, 0, []
+
+        def labeled(seg):
+            if classifier is None:
+                return seg
+            a, b = round(seg["start"] / FRAME_HOP), round(seg["end"] / FRAME_HOP)
+            speech, music, embeddings = (_frame_slice(features, feature_starts, a, b, key)
+                                         for key in ("speech", "music", "embedding"))
+            return {**seg, "label": classifier.classify(speech, music, embeddings, seg["end"] - seg["start"])}
+
+        # 제너레이터를 소비하는 쪽이 기다리는 시간(큐가 가득 찬 경우)도 포함됨
+        with stage("speech_detection"):
+            for top, speech, window_features in self._iter_window_scores(waveform, sr, window_seconds, classifier):
+                top_class_indices.append(top)
+                speech_scores.append(speech)
+                if window_features is not None:
+                    features.append(window_features)
+                    feature_starts.append(frames)
+                frames += len(top)
+                # 구간 분할은 앞뒤 프레임에 따라 달라지므로 지금까지의 프레임 전체로 다시 계산 (프레임 수는 시간당 7500개)
+                segments = self._segments_from_frames(np.concatenate(top_class_indices),
+                                                      np.concatenate(speech_scores))
+                while (emitted < len(segments)
+                       and (frames - round(segments[emitted]["end"] / FRAME_HOP)) * FRAME_HOP >= MIN_SEGMENT_GAP):
+                    yield labeled(segments[emitted])
+                    emitted += 1
+            for seg in segments[emitted:]:
+                yield labeled(seg)
+
+    def _iter_window_scores(self, waveform, sr, window_seconds, classifier=None):
+        """창마다 (프레임별 최상위 클래스, 프레임별 Speech 점수, 분류용 프레임 특징 또는 None)을 반환합니다."""
+        frames_per_window = max(1, int(window_seconds * sr) // FRAME_HOP_SAMPLES)
+        window_samples = frames_per_window * FRAME_HOP_SAMPLES
+        overlap_samples = FRAME_WINDOW_SAMPLES - FRAME_HOP_SAMPLES
+
+        # 디코딩 중인 파형(GrowingWaveform)은 창 하나만큼 디코딩될 때까지 기다렸다가 처리
+        wait_for = getattr(waveform, "wait_for", None)
+
+        speech_index = self.class_names.index(SPEECH_CLASS)
+        start = 0
+        while True:
+            end = start + window_samples + overlap_samples
+            available = wait_for(end) if wait_for is not None else len(waveform)
+            if available >= end:
+                count = frames_per_window
             else:
-                if cur_start is not None:
-                    segments.append({"start": cur_start, "end": i * frame_hop})
-                    cur_start = None
-        if cur_start is not None:
-            segments.append({"start": cur_start, "end": len(top_classes)*frame_hop})
-            
-        return segments
+                # 마지막 창: 전체 길이가 정해졌으므로 남은 프레임 수를 계산
+                total_frames = 1 + max(0, -(-(available - FRAME_WINDOW_SAMPLES) // FRAME_HOP_SAMPLES))
+                count = min(frames_per_window, total_frames - start // FRAME_HOP_SAMPLES)
+                if count <= 0:
+                    return
+            scores, embeddings = self._gated_yamnet(np.asarray(waveform[start:end], dtype=np.float32), count)
+            window_features = None
+            if classifier is not None:
+                window_features = classifier.frame_features(scores, embeddings)
+            yield np.argmax(scores, axis=1), scores[:, speech_index], window_features
+            if available < end:
+                return
+            start += window_samples
+
+    def _gated_yamnet(self, block, count):
+        """
+        창 하나의 프레임 count개에 대한 (점수, 임베딩 또는 None).
+        SILENCE_GATE가 켜져 있으면 무음 프레임은 YAMNet을 실행하지 않고 무음 파형의 출력으로 채우고,
+        소리가 있는 프레임 구간들만 프레임 간격에 맞춰 이어 붙여 한 번에 실행합니다.
+        구간 사이에 프레임 2개 길이의 0을 넣어 각 구간의 프레임이 원래 위치에서 계산한 것과 같게 합니다.
+        """
+        active = (active_frames(block, count, settings.SILENCE_GATE_DBFS) if settings.SILENCE_GATE
+                  else np.ones(count, dtype=bool))
+        YAMNET_FRAMES.labels("analyzed").inc(int(active.sum()))
+        YAMNET_FRAMES.labels("skipped").inc(int(count - active.sum()))
+        # 백엔드(TF/TFLite)가 numpy 배열을 그대로 받으므로 TensorFlow를 임포트하지 않음
+        if active.all():
+            scores, embeddings, _ = self.yamnet_model(block)
+            return _as_numpy(scores)[:count], _as_numpy(embeddings)[:count] if embeddings is not None else None
+
+        silent_scores, silent_embedding = self._silence_output
+        scores = np.repeat(silent_scores[None], count, axis=0)
+        embeddings = np.repeat(silent_embedding[None], count, axis=0) if silent_embedding is not None else None
+        starts, ends = _find_runs(active)
+        if not len(starts):
+            return scores, embeddings
+        # 이어 붙일 때 넣는 0보다 짧은 간격은 YAMNet을 실행하는 편이 같거나 싸므로 합침
+        is_new_run = np.concatenate(([True], starts[1:] - ends[:-1] > 2))
+        starts, ends = starts[is_new_run], ends[np.concatenate((is_new_run[1:], [True]))]
+        pieces, offsets, offset = [], [], 0
+        for a, b in zip(starts, ends):
+            piece = block[a * FRAME_HOP_SAMPLES:(b - 1) * FRAME_HOP_SAMPLES + FRAME_WINDOW_SAMPLES]
+            pieces.append(np.pad(piece, (0, (b - a + 2) * FRAME_HOP_SAMPLES - len(piece))))
+            offsets.append(offset)
+            offset += b - a + 2
+        run_scores, run_embeddings, _ = self.yamnet_model(np.concatenate(pieces))
+        run_scores = _as_numpy(run_scores)
+        run_embeddings = _as_numpy(run_embeddings) if run_embeddings is not None else None
+        for a, b, offset in zip(starts, ends, offsets):
+            scores[a:b] = run_scores[offset:offset + b - a]
+            if embeddings is not None and run_embeddings is not None:
+                embeddings[a:b] = run_embeddings[offset:offset + b - a]
+        return scores, embeddings
+
+    def _process_scores(self, scores, sr, **kwargs):
+        speech_index = self.class_names.index(SPEECH_CLASS)
+        return self._segments_from_frames(np.argmax(scores, axis=1), scores[:, speech_index], **kwargs)
+
+    def _segments_from_frames(self, top_class_indices, speech_scores,
+                              hold_threshold=SPEECH_HOLD_THRESHOLD,
+                              min_gap=MIN_SEGMENT_GAP,
+                              min_duration=MIN_SEGMENT_DURATION):
+        """
+        프레임별 최상위 클래스와 Speech 점수로 음성 구간을 찾습니다.
+        - 최상위 클래스가 Speech인 프레임에서 구간이 시작되고, Speech 점수가 hold_threshold 이상인 동안 유지됩니다.
+        - min_gap보다 짧은 간격으로 떨어진 구간은 합치고, min_duration보다 짧은 구간은 버립니다.
+        """
+        speech_index = self.class_names.index(SPEECH_CLASS)
+        strong = np.asarray(top_class_indices) == speech_index
+        weak = strong | (np.asarray(speech_scores) >= hold_threshold)
 
-    def transcribe_segments(self, segments, waveform, sr):
+        # 1. 유지 조건(weak)을 만족하는 연속 구간 중 시작 조건(strong) 프레임을 포함하는 것만 남김
+        starts, ends = _find_runs(weak)
+        strong_frames = np.flatnonzero(strong)
+        strong_count = np.concatenate(([0], np.cumsum(strong)))
+        keep = strong_count[ends] - strong_count[starts] > 0
+        starts, ends = starts[keep], ends[keep]
+        # 구간은 첫 strong 프레임에서 시작 (그 앞의 weak 프레임은 포함하지 않음)
+        starts = strong_frames[np.searchsorted(strong_frames, starts)]
+
+        # 2. 짧은 간격 병합
+        if len(starts) > 1:
+            is_new_group = np.concatenate(([True], (starts[1:] - ends[:-1]) * FRAME_HOP >= min_gap))
+            is_group_end = np.concatenate((is_new_group[1:], [True]))
+            starts, ends = starts[is_new_group], ends[is_group_end]
+
+        # 3. 최소 길이 필터
+        keep = (ends - starts) * FRAME_HOP >= min_duration
+        return [{"start": float(start * FRAME_HOP), "end": float(end * FRAME_HOP)}
+                for start, end in zip(starts[keep], ends[keep])]
+
+    @timed("transcription")
+    def transcribe_segments(self, segments, waveform, sr, batch_size=1, on_segment=None, whisper_model=None):
+        """
+        on_segment가 주어지면 텍스트 변환이 끝난 구간마다 바로 호출합니다. (스트리밍 응답용)
+        segments는 리스트 외에 제너레이터 등 한 번만 순회할 수 있는 iterable이어도 되며,
+        구간이 도착하는 대로 처리하므로 음성 구간 검출과 겹쳐서 실행할 수 있습니다.
+        whisper_model(모델 이름)이 주어지면 WHISPER_MODEL 대신 그 모델로 변환합니다. (tier_scheduler)
+        """
+        model = self.whisper_for(whisper_model)
+        if batch_size > 1:
+            transcribed = self._transcribe_segments_batched(model, segments, waveform, sr, batch_size, on_segment)
+        else:
+            transcribed = self._transcribe_segments_sequential(model, segments, waveform, sr, on_segment)
+        SPEECH_SEGMENTS.inc(len(transcribed))
+        return transcribed
+
+    def _transcribe_segments_sequential(self, model, segments, waveform, sr, on_segment=None):
+        transcribed = []
         for seg in segments:
             start_sample = int(seg['start'] * sr)
             end_sample = int(seg['end'] * sr)
@@ -59,7 +312,136 @@ class AudioProcessor:
                 continue
                 
             audio_float32 = segment_audio.astype(np.float32)
-            result = self.whisper_model.transcribe(audio_float32, language="ko")
-            seg["text"] = result["text"].strip()
+            seg["text"] = self._transcribe_one(model, audio_float32)
+            transcribed.append(seg)
+            if on_segment is not None:
+                on_segment(seg)
             
-        return [seg for seg in segments if "text" in seg]
+        return transcribed
+
+    def _transcribe_one(self, model, audio_float32):
+        result = model.transcribe(audio_float32, language="ko")
+        return result["text"].strip()
+
+    def _transcribe_segments_batched(self, model, segments, waveform, sr, batch_size, on_segment=None):
+        """
+        30초 이하 구간을 batch_size개씩 묶어 한 번의 디코더 패스로 STT합니다.
+        각 구간의 mel은 transcribe()와 같은 방식으로 만들고, 온도 fallback이나
+        다음 창 탐색이 필요한 구간만 transcribe()로 다시 처리하므로 결과는 구간별 처리와 같습니다.
+        """
+        # 모델이 로드된 뒤에만 호출되므로 여기서 임포트해도 추가 비용 없음
+        import torch
+        import whisper
+        from whisper.audio import N_FRAMES, N_SAMPLES
+        from whisper.tokenizer import get_tokenizer
+
+        fp16 = model.device != torch.device("cpu")
+        options = whisper.DecodingOptions(language="ko", temperature=0.0, fp16=fp16)
+        tokenizer = get_tokenizer(model.is_multilingual, num_languages=model.num_languages,
+                                  language="ko", task="transcribe")
+
+        def decode_batch(batch):
+            mels, sizes = [], []
+            for _, audio_float32 in batch:
+                mel = whisper.log_mel_spectrogram(audio_float32, model.dims.n_mels, padding=N_SAMPLES)
+                size = min(N_FRAMES, mel.shape[-1] - N_FRAMES)
+                mels.append(whisper.pad_or_trim(mel[:, :size], N_FRAMES))
+                sizes.append(size)
+
+            mel_batch = torch.stack(mels).to(model.device).to(torch.float16 if fp16 else torch.float32)
+            results = whisper.decode(model, mel_batch, options)
+
+            for (seg, audio_float32), result, size in zip(batch, results, sizes):
+                text = _first_window_text(result, tokenizer, size)
+                seg["text"] = text.strip() if text is not None else self._transcribe_one(model, audio_float32)
+                if on_segment is not None:
+                    on_segment(seg)
+
+        # 구간이 도착하는 대로 batch_size개가 모이면 바로 디코딩 (segments가 제너레이터여도 검출과 겹쳐 실행됨)
+        received, pending = [], []
+        for seg in segments:
+            segment_audio = waveform[int(seg['start'] * sr):int(seg['end'] * sr)]
+            if len(segment_audio) < sr:
+                continue
+            received.append(seg)
+
+            audio_float32 = segment_audio.astype(np.float32)
+            if len(audio_float32) > N_SAMPLES:
+                # 30초를 넘는 구간은 여러 창을 이어서 디코딩해야 하므로 기존 방식 사용
+                seg["text"] = self._transcribe_one(model, audio_float32)
+                if on_segment is not None:
+                    on_segment(seg)
+            else:
+                pending.append((seg, audio_float32))
+                if len(pending) == batch_size:
+                    decode_batch(pending)
+                    pending = []
+        if pending:
+            decode_batch(pending)
+
+        return received
+
+
+def _as_numpy(value) -> np.ndarray:
+    """TF 텐서는 numpy 배열로 바꾸고, TFLite 백엔드의 numpy 배열은 그대로 반환합니다."""
+    return value.numpy() if hasattr(value, "numpy") else np.asarray(value)
+
+
+def _frame_slice(chunks, chunk_starts, start, end, key):
+    """창별로 나뉘어 저장된 프레임 특징에서 [start, end) 프레임 범위를 이어 붙입니다. (없는 특징은 None)"""
+    parts = []
+    for chunk, chunk_start in zip(chunks, chunk_starts):
+        if key not in chunk:
+            return None
+        chunk_end = chunk_start + len(chunk[key])
+        if chunk_end > start and chunk_start < end:
+            parts.append(chunk[key][max(start - chunk_start, 0):end - chunk_start])
+    return np.concatenate(parts) if parts else None
+
+
+def _find_runs(mask):
+    """불리언 배열에서 True가 연속된 구간의 (시작 인덱스 배열, 끝 인덱스 배열(미포함))을 반환합니다."""
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], mask.astype(np.int8), [0]))))
+    return edges[0::2], edges[1::2]
+
+
+def _first_window_text(result, tokenizer, segment_size):
+    """
+    30초 이하 오디오에 대해 whisper.transcribe()가 반환하는 text를 첫 창의 디코딩 결과로 재현합니다.
+    온도 fallback이 필요하거나 다음 창을 이어서 디코딩해야 하면 None을 반환합니다.
+    """
+    needs_fallback = (result.compression_ratio > _COMPRESSION_RATIO_THRESHOLD
+                      or result.avg_logprob < _LOGPROB_THRESHOLD)
+    if result.no_speech_prob > _NO_SPEECH_THRESHOLD and result.avg_logprob < _LOGPROB_THRESHOLD:
+        needs_fallback = False  # 무음
+    if needs_fallback:
+        return None
+
+    if result.no_speech_prob > _NO_SPEECH_THRESHOLD and not result.avg_logprob > _LOGPROB_THRESHOLD:
+        return ""
+
+    tokens = list(result.tokens)
+    is_timestamp = [t >= tokenizer.timestamp_begin for t in tokens]
+    single_timestamp_ending = is_timestamp[-2:] == [False, True]
+    consecutive = [i + 1 for i in range(len(tokens) - 1) if is_timestamp[i] and is_timestamp[i + 1]]
+
+    if not consecutive:
+        return tokenizer.decode(tokens)
+
+    slices = consecutive + ([len(tokens)] if single_timestamp_ending else [])
+    if not single_timestamp_ending:
+        last_timestamp_pos = tokens[slices[-1] - 1] - tokenizer.timestamp_begin
+        # 타임스탬프 토큰 하나는 mel 2프레임에 해당
+        if last_timestamp_pos * 2 < segment_size:
+            return None  # 마지막 타임스탬프 이후 오디오를 다음 창에서 이어서 디코딩해야 함
+
+    all_tokens = []
+    last_slice = 0
+    for current_slice in slices:
+        sliced = tokens[last_slice:current_slice]
+        last_slice = current_slice
+        # transcribe()와 같이 길이가 0이거나 텍스트가 없는 구간은 버림
+        if sliced[0] == sliced[-1] or not tokenizer.decode(sliced).strip():
+            continue
+        all_tokens.extend(sliced)
+    return tokenizer.decode(all_tokens)
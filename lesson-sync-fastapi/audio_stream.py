@@ -0,0 +1,256 @@
+import logging
+import os
+import sys
+import tempfile
+import threading
+from typing import Iterator, NamedTuple, Optional, Tuple
+
+import librosa
+import numpy as np
+import soundfile as sf
+import soxr
+
+from config import settings
+from metrics import in_context
+
+logger = logging.getLogger(__name__)
+
+TARGET_SR = 16000
+_DTYPE = np.float32
+_ITEM_SIZE = np.dtype(_DTYPE).itemsize
+# 스풀 파일 이름: lesson-wave-<소유 프로세스 pid>-XXXX.f32 (purge_stale_spools가 pid로 주인 없는 파일을 찾음)
+_SPOOL_PREFIX = "lesson-wave-"
+
+
+class WaveformRef(NamedTuple):
+    """
+    다른 프로세스(모델 워커, 모델 서버)에 넘기는 파형 설명자. 파형 대신 (스풀 파일, 시작 샘플, 길이)만 pickle됩니다.
+    open()으로 만든 파형은 같은 파일을 메모리 매핑해 읽으므로 복사가 없고, 스풀 파일을 소유하지 않습니다.
+    """
+    path: str
+    offset: int
+    length: int
+    sr: int = TARGET_SR
+
+    def open(self) -> "SpooledWaveform":
+        return SpooledWaveform(self.path, self.sr, offset=self.offset, length=self.length, owner=False)
+
+
+class SpooledWaveform:
+    """
+    디스크에 저장된 16kHz mono float32 PCM 파형.
+    슬라이싱(waveform[a:b])은 요청한 구간을 메모리 매핑한 뷰를 반환하므로(copy-on-write) 파일을 복사해 읽지 않고,
+    같은 파일을 여는 프로세스들은 페이지 캐시(WAVEFORM_SPOOL_DIR가 /dev/shm이면 공유 메모리)를 함께 사용합니다.
+    녹음 길이와 관계없이 프로세스 메모리 사용량이 일정하게 유지됩니다.
+    owner=False(WaveformRef.open)이면 close해도 스풀 파일을 지우지 않습니다. 파일은 만든 프로세스가 지웁니다.
+    """
+
+    def __init__(self, path: str, sr: int = TARGET_SR, offset: int = 0, length: Optional[int] = None,
+                 owner: bool = True):
+        self.path = path
+        self.sr = sr
+        self._offset = offset
+        self._length = os.path.getsize(path) // _ITEM_SIZE - offset if length is None else length
+        self._owner = owner
+
+    def __len__(self) -> int:
+        return self._length
+
+    @property
+    def duration(self) -> float:
+        return self._length / self.sr
+
+    def __getitem__(self, item) -> np.ndarray:
+        if not isinstance(item, slice):
+            raise TypeError("SpooledWaveform은 슬라이스 접근만 지원합니다")
+        start, stop, step = item.indices(self._length)
+        if stop <= start:
+            return np.zeros(0, dtype=_DTYPE)
+        data = np.memmap(self.path, dtype=_DTYPE, mode="c", offset=(self._offset + start) * _ITEM_SIZE,
+                         shape=(stop - start,)).view(np.ndarray)
+        return data[::step] if step != 1 else data
+
+    def ref(self, start: int = 0, stop: Optional[int] = None) -> WaveformRef:
+        """[start, stop) 구간의 설명자 (다른 프로세스에서 WaveformRef.open()으로 복사 없이 엶)"""
+        start, stop, _ = slice(start, stop).indices(self._length)
+        return WaveformRef(self.path, self._offset + start, max(stop - start, 0), self.sr)
+
+    def iter_windows(self, window_samples: int, overlap_samples: int = 0) -> Iterator[Tuple[int, np.ndarray]]:
+        """(시작 샘플, 블록) 단위로 파형을 순회합니다. 각 블록 뒤에 overlap_samples만큼을 덧붙입니다."""
+        for start in range(0, max(self._length, 1), window_samples):
+            yield start, self[start:start + window_samples + overlap_samples]
+
+    def close(self):
+        if self._owner and os.path.exists(self.path):
+            os.remove(self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class GrowingWaveform(SpooledWaveform):
+    """
+    디코딩 스레드가 뒤에 이어 쓰는 동안 앞부분을 읽을 수 있는 SpooledWaveform. (decode_progressively 참고)
+    len()은 지금까지 디코딩된 길이이고, 아직 디코딩되지 않은 구간을 슬라이싱하면 디코딩될 때까지 기다립니다.
+    """
+
+    def __init__(self, path: str, sr: int = TARGET_SR):
+        super().__init__(path, sr)
+        self._cond = threading.Condition()
+        self._finished = False
+        self._closed = False
+        self._error: Optional[BaseException] = None
+
+    def wait_for(self, samples: int) -> int:
+        """samples개 이상 디코딩되거나 디코딩이 끝날 때까지 기다린 뒤 지금까지의 길이를 반환합니다."""
+        with self._cond:
+            while self._length < samples and not self._finished:
+                self._cond.wait()
+            if self._error is not None:
+                raise self._error
+            return self._length
+
+    def __getitem__(self, item) -> np.ndarray:
+        if isinstance(item, slice) and item.stop is not None and item.stop >= 0:
+            self.wait_for(item.stop)
+        else:
+            self.wait_for(sys.maxsize)
+        return super().__getitem__(item)
+
+    def _extend(self, samples: int):
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("파형이 이미 닫혔습니다")
+            self._length += samples
+            self._cond.notify_all()
+
+    def _finish(self, error: Optional[BaseException] = None):
+        with self._cond:
+            self._finished = True
+            self._error = error
+            self._cond.notify_all()
+
+    def close(self):
+        # 디코딩 스레드는 다음 블록을 쓸 때 멈춤
+        with self._cond:
+            self._closed = True
+        super().close()
+
+
+class _GrowingWriter:
+    def __init__(self, out, waveform: GrowingWaveform):
+        self._out = out
+        self._waveform = waveform
+
+    def write(self, data: bytes):
+        self._out.write(data)
+        self._out.flush()
+        self._waveform._extend(len(data) // _ITEM_SIZE)
+
+
+def decode_progressively(source, sr: int = TARGET_SR, block_seconds: float = 5.0) -> GrowingWaveform:
+    """
+    백그라운드 스레드에서 블록 단위로 디코딩하면서, 디코딩된 앞부분을 바로 읽을 수 있는 파형을 반환합니다.
+    source는 soundfile이 읽을 수 있는 파일 경로나 파일 객체입니다. (업로드 중인 파일처럼 읽을 때 기다리는 객체도 가능)
+    디코딩 오류는 파형을 읽는 쪽에서 발생합니다. source가 읽기 중 발생한 오류를 error 속성에 남기면 그 오류를 사용합니다.
+    """
+    fd, spool_path = _create_spool()
+    os.close(fd)
+    waveform = GrowingWaveform(spool_path, sr)
+
+    def decode():
+        error = None
+        try:
+            with open(spool_path, "wb") as out:
+                _stream_decode(source, sr, block_seconds, _GrowingWriter(out, waveform))
+            error = getattr(source, "error", None)
+        except Exception as e:
+            error = e
+        waveform._finish(error)
+
+    threading.Thread(target=in_context(decode), name="audio-decode", daemon=True).start()
+    return waveform
+
+
+def decode_to_spool(source_path: str, sr: int = TARGET_SR, block_seconds: float = 30.0) -> SpooledWaveform:
+    """
+    오디오 파일을 블록 단위로 디코딩/리샘플링하여 디스크에 저장합니다.
+    soundfile이 읽을 수 없는 포맷(m4a 등)은 librosa.load로 한 번에 디코딩합니다.
+    """
+    fd, spool_path = _create_spool()
+    try:
+        with os.fdopen(fd, "wb") as out:
+            try:
+                _stream_decode(source_path, sr, block_seconds, out)
+            except sf.LibsndfileError:
+                logger.warning("스트리밍 디코딩을 지원하지 않는 포맷입니다. 전체 디코딩으로 대체합니다.")
+                out.seek(0)
+                out.truncate()
+                waveform, _ = librosa.load(source_path, sr=sr, mono=True)
+                block = int(block_seconds * sr)
+                for start in range(0, len(waveform), block):
+                    out.write(np.asarray(waveform[start:start + block], dtype=_DTYPE).tobytes())
+    except Exception:
+        os.remove(spool_path)
+        raise
+    return SpooledWaveform(spool_path, sr)
+
+
+def _spool_dir() -> str:
+    return settings.WAVEFORM_SPOOL_DIR or tempfile.gettempdir()
+
+
+def _create_spool() -> Tuple[int, str]:
+    return tempfile.mkstemp(prefix=f"{_SPOOL_PREFIX}{os.getpid()}-", suffix=".f32", dir=_spool_dir())
+
+
+def purge_stale_spools() -> int:
+    """
+    만든 프로세스가 이미 종료된 스풀 파일을 지우고 지운 개수를 반환합니다. (서버 시작 시 호출)
+    워커는 스풀 파일을 지우지 않으므로 워커가 비정상 종료되어도 파일은 소유 프로세스가 정리하고,
+    소유 프로세스 자체가 비정상 종료되어 남은 파일은 여기서 정리됩니다.
+    """
+    removed = 0
+    directory = _spool_dir()
+    for name in os.listdir(directory):
+        if not (name.startswith(_SPOOL_PREFIX) and name.endswith(".f32")):
+            continue
+        pid = name[len(_SPOOL_PREFIX):].split("-", 1)[0]
+        if not pid.isdigit() or _process_alive(int(pid)):
+            continue
+        try:
+            os.remove(os.path.join(directory, name))
+            removed += 1
+        except FileNotFoundError:
+            pass
+    if removed:
+        logger.info(f"종료된 프로세스의 파형 스풀 파일 {removed}개 삭제")
+    return removed
+
+
+def _process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _stream_decode(source_path: str, sr: int, block_seconds: float, out):
+    with sf.SoundFile(source_path) as f:
+        blocksize = max(1, int(block_seconds * f.samplerate))
+        resampler = soxr.ResampleStream(f.samplerate, sr, 1, dtype="float32") if f.samplerate != sr else None
+
+        for block in f.blocks(blocksize=blocksize, dtype="float32", always_2d=True):
+            mono = block.mean(axis=1, dtype=_DTYPE)
+            if resampler is not None:
+                mono = resampler.resample_chunk(mono)
+            out.write(mono.tobytes())
+
+        if resampler is not None:
+            out.write(resampler.resample_chunk(np.zeros(0, dtype=_DTYPE), last=True).tobytes())
@@ -0,0 +1,188 @@
+"""
+추론 백엔드 벤치마크 (inference_backends).
+
+합성 레슨 녹음(bench_pipeline과 같은 방식)으로 백엔드와 스레드 수마다
+  - YAMNet:  extract_speech_segments_stream (녹음 전체)
+  - Whisper: transcribe_segments (합성할 때 기록한 말소리 구간)
+을 실행해 실시간 배율(RTF = 처리 시간 / 오디오 길이)과 코어당 RTF(RTF x 스레드 수), 로드 시간, 최대 RSS,
+TensorFlow 임포트 여부를 JSON으로 기록합니다. 각 백엔드의 결과는 첫 번째 백엔드(기준)와 비교합니다.
+  - YAMNet:  기준 구간과 겹치는 길이 비율, 구간 라벨 일치율
+  - Whisper: 기준 텍스트와의 문자 유사도 (difflib, 1.0이면 같음)
+스레드 수와 메모리를 따로 재기 위해 조합마다 별도 프로세스에서 실행합니다.
+
+사용법:
+    python benchmarks/bench_inference_backends.py --minutes 2 --threads 1 2 4 --output bench_backends.json
+    python benchmarks/bench_inference_backends.py --random-weights --models whisper   # 모델 다운로드가 불가능한 환경
+    MODEL_DIR=models python benchmarks/bench_inference_backends.py --yamnet-backends tf tflite --models yamnet
+"""
+import argparse
+import copy
+import difflib
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+os.environ.setdefault("OPENAI_API_KEY", "bench")
+
+from bench_pipeline import SR, _git_revision, _overlap_seconds, _rss_mb, make_lesson_audio  # noqa: E402
+from inference_backends import WHISPER_BACKENDS, YAMNET_BACKENDS  # noqa: E402
+
+MODELS = ["yamnet", "whisper"]
+
+
+def _set_threads(model: str, backend: str, threads: int):
+    import torch
+    torch.set_num_threads(threads)
+    if model == "yamnet" and backend == "tf":
+        import tensorflow as tf
+        tf.config.threading.set_intra_op_parallelism_threads(threads)
+        tf.config.threading.set_inter_op_parallelism_threads(1)
+
+
+def _run_yamnet(conf, workdir, backend, threads):
+    import librosa
+    import inference_backends
+    from audio_processor import AudioProcessor
+    from config import settings
+
+    waveform, _ = librosa.load(os.path.join(workdir, "lesson.wav"), sr=SR, mono=True)
+    processor = AudioProcessor()
+    start = time.perf_counter()
+    if backend == "tflite":
+        processor.yamnet_model = inference_backends.TFLiteYamnet(
+            *inference_backends.tflite_yamnet_paths(settings.MODEL_DIR), num_threads=threads)
+    processor.class_names
+    load_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    segments = list(processor.iter_speech_segments_stream(waveform, SR, classify=True))
+    seconds = time.perf_counter() - start
+    return {"seconds": seconds, "load_seconds": load_seconds, "audio_seconds": len(waveform) / SR,
+            "segments": segments}
+
+
+def _run_whisper(conf, workdir, backend, threads):
+    import librosa
+    from audio_processor import AudioProcessor
+    from config import settings
+    from inference_backends import quantize_whisper
+
+    waveform, _ = librosa.load(os.path.join(workdir, "lesson.wav"), sr=SR, mono=True)
+    with open(os.path.join(workdir, "truth.json")) as f:
+        segments = json.load(f)
+    processor = AudioProcessor()
+    start = time.perf_counter()
+    if conf["random_weights"]:
+        from bench_whisper_batch import _load_model
+        model = _load_model(settings.WHISPER_MODEL, True)
+        processor.whisper_model = quantize_whisper(model) if backend == "torch-int8" else model
+    processor.whisper_model
+    load_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    results = processor.transcribe_segments(copy.deepcopy(segments), waveform, SR,
+                                            batch_size=settings.WHISPER_BATCH_SIZE)
+    seconds = time.perf_counter() - start
+    return {"seconds": seconds, "load_seconds": load_seconds,
+            "audio_seconds": sum(seg["end"] - seg["start"] for seg in segments),
+            "text": " ".join(seg["text"] for seg in results)}
+
+
+def _run_child(model: str, backend: str, threads: int, workdir: str):
+    with open(os.path.join(workdir, "config.json")) as f:
+        conf = json.load(f)
+    _set_threads(model, backend, threads)
+    rss_before = _rss_mb()
+    result = globals()[f"_run_{model}"](conf, workdir, backend, threads)
+    result.update({"threads": threads, "rtf": result["seconds"] / result["audio_seconds"],
+                   "rss_before_mb": rss_before, "peak_rss_mb": _rss_mb(),
+                   "tensorflow_imported": "tensorflow" in sys.modules})
+    result["rtf_per_core"] = result["rtf"] * threads
+    print(json.dumps(result, ensure_ascii=False))
+
+
+def _parity(model: str, result: dict, reference: dict) -> dict:
+    """기준 백엔드 결과와의 일치 정도"""
+    if model == "whisper":
+        return {"text_similarity": difflib.SequenceMatcher(None, reference["text"], result["text"]).ratio()}
+    segments, expected = result["segments"], reference["segments"]
+    expected_seconds = sum(seg["end"] - seg["start"] for seg in expected)
+    same_labels = sum(a == b for a, b in zip(segments, expected)) if len(segments) == len(expected) else 0
+    return {"overlap_ratio": _overlap_seconds(expected, segments) / expected_seconds if expected_seconds else None,
+            "same_segments_ratio": same_labels / len(expected) if expected else None}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--minutes", type=float, default=2.0, help="합성 레슨 녹음 길이(분)")
+    parser.add_argument("--speech-ratio", type=float, default=0.4)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--models", nargs="+", default=MODELS, choices=MODELS)
+    parser.add_argument("--yamnet-backends", nargs="+", default=list(YAMNET_BACKENDS), choices=YAMNET_BACKENDS)
+    parser.add_argument("--whisper-backends", nargs="+", default=list(WHISPER_BACKENDS), choices=WHISPER_BACKENDS)
+    parser.add_argument("--threads", nargs="+", type=int, default=[1], help="측정할 스레드 수 목록")
+    parser.add_argument("--random-weights", action="store_true",
+                        help="Whisper 가중치를 내려받지 않고 같은 구조의 임의 가중치로 측정 (텍스트 유사도는 의미 없음)")
+    parser.add_argument("--output", help="결과를 저장할 JSON 파일 경로")
+    parser.add_argument("--child", nargs=4, metavar=("MODEL", "BACKEND", "THREADS", "WORKDIR"),
+                        help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        model, backend, threads, workdir = args.child
+        _run_child(model, backend, int(threads), workdir)
+        return
+
+    conf = {"minutes": args.minutes, "speech_ratio": args.speech_ratio, "seed": args.seed,
+            "random_weights": args.random_weights}
+    results = {"config": conf,
+               "environment": {"python": platform.python_version(), "platform": platform.platform(),
+                               "cpu_count": os.cpu_count(), "git_revision": _git_revision()},
+               "models": {}}
+    backends = {"yamnet": args.yamnet_backends, "whisper": args.whisper_backends}
+    with tempfile.TemporaryDirectory() as workdir:
+        truth = make_lesson_audio(os.path.join(workdir, "lesson.wav"), args.minutes, args.speech_ratio, args.seed)
+        print(f"합성 녹음 {args.minutes}분 (말소리 {len(truth)}구간)")
+        with open(os.path.join(workdir, "truth.json"), "w") as f:
+            json.dump(truth, f)
+        with open(os.path.join(workdir, "config.json"), "w") as f:
+            json.dump(conf, f)
+
+        for model in [m for m in MODELS if m in args.models]:
+            reference = {}
+            for backend in backends[model]:
+                for threads in args.threads:
+                    env = {**os.environ, f"{model.upper()}_BACKEND": backend, "OMP_NUM_THREADS": str(threads)}
+                    proc = subprocess.run([sys.executable, __file__, "--child", model, backend, str(threads), workdir],
+                                          capture_output=True, text=True, env=env)
+                    name = f"{model}/{backend}/{threads}"
+                    if proc.returncode != 0:
+                        error = (proc.stderr.strip().splitlines() or ["unknown error"])[-1]
+                        results["models"][name] = {"error": error}
+                        print(f"{name:>24}: 실패 - {error}")
+                        continue
+                    result = json.loads(proc.stdout.strip().splitlines()[-1])
+                    # 스레드 수가 같은 첫 번째 백엔드를 기준으로 비교
+                    result.update(_parity(model, result, reference.setdefault(threads, dict(result))))
+                    result.pop("segments", None)
+                    result.pop("text", None)
+                    results["models"][name] = result
+                    parity = ", ".join(f"{key} {result[key]:.3f}" for key in ("overlap_ratio", "text_similarity")
+                                       if result.get(key) is not None)
+                    print(f"{name:>24}: RTF {result['rtf']:.3f} (코어당 {result['rtf_per_core']:.3f}), "
+                          f"load {result['load_seconds']:.1f} s, peak RSS {result['peak_rss_mb']:.0f} MB, {parity}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
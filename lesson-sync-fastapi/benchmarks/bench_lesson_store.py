@@ -0,0 +1,78 @@
+"""
+레슨 저장소 조회 벤치마크.
+
+레슨 N개(레슨마다 주석 40개, 보정 스크립트 약 3천 자)를 저장한 뒤 다음 조회 시간을 잽니다.
+  - measure:        한 악보의 특정 마디에 대한 모든 레슨의 지시어
+  - measure_all:    악보 구분 없이 특정 마디의 지시어
+  - search:         보정 스크립트/요약 전문 검색 (FTS5)
+  - get_lesson:     레슨 하나의 전체 결과
+
+사용법:
+    python benchmarks/bench_lesson_store.py --lessons 1000 5000 --output bench_lesson_store.json
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lesson_store import LessonStore  # noqa: E402
+
+_DIRECTIVES = ["부드럽다 연주", "크레센도 점점 크게", "스타카토 짧다 가볍다", "레가토 잇다", "비브라토 넣다"]
+
+
+def populate(store: LessonStore, lessons: int, seed: int = 0):
+    rng = random.Random(seed)
+    for i in range(lessons):
+        annotations = [(rng.randint(1, 120), rng.choice(_DIRECTIVES)) for _ in range(40)]
+        transcript = " ".join(f"{m}마디는 {d}로 해주세요." for m, d in annotations) * 3
+        store.save_lesson({"speech_segments": [{"start": 0.0, "end": 30.0, "text": transcript[:200]}],
+                           "corrected_transcript": transcript, "summary": f"레슨 {i} 요약"},
+                          annotations, score_id=f"score-{i % 20}", title=f"레슨 {i}")
+
+
+def measure(fn, repeat: int) -> float:
+    fn()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lessons", type=int, nargs="+", default=[1000])
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--output", help="결과를 저장할 JSON 파일 경로")
+    args = parser.parse_args()
+
+    results = []
+    for lessons in args.lessons:
+        with tempfile.TemporaryDirectory() as tmp:
+            store = LessonStore(os.path.join(tmp, "lessons.db"))
+            start = time.perf_counter()
+            populate(store, lessons)
+            print(f"{lessons} lessons stored in {time.perf_counter() - start:.2f} s")
+            queries = [
+                ("measure", lambda: store.annotations_for_measure(23, score_id="score-3")),
+                ("measure_all", lambda: store.annotations_for_measure(23, limit=20)),
+                ("search", lambda: store.search("크레센도 점점", limit=20)),
+                ("get_lesson", lambda: store.get_lesson(lessons // 2)),
+            ]
+            for name, fn in queries:
+                seconds = measure(fn, args.repeat)
+                results.append({"lessons": lessons, "query": name, "ms_per_query": seconds * 1000})
+                print(f"{lessons:>6} lessons {name:>12}: {seconds * 1000:8.3f} ms/query")
+            store.close()
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+마디 번호 인식 처리량 벤치마크 (형태소 분석 제외).
+
+긴 보정 스크립트에서 마디 언급을 찾아 번호로 바꾸고 중복을 거르는 단계만 비교합니다.
+  - legacy: 숫자 단어를 `(?:...)+`로 반복하는 기존 정규식 + 결과 리스트를 any()로 훑는 중복 검사
+  - current: score_annotator의 숫자 문법 정규식 + set 중복 검사
+
+사용법:
+    python benchmarks/bench_measure_parser.py --mentions 100 1000 10000 --output bench_measure.json
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import score_annotator  # noqa: E402
+
+_LEGACY_WORDS = ['한', '두', '세', '네', '다섯', '여섯', '일곱', '여덟', '아홉', '열', '스무', '서른', '마흔', '쉰',
+                 '일', '이', '삼', '사', '오', '육', '칠', '팔', '구', '십', '백', '천']
+_LEGACY_RE = re.compile(rf"(?:((?:\d+|{'|'.join(_LEGACY_WORDS)})+)\s*(?:번째\s*)?마디|"
+                        rf"마디\s*((?:\d+|{'|'.join(_LEGACY_WORDS)})+))")
+
+_PHRASES = ["{n}마디를 보면 부드럽게 연주해 주세요.", "마디 {n} 이제 크레센도로 점점 크게.",
+            "{n}번째 마디는 스타카토로 짧게.", "{n}마디부터 {m}마디까지 레가토로 이어주세요.",
+            "여기 마디 사이에서 숨을 쉬고 이제 다시 해볼까요?"]
+
+
+def make_transcript(mentions: int) -> str:
+    # 앞부분 마디를 반복해서 언급하므로 중복 검사 비용도 함께 커짐
+    return " ".join(_PHRASES[i % len(_PHRASES)].format(n=i % 500 + 1, m=i % 500 + 4) for i in range(mentions))
+
+
+def legacy(text: str):
+    measures = []
+    for match in _LEGACY_RE.finditer(text):
+        measure = score_annotator._convert_korean_to_int(match.group(1) or match.group(2))
+        if measure == 0 or any(m == measure for m in measures):
+            continue
+        measures.append(measure)
+    return measures
+
+
+def current(text: str):
+    measures, seen = [], set()
+    for match in score_annotator._MEASURE_RE.finditer(text):
+        for measure in score_annotator._match_measures(match):
+            if measure not in seen:
+                seen.add(measure)
+                measures.append(measure)
+    return measures
+
+
+def measure(fn, text: str, repeat: int) -> float:
+    fn(text)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn(text)
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mentions", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--output", help="결과를 저장할 JSON 파일 경로")
+    args = parser.parse_args()
+
+    results = []
+    for mentions in args.mentions:
+        text = make_transcript(mentions)
+        for name, fn in [("legacy", legacy), ("current", current)]:
+            seconds = measure(fn, text, args.repeat)
+            results.append({"mentions": mentions, "chars": len(text), "mode": name,
+                            "ms_per_text": seconds * 1000, "mb_per_second": len(text) / seconds / 1e6})
+            print(f"{mentions:>6} mentions {name:>8}: {seconds * 1000:9.2f} ms/text")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
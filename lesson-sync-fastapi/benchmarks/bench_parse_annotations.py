@@ -0,0 +1,83 @@
+"""
+parse_annotations 처리량 벤치마크.
+
+합성한 보정 스크립트(마디 언급 N개)에 대해 세 가지 방식을 비교합니다.
+  - per_span: 마디 구간마다 okt.pos를 호출 (기존 방식)
+  - batched:  텍스트 전체를 한 번 형태소 분석하고 위치로 나눔 (캐시 미사용)
+  - cached:   같은 텍스트를 다시 요청한 경우 (결과 캐시 적중)
+
+사용법:
+    python benchmarks/bench_parse_annotations.py --mentions 5 20 80 --output bench_parse.json
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import score_annotator  # noqa: E402
+
+_DIRECTIVES = ["부드럽게 연주해 주세요.", "크레센도로 점점 크게 해볼까요?", "스타카토는 짧고 가볍게.",
+               "활을 길게 쓰면서 레가토로 이어주세요.", "비브라토를 조금 더 넣을 거예요."]
+
+
+def make_transcript(mentions: int) -> str:
+    return " ".join(f"좋아요 이제 {i + 1}마디를 보면 {_DIRECTIVES[i % len(_DIRECTIVES)]}" for i in range(mentions))
+
+
+def per_span(text: str):
+    okt = score_annotator._get_okt()
+    matches = list(score_annotator._MEASURE_RE.finditer(text))
+    for i, match in enumerate(matches):
+        end = matches[i + 1].start() if i + 1 < len(matches) else len(text)
+        candidate = text[match.end():end].strip()
+        if candidate:
+            okt.pos(candidate, norm=True, stem=True)
+
+
+def batched(text: str):
+    score_annotator._parse_annotations(text)
+
+
+def cached(text: str):
+    score_annotator.parse_annotations(text)
+
+
+def measure(fn, text: str, repeat: int) -> float:
+    for _ in range(3):
+        fn(text)  # JVM JIT 워밍업
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn(text)
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mentions", type=int, nargs="+", default=[5, 20, 80])
+    parser.add_argument("--repeat", type=int, default=30)
+    parser.add_argument("--output", help="결과를 저장할 JSON 파일 경로")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    score_annotator._get_okt()
+    print(f"JVM/Okt 시작: {time.perf_counter() - start:.2f} s")
+
+    results = []
+    for mentions in args.mentions:
+        text = make_transcript(mentions)
+        for name, fn in [("per_span", per_span), ("batched", batched), ("cached", cached)]:
+            seconds = measure(fn, text, args.repeat)
+            results.append({"mentions": mentions, "mode": name, "ms_per_text": seconds * 1000,
+                            "texts_per_second": 1 / seconds})
+            print(f"{mentions:>4} mentions {name:>9}: {seconds * 1000:8.2f} ms/text")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
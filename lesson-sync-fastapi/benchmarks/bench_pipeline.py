@@ -0,0 +1,372 @@
+"""
+레슨 파이프라인 전체 벤치마크.
+
+말소리/연주가 번갈아 나오는 합성 레슨 녹음(길이, 말소리 비율 지정)을 만들고
+각 단계를 따로, 그리고 전체 파이프라인을 처음부터 끝까지 실행해 처리 시간, 최대 RSS, 처리량을 JSON으로 기록합니다.
+  - decode:           librosa.load (16kHz mono)
+  - speech_detection: AudioProcessor.extract_speech_segments (YAMNet)
+  - transcription:    AudioProcessor.transcribe_segments (Whisper, 앞 단계에서 찾은 구간)
+  - annotation:       parse_annotations (합성 보정 스크립트)
+  - end_to_end:       run_lesson_pipeline + parse_annotations (LLM은 지연 시간을 주입한 로컬 가짜 서버)
+모델 로드와 Okt 시작 시간은 측정에서 제외하고 load_seconds로 따로 보고합니다.
+최대 RSS를 단계별로 재기 위해 단계마다 별도 프로세스에서 실행합니다.
+
+사용법:
+    python benchmarks/bench_pipeline.py --minutes 10 --speech-ratio 0.4 --output bench_pipeline.json
+    python benchmarks/bench_pipeline.py --random-weights --stages decode transcription annotation
+    python benchmarks/bench_pipeline.py --baseline bench_pipeline.json --fail-threshold 20   # 이전 결과와 비교
+    SPEECH_QUEUE_SIZE=0 python benchmarks/bench_pipeline.py --stages end_to_end   # 검출/STT를 겹치지 않는 경우
+    LLM_STRUCTURED_OUTPUT=1 python benchmarks/bench_pipeline.py --stages end_to_end   # 보정/요약/지시어를 한 번에
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import soundfile as sf
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "test"))
+# config.Settings는 OPENAI_API_KEY가 필요함 (LLM 호출은 모두 가짜 서버로 감)
+os.environ.setdefault("OPENAI_API_KEY", "bench")
+
+STAGES = ["decode", "speech_detection", "transcription", "annotation", "end_to_end"]
+SOURCE_SR = 44100
+SR = 16000
+
+_DIRECTIVES = ["부드럽게 연주해 주세요.", "크레센도로 점점 크게 해볼까요?", "스타카토는 짧고 가볍게.",
+               "활을 길게 쓰면서 레가토로 이어주세요.", "비브라토를 조금 더 넣을 거예요."]
+_NUMERALS = ["1", "이", "삼", "4", "다섯", "여섯", "7", "팔", "12", "열세"]
+
+
+def make_transcript(mentions: int) -> str:
+    """마디 언급이 mentions개 들어 있는 합성 보정 스크립트"""
+    return " ".join(f"좋아요 이제 {_NUMERALS[i % len(_NUMERALS)]}마디를 보면 {_DIRECTIVES[i % len(_DIRECTIVES)]}"
+                    for i in range(mentions))
+
+
+def _speech_like(n: int, sr: int, rng) -> np.ndarray:
+    """성대 펄스(하모닉) + 포먼트 강조 + 음절 단위(약 4Hz) 진폭 변화로 말소리 비슷한 신호를 만듭니다."""
+    t = np.arange(n) / sr
+    f0 = rng.uniform(110, 220) * (1 + 0.08 * np.sin(2 * np.pi * rng.uniform(0.3, 1.0) * t))
+    phase = 2 * np.pi * np.cumsum(f0) / sr
+    formants = rng.choice([300, 500, 700, 1100, 1700, 2500], size=3, replace=False)
+    signal = np.zeros(n)
+    for k in range(1, 25):
+        weight = sum(np.exp(-((k * f0 - f) / 150.0) ** 2) for f in formants) + 0.05
+        signal += weight * np.sin(k * phase) / k
+    syllables = np.clip(np.sin(2 * np.pi * rng.uniform(3, 5) * t + rng.uniform(0, np.pi)), 0, None)
+    signal *= syllables + 0.05 * rng.standard_normal(n)
+    return 0.3 * signal / (np.abs(signal).max() + 1e-9)
+
+
+def _music_like(n: int, sr: int, rng) -> np.ndarray:
+    """비브라토가 있는 현악기 음을 0.5~1초 간격으로 바꿔 가며 연주하는 신호"""
+    signal = np.zeros(n)
+    note = int(sr * rng.uniform(0.5, 1.0))
+    for start in range(0, n, note):
+        m = min(note, n - start)
+        t = np.arange(m) / sr
+        freq = 196 * 2 ** (rng.integers(0, 24) / 12)
+        phase = 2 * np.pi * freq * t + 0.3 * np.sin(2 * np.pi * 5.5 * t)
+        tone = sum(np.sin(k * phase) / k ** 1.5 for k in range(1, 8))
+        envelope = np.minimum(1, np.minimum(t / 0.05, (m / sr - t) / 0.05))
+        signal[start:start + m] = tone * envelope
+    return 0.25 * signal / (np.abs(signal).max() + 1e-9)
+
+
+def make_lesson_audio(path: str, minutes: float, speech_ratio: float, seed: int = 0, sr: int = SOURCE_SR):
+    """
+    말소리와 연주 구간(각 3~15초)이 번갈아 나오는 합성 레슨 녹음을 블록 단위로 기록하고,
+    말소리 구간 목록(초)을 반환합니다. 구간 종류는 전체 중 말소리 길이가 speech_ratio에 가깝도록 고릅니다.
+    """
+    rng = np.random.default_rng(seed)
+    total = int(minutes * 60 * sr)
+    speech, written, speech_samples = [], 0, 0
+    with sf.SoundFile(path, "w", samplerate=sr, channels=1, subtype="PCM_16") as f:
+        while written < total:
+            n = min(int(rng.uniform(3, 15) * sr), total - written)
+            is_speech = speech_samples < speech_ratio * (written + n / 2)
+            if is_speech:
+                speech.append({"start": written / sr, "end": (written + n) / sr})
+                speech_samples += n
+                data = _speech_like(n, sr, rng)
+            else:
+                data = _music_like(n, sr, rng)
+            data += 0.003 * rng.standard_normal(n)
+            f.write(np.clip(data, -1, 1).astype(np.float32))
+            written += n
+    return speech
+
+
+def _overlap_seconds(a, b) -> float:
+    total, j = 0.0, 0
+    for seg in a:
+        while j < len(b) and b[j]["end"] <= seg["start"]:
+            j += 1
+        k = j
+        while k < len(b) and b[k]["start"] < seg["end"]:
+            total += min(seg["end"], b[k]["end"]) - max(seg["start"], b[k]["start"])
+            k += 1
+    return total
+
+
+# --- 단계별 실행 (자식 프로세스) ---
+
+def _rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _measure(run, repeat: int):
+    """run()을 repeat번 실행하고 (중앙값 초, 회차별 초, 마지막 결과)를 반환합니다."""
+    times, result = [], None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = run()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times), times, result
+
+
+def _audio_processor(conf):
+    from audio_processor import AudioProcessor
+    processor = AudioProcessor()
+    if conf["random_weights"]:
+        from bench_whisper_batch import _load_model
+        processor.whisper_model = _load_model(conf["whisper_model"], True)
+    return processor
+
+
+def _load_waveform(workdir: str):
+    import librosa
+    waveform, _ = librosa.load(os.path.join(workdir, "lesson.wav"), sr=SR, mono=True)
+    return waveform
+
+
+def _stage_decode(conf, workdir):
+    import librosa
+    path = os.path.join(workdir, "lesson.wav")
+    seconds, times, waveform = _measure(lambda: librosa.load(path, sr=SR, mono=True)[0], conf["repeat"])
+    audio_seconds = len(waveform) / SR
+    return {"seconds": seconds, "runs": times, "audio_seconds": audio_seconds,
+            "x_realtime": audio_seconds / seconds}
+
+
+def _stage_speech_detection(conf, workdir):
+    waveform = _load_waveform(workdir)
+    processor = _audio_processor(conf)
+    start = time.perf_counter()
+    processor.class_names
+    load_seconds = time.perf_counter() - start
+    seconds, times, segments = _measure(lambda: processor.extract_speech_segments(waveform, SR), conf["repeat"])
+    with open(os.path.join(workdir, "segments.json"), "w") as f:
+        json.dump(segments, f)
+    with open(os.path.join(workdir, "truth.json")) as f:
+        truth = json.load(f)
+    truth_seconds = sum(seg["end"] - seg["start"] for seg in truth)
+    detected_seconds = sum(seg["end"] - seg["start"] for seg in segments)
+    overlap = _overlap_seconds(truth, segments)
+    return {"seconds": seconds, "runs": times, "load_seconds": load_seconds,
+            "audio_seconds": len(waveform) / SR, "x_realtime": len(waveform) / SR / seconds,
+            "segments": len(segments), "speech_seconds": detected_seconds,
+            # 합성 말소리 구간 대비 검출 정도 (합성 신호라 절대값보다 실행 간 변화를 볼 것)
+            "recall": overlap / truth_seconds if truth_seconds else None,
+            "precision": overlap / detected_seconds if detected_seconds else None}
+
+
+def _stage_transcription(conf, workdir):
+    import copy
+    waveform = _load_waveform(workdir)
+    # 음성 구간 검출 단계를 실행하지 않았으면 합성할 때 기록한 말소리 구간을 사용
+    path = os.path.join(workdir, "segments.json")
+    if not os.path.exists(path):
+        path = os.path.join(workdir, "truth.json")
+    with open(path) as f:
+        segments = json.load(f)
+    processor = _audio_processor(conf)
+    start = time.perf_counter()
+    processor.whisper_model
+    load_seconds = time.perf_counter() - start
+    from config import settings
+    seconds, times, results = _measure(
+        lambda: processor.transcribe_segments(copy.deepcopy(segments), waveform, SR,
+                                              batch_size=settings.WHISPER_BATCH_SIZE), conf["repeat"])
+    speech_seconds = sum(seg["end"] - seg["start"] for seg in segments)
+    return {"seconds": seconds, "runs": times, "load_seconds": load_seconds, "segments": len(segments),
+            "segments_per_second": len(segments) / seconds if segments else None,
+            "speech_seconds": speech_seconds, "x_realtime": speech_seconds / seconds,
+            "batch_size": settings.WHISPER_BATCH_SIZE, "text_chars": sum(len(seg["text"]) for seg in results)}
+
+
+def _stage_annotation(conf, workdir):
+    import score_annotator
+    start = time.perf_counter()
+    score_annotator.warm_up()
+    load_seconds = time.perf_counter() - start
+    text = make_transcript(conf["mentions"])
+
+    def run():
+        # 결과 캐시 적중을 피하기 위해 매번 캐시를 비움 (실제 요청은 대부분 새 텍스트)
+        score_annotator._parse_annotations_cached.cache_clear()
+        return score_annotator.parse_annotations(text)
+    seconds, times, annotations = _measure(run, conf["repeat"])
+    return {"seconds": seconds, "runs": times, "load_seconds": load_seconds, "chars": len(text),
+            "chars_per_second": len(text) / seconds, "annotations": len(annotations)}
+
+
+def _stage_end_to_end(conf, workdir):
+    from fake_openai_server import FakeOpenAIServer, FakeResponse
+    from config import settings
+    import score_annotator
+
+    processor = _audio_processor(conf)
+    start = time.perf_counter()
+    processor.warm_up()
+    score_annotator.warm_up()
+    load_seconds = time.perf_counter() - start
+
+    transcript = make_transcript(conf["mentions"])
+    content = transcript
+    if settings.LLM_STRUCTURED_OUTPUT:
+        content = json.dumps({"corrected_transcript": transcript,
+                              "summary_sections": [{"title": "마디별 주의사항", "content": transcript[:500]}],
+                              "annotations": [{"measure": m, "directive": d}
+                                              for m, d in score_annotator.parse_annotations(transcript)]},
+                             ensure_ascii=False)
+    response = FakeResponse(content=content, delay=conf["llm_latency"])
+    with FakeOpenAIServer(default=response) as server:
+        settings.OPENAI_BASE_URL = server.base_url
+        from lesson_pipeline import run_lesson_pipeline
+        from summary_service import SummaryService
+        service = SummaryService()
+        path = os.path.join(workdir, "lesson.wav")
+
+        def run():
+            score_annotator._parse_annotations_cached.cache_clear()
+            result = run_lesson_pipeline(path, processor, service)
+            # 구조화 응답을 받았으면 지시어를 다시 파싱하지 않음 (/lesson-summary 저장과 같은 방식)
+            if "annotations" in result:
+                return result, result["annotations"]
+            return result, score_annotator.parse_annotations(result["corrected_transcript"])
+        seconds, times, (result, annotations) = _measure(run, conf["repeat"])
+        llm_requests = len(server.requests) / conf["repeat"]
+        llm_input_chars = sum(len(message["content"]) for request in server.requests
+                              for message in request["messages"]) / conf["repeat"]
+    with sf.SoundFile(path) as f:
+        audio_seconds = f.frames / f.samplerate
+    return {"seconds": seconds, "runs": times, "load_seconds": load_seconds, "audio_seconds": audio_seconds,
+            "x_realtime": audio_seconds / seconds, "segments": len(result["speech_segments"]),
+            "annotations": len(annotations), "llm_requests": llm_requests, "llm_input_chars": llm_input_chars,
+            "llm_structured": settings.LLM_STRUCTURED_OUTPUT, "llm_latency": conf["llm_latency"]}
+
+
+def _run_child(stage: str, workdir: str):
+    with open(os.path.join(workdir, "config.json")) as f:
+        conf = json.load(f)
+    rss_before = _rss_mb()
+    result = globals()[f"_stage_{stage}"](conf, workdir)
+    result.update({"rss_before_mb": rss_before, "peak_rss_mb": _rss_mb()})
+    print(json.dumps(result))
+
+
+# --- 실행 / 비교 ---
+
+def compare(results: dict, baseline: dict, threshold: float) -> bool:
+    """이전 결과와 단계별 시간/RSS를 비교해 출력하고, threshold(%) 이상 느려진 단계가 없으면 True"""
+    ok = True
+    for stage, current in results["stages"].items():
+        previous = baseline.get("stages", {}).get(stage)
+        if not previous or "seconds" not in current or "seconds" not in previous:
+            continue
+        time_change = (current["seconds"] / previous["seconds"] - 1) * 100
+        rss_change = (current["peak_rss_mb"] / previous["peak_rss_mb"] - 1) * 100
+        regressed = threshold is not None and time_change > threshold
+        ok = ok and not regressed
+        print(f"{stage:>17}: time {time_change:+6.1f}%, peak RSS {rss_change:+6.1f}%"
+              + ("  <- regression" if regressed else ""))
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--minutes", type=float, default=5.0, help="합성 레슨 녹음 길이(분)")
+    parser.add_argument("--speech-ratio", type=float, default=0.4, help="녹음 중 말소리 구간 비율 (0~1)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--stages", nargs="+", default=STAGES, choices=STAGES)
+    parser.add_argument("--repeat", type=int, default=1, help="단계마다 반복 실행 횟수 (중앙값 보고)")
+    parser.add_argument("--mentions", type=int, default=None,
+                        help="합성 보정 스크립트의 마디 언급 수 (기본: 녹음 1분당 4개)")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="가짜 LLM 응답 지연(초)")
+    parser.add_argument("--whisper-model", default="tiny")
+    parser.add_argument("--random-weights", action="store_true",
+                        help="Whisper 가중치를 내려받지 않고 같은 구조의 임의 가중치로 측정")
+    parser.add_argument("--output", help="결과를 저장할 JSON 파일 경로")
+    parser.add_argument("--baseline", help="비교할 이전 결과 JSON")
+    parser.add_argument("--fail-threshold", type=float, default=None,
+                        help="baseline보다 이 비율(%%) 이상 느려진 단계가 있으면 종료 코드 1")
+    parser.add_argument("--child", nargs=2, metavar=("STAGE", "WORKDIR"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        _run_child(*args.child)
+        return
+
+    conf = {"minutes": args.minutes, "speech_ratio": args.speech_ratio, "seed": args.seed,
+            "repeat": args.repeat, "mentions": args.mentions or max(1, round(args.minutes * 4)),
+            "llm_latency": args.llm_latency, "whisper_model": args.whisper_model,
+            "random_weights": args.random_weights}
+    results = {"config": conf,
+               "environment": {"python": platform.python_version(), "platform": platform.platform(),
+                               "cpu_count": os.cpu_count(), "git_revision": _git_revision()},
+               "stages": {}}
+    with tempfile.TemporaryDirectory() as workdir:
+        start = time.perf_counter()
+        truth = make_lesson_audio(os.path.join(workdir, "lesson.wav"), args.minutes, args.speech_ratio, args.seed)
+        print(f"합성 녹음 {args.minutes}분 (말소리 {len(truth)}구간) 생성: {time.perf_counter() - start:.1f} s")
+        with open(os.path.join(workdir, "truth.json"), "w") as f:
+            json.dump(truth, f)
+        with open(os.path.join(workdir, "config.json"), "w") as f:
+            json.dump(conf, f)
+
+        # 정의된 순서대로 실행 (transcription은 speech_detection의 결과 구간을 사용)
+        for stage in [s for s in STAGES if s in args.stages]:
+            proc = subprocess.run([sys.executable, __file__, "--child", stage, workdir],
+                                  capture_output=True, text=True)
+            if proc.returncode != 0:
+                error = (proc.stderr.strip().splitlines() or ["unknown error"])[-1]
+                results["stages"][stage] = {"error": error}
+                print(f"{stage:>17}: 실패 - {error}")
+                continue
+            result = json.loads(proc.stdout.strip().splitlines()[-1])
+            results["stages"][stage] = result
+            rate = f", {result['x_realtime']:.1f}x realtime" if result.get("x_realtime") else ""
+            print(f"{stage:>17}: {result['seconds']:8.3f} s, peak RSS {result['peak_rss_mb']:8.1f} MB{rate}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if not compare(results, baseline, args.fail_threshold):
+            sys.exit(1)
+
+
+def _git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+악보 정렬 DTW 벤치마크 (score_alignment.align_chroma).
+
+임의의 음표로 만든 긴 악보 크로마에서, 녹음 길이만큼의 연주 구간을 잘라 템포를 0.6~1.6배로 바꾸고
+잡음을 더한 크로마를 만들어 (오디오 디코딩/크로마 계산 제외, DTW만)
+  - multiscale: ALIGNMENT_FACTORS 다중 해상도 + 띠 DTW (현재 방식)
+  - full:       전체 비용 행렬 부분열 DTW (--full-max-cells보다 크면 건너뜀)
+의 시간, 구간 하나의 최대 메모리(tracemalloc), 찾은 위치 오차(악보 프레임)를 비교합니다.
+
+사용법:
+    python benchmarks/bench_score_alignment.py --audio-minutes 10 60 --score-minutes 20 --output bench_align.json
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from score_alignment import ALIGNMENT_FACTORS, FEATURE_RATE, _normalize, align_chroma  # noqa: E402
+
+
+def make_score(minutes: float, rng) -> np.ndarray:
+    """0.25~1초 길이의 음(기음 + 5도 배음)을 이어 붙인 악보 크로마"""
+    frames = int(minutes * 60 * FEATURE_RATE)
+    chroma = np.zeros((frames, 12), dtype=np.float32)
+    position = 0
+    while position < frames:
+        length = int(rng.integers(FEATURE_RATE // 4, FEATURE_RATE + 1))
+        pitch = rng.integers(12)
+        chroma[position:position + length, pitch] = 1.0
+        chroma[position:position + length, (pitch + 7) % 12] = 0.3
+        position += length
+    return _normalize(chroma)
+
+
+def make_regions(score: np.ndarray, minutes: float, region_seconds: float, rng):
+    """녹음 minutes분을 region_seconds초 연주 구간들로 만들고 [(크로마, 악보 시작 프레임, 악보 끝 프레임)]을 반환"""
+    regions = []
+    for _ in range(max(1, int(minutes * 60 / region_seconds))):
+        tempo = rng.uniform(0.6, 1.6)  # 악보 대비 연주 속도
+        frames = int(region_seconds * FEATURE_RATE)
+        span = int(frames * tempo)
+        start = int(rng.integers(0, max(1, len(score) - span)))
+        positions = np.minimum(start + (np.arange(frames) * tempo).astype(int), len(score) - 1)
+        noisy = score[positions] + 0.3 * rng.random((frames, 12)).astype(np.float32)
+        regions.append((_normalize(noisy), start, positions[-1]))
+    return regions
+
+
+def run(method: str, regions, score: np.ndarray) -> dict:
+    factors = ALIGNMENT_FACTORS if method == "multiscale" else (1,)
+    start = time.perf_counter()
+    errors = []
+    for query, first, last in regions:
+        path, _ = align_chroma(query, score, factors=factors)
+        errors.append(max(abs(int(path[0, 1]) - first), abs(int(path[-1, 1]) - last)))
+    seconds = time.perf_counter() - start
+    # tracemalloc은 할당마다 느려지므로 메모리는 가장 긴 구간 하나로 따로 측정
+    tracemalloc.start()
+    align_chroma(max(regions, key=lambda region: len(region[0]))[0], score, factors=factors)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"seconds": seconds, "peak_mb": peak / 1024 / 1024,
+            "max_error_seconds": max(errors) / FEATURE_RATE,
+            "median_error_seconds": float(np.median(errors)) / FEATURE_RATE}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--audio-minutes", nargs="+", type=float, default=[10, 60], help="연주 구간 전체 길이(분)")
+    parser.add_argument("--score-minutes", type=float, default=20.0, help="악보 길이(분)")
+    parser.add_argument("--region-seconds", type=float, default=120.0, help="연주 구간 하나의 길이(초)")
+    parser.add_argument("--full-max-cells", type=float, default=2e8,
+                        help="전체 DTW를 실행할 최대 비용 행렬 칸 수 (녹음 프레임 x 악보 프레임)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="결과를 저장할 JSON 파일 경로")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    score = make_score(args.score_minutes, rng)
+    results = {"config": vars(args), "runs": []}
+    for minutes in args.audio_minutes:
+        regions = make_regions(score, minutes, args.region_seconds, rng)
+        cells = sum(len(query) for query, _, _ in regions) * len(score)
+        for method in ("multiscale", "full"):
+            if method == "full" and cells > args.full_max_cells:
+                print(f"{minutes:6.1f}분 {method:>10}: 건너뜀 (비용 행렬 {cells:.1e}칸)")
+                continue
+            result = {"audio_minutes": minutes, "method": method, **run(method, regions, score)}
+            results["runs"].append(result)
+            print(f"{minutes:6.1f}분 {method:>10}: {result['seconds']:7.2f} s, peak {result['peak_mb']:7.1f} MB, "
+                  f"위치 오차 최대 {result['max_error_seconds']:.1f} s (중앙값 {result['median_error_seconds']:.1f} s)")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+악보 주석 쓰기 벤치마크.
+
+합성한 오케스트라 악보(파트 P개 x 마디 M개)의 첫 파트에 지시어 N개를 쓰는 시간을 비교합니다.
+  - etree:   ElementTree로 전체 트리를 읽고 <direction>을 넣은 뒤 전체를 다시 직렬화
+  - indexed: score_writer로 마디 색인을 만들고 바이트 위치에 끼워 넣기 (색인 캐시 미사용)
+  - cached:  같은 악보에 다시 주석을 쓰는 경우 (색인 캐시 적중)
+
+사용법:
+    python benchmarks/bench_score_writer.py --parts 1 16 --measures 300 --output bench_score_writer.json
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import xml.etree.ElementTree as ET
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import score_writer  # noqa: E402
+
+_NOTE = "      <note><pitch><step>A</step><octave>4</octave></pitch><duration>1</duration><type>eighth</type></note>\n"
+
+
+def make_score(parts: int, measures: int, notes: int = 8) -> bytes:
+    lines = ['<?xml version="1.0" encoding="UTF-8"?>\n<score-partwise version="4.0">\n']
+    for p in range(1, parts + 1):
+        lines.append(f'  <part id="P{p}">\n')
+        for m in range(1, measures + 1):
+            lines.append(f'    <measure number="{m}">\n' + _NOTE * notes + "    </measure>\n")
+        lines.append("  </part>\n")
+    lines.append("</score-partwise>\n")
+    return "".join(lines).encode("utf-8")
+
+
+def etree(xml: bytes, annotations):
+    root = ET.fromstring(xml)
+    part = root.find("part")
+    measures = {m.get("number"): m for m in part.findall("measure")}
+    for measure, directive in annotations:
+        element = measures.get(str(measure))
+        if element is not None:
+            direction = ET.Element("direction")
+            ET.SubElement(ET.SubElement(direction, "direction-type"), "words").text = directive
+            element.insert(0, direction)
+    return ET.tostring(root, encoding="utf-8")
+
+
+def indexed(xml: bytes, annotations):
+    score_writer.measure_index.cache_clear()
+    return score_writer.annotate_musicxml(xml, annotations)
+
+
+def cached(xml: bytes, annotations):
+    return score_writer.annotate_musicxml(xml, annotations)
+
+
+def measure(fn, xml: bytes, annotations, repeat: int) -> float:
+    fn(xml, annotations)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn(xml, annotations)
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--parts", type=int, nargs="+", default=[1, 16])
+    parser.add_argument("--measures", type=int, default=300)
+    parser.add_argument("--annotations", type=int, default=40)
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--output", help="결과를 저장할 JSON 파일 경로")
+    args = parser.parse_args()
+
+    annotations = [(i * args.measures // args.annotations + 1, "점점 크게") for i in range(args.annotations)]
+    results = []
+    for parts in args.parts:
+        xml = make_score(parts, args.measures)
+        for name, fn in [("etree", etree), ("indexed", indexed), ("cached", cached)]:
+            seconds = measure(fn, xml, annotations, args.repeat)
+            results.append({"parts": parts, "measures": args.measures, "bytes": len(xml), "mode": name,
+                            "ms_per_score": seconds * 1000})
+            print(f"{parts:>3} parts ({len(xml) / 1e6:5.1f} MB) {name:>8}: {seconds * 1000:8.2f} ms/score")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+무음 게이트 벤치마크 (silence_gate + AudioProcessor._gated_yamnet).
+
+말소리/연주 구간 사이에 조용한 구간(배경 소음 -50dBFS)을 silence-ratio만큼 섞은 합성 레슨 녹음마다
+SILENCE_GATE를 끄고/켜고 iter_speech_segments_stream(classify=True)를 실행해
+처리 시간, YAMNet에 넘긴 프레임 비율, 속도 향상, 게이트를 끈 결과와의 구간 일치 정도를 JSON으로 기록합니다.
+
+기본은 설정(MODEL_DIR/YAMNET_BACKEND)대로 YAMNet을 로드합니다. 모델을 내려받을 수 없는 환경에서는
+--fake-model로 YAMNet과 같은 프레임 나누기와 비슷한 프레임당 연산량을 가진 임의 가중치 모델을 사용합니다.
+(이 경우 구간 일치 정도는 프레임 에너지로 만든 Speech 점수 기준)
+
+사용법:
+    python benchmarks/bench_silence_gate.py --minutes 10 --silence-ratios 0 0.25 0.5 0.75 --output bench_gate.json
+    python benchmarks/bench_silence_gate.py --fake-model --minutes 5
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+
+import numpy as np
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+os.environ.setdefault("OPENAI_API_KEY", "bench")
+
+from bench_pipeline import SR, _git_revision, _music_like, _overlap_seconds, _speech_like  # noqa: E402
+
+
+class _FakeYamnet:
+    """
+    YAMNet과 같은 방식으로 패딩/프레임을 나누고, 프레임마다 임의 가중치 층 두 개를 계산하는 모델.
+    hidden=4096이면 프레임당 곱셈 수(약 6,800만)가 YAMNet(MobileNetV1, 약 6,900만)과 비슷합니다.
+    Speech 점수는 프레임 에너지로 만듭니다.
+    """
+
+    def __init__(self, hidden: int = 4096):
+        rng = np.random.default_rng(0)
+        self._hidden = (rng.standard_normal((15600, hidden)) / 125).astype(np.float32)
+        self._projection = (rng.standard_normal((hidden, 1024)) / np.sqrt(hidden)).astype(np.float32)
+
+    def class_map_path(self):
+        return None
+
+    def __call__(self, waveform):
+        window, hop = 15600, 7680
+        padded_len = window + -(-(max(len(waveform), window) - window) // hop) * hop
+        padded = np.pad(np.asarray(waveform, dtype=np.float32), (0, padded_len - len(waveform)))
+        frames = np.lib.stride_tricks.sliding_window_view(padded, window)[::hop]
+        embeddings = np.tanh(np.maximum(frames @ self._hidden, 0) @ self._projection)
+        energy = np.abs(frames).mean(axis=1)
+        scores = np.stack([np.full_like(energy, 0.25), np.minimum(energy * 10, 1.0), 1 - np.minimum(energy * 10, 1.0)],
+                          axis=1)
+        return scores, embeddings, None
+
+
+def make_recording(minutes: float, silence_ratio: float, seed: int):
+    """말소리/연주(3~15초)와 조용한 구간(5~60초)이 섞인 16kHz 파형과 말소리 구간 목록"""
+    rng = np.random.default_rng(seed)
+    total = int(minutes * 60 * SR)
+    parts, speech, written, silent = [], [], 0, 0
+    while written < total:
+        if silent < silence_ratio * written or (silence_ratio >= 1 and not written):
+            n = min(int(rng.uniform(5, 60) * SR), total - written)
+            data = np.zeros(n)
+            silent += n
+        else:
+            n = min(int(rng.uniform(3, 15) * SR), total - written)
+            if rng.random() < 0.5:
+                speech.append({"start": written / SR, "end": (written + n) / SR})
+                data = _speech_like(n, SR, rng)
+            else:
+                data = _music_like(n, SR, rng)
+        parts.append((data + 0.003 * rng.standard_normal(n)).astype(np.float32))
+        written += n
+    return np.concatenate(parts), speech, silent / total
+
+
+def run(processor, waveform):
+    import metrics
+    processor.__dict__.pop("_silence_output", None)
+    counter = metrics.YAMNET_FRAMES
+    before = {gate: counter.labels(gate)._value.get() for gate in ("analyzed", "skipped")}
+    start = time.perf_counter()
+    segments = list(processor.iter_speech_segments_stream(waveform, SR, classify=True))
+    seconds = time.perf_counter() - start
+    frames = {gate: counter.labels(gate)._value.get() - before[gate] for gate in before}
+    return seconds, segments, frames["analyzed"] / max(frames["analyzed"] + frames["skipped"], 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--minutes", type=float, default=10.0, help="합성 녹음 길이(분)")
+    parser.add_argument("--silence-ratios", nargs="+", type=float, default=[0.0, 0.25, 0.5, 0.75])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--fake-model", action="store_true", help="YAMNet 대신 비슷한 연산량의 임의 가중치 모델 사용")
+    parser.add_argument("--fake-hidden", type=int, default=4096, help="임의 가중치 모델의 은닉층 크기 (프레임당 연산량)")
+    parser.add_argument("--output", help="결과를 저장할 JSON 파일 경로")
+    args = parser.parse_args()
+
+    import audio_processor
+    from audio_processor import AudioProcessor
+
+    processor = AudioProcessor()
+    if args.fake_model:
+        processor.yamnet_model = _FakeYamnet(args.fake_hidden)
+        processor.class_names = ["Music", "Speech", "Silence"]
+    processor.class_names
+
+    results = {"config": vars(args),
+               "environment": {"python": platform.python_version(), "platform": platform.platform(),
+                               "cpu_count": os.cpu_count(), "git_revision": _git_revision()},
+               "runs": []}
+    for silence_ratio in args.silence_ratios:
+        waveform, truth, actual_ratio = make_recording(args.minutes, silence_ratio, args.seed)
+        result = {"silence_ratio": actual_ratio}
+        outputs = {}
+        for gate in (False, True):
+            audio_processor.settings.SILENCE_GATE = gate
+            seconds, segments, analyzed = run(processor, waveform)
+            outputs[gate] = segments
+            result["gate" if gate else "no_gate"] = {"seconds": seconds, "analyzed_frames_ratio": analyzed,
+                                                     "segments": len(segments)}
+        expected_seconds = sum(seg["end"] - seg["start"] for seg in outputs[False])
+        result["speedup"] = result["no_gate"]["seconds"] / result["gate"]["seconds"]
+        result["overlap_ratio"] = (_overlap_seconds(outputs[False], outputs[True]) / expected_seconds
+                                   if expected_seconds else None)
+        result["same_labels"] = [s.get("label") for s in outputs[False]] == [s.get("label") for s in outputs[True]]
+        results["runs"].append(result)
+        print(f"무음 {actual_ratio:4.0%}: 게이트 없음 {result['no_gate']['seconds']:6.2f} s, "
+              f"게이트 {result['gate']['seconds']:6.2f} s (YAMNet 프레임 {result['gate']['analyzed_frames_ratio']:.0%}), "
+              f"속도 x{result['speedup']:.2f}, 구간 겹침 {result['overlap_ratio'] or 0:.3f}, "
+              f"라벨 일치 {result['same_labels']}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
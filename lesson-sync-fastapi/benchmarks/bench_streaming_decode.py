@@ -0,0 +1,102 @@
+"""
+스트리밍 디코딩 메모리 벤치마크.
+
+합성한 긴 WAV 파일(기본 0.5/1/2시간)을 두 가지 방식으로 처리하고 프로세스 최대 RSS를 비교합니다.
+  - full:   업로드 바이트 전체를 읽은 뒤 librosa.load (기존 방식)
+  - stream: decode_to_spool로 블록 디코딩 후 YAMNet 입력 창 단위로 순회
+
+사용법:
+    python benchmarks/bench_streaming_decode.py --hours 0.5 1 2 --output bench_decode.json
+"""
+import argparse
+import io
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import soundfile as sf
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+SOURCE_SR = 44100
+
+
+def make_synthetic_wav(path: str, hours: float, sr: int = SOURCE_SR):
+    """말소리/연주/무음이 번갈아 나오는 합성 레슨 녹음을 블록 단위로 기록합니다."""
+    rng = np.random.default_rng(0)
+    block = 60 * sr
+    total = int(hours * 3600 * sr)
+    with sf.SoundFile(path, "w", samplerate=sr, channels=1, subtype="PCM_16") as f:
+        for start in range(0, total, block):
+            n = min(block, total - start)
+            t = (start + np.arange(n)) / sr
+            kind = (start // block) % 3
+            if kind == 0:
+                data = 0.2 * rng.standard_normal(n)
+            elif kind == 1:
+                data = 0.3 * np.sin(2 * np.pi * 440 * t)
+            else:
+                data = np.zeros(n)
+            f.write(np.clip(data, -1, 1).astype(np.float32))
+
+
+def _run_child(mode: str, path: str):
+    start = time.perf_counter()
+    if mode == "full":
+        import librosa
+        with open(path, "rb") as f:
+            audio_bytes = f.read()
+        waveform, _ = librosa.load(io.BytesIO(audio_bytes), sr=16000, mono=True)
+        samples = len(waveform)
+    else:
+        from audio_stream import decode_to_spool
+        samples = 0
+        with decode_to_spool(path) as waveform:
+            # audio_processor의 YAMNet 창 설정과 동일 (TensorFlow 임포트 비용을 측정에서 제외)
+            window = 125 * 7680
+            for _, block in waveform.iter_windows(window, 15600 - 7680):
+                samples += min(len(block), window)
+    elapsed = time.perf_counter() - start
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(json.dumps({"samples": samples, "seconds": elapsed, "peak_rss_mb": peak_kb / 1024}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--hours", type=float, nargs="+", default=[0.5, 1.0, 2.0])
+    parser.add_argument("--modes", nargs="+", default=["full", "stream"], choices=["full", "stream"])
+    parser.add_argument("--output", help="결과를 저장할 JSON 파일 경로")
+    parser.add_argument("--child", nargs=2, metavar=("MODE", "PATH"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        _run_child(*args.child)
+        return
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for hours in args.hours:
+            path = os.path.join(tmp, f"lesson_{hours}h.wav")
+            make_synthetic_wav(path, hours)
+            for mode in args.modes:
+                # 최대 RSS를 독립적으로 측정하기 위해 모드마다 별도 프로세스에서 실행
+                out = subprocess.run([sys.executable, __file__, "--child", mode, path],
+                                     check=True, capture_output=True, text=True).stdout
+                result = {"hours": hours, "mode": mode, **json.loads(out.strip().splitlines()[-1])}
+                results.append(result)
+                print(f"{hours:>5}h {mode:>6}: peak RSS {result['peak_rss_mb']:8.1f} MB, "
+                      f"{result['seconds']:6.1f} s")
+            os.remove(path)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+API 프로세스 -> 모델 워커 프로세스 파형 전달 벤치마크.
+
+minutes분 길이의 16kHz 녹음을 만들고, 워커 프로세스(spawn)가 말소리 구간(segment-seconds초, 구간 사이 같은 길이)마다
+파형을 잘라 RMS를 계산하는 작업을 세 가지 전달 방식으로 실행해
+워커 호출 시간, 워커로 pickle되는 바이트 수, 작업을 마친 시점의 워커 전용 메모리(RssAnon)를 비교합니다.
+(메모리 매핑으로 읽은 페이지는 프로세스끼리 공유하는 페이지 캐시이므로 RssAnon에 포함되지 않음)
+  - array: API 프로세스가 디코딩한 파형(np.ndarray)을 그대로 인자로 전달 (pickle 복사)
+  - path:  오디오 파일 경로를 전달하고 워커가 다시 디코딩 (악보 정렬을 위해 API 프로세스도 디코딩하므로 두 번)
+  - ref:   API 프로세스가 한 번 디코딩한 스풀 파일의 WaveformRef만 전달하고 워커는 메모리 매핑으로 읽음 (현재 방식)
+각 방식의 시간에는 API 프로세스의 디코딩 시간이 포함됩니다.
+
+사용법:
+    python benchmarks/bench_waveform_handoff.py --minutes 30 60 --output bench_handoff.json
+    WAVEFORM_SPOOL_DIR=/dev/shm python benchmarks/bench_waveform_handoff.py   # 스풀 파일을 공유 메모리에
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import pickle
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import soundfile as sf
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("OPENAI_API_KEY", "bench")
+
+from audio_stream import TARGET_SR, WaveformRef, decode_to_spool  # noqa: E402
+
+
+def _segments(length: int, segment_seconds: float):
+    step = int(segment_seconds * TARGET_SR)
+    return [(start, start + step) for start in range(0, length - step + 1, 2 * step)]
+
+
+def _segment_rms(waveform, segment_seconds: float) -> float:
+    total = 0.0
+    for start, end in _segments(len(waveform), segment_seconds):
+        block = waveform[start:end]
+        total += float(np.sqrt(np.mean(block * block)))
+    return total
+
+
+def _anon_rss_mb() -> float:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("RssAnon:"):
+                return int(line.split()[1]) / 1024
+    return float("nan")
+
+
+def _worker(method: str, payload, segment_seconds: float):
+    start = time.perf_counter()
+    if method == "array":
+        value = _segment_rms(payload, segment_seconds)
+    elif method == "path":
+        with decode_to_spool(payload) as waveform:
+            value = _segment_rms(waveform, segment_seconds)
+    else:
+        value = _segment_rms(WaveformRef(*payload).open(), segment_seconds)
+    return value, time.perf_counter() - start, _anon_rss_mb()
+
+
+def _warm(_):
+    return os.getpid()
+
+
+def run(method: str, audio_path: str, segment_seconds: float) -> dict:
+    # 워커는 방식마다 새로 띄움 (프로세스 시작 시간은 측정에서 제외)
+    with ProcessPoolExecutor(1, mp_context=multiprocessing.get_context("spawn")) as pool:
+        pool.submit(_warm, None).result()
+        start = time.perf_counter()
+        with decode_to_spool(audio_path) as waveform:
+            if method == "array":
+                payload = waveform[0:len(waveform)].copy()
+            elif method == "path":
+                payload = audio_path
+            else:
+                payload = tuple(waveform.ref())
+            value, worker_seconds, worker_rss = pool.submit(_worker, method, payload, segment_seconds).result()
+        seconds = time.perf_counter() - start
+    return {"method": method, "seconds": seconds, "worker_seconds": worker_seconds,
+            "payload_bytes": len(pickle.dumps(payload, protocol=pickle.HIGHEST_PROTOCOL)),
+            "worker_anon_rss_mb": worker_rss, "checksum": value}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--minutes", nargs="+", type=float, default=[30.0], help="녹음 길이(분)")
+    parser.add_argument("--segment-seconds", type=float, default=5.0, help="말소리 구간 하나의 길이(초)")
+    parser.add_argument("--output", help="결과를 저장할 JSON 파일 경로")
+    args = parser.parse_args()
+
+    results = {"config": vars(args), "runs": []}
+    rng = np.random.default_rng(0)
+    for minutes in args.minutes:
+        with tempfile.TemporaryDirectory() as workdir:
+            audio_path = os.path.join(workdir, "lesson.wav")
+            sf.write(audio_path, 0.1 * rng.standard_normal(int(minutes * 60 * TARGET_SR)).astype(np.float32),
+                     TARGET_SR, subtype="PCM_16")
+            for method in ("array", "path", "ref"):
+                result = {"minutes": minutes, **run(method, audio_path, args.segment_seconds)}
+                results["runs"].append(result)
+                print(f"{minutes:5.1f}분 {method:>5}: {result['seconds']:6.2f} s (워커 {result['worker_seconds']:5.2f} s), "
+                      f"전달 {result['payload_bytes'] / 1024 / 1024:8.2f} MB, "
+                      f"워커 RssAnon {result['worker_anon_rss_mb']:7.1f} MB")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
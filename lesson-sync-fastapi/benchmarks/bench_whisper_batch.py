@@ -0,0 +1,96 @@
+"""
+Whisper 배치 STT 벤치마크.
+
+같은 음성 구간들을 구간별 transcribe()와 배치 디코딩으로 각각 처리하여
+초당 처리 구간 수(segments/s)와 결과 일치 여부를 보고합니다. (CPU 기준)
+
+사용법:
+    python benchmarks/bench_whisper_batch.py --audio lesson.wav --segments 32 --batch-size 8
+    python benchmarks/bench_whisper_batch.py --random-weights   # 모델 다운로드가 불가능한 환경
+"""
+import argparse
+import copy
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import torch
+import whisper
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from audio_processor import AudioProcessor  # noqa: E402
+
+SR = 16000
+
+
+def _load_model(name: str, random_weights: bool):
+    if not random_weights:
+        return whisper.load_model(name, device="cpu")
+    # 가중치 없이 tiny 구조만 만들어 연산량을 측정 (텍스트 품질은 의미 없음)
+    dims = whisper.ModelDimensions(n_mels=80, n_audio_ctx=1500, n_audio_state=384, n_audio_head=6,
+                                   n_audio_layer=4, n_vocab=51865, n_text_ctx=448, n_text_state=384,
+                                   n_text_head=6, n_text_layer=4)
+    torch.manual_seed(0)
+    model = whisper.model.Whisper(dims).eval()
+    # 디코더 위치 임베딩은 torch.empty로 만들어지므로 (체크포인트에서 덮어씀) 직접 초기화
+    torch.nn.init.normal_(model.decoder.positional_embedding, std=0.01)
+    return model
+
+
+def _make_segments(count: int, total_seconds: float, rng):
+    """2~10초 길이의 구간을 겹치지 않게 배치합니다."""
+    segments, cursor = [], 0.0
+    for _ in range(count):
+        duration = float(rng.uniform(2, 10))
+        if cursor + duration > total_seconds:
+            break
+        segments.append({"start": cursor, "end": cursor + duration})
+        cursor += duration + float(rng.uniform(0.5, 3))
+    return segments
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--audio", help="구간을 잘라낼 녹음 파일 (없으면 합성 잡음 사용)")
+    parser.add_argument("--model", default="tiny")
+    parser.add_argument("--random-weights", action="store_true")
+    parser.add_argument("--segments", type=int, default=24)
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--output", help="결과를 저장할 JSON 파일 경로")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    if args.audio:
+        import librosa
+        waveform, _ = librosa.load(args.audio, sr=SR, mono=True)
+    else:
+        waveform = (0.05 * rng.standard_normal(args.segments * 13 * SR)).astype(np.float32)
+    segments = _make_segments(args.segments, len(waveform) / SR, rng)
+
+    processor = AudioProcessor.__new__(AudioProcessor)
+    processor.whisper_model = _load_model(args.model, args.random_weights)
+
+    results = {}
+    outputs = {}
+    for mode, batch_size in [("sequential", 1), ("batched", args.batch_size)]:
+        start = time.perf_counter()
+        outputs[mode] = processor.transcribe_segments(copy.deepcopy(segments), waveform, SR, batch_size=batch_size)
+        elapsed = time.perf_counter() - start
+        results[mode] = {"seconds": elapsed, "segments_per_second": len(segments) / elapsed}
+        print(f"{mode:>10}: {len(segments)} segments in {elapsed:6.1f} s "
+              f"({results[mode]['segments_per_second']:.2f} segments/s)")
+
+    results["outputs_match"] = outputs["sequential"] == outputs["batched"]
+    results["speedup"] = results["sequential"]["seconds"] / results["batched"]["seconds"]
+    print(f"outputs match: {results['outputs_match']}, speedup: {results['speedup']:.2f}x")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
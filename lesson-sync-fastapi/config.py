@@ -1,7 +1,80 @@
+from typing import Optional
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 class Settings(BaseSettings):
     OPENAI_API_KEY: str
+    OPENAI_BASE_URL: Optional[str] = None  # OpenAI 호환 서버 주소 (테스트용 가짜 서버 등)
+
+    # LLM 호출 공통 정책
+    LLM_MAX_CONCURRENCY: int = 4            # 프로세스당 동시 LLM 호출 수
+    LLM_MAX_RETRIES: int = 5
+    LLM_TIMEOUT_SECONDS: float = 120.0
+    LLM_CIRCUIT_FAILURE_THRESHOLD: int = 5  # 연속 실패 시 회로 차단
+    LLM_CIRCUIT_RESET_SECONDS: float = 30.0
+    LLM_CHUNK_MAX_TOKENS: int = 1500        # 보정/부분 요약 한 번에 보내는 스크립트 분량
+    LLM_SUMMARY_MAX_INPUT_TOKENS: int = 6000  # 이보다 길면 부분 요약을 거쳐 계층적으로 요약
+    # True이면 스크립트를 한 번만 보내 보정/요약/마디별 지시어를 JSON 응답 하나로 받음
+    # (스크립트가 LLM_SUMMARY_MAX_INPUT_TOKENS보다 길거나 응답 검증에 실패하면 보정 -> 요약 두 번 호출로 처리)
+    LLM_STRUCTURED_OUTPUT: bool = False
+
+    # 비동기 레슨 처리 작업 큐 설정
+    JOB_WORKERS: int = 2                # 동시에 실행되는 레슨 작업 수
+    JOB_MAX_PENDING: int = 8            # 대기 + 실행 중 작업의 최대 개수 (초과 시 503)
+    JOB_RESULT_TTL_SECONDS: int = 3600  # 완료된 작업 결과 보관 시간
+    MODEL_WORKER_PROCESSES: int = 0     # 0이면 스레드에서, 1 이상이면 별도 프로세스에서 모델 단계 실행
+
+    # 모델 로드 설정
+    MODEL_DIR: str = ""                 # 지정하면 MODEL_DIR/yamnet, MODEL_DIR/whisper에서 모델을 로드
+    PRELOAD_MODELS: bool = False        # 서버 시작 시 모델을 미리 로드 (기본은 첫 사용 시 로드)
+    # 공유 모델 서버 (python model_server.py). 주소를 지정하면 모든 API 워커가 이 프로세스의 모델을 함께 사용
+    MODEL_SERVER_ADDRESS: str = ""      # 예: 127.0.0.1:50055
+    MODEL_SERVER_AUTHKEY: str = ""      # 필수 (모델 서버와 API 워커가 같은 값을 사용, 비어 있으면 시작하지 않음)
+    MODEL_SERVER_ALLOW_REMOTE: bool = False  # 루프백이 아닌 주소에 모델 서버를 바인딩하도록 허용
+    MODEL_SERVER_CONCURRENCY: int = 1   # 모델 서버에서 동시에 처리하는 요청 수
+
+    # 지시어 파싱 (/parse-directives/batch)
+    ANNOTATION_WORKERS: int = 4             # 하나의 Okt 인스턴스를 공유하며 병렬로 파싱하는 스레드 수
+    ANNOTATION_BATCH_MAX_TEXTS: int = 10000 # JSON 배치 요청 한 번에 받을 수 있는 텍스트 수 (JSONL 스트림은 제한 없음)
+
+    # 계측: True이면 X-Debug-Trace: 1 헤더를 보낸 요청에 단계별 처리 시간을 X-Debug-Trace 응답 헤더로 돌려줌
+    DEBUG_TRACE: bool = False
+
+    # Whisper 설정
+    WHISPER_MODEL: str = "tiny"
+    WHISPER_BATCH_SIZE: int = 8         # 배치 STT 크기 (1이면 구간별로 transcribe 호출)
+    # 추론 백엔드 (inference_backends 참고). CPU 서버에서는 tflite / torch-int8이 더 가볍고 빠름
+    YAMNET_BACKEND: str = "tf"          # tf | tflite (MODEL_DIR/yamnet_tflite/yamnet.tflite)
+    WHISPER_BACKEND: str = "torch"      # torch | torch-int8
+    # 부하에 따른 Whisper 티어 선택 (tier_scheduler 참고). 정확한 모델부터 "모델:처리 비율"을 쉼표로 나열
+    # (처리 비율: 오디오 1초의 모델 단계에 걸리는 초, 예: "small:0.6,base:0.25,tiny:0.1"). 비어 있으면 WHISPER_MODEL만 사용
+    WHISPER_TIERS: str = ""
+    LATENCY_TARGET_SECONDS: float = 600.0   # 대기 중인 작업까지 모델 단계가 끝나기를 바라는 시간
+    # 무음 게이트 (silence_gate 참고): 소리가 거의 없는 YAMNet 프레임은 모델을 실행하지 않고 무음으로 처리
+    SILENCE_GATE: bool = True
+    SILENCE_GATE_DBFS: float = -55.0    # 프레임 안의 가장 큰 RMS(32ms)가 이보다 작으면 무음
+    # 음성 구간 검출(YAMNet)과 STT(Whisper)를 겹쳐 실행할 때 검출된 구간을 넘기는 대기열 크기
+    # (가득 차면 검출이 STT를 기다림. 0이면 검출을 모두 마친 뒤 STT 시작)
+    SPEECH_QUEUE_SIZE: int = 64
+    # 구간 분류 라벨(teacher_speech, student_speech, mixed, music)별 STT 정책 (쉼표로 구분)
+    SKIP_SEGMENT_LABELS: str = "music"              # STT하지 않음 (응답에는 빈 text로 포함)
+    DEFER_SEGMENT_LABELS: str = "student_speech"    # 다른 구간을 모두 변환한 뒤에 STT
+
+    # 디코딩한 파형(16kHz float32)을 저장하는 디렉터리. 비어 있으면 임시 디렉터리
+    # 모델 워커/모델 서버는 이 파일을 메모리 매핑해 읽음 (/dev/shm으로 지정하면 디스크 대신 공유 메모리 사용)
+    WAVEFORM_SPOOL_DIR: str = ""
+
+    # 단계별 처리 결과 캐시 (디렉터리를 지정하면 활성화)
+    RESULT_CACHE_DIR: str = ""
+    RESULT_CACHE_MAX_MB: int = 512
+
+    # 레슨 결과 저장소 (SQLite 파일 경로를 지정하면 결과와 주석을 저장하고 /lessons로 조회)
+    LESSON_STORE_PATH: str = ""
+
+    # 이어 올리기 업로드 (/uploads)
+    UPLOAD_DIR: str = ""                    # 비어 있으면 임시 디렉터리 아래 lesson-sync-uploads
+    UPLOAD_MAX_BYTES: int = 2 * 1024 ** 3
+    UPLOAD_TTL_SECONDS: int = 86400         # 만든 뒤 이 시간이 지난 업로드는 삭제
+    UPLOAD_STALL_SECONDS: float = 120.0     # 받는 중에 처리할 때 데이터가 이 시간 동안 오지 않으면 작업 실패
 
     model_config = SettingsConfigDict(env_file='.env', env_file_encoding='utf-8')
 
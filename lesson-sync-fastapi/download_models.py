@@ -0,0 +1,38 @@
+"""
+YAMNet/Whisper 모델을 로컬 모델 디렉터리(MODEL_DIR)에 내려받습니다.
+오프라인 서버나 컨테이너 이미지에서는 이 디렉터리를 함께 배포하고 MODEL_DIR로 지정하면
+서버가 시작될 때 네트워크에 접근하지 않습니다.
+
+사용법:
+    python download_models.py --model-dir ./models --whisper tiny small
+"""
+import argparse
+import os
+import shutil
+
+import whisper
+
+from audio_processor import YAMNET_HANDLE
+from config import settings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model-dir", default=settings.MODEL_DIR or "models")
+    parser.add_argument("--whisper", nargs="+", default=[settings.WHISPER_MODEL], help="내려받을 Whisper 모델 이름")
+    args = parser.parse_args()
+
+    yamnet_dir = os.path.join(args.model_dir, "yamnet")
+    if not os.path.isdir(yamnet_dir):
+        import tensorflow_hub as hub
+        shutil.copytree(hub.resolve(YAMNET_HANDLE), yamnet_dir)
+    print(f"YAMNet: {yamnet_dir}")
+
+    whisper_dir = os.path.join(args.model_dir, "whisper")
+    for name in args.whisper:
+        path = whisper._download(whisper._MODELS[name], whisper_dir, in_memory=False)
+        print(f"Whisper {name}: {path}")
+
+
+if __name__ == "__main__":
+    main()
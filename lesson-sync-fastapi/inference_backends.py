@@ -0,0 +1,120 @@
+"""
+YAMNet/Whisper 추론 백엔드.
+
+설정(YAMNET_BACKEND, WHISPER_BACKEND)으로 모델을 실행하는 방식을 고릅니다. 서버가 CPU 전용이므로
+기본 백엔드보다 가볍고 빠른 CPU 백엔드를 함께 제공합니다.
+  - YAMNet  tf:         TF Hub/SavedModel (기본)
+            tflite:     MODEL_DIR/yamnet_tflite/yamnet.tflite (YAMNet export.py로 만든 모델)
+                        ai_edge_litert나 tflite_runtime이 설치되어 있으면 TensorFlow를 임포트하지 않음
+  - Whisper torch:      PyTorch 모델 (기본)
+            torch-int8: Linear 가중치를 int8로 동적 양자화한 PyTorch 모델 (CPU 전용)
+                        모델 구조와 디코딩 코드는 그대로이므로 배치 디코딩과 kv-cache를 그대로 사용
+                        (활성값 양자화 범위가 배치 전체로 정해지므로 배치 구성에 따라 결과가 조금 달라질 수 있음)
+
+백엔드마다 결과가 조금씩 다를 수 있으므로 단계별 캐시 키에 백엔드 이름이 포함됩니다.
+"""
+import logging
+import os
+import threading
+from functools import lru_cache
+from typing import Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+YAMNET_BACKENDS = ("tf", "tflite")
+WHISPER_BACKENDS = ("torch", "torch-int8")
+
+YAMNET_EMBEDDING_SIZE = 1024
+
+
+def check_backend(name: str, backends) -> str:
+    if name not in backends:
+        raise ValueError(f"알 수 없는 추론 백엔드: {name} (사용 가능: {', '.join(backends)})")
+    return name
+
+
+def _tflite_interpreter(model_path: str, num_threads: Optional[int] = None):
+    """가벼운 런타임을 먼저 찾고, 없으면 TensorFlow에 포함된 인터프리터를 사용합니다."""
+    try:
+        from ai_edge_litert.interpreter import Interpreter
+    except ImportError:
+        try:
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:
+            import tensorflow as tf
+            Interpreter = tf.lite.Interpreter
+    return Interpreter(model_path=model_path, num_threads=num_threads)
+
+
+class TFLiteYamnet:
+    """
+    TFLite로 변환한 YAMNet. SavedModel과 같이 가변 길이 파형을 받아 (scores, embeddings, spectrogram)을 반환합니다.
+    출력 순서는 변환 방식에 따라 달라지므로 마지막 차원 크기(클래스 수, 임베딩 크기)로 구분합니다.
+    인터프리터는 스레드 안전하지 않으므로 호출을 직렬화합니다.
+    """
+
+    def __init__(self, model_path: str, class_map_path: str, num_threads: Optional[int] = None):
+        import pandas as pd
+        self._class_map_path = class_map_path
+        num_classes = len(pd.read_csv(class_map_path))
+        self._interpreter = _tflite_interpreter(model_path, num_threads)
+        self._input = self._interpreter.get_input_details()[0]["index"]
+        outputs = {int(d["shape_signature"][-1]): d["index"] for d in self._interpreter.get_output_details()}
+        if num_classes not in outputs:
+            raise ValueError(f"{model_path}의 출력에 클래스 점수({num_classes}개)가 없습니다")
+        self._scores = outputs[num_classes]
+        self._embeddings = outputs.get(YAMNET_EMBEDDING_SIZE)
+        self._length: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def class_map_path(self) -> str:
+        return self._class_map_path
+
+    def __call__(self, waveform):
+        waveform = np.asarray(waveform, dtype=np.float32)
+        with self._lock:
+            if len(waveform) != self._length:
+                # 창 길이는 마지막 창을 빼면 같으므로 길이가 바뀔 때만 텐서를 다시 할당
+                self._interpreter.resize_tensor_input(self._input, [len(waveform)], strict=True)
+                self._interpreter.allocate_tensors()
+                self._length = len(waveform)
+            self._interpreter.set_tensor(self._input, waveform)
+            self._interpreter.invoke()
+            scores = self._interpreter.get_tensor(self._scores).copy()
+            embeddings = (self._interpreter.get_tensor(self._embeddings).copy()
+                          if self._embeddings is not None else None)
+        return scores, embeddings, None
+
+
+def tflite_yamnet_paths(model_dir: str):
+    """(yamnet.tflite 경로, yamnet_class_map.csv 경로)"""
+    path = os.path.join(model_dir, "yamnet_tflite")
+    return os.path.join(path, "yamnet.tflite"), os.path.join(path, "yamnet_class_map.csv")
+
+
+@lru_cache(maxsize=None)
+def load_tflite_yamnet(model_dir: str, num_threads: Optional[int] = None) -> TFLiteYamnet:
+    model_path, class_map_path = tflite_yamnet_paths(model_dir)
+    if not (os.path.isfile(model_path) and os.path.isfile(class_map_path)):
+        raise FileNotFoundError(f"{os.path.dirname(model_path)}에 yamnet.tflite와 yamnet_class_map.csv가 필요합니다 "
+                                "(tensorflow/models의 research/audioset/yamnet/export.py로 생성)")
+    logger.info(f"YAMNet 로드: {model_path} (tflite)")
+    return TFLiteYamnet(model_path, class_map_path, num_threads)
+
+
+def quantize_whisper(model):
+    """
+    Whisper의 Linear 층(어텐션 q/k/v/out, MLP) 가중치를 int8로 동적 양자화합니다. (CPU 전용)
+    활성값은 실행할 때 양자화되므로 보정 데이터가 필요 없습니다.
+    임베딩과 합성곱 층은 그대로 두며, 모델을 제자리에서 바꿉니다.
+    """
+    import torch
+    import whisper
+
+    # whisper.model.Linear는 가중치를 입력 dtype으로 바꾸는 것만 다르므로 CPU(fp32)에서는 nn.Linear와 같음
+    for module in model.modules():
+        if type(module) is whisper.model.Linear:
+            module.__class__ = torch.nn.Linear
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
@@ -0,0 +1,154 @@
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from metrics import JOB_QUEUE_DEPTH
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFullError(Exception):
+    """대기 중인 작업이 최대치에 도달해 새 작업을 받을 수 없을 때 발생합니다."""
+
+
+@dataclass
+class Job:
+    id: str
+    status: str = "queued"  # queued | running | done | failed
+    stage: str = "queued"
+    progress: float = 0.0
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    finished_at: Optional[float] = None
+    # 작업이 끝나면 완료되는 Future (결과와 오류는 result/error에 기록되며, Future의 값은 항상 None)
+    future: Optional[Future] = field(default=None, repr=False, compare=False)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "stage": self.stage,
+            "progress": round(self.progress, 3),
+            "result": self.result,
+            "error": self.error,
+        }
+
+
+class JobQueue:
+    """
+    레슨 처리 작업을 백그라운드 워커 풀에서 실행하는 작업 큐.
+    max_pending을 넘는 요청은 QueueFullError로 거절하여(admission control)
+    업로드가 몰려도 메모리를 무한정 사용하지 않도록 합니다.
+    """
+
+    def __init__(self, max_workers: int = 2, max_pending: int = 8, result_ttl: float = 3600):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="lesson-job")
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._result_ttl = result_ttl
+        self._jobs: Dict[str, Job] = {}
+        self._active = 0
+        self._lock = threading.Lock()
+
+    def submit(self, fn: Callable[..., Dict[str, Any]], *args, **kwargs) -> Job:
+        """
+        작업을 큐에 넣고 즉시 Job을 반환합니다.
+        fn은 progress=(stage, value) 콜백을 키워드 인자로 받아야 합니다.
+        """
+        with self.reserve() as submit:
+            return submit(fn, *args, **kwargs)
+
+    @contextmanager
+    def reserve(self) -> Iterator[Callable[..., Job]]:
+        """
+        작업 하나의 자리를 먼저 확보하고, 그 자리에 작업을 넣는 submit 함수를 제공합니다.
+        업로드를 받기 전에 거절할 수 있도록 자리가 없으면 바로 QueueFullError를 냅니다.
+        블록 안에서 submit하지 않고 나가면(업로드 실패 등) 자리를 돌려줍니다.
+        """
+        if not self._slots.acquire(blocking=False):
+            raise QueueFullError("처리 대기 중인 작업이 너무 많습니다")
+        submitted = False
+
+        def submit(fn: Callable[..., Dict[str, Any]], *args, **kwargs) -> Job:
+            nonlocal submitted
+            if submitted:
+                raise RuntimeError("확보한 자리에는 작업 하나만 넣을 수 있습니다")
+            submitted = True
+            return self._submit(fn, args, kwargs)
+
+        try:
+            yield submit
+        finally:
+            if not submitted:
+                self._slots.release()
+
+    def _submit(self, fn, args, kwargs) -> Job:
+        self._evict_expired()
+        job = Job(id=uuid.uuid4().hex)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._active += 1
+        JOB_QUEUE_DEPTH.inc()
+        try:
+            job.future = self._executor.submit(self._run, job, fn, args, kwargs)
+        except Exception:
+            self._finish(job)
+            raise
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def pending_count(self) -> int:
+        """대기 중이거나 실행 중인 작업 수"""
+        with self._lock:
+            return self._active
+
+    def queued_ages(self) -> List[float]:
+        """아직 실행을 시작하지 않은 작업들이 기다린 시간(초)"""
+        now = time.time()
+        with self._lock:
+            return [now - job.created_at for job in self._jobs.values() if job.status == "queued"]
+
+    def shutdown(self, wait: bool = True):
+        self._executor.shutdown(wait=wait)
+
+    def _run(self, job: Job, fn, args, kwargs):
+        job.status = "running"
+
+        def progress(stage: str, value: float):
+            job.stage = stage
+            job.progress = value
+
+        try:
+            job.result = fn(*args, progress=progress, **kwargs)
+            job.status = "done"
+            job.stage = "done"
+            job.progress = 1.0
+        except Exception as e:
+            logger.exception("작업 %s 처리 실패", job.id)
+            job.status = "failed"
+            job.error = str(e)
+        finally:
+            self._finish(job)
+
+    def _finish(self, job: Job):
+        job.finished_at = time.time()
+        with self._lock:
+            self._active -= 1
+        JOB_QUEUE_DEPTH.dec()
+        self._slots.release()
+
+    def _evict_expired(self):
+        now = time.time()
+        with self._lock:
+            expired = [job_id for job_id, job in self._jobs.items()
+                       if job.finished_at is not None and now - job.finished_at > self._result_ttl]
+            for job_id in expired:
+                del self._jobs[job_id]
@@ -0,0 +1,481 @@
+import hashlib
+import logging
+import queue
+import threading
+import time
+from contextlib import nullcontext
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+from audio_processor import AudioProcessor, SEGMENTER_VERSION
+from audio_stream import SpooledWaveform, WaveformRef, decode_progressively, decode_to_spool
+from config import settings
+from metrics import AUDIO_SECONDS, SEGMENT_LABELS, in_context, stage, timed
+from result_cache import ResultCache, cache_key, file_digest
+from score_alignment import ALIGNMENT_VERSION, align_lesson, assign_measures
+from segment_classifier import parse_labels
+from summary_service import (CHUNK_SUMMARY_SYSTEM_PROMPT, CORRECTION_SYSTEM_PROMPT, MODEL_NAME,
+                             STRUCTURED_SYSTEM_PROMPT, SUMMARY_SYSTEM_PROMPT)
+from tier_scheduler import TierScheduler
+
+logger = logging.getLogger(__name__)
+
+# 진행 상황 콜백: (단계 이름, 0.0~1.0 진행률)
+ProgressCallback = Callable[[str, float], None]
+# 부분 결과 콜백: (이벤트 이름, 데이터) - stage / segment / correction / summary
+EventCallback = Callable[[str, Dict[str, Any]], None]
+
+# 모델 워커 프로세스 안에서만 사용하는 AudioProcessor
+_worker_audio_processor = None
+
+
+@dataclass(frozen=True)
+class StageKeys:
+    """
+    단계별 캐시 키. 각 키는 이전 단계 키와 해당 단계의 모델/프롬프트 버전으로 만들어지므로
+    요약 프롬프트만 바뀌면 summary 키만 달라지고 앞 단계 결과는 그대로 재사용됩니다.
+    """
+    segments: str
+    transcript: str
+    corrected: str
+
+    @classmethod
+    def for_audio(cls, audio_digest: str, whisper_model: Optional[str] = None) -> "StageKeys":
+        gate = f"gate{settings.SILENCE_GATE_DBFS:g}" if settings.SILENCE_GATE else "nogate"
+        segments = cache_key("segments", audio_digest, "yamnet", settings.YAMNET_BACKEND, SEGMENTER_VERSION, gate)
+        transcript = cache_key("transcript", segments, "whisper", whisper_model or settings.WHISPER_MODEL,
+                               settings.WHISPER_BACKEND, "ko")
+        corrected = cache_key("corrected", transcript, MODEL_NAME, CORRECTION_SYSTEM_PROMPT,
+                              str(settings.LLM_CHUNK_MAX_TOKENS))
+        return cls(segments, transcript, corrected)
+
+    def alignment_for(self, score: bytes, part_id: Optional[str]) -> str:
+        return cache_key("alignment", self.transcript, hashlib.sha256(score).hexdigest(), part_id or "",
+                         ALIGNMENT_VERSION)
+
+    @property
+    def structured(self) -> str:
+        return cache_key("structured", self.transcript, MODEL_NAME, STRUCTURED_SYSTEM_PROMPT,
+                         str(settings.LLM_SUMMARY_MAX_INPUT_TOKENS))
+
+    @staticmethod
+    def summary_for(corrected_transcript: str) -> str:
+        # 보정 결과는 저장되지 않을 수 있으므로(보정 실패) 요약은 보정된 텍스트 내용으로 키를 만듦
+        return cache_key("summary", cache_key(corrected_transcript), MODEL_NAME, SUMMARY_SYSTEM_PROMPT,
+                         CHUNK_SUMMARY_SYSTEM_PROMPT, str(settings.LLM_CHUNK_MAX_TOKENS),
+                         str(settings.LLM_SUMMARY_MAX_INPUT_TOKENS))
+
+
+def create_result_cache() -> Optional[ResultCache]:
+    """설정에 캐시 디렉터리가 지정된 경우에만 ResultCache를 만듭니다."""
+    if not settings.RESULT_CACHE_DIR:
+        return None
+    return ResultCache(settings.RESULT_CACHE_DIR, settings.RESULT_CACHE_MAX_MB * 1024 * 1024)
+
+
+def _report(progress: Optional[ProgressCallback], stage: str, value: float):
+    if progress is not None:
+        progress(stage, value)
+
+
+def _cached(cache: Optional[ResultCache], key: Optional[str], compute: Callable[[], Any],
+            should_store: Callable[[Any], bool] = lambda value: True) -> Any:
+    if cache is None:
+        return compute()
+    value = cache.get(key)
+    if value is None:
+        value = compute()
+        if should_store(value):
+            cache.put(key, value)
+    else:
+        logger.info(f"캐시된 결과 사용: {key[:12]}")
+    return value
+
+
+_END = object()
+
+
+def _prefetch(items: Iterable, maxsize: int) -> Iterator:
+    """
+    items를 백그라운드 스레드에서 미리 순회하며 최대 maxsize개까지 대기열에 쌓아 두고 순서대로 내보냅니다.
+    (음성 구간 검출이 다음 창을 처리하는 동안 앞서 검출된 구간의 STT를 진행)
+    생산 쪽 예외는 소비하는 쪽에서 다시 발생하고, 소비를 중단하면 생산 스레드도 멈춥니다.
+    """
+    buffer = queue.Queue(maxsize)
+    stopped = threading.Event()
+
+    def put(item) -> bool:
+        while not stopped.is_set():
+            try:
+                buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for item in items:
+                if not put(item):
+                    return
+            put(_END)
+        except BaseException as e:
+            put(e)
+
+    producer = threading.Thread(target=in_context(produce), name="speech-detection", daemon=True)
+    producer.start()
+    try:
+        while True:
+            item = buffer.get()
+            if item is _END:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        stopped.set()
+        producer.join()
+
+
+def _detected_segments(audio_processor, waveform, cache: Optional[ResultCache], keys: Optional[StageKeys],
+                       on_first: Callable[[], None]) -> Iterator[Dict]:
+    """
+    음성 구간을 검출되는 대로 내보냅니다. 캐시에 저장된 구간이 있으면 그것을 사용하고,
+    없으면 SPEECH_QUEUE_SIZE 크기의 대기열을 사이에 두고 검출을 STT와 겹쳐 실행한 뒤 전체 구간을 캐시에 저장합니다.
+    """
+    segments = cache.get(keys.segments) if cache is not None else None
+    if segments is not None:
+        logger.info(f"캐시된 결과 사용: {keys.segments[:12]}")
+        on_first()
+        yield from segments
+        return
+
+    detected = audio_processor.iter_speech_segments_stream(waveform, waveform.sr, classify=True)
+    if settings.SPEECH_QUEUE_SIZE > 0:
+        detected = _prefetch(detected, settings.SPEECH_QUEUE_SIZE)
+    else:
+        detected = iter(list(detected))
+    segments = []
+    for seg in detected:
+        if not segments:
+            on_first()
+        # STT가 구간 dict에 text를 채우므로 캐시에는 검출 결과 그대로 복사해 둠
+        segments.append(dict(seg))
+        yield seg
+    if not segments:
+        on_first()
+    logger.info("음성 구간 추출 완료")
+    if cache is not None:
+        cache.put(keys.segments, segments)
+
+
+def _prioritized(segments: Iterable[Dict], skipped: List[Dict]) -> Iterator[Dict]:
+    """
+    분류 라벨에 따라 STT 순서를 정합니다.
+    SKIP_SEGMENT_LABELS 구간은 STT로 넘기지 않고 skipped에 모으고,
+    DEFER_SEGMENT_LABELS 구간은 나머지 구간을 모두 넘긴 뒤에 넘깁니다.
+    """
+    skip, defer = parse_labels(settings.SKIP_SEGMENT_LABELS), parse_labels(settings.DEFER_SEGMENT_LABELS)
+    deferred = []
+    for seg in segments:
+        label = seg.get("label")
+        if label is not None:
+            SEGMENT_LABELS.labels(label).inc()
+        if label in skip:
+            skipped.append({**seg, "text": ""})
+        elif label in defer:
+            deferred.append(seg)
+        else:
+            yield seg
+    yield from deferred
+
+
+def _restored(segments: Iterable[Dict], checkpoint, restored: List[Dict]) -> Iterator[Dict]:
+    """체크포인트에 STT 결과가 있는 구간은 restored에 모으고, 나머지만 STT로 넘깁니다."""
+    for seg in segments:
+        saved = checkpoint.get(seg)
+        if saved is not None:
+            restored.append(saved)
+        else:
+            yield seg
+
+
+def _checkpointed(checkpoint, on_segment: Optional[Callable[[Dict], None]]) -> Callable[[Dict], None]:
+    """STT가 끝난 구간을 체크포인트에 저장한 뒤 on_segment를 호출합니다."""
+    def save(seg: Dict):
+        checkpoint.save(seg)
+        if on_segment is not None:
+            on_segment(seg)
+    return save
+
+
+def transcribe_audio(audio_path: Optional[str], audio_processor, progress: Optional[ProgressCallback] = None,
+                     cache: Optional[ResultCache] = None, keys: Optional[StageKeys] = None,
+                     on_segment: Optional[Callable[[Dict], None]] = None,
+                     source=None, checkpoint=None, waveform: Optional[SpooledWaveform] = None,
+                     whisper_model: Optional[str] = None) -> List[Dict]:
+    """
+    오디오 파일을 블록 단위로 디코딩하고 음성 구간 추출 및 STT까지 수행합니다. (모델 단계)
+    디코딩된 파형은 디스크에 두고 필요한 구간만 읽으므로 녹음 길이와 관계없이 메모리 사용량이 일정합니다.
+    source(업로드 중인 파일 객체 등)가 주어지면 audio_path 대신 source를 받는 대로 디코딩하며 처리합니다.
+    waveform(이미 디코딩된 파형)이 주어지면 디코딩하지 않고 사용하며, 닫는 것은 호출한 쪽이 합니다.
+    checkpoint(get(seg)/save(seg))가 주어지면 이미 변환된 구간은 STT를 건너뛰고, 새로 변환한 구간은 저장합니다.
+    whisper_model(tier_scheduler가 고른 모델 이름)이 주어지면 WHISPER_MODEL 대신 그 모델로 STT합니다.
+    """
+    owned = waveform is None
+    if waveform is not None:
+        AUDIO_SECONDS.inc(len(waveform) / waveform.sr)
+    elif source is not None:
+        # 디코딩이 백그라운드에서 진행되므로 디코딩 시간은 음성 구간 검출 단계에 포함됨
+        _report(progress, "decoding", 0.05)
+        waveform = decode_progressively(source)
+    else:
+        _report(progress, "decoding", 0.05)
+        with stage("decode"):
+            waveform = decode_to_spool(audio_path)
+        AUDIO_SECONDS.inc(len(waveform) / waveform.sr)
+    # 1. 음성 구간 추출 및 STT (원본 텍스트 생성). 검출된 구간은 바로 STT로 넘어가므로 두 단계가 겹쳐 실행됨
+    _report(progress, "detecting_speech", 0.15)
+    segments = _detected_segments(audio_processor, waveform, cache, keys,
+                                  on_first=lambda: _report(progress, "transcribing", 0.3))
+    to_transcribe: Iterable[Dict] = segments
+    restored: List[Dict] = []
+    if checkpoint is not None:
+        to_transcribe = _restored(segments, checkpoint, restored)
+        on_segment = _checkpointed(checkpoint, on_segment)
+    # 연주(music) 구간은 STT를 건너뛰고, 학생 발화는 선생님 발화를 모두 변환한 뒤에 변환
+    skipped: List[Dict] = []
+    model_kwargs = {"whisper_model": whisper_model} if whisper_model is not None else {}
+    try:
+        raw_speech_segments = audio_processor.transcribe_segments(
+            _prioritized(to_transcribe, skipped), waveform, waveform.sr,
+            batch_size=settings.WHISPER_BATCH_SIZE, on_segment=on_segment, **model_kwargs)
+        logger.info("텍스트 변환 완료")
+        if source is not None:
+            AUDIO_SECONDS.inc(len(waveform) / waveform.sr)
+    finally:
+        # STT가 중간에 실패해도 검출 스레드를 멈춘 뒤 파형 파일을 지움
+        segments.close()
+        if owned:
+            waveform.close()
+    if restored:
+        logger.info(f"체크포인트에서 구간 {len(restored)}개 복원")
+    if skipped or restored or any("label" in seg for seg in raw_speech_segments):
+        # 미뤄서 변환한 구간, 건너뛴 구간, 복원한 구간을 포함해 녹음 순서대로 정렬
+        raw_speech_segments = sorted(raw_speech_segments + skipped + restored, key=lambda seg: seg["start"])
+    return raw_speech_segments
+
+
+def init_model_worker():
+    """모델 워커 프로세스 초기화 함수. 모델은 프로세스마다 한 번, 첫 요청 때 로드합니다. (PRELOAD_MODELS면 즉시)"""
+    global _worker_audio_processor
+    _worker_audio_processor = AudioProcessor()
+    if settings.PRELOAD_MODELS:
+        _worker_audio_processor.warm_up()
+
+
+def transcribe_in_worker(waveform: WaveformRef, cache: Optional[ResultCache] = None,
+                         keys: Optional[StageKeys] = None, whisper_model: Optional[str] = None) -> List[Dict]:
+    """
+    ProcessPoolExecutor/모델 서버에서 실행되는 모델 단계 (진행 상황 콜백은 전달할 수 없음)
+    API 프로세스가 디코딩한 스풀 파일을 설명자로 받아 메모리 매핑으로 읽으며, 파일은 API 프로세스가 지웁니다.
+    """
+    return transcribe_audio(None, _worker_audio_processor, cache=cache, keys=keys, waveform=waveform.open(),
+                            whisper_model=whisper_model)
+
+
+def _cached_tier(scheduler: TierScheduler, cache: Optional[ResultCache], digest: Optional[str]) -> Optional[str]:
+    """티어 중 변환 결과가 캐시에 있는 가장 정확한 티어 (없으면 None)"""
+    if cache is None:
+        return None
+    for tier in scheduler.tiers:
+        if cache.get(StageKeys.for_audio(digest, tier.name).transcript) is not None:
+            return tier.name
+    return None
+
+
+class _SharedWaveform:
+    """
+    레슨 하나에서 한 번만 디코딩해 모델 단계(워커 프로세스 포함)와 악보 정렬이 함께 쓰는 파형.
+    처음 필요할 때 디코딩하므로 모든 단계가 캐시에 있으면 디코딩하지 않습니다.
+    스풀 파일은 이 프로세스가 소유하고 close에서 지우므로, 워커가 비정상 종료되어도 파일이 남지 않습니다.
+    """
+
+    def __init__(self, audio_path: str):
+        self._audio_path = audio_path
+        self._waveform: Optional[SpooledWaveform] = None
+
+    def get(self) -> SpooledWaveform:
+        if self._waveform is None:
+            with stage("decode"):
+                self._waveform = decode_to_spool(self._audio_path)
+        return self._waveform
+
+    def close(self):
+        if self._waveform is not None:
+            self._waveform.close()
+
+
+class _EventStream:
+    """
+    파이프라인 단계별 부분 결과를 emit 콜백으로 내보냅니다.
+    캐시 적중이나 모델 워커 프로세스 사용처럼 단계가 점진적으로 결과를 내지 못한 경우에는
+    단계가 끝난 뒤 전체 결과를 한 번에 내보내므로, 클라이언트는 항상 같은 순서의 이벤트를 받습니다.
+    """
+
+    def __init__(self, emit: EventCallback):
+        self._emit = emit
+        self._counts: Dict[str, int] = {}
+
+    def __call__(self, event: str, data: Dict[str, Any]):
+        self._counts[event] = self._counts.get(event, 0) + 1
+        self._emit(event, data)
+
+    def progress(self, progress: Optional[ProgressCallback]) -> ProgressCallback:
+        def report(stage: str, value: float):
+            _report(progress, stage, value)
+            self("stage", {"stage": stage, "progress": value})
+        return report
+
+    def segment(self, seg: Dict):
+        data = {"start": seg["start"], "end": seg["end"], "text": seg["text"]}
+        if "label" in seg:
+            data["label"] = seg["label"]
+        self("segment", data)
+
+    def correction(self, index: int, total: int, text: str):
+        self("correction", {"index": index, "total": total, "text": text})
+
+    def summary_token(self, delta: str):
+        self("summary", {"delta": delta})
+
+    def ensure(self, event: str, fallback: Callable[[], None]):
+        if not self._counts.get(event):
+            fallback()
+
+
+@timed("pipeline")
+def run_lesson_pipeline(audio_path: str, audio_processor, summary_service,
+                        progress: Optional[ProgressCallback] = None,
+                        model_executor=None,
+                        cache: Optional[ResultCache] = None,
+                        emit: Optional[EventCallback] = None,
+                        source=None, checkpoint=None,
+                        score: Optional[bytes] = None, part_id: Optional[str] = None,
+                        scheduler: Optional[TierScheduler] = None, submitted_at: Optional[float] = None) -> Dict:
+    """
+    레슨 녹음 한 건에 대한 전체 처리 파이프라인.
+    model_executor가 주어지면 YAMNet/Whisper 단계는 해당 프로세스 풀에서 실행됩니다.
+    cache가 주어지면 같은 오디오에 대해 이미 계산된 단계는 건너뜁니다.
+    emit이 주어지면 STT 구간, 보정 청크, 요약 토큰을 만들어지는 즉시 emit(event, data)로 전달합니다.
+    source, checkpoint는 transcribe_audio로 전달합니다. (이어 올리기 업로드, model_executor 없이 실행할 때만 사용)
+    score(MXL/MusicXML 바이트)가 주어지면 연주 구간을 악보에 맞춰 playing_segments와 말소리 구간의 measures를 붙입니다.
+    LLM_STRUCTURED_OUTPUT이면 보정/요약/지시어를 한 번의 호출로 받아 annotations도 붙입니다. (실패하면 기존 두 단계)
+    scheduler가 주어지면 모델 단계를 시작할 때 부하에 맞춰 Whisper 티어를 고르고 whisper_model로 응답에 알립니다.
+    (submitted_at: 작업 큐에 접수된 시각(time.time()). 기다린 시간도 지연 목표에 포함되며, 없으면 지금부터 계산)
+    """
+    submitted_at = submitted_at or time.time()
+    digest = file_digest(audio_path) if cache is not None else None
+    keys = StageKeys.for_audio(digest) if cache is not None else None
+    # 어느 티어로든 변환한 결과가 캐시에 있으면 (정확한 티어부터) 그대로 사용
+    tier = _cached_tier(scheduler, cache, digest) if scheduler is not None else None
+    events = _EventStream(emit) if emit is not None else None
+    if events is not None:
+        progress = events.progress(progress)
+
+    # 디코딩한 파형은 모델 단계와 악보 정렬이 함께 사용 (모델 워커에는 스풀 파일 설명자만 넘김)
+    shared = _SharedWaveform(audio_path)
+
+    def transcribe():
+        model_kwargs = {"whisper_model": tier} if tier is not None else {}
+        if source is not None:
+            # 받는 중인 업로드는 받는 대로 디코딩 (모델 워커를 쓰지 않을 때만 주어짐)
+            return transcribe_audio(audio_path, audio_processor, progress, cache, keys,
+                                    on_segment=events and events.segment, source=source, checkpoint=checkpoint,
+                                    **model_kwargs)
+        _report(progress, "decoding", 0.05)
+        waveform = shared.get()
+        if model_executor is not None:
+            _report(progress, "transcribing", 0.1)
+            # 모델 워커(다른 프로세스)의 단계별 시간은 이 프로세스에서 볼 수 없으므로 전체를 한 단계로 기록
+            with stage("model_worker"):
+                return model_executor.submit(transcribe_in_worker, waveform.ref(), cache, keys,
+                                             **model_kwargs).result()
+        return transcribe_audio(audio_path, audio_processor, progress, cache, keys,
+                                on_segment=events and events.segment, checkpoint=checkpoint, waveform=waveform,
+                                **model_kwargs)
+
+    try:
+        lease = nullcontext()
+        if scheduler is not None and tier is None:
+            # 받는 중인 업로드는 아직 길이를 모르므로 스케줄러가 평균 레슨 길이로 추정
+            lease = scheduler.acquire(None if source is not None else shared.get().duration,
+                                      waited=time.time() - submitted_at)
+            tier = lease.tier.name
+        if tier is not None and keys is not None:
+            keys = StageKeys.for_audio(digest, tier)
+        with lease:
+            raw_speech_segments = _cached(cache, keys and keys.transcript, transcribe)
+        if events is not None:
+            events.ensure("segment", lambda: [events.segment(seg) for seg in raw_speech_segments])
+
+        playing_segments = None
+        if score is not None:
+            # 연주 구간을 악보에 정렬 (모델이 필요 없으므로 이 프로세스에서 모델 단계와 같은 파형으로 계산)
+            _report(progress, "aligning", 0.65)
+            with stage("alignment"):
+                playing_segments = _cached(cache, keys and keys.alignment_for(score, part_id),
+                                           lambda: align_lesson(audio_path, raw_speech_segments, score, part_id,
+                                                                waveform=shared.get()))
+            assign_measures(raw_speech_segments, playing_segments)
+    finally:
+        shared.close()
+
+    # 2. STT 결과를 하나의 문자열로 합치고, ChatGPT로 보정 (긴 레슨은 구간 경계를 따라 나눠 병렬 보정)
+    _report(progress, "correcting", 0.7)
+    raw_transcript = " ".join([seg["text"] for seg in raw_speech_segments])
+    structured = None
+    if settings.LLM_STRUCTURED_OUTPUT:
+        # 보정/요약/마디별 지시어를 한 번의 호출로 받음 (실패하면 None이므로 보정 -> 요약 두 번 호출로 처리)
+        structured = _cached(cache, keys and keys.structured,
+                             lambda: summary_service.structured_lesson(raw_transcript),
+                             should_store=lambda value: value is not None)
+    if structured is not None:
+        corrected_transcript = structured["corrected_transcript"]
+    else:
+        correct_kwargs = {"on_chunk": events.correction} if events is not None else {}
+        # 보정 실패 시 원본이 그대로 반환되므로(청크로 나눈 경우 공백만 다를 수 있음), 그 경우는 캐시에 저장하지 않음
+        corrected_transcript = _cached(cache, keys and keys.corrected,
+                                       lambda: summary_service.correct_transcript(raw_transcript,
+                                                                                  segments=raw_speech_segments,
+                                                                                  **correct_kwargs),
+                                       should_store=lambda corrected: corrected.split() != raw_transcript.split())
+    if events is not None:
+        events.ensure("correction", lambda: events.correction(0, 1, corrected_transcript))
+    logger.info("텍스트 보정 완료")
+
+    # 3. 보정된 텍스트를 기반으로 요약 생성
+    _report(progress, "summarizing", 0.85)
+    if structured is not None:
+        summary = structured["summary"]
+    else:
+        summary_kwargs = {"on_token": events.summary_token} if events is not None else {}
+        summary = _cached(cache, keys and keys.summary_for(corrected_transcript),
+                          lambda: summary_service.generate_summary(corrected_transcript, **summary_kwargs))
+    if events is not None:
+        events.ensure("summary", lambda: events.summary_token(summary))
+    logger.info("레슨 내용 요약 완료")
+
+    # 4. 클라이언트에 필요한 모든 정보를 담아 응답
+    result = {
+        "speech_segments": raw_speech_segments,  # 원본 STT 결과
+        "corrected_transcript": corrected_transcript,  # 보정된 전체 텍스트
+        "summary": summary  # 요약
+    }
+    if tier is not None:
+        result["whisper_model"] = tier  # 스케줄러가 고른(또는 캐시된 결과의) Whisper 티어
+    if structured is not None:
+        result["annotations"] = structured["annotations"]  # 마디별 지시어 (/parse-directives 응답과 같은 형태)
+    if playing_segments is not None:
+        result["playing_segments"] = playing_segments  # 연주 구간별 악보 마디 범위
+    return result
@@ -0,0 +1,193 @@
+"""
+레슨 처리 결과 저장소 (SQLite).
+
+/lesson-summary 결과(STT 구간, 보정 스크립트, 요약)와 보정 스크립트에서 파싱한 주석을 저장해,
+오디오를 다시 올리지 않고도 지난 레슨을 조회하고 검색할 수 있게 합니다.
+- 악보/마디별 주석 조회: annotations(measure, score_id) 인덱스
+- 보정 스크립트/요약 전문 검색: FTS5 (trigram 토크나이저라 조사가 붙은 한국어도 부분 문자열로 검색됨)
+"""
+import logging
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS lessons (
+    id INTEGER PRIMARY KEY,
+    score_id TEXT,
+    title TEXT,
+    corrected_transcript TEXT NOT NULL DEFAULT '',
+    summary TEXT NOT NULL DEFAULT '',
+    created_at REAL NOT NULL
+);
+-- 악보별 목록을 최근 레슨(id 역순)부터 정렬 없이 읽음
+CREATE INDEX IF NOT EXISTS lessons_score_id ON lessons (score_id, id);
+
+CREATE TABLE IF NOT EXISTS segments (
+    lesson_id INTEGER NOT NULL REFERENCES lessons (id) ON DELETE CASCADE,
+    idx INTEGER NOT NULL,
+    start REAL NOT NULL,
+    end REAL NOT NULL,
+    text TEXT NOT NULL,
+    label TEXT,
+    PRIMARY KEY (lesson_id, idx)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS annotations (
+    lesson_id INTEGER NOT NULL REFERENCES lessons (id) ON DELETE CASCADE,
+    score_id TEXT,
+    measure INTEGER NOT NULL,
+    directive TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS annotations_lesson ON annotations (lesson_id);
+CREATE INDEX IF NOT EXISTS annotations_measure ON annotations (measure, lesson_id);
+CREATE INDEX IF NOT EXISTS annotations_score_measure ON annotations (score_id, measure, lesson_id);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS lessons_fts USING fts5 (
+    corrected_transcript, summary, content='lessons', content_rowid='id', tokenize='trigram'
+);
+CREATE TRIGGER IF NOT EXISTS lessons_fts_insert AFTER INSERT ON lessons BEGIN
+    INSERT INTO lessons_fts (rowid, corrected_transcript, summary)
+    VALUES (new.id, new.corrected_transcript, new.summary);
+END;
+CREATE TRIGGER IF NOT EXISTS lessons_fts_delete AFTER DELETE ON lessons BEGIN
+    INSERT INTO lessons_fts (lessons_fts, rowid, corrected_transcript, summary)
+    VALUES ('delete', old.id, old.corrected_transcript, old.summary);
+END;
+"""
+
+# trigram 토크나이저는 3글자 이상만 MATCH로 찾을 수 있음 (더 짧은 검색어는 LIKE로 처리)
+_MIN_MATCH_CHARS = 3
+
+
+class LessonStore:
+    """
+    레슨 결과를 SQLite 파일 하나에 저장합니다.
+    스레드마다 별도 연결을 사용하고 WAL 모드로 열어, 작업 큐 워커가 쓰는 동안에도 조회가 막히지 않습니다.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            self._local.conn = conn
+        return conn
+
+    def save_lesson(self, result: Dict[str, Any], annotations: Iterable[Tuple[int, str]] = (),
+                    score_id: Optional[str] = None, title: Optional[str] = None) -> int:
+        """파이프라인 결과와 주석을 한 트랜잭션으로 저장하고 lesson_id를 반환합니다."""
+        with self._connect() as conn:
+            lesson_id = conn.execute(
+                "INSERT INTO lessons (score_id, title, corrected_transcript, summary, created_at) VALUES (?, ?, ?, ?, ?)",
+                (score_id, title, result.get("corrected_transcript") or "", result.get("summary") or "", time.time()),
+            ).lastrowid
+            conn.executemany(
+                "INSERT INTO segments (lesson_id, idx, start, end, text, label) VALUES (?, ?, ?, ?, ?, ?)",
+                [(lesson_id, i, seg["start"], seg["end"], seg.get("text", ""), seg.get("label"))
+                 for i, seg in enumerate(result.get("speech_segments") or [])],
+            )
+            conn.executemany(
+                "INSERT INTO annotations (lesson_id, score_id, measure, directive) VALUES (?, ?, ?, ?)",
+                [(lesson_id, score_id, measure, directive) for measure, directive in annotations],
+            )
+        logger.info(f"레슨 저장: {lesson_id} (score_id={score_id})")
+        return lesson_id
+
+    def get_lesson(self, lesson_id: int) -> Optional[Dict[str, Any]]:
+        conn = self._connect()
+        row = conn.execute("SELECT * FROM lessons WHERE id = ?", (lesson_id,)).fetchone()
+        if row is None:
+            return None
+        lesson = _lesson_dict(row)
+        lesson["corrected_transcript"] = row["corrected_transcript"]
+        lesson["summary"] = row["summary"]
+        lesson["speech_segments"] = [
+            {"start": r["start"], "end": r["end"], "text": r["text"], **({"label": r["label"]} if r["label"] else {})}
+            for r in conn.execute("SELECT start, end, text, label FROM segments WHERE lesson_id = ? ORDER BY idx",
+                                  (lesson_id,))
+        ]
+        lesson["annotations"] = [
+            {"measure": r["measure"], "directive": r["directive"]}
+            for r in conn.execute("SELECT measure, directive FROM annotations WHERE lesson_id = ? ORDER BY rowid",
+                                  (lesson_id,))
+        ]
+        return lesson
+
+    def list_lessons(self, score_id: Optional[str] = None, limit: int = 50, offset: int = 0) -> List[Dict[str, Any]]:
+        """
+        최근 레슨부터 목록을 반환합니다. (전문은 제외)
+        id는 저장 순서대로 커지므로 id 역순으로 읽음 (score_id를 지정하면 lessons_score_id 인덱스 순서 그대로)
+        """
+        where, params = ("WHERE score_id = ?", [score_id]) if score_id is not None else ("", [])
+        rows = self._connect().execute(
+            f"SELECT id, score_id, title, created_at FROM lessons {where} ORDER BY id DESC "
+            "LIMIT ? OFFSET ?", (*params, limit, offset))
+        return [_lesson_dict(row) for row in rows]
+
+    def delete_lesson(self, lesson_id: int) -> bool:
+        with self._connect() as conn:
+            return conn.execute("DELETE FROM lessons WHERE id = ?", (lesson_id,)).rowcount > 0
+
+    def annotations_for_measure(self, measure: int, score_id: Optional[str] = None,
+                                limit: int = 100) -> List[Dict[str, Any]]:
+        """
+        여러 레슨에 걸쳐 특정 마디에 대한 지시어를 최근 레슨부터 반환합니다.
+        lesson_id는 저장 순서대로 커지므로 인덱스 순서 그대로 읽고 LIMIT에서 멈춤 (정렬 없음)
+        """
+        where, params = "a.measure = ?", [measure]
+        if score_id is not None:
+            where, params = "a.score_id = ? AND a.measure = ?", [score_id, measure]
+        rows = self._connect().execute(
+            "SELECT a.lesson_id, a.score_id, a.measure, a.directive, l.title, l.created_at "
+            f"FROM annotations a JOIN lessons l ON l.id = a.lesson_id WHERE {where} "
+            "ORDER BY a.lesson_id DESC, a.rowid LIMIT ?", (*params, limit))
+        return [dict(row) for row in rows]
+
+    def search(self, query: str, score_id: Optional[str] = None, limit: int = 20) -> List[Dict[str, Any]]:
+        """
+        보정 스크립트와 요약에서 검색어가 들어 있는 레슨을 최근 레슨부터 찾고, 일치 부분 주변을 snippet으로 돌려줍니다.
+        FTS 색인의 rowid 역순으로 읽으므로 흔한 검색어도 limit개만 snippet을 만듭니다.
+        """
+        query = query.strip()
+        if not query:
+            return []
+        if len(query) >= _MIN_MATCH_CHARS:
+            # 검색어 전체를 하나의 구문으로 취급 (FTS 질의 문법 문자도 그대로 검색)
+            condition, params = "lessons_fts MATCH ?", ['"' + query.replace('"', '""') + '"']
+        else:
+            like = "%" + query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+            condition = "(lessons_fts.corrected_transcript LIKE ? ESCAPE '\\' OR lessons_fts.summary LIKE ? ESCAPE '\\')"
+            params = [like, like]
+        if score_id is not None:
+            condition += " AND l.score_id = ?"
+            params.append(score_id)
+        rows = self._connect().execute(
+            "SELECT l.id, l.score_id, l.title, l.created_at, "
+            "snippet(lessons_fts, -1, '[', ']', '…', 16) AS snippet "
+            f"FROM lessons_fts JOIN lessons l ON l.id = lessons_fts.rowid WHERE {condition} "
+            "ORDER BY lessons_fts.rowid DESC LIMIT ?", (*params, limit))
+        return [{**_lesson_dict(row), "snippet": row["snippet"]} for row in rows]
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+def _lesson_dict(row: sqlite3.Row) -> Dict[str, Any]:
+    return {"id": row["id"], "score_id": row["score_id"], "title": row["title"], "created_at": row["created_at"]}
+
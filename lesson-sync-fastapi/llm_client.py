@@ -0,0 +1,248 @@
+import asyncio
+import collections
+import logging
+import random
+import threading
+import time
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from typing import Awaitable, Callable, Optional, TypeVar
+
+from openai import APIConnectionError, APITimeoutError, InternalServerError, RateLimitError
+
+from config import settings
+from metrics import LLM_REJECTED, LLM_RETRIES
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# 재시도하면 성공할 수 있는 오류 (속도 제한, 네트워크, 5xx)
+RETRYABLE_ERRORS = (RateLimitError, APIConnectionError, APITimeoutError, InternalServerError)
+
+
+class CircuitOpenError(Exception):
+    """연속 실패로 회로가 열려 있어 LLM 호출을 즉시 거절할 때 발생합니다."""
+
+
+class StreamInterruptedError(Exception):
+    """
+    스트리밍 응답을 일부 받은 뒤 연결이 끊긴 경우. 이미 전달한 토큰이 중복되지 않도록 재시도하지 않지만
+    서버/네트워크 장애이므로 회로에는 실패로 반영합니다.
+    """
+
+
+@dataclass
+class RetryPolicy:
+    """지터가 적용된 지수 백오프. 서버가 Retry-After를 보내면 그 값을 우선합니다."""
+    max_retries: int = 5
+    base_delay: float = 1.0
+    max_delay: float = 30.0
+
+    def delay_for(self, attempt: int, error: Exception) -> float:
+        retry_after = _retry_after_seconds(error)
+        if retry_after is not None:
+            return min(retry_after, self.max_delay)
+        # full jitter: 0 ~ base * 2^attempt 사이에서 무작위로 선택
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+
+def _retry_after_seconds(error: Exception) -> Optional[float]:
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    headers = response.headers
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        value = headers.get("retry-after")
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class CircuitBreaker:
+    """
+    연속 failure_threshold회 실패하면 reset_timeout초 동안 호출을 차단합니다.
+    시간이 지나면 한 번의 시험 호출(half-open)을 허용하고, 성공하면 다시 닫힙니다.
+    스레드와 이벤트 루프에서 함께 사용할 수 있도록 스레드 락으로 보호합니다.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        with self._lock:
+            return self._opened_at is not None
+
+    def before_call(self):
+        with self._lock:
+            if self._opened_at is None:
+                return
+            if time.monotonic() - self._opened_at < self.reset_timeout or self._probing:
+                LLM_REJECTED.inc()
+                raise CircuitOpenError("LLM 호출이 연속으로 실패하여 일시적으로 차단되었습니다")
+            self._probing = True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._probing or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+                self._probing = False
+
+
+def call_with_retry(fn: Callable[[], T], policy: RetryPolicy, breaker: CircuitBreaker,
+                    sleep: Callable[[float], None] = time.sleep) -> T:
+    """
+    동기 호출에 공통 재시도 정책과 서킷 브레이커를 적용합니다.
+    회로 확인은 호출을 시작할 때 한 번 하고, 재시도를 포함한 호출 하나를 회로에는 한 번의 성공/실패로 반영합니다.
+    (재시도 중인 호출이 스스로 회로를 열어 실제 오류 대신 CircuitOpenError로 끝나지 않도록)
+    """
+    breaker.before_call()
+    for attempt in range(policy.max_retries + 1):
+        try:
+            result = fn()
+        except RETRYABLE_ERRORS as e:
+            if attempt == policy.max_retries:
+                breaker.record_failure()
+                raise
+            delay = policy.delay_for(attempt, e)
+            logger.warning(f"LLM 호출 실패({type(e).__name__}). {delay:.2f}초 후 재시도 ({attempt + 1}/{policy.max_retries})")
+            LLM_RETRIES.labels(type(e).__name__).inc()
+            sleep(delay)
+        except StreamInterruptedError:
+            breaker.record_failure()
+            raise
+        except Exception:
+            # 요청 자체의 오류(400 등)는 서버가 응답한 것이므로 회로 상태에는 성공으로 반영
+            breaker.record_success()
+            raise
+        else:
+            breaker.record_success()
+            return result
+
+
+async def acall_with_retry(fn: Callable[[], Awaitable[T]], policy: RetryPolicy, breaker: CircuitBreaker) -> T:
+    """비동기 호출에 공통 재시도 정책과 서킷 브레이커를 적용합니다. (회로 반영은 call_with_retry와 같음)"""
+    breaker.before_call()
+    for attempt in range(policy.max_retries + 1):
+        try:
+            result = await fn()
+        except RETRYABLE_ERRORS as e:
+            if attempt == policy.max_retries:
+                breaker.record_failure()
+                raise
+            delay = policy.delay_for(attempt, e)
+            logger.warning(f"LLM 호출 실패({type(e).__name__}). {delay:.2f}초 후 재시도 ({attempt + 1}/{policy.max_retries})")
+            LLM_RETRIES.labels(type(e).__name__).inc()
+            await asyncio.sleep(delay)
+        except StreamInterruptedError:
+            breaker.record_failure()
+            raise
+        except Exception:
+            breaker.record_success()
+            raise
+        else:
+            breaker.record_success()
+            return result
+
+
+class ConcurrencyLimiter:
+    """
+    스레드(with)와 이벤트 루프(async with)가 함께 쓰는 동시 호출 제한. 기다리는 호출은 도착 순서대로 진행합니다.
+    비동기 호출은 스레드를 점유하지 않고 future로 기다리며, 슬롯은 다른 스레드에서 반환되어도 해당 루프에서 넘겨받습니다.
+    """
+
+    def __init__(self, limit: int):
+        self._available = limit
+        self._waiters: collections.deque = collections.deque()
+        self._lock = threading.Lock()
+
+    def _try_acquire(self) -> bool:
+        if self._available > 0 and not self._waiters:
+            self._available -= 1
+            return True
+        return False
+
+    def acquire(self):
+        with self._lock:
+            if self._try_acquire():
+                return
+            event = threading.Event()
+            self._waiters.append(event)
+        event.wait()
+
+    async def acquire_async(self):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._try_acquire():
+                return
+            future = loop.create_future()
+            self._waiters.append(future)
+        try:
+            await future
+        except asyncio.CancelledError:
+            with self._lock:
+                if future in self._waiters:
+                    self._waiters.remove(future)
+                    raise
+            # 슬롯을 넘겨받은 뒤 취소되었으면 반환 (future가 취소되었으면 _hand_over가 반환)
+            if future.done() and not future.cancelled():
+                self.release()
+            raise
+
+    def release(self):
+        with self._lock:
+            if not self._waiters:
+                self._available += 1
+                return
+            waiter = self._waiters.popleft()
+        if isinstance(waiter, threading.Event):
+            waiter.set()
+        else:
+            waiter.get_loop().call_soon_threadsafe(self._hand_over, waiter)
+
+    def _hand_over(self, future: asyncio.Future):
+        if future.cancelled():
+            self.release()
+        else:
+            future.set_result(None)
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+    async def __aenter__(self):
+        await self.acquire_async()
+        return self
+
+    async def __aexit__(self, *exc):
+        self.release()
+
+
+# 프로세스 전체에서 공유하는 재시도 정책, 서킷 브레이커, 동시 호출 제한 (동기/비동기 서비스가 함께 사용)
+retry_policy = RetryPolicy(max_retries=settings.LLM_MAX_RETRIES)
+circuit_breaker = CircuitBreaker(failure_threshold=settings.LLM_CIRCUIT_FAILURE_THRESHOLD,
+                                 reset_timeout=settings.LLM_CIRCUIT_RESET_SECONDS)
+llm_limiter = ConcurrencyLimiter(settings.LLM_MAX_CONCURRENCY)
@@ -1,13 +1,34 @@
 # main.py 수정
-from fastapi import FastAPI, UploadFile, File, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from starlette.requests import ClientDisconnect
 from audio_processor import AudioProcessor
-from summary_service import SummaryService
-from pydantic import BaseModel
-from typing import List, Tuple
-from score_annotator import parse_annotations
+from audio_stream import purge_stale_spools
+from summary_service import AsyncSummaryService, LoopSummaryService
+from pydantic import BaseModel, TypeAdapter, ValidationError
+from typing import List, Optional, Tuple, Union
+from score_annotator import AnnotationInfo, parse_annotations, warm_up as warm_up_annotator
+from score_alignment import score_chroma
+from score_writer import ScoreFormatError, annotate_score
+from lesson_store import LessonStore
+from upload_store import Upload, UploadOffsetError, UploadStore
+from metrics import in_context, render_latest, tracing
+from config import settings
+from job_queue import JobQueue, QueueFullError
+from lesson_pipeline import run_lesson_pipeline, init_model_worker, create_result_cache
+from model_server import RemoteModelExecutor, parse_address
+from tier_scheduler import create_tier_scheduler
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import asynccontextmanager
+import multiprocessing
+import asyncio
+import json
+import time
+from urllib.parse import quote
 import librosa
-import io
+import tempfile
+import os
 import logging
 
 test_data = {
@@ -125,60 +146,428 @@ test_data = {
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="LessonSync FastAPI Server")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global summary_service
+    # LLM 호출은 이 이벤트 루프에서 AsyncOpenAI 클라이언트 하나로 처리 (파이프라인 스레드는 결과만 기다림)
+    async_summary_service = AsyncSummaryService()
+    summary_service = LoopSummaryService(async_summary_service, asyncio.get_running_loop())
+    # 이전에 비정상 종료된 프로세스가 남긴 파형 스풀 파일 정리
+    await run_in_threadpool(purge_stale_spools)
+    # 모델은 첫 사용 시 로드되며, PRELOAD_MODELS이면 서버 시작 시 미리 로드 (모델 단계를 별도 프로세스에서 실행하면 생략)
+    if settings.PRELOAD_MODELS and model_executor is None:
+        await run_in_threadpool(audio_processor.warm_up)
+    if settings.PRELOAD_MODELS:
+        await asyncio.get_running_loop().run_in_executor(annotation_executor, lambda: None)
+    yield
+    # 서버 종료 시 워커 풀 정리
+    job_queue.shutdown(wait=False)
+    annotation_executor.shutdown(wait=False)
+    if model_executor is not None:
+        model_executor.shutdown(wait=False)
+    await async_summary_service.aclose()
+
+app = FastAPI(title="LessonSync FastAPI Server", lifespan=lifespan)
 audio_processor = AudioProcessor()
-summary_service = SummaryService()
+# lifespan에서 서버의 이벤트 루프에 연결
+summary_service: Optional[LoopSummaryService] = None
+
+job_queue = JobQueue(
+    max_workers=settings.JOB_WORKERS,
+    max_pending=settings.JOB_MAX_PENDING,
+    result_ttl=settings.JOB_RESULT_TTL_SECONDS,
+)
+# 지시어 파싱 워커 풀: 모든 스레드가 score_annotator의 Okt 인스턴스(JVM) 하나를 공유
+# 각 스레드는 시작할 때 warm_up으로 JVM에 연결하고 사전을 로드해 둠
+def _init_annotator_thread():
+    # initializer가 예외를 내면 풀 전체가 BrokenThreadPool이 되므로 로그만 남김 (첫 파싱에서 다시 초기화)
+    try:
+        warm_up_annotator()
+    except Exception:
+        logger.exception("지시어 파서 초기화 실패")
+
+annotation_executor = ThreadPoolExecutor(max_workers=settings.ANNOTATION_WORKERS,
+                                         thread_name_prefix="annotator", initializer=_init_annotator_thread)
+# 단계별 결과 캐시 (RESULT_CACHE_DIR 미설정 시 None)
+result_cache = create_result_cache()
+# 레슨 결과 저장소 (LESSON_STORE_PATH 미설정 시 None)
+lesson_store = LessonStore(settings.LESSON_STORE_PATH) if settings.LESSON_STORE_PATH else None
+# 이어 올리기 업로드 저장소 (서버가 재시작되어도 받은 바이트와 STT 체크포인트가 남도록 디스크에 보관)
+upload_store = UploadStore(settings.UPLOAD_DIR or os.path.join(tempfile.gettempdir(), "lesson-sync-uploads"),
+                           settings.UPLOAD_TTL_SECONDS)
+def _create_model_executor():
+    """
+    YAMNet/Whisper 단계를 실행할 곳을 정합니다.
+    - MODEL_SERVER_ADDRESS: 공유 모델 서버 (모든 API 워커가 모델 한 벌을 함께 사용)
+    - MODEL_WORKER_PROCESSES > 0: 이 워커 전용 프로세스 풀 (프로세스마다 모델을 한 번 로드)
+    - 둘 다 없으면 None (API 프로세스 안에서 실행)
+    """
+    if settings.MODEL_SERVER_ADDRESS:
+        return RemoteModelExecutor(parse_address(settings.MODEL_SERVER_ADDRESS),
+                                   settings.MODEL_SERVER_AUTHKEY.encode(),
+                                   max_workers=settings.JOB_WORKERS + 2)
+    if settings.MODEL_WORKER_PROCESSES > 0:
+        return ProcessPoolExecutor(
+            max_workers=settings.MODEL_WORKER_PROCESSES,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=init_model_worker,
+        )
+    return None
+
+model_executor = _create_model_executor()
+# 부하에 따른 Whisper 티어 선택 (WHISPER_TIERS 미설정 시 None). 작업 큐에서 기다리는 작업을 부하로 사용
+tier_scheduler = create_tier_scheduler(queued=job_queue.queued_ages)
+
+async def _spool_upload(file: UploadFile) -> str:
+    """업로드 파일을 메모리에 모두 올리지 않고 1MB 단위로 임시 파일에 저장합니다."""
+    suffix = os.path.splitext(file.filename or "")[1]
+    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as spool:
+        while chunk := await file.read(1024 * 1024):
+            spool.write(chunk)
+        return spool.name
+
+def _save_lesson(result: dict, score_id: Optional[str] = None, title: Optional[str] = None) -> dict:
+    """
+    저장소가 설정되어 있으면 결과와 주석을 저장하고 lesson_id를 붙여 반환합니다.
+    주석은 구조화 LLM 응답의 annotations가 있으면 그대로 쓰고, 없으면 보정 스크립트에서 파싱합니다.
+    저장에 실패해도 처리 결과는 그대로 응답합니다.
+    """
+    if lesson_store is None:
+        return result
+    try:
+        corrected = result.get("corrected_transcript") or ""
+        if "annotations" in result:
+            annotations = [(a["measure"], a["directive"]) for a in result["annotations"]]
+        else:
+            annotations = parse_annotations(corrected) if corrected else []
+        lesson_id = lesson_store.save_lesson(result, annotations, score_id=score_id, title=title)
+    except Exception:
+        logger.exception("레슨 결과 저장 실패")
+        return result
+    return {**result, "lesson_id": lesson_id}
+
+async def _read_score(score: Optional[UploadFile], part_id: Optional[str]) -> Optional[bytes]:
+    """레슨과 함께 올린 악보(MXL/MusicXML)를 읽고, 처리 도중 정렬 단계에서 실패하지 않도록 형식을 미리 확인합니다."""
+    if score is None:
+        return None
+    data = await score.read()
+    try:
+        await run_in_threadpool(score_chroma, data, part_id)
+    except ScoreFormatError as e:
+        raise HTTPException(400, str(e))
+    return data
+
+@app.middleware("http")
+async def debug_trace(request: Request, call_next):
+    """
+    DEBUG_TRACE가 켜져 있고 요청에 X-Debug-Trace 헤더가 있으면 단계별 처리 시간을 응답 헤더로 돌려줍니다.
+    (스트리밍 응답은 헤더를 먼저 보내므로 응답 시작 전까지의 단계만 포함)
+    """
+    if not settings.DEBUG_TRACE or request.headers.get("x-debug-trace", "").lower() not in ("1", "true"):
+        return await call_next(request)
+    with tracing() as trace:
+        response = await call_next(request)
+        response.headers["X-Debug-Trace"] = trace.to_header()
+    return response
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus 텍스트 형식의 처리 지표"""
+    content, media_type = render_latest()
+    return Response(content=content, media_type=media_type)
 
 @app.post("/lesson-summary")
-async def process_lesson(file: UploadFile = File(...)):
+async def process_lesson(file: UploadFile = File(...), score_id: Optional[str] = Form(None),
+                         title: Optional[str] = Form(None), score: Optional[UploadFile] = File(None),
+                         part_id: Optional[str] = Form(None)):
+    """score(악보 파일)를 함께 올리면 연주 구간을 악보에 맞춰 마디 범위를 붙입니다. (part_id: 정렬할 파트, 기본은 전체)"""
     if not file.content_type.startswith("audio/"):
         raise HTTPException(400, "Only audio files allowed")
+    score_data = await _read_score(score, part_id)
 
+    # 작업 큐의 자리를 먼저 확보해, 요청이 몰리면 업로드를 받기 전에 거절 (/lesson-summary/jobs와 같은 제한)
     try:
-        audio_bytes = await file.read()
-        waveform, sr = librosa.load(io.BytesIO(audio_bytes), sr=16000, mono=True)
-        
-        # 1. 음성 구간 추출 및 STT (원본 텍스트 생성)
-        segments = audio_processor.extract_speech_segments(waveform, sr)
-        logger.info("음성 구간 추출 완료")
-
-        raw_speech_segments = audio_processor.transcribe_segments(segments, waveform, sr)
-        logger.info("텍스트 변환 완료")
-
-        # 2. STT 결과를 하나의 문자열로 합치고, ChatGPT로 보정
-        raw_transcript = " ".join([seg["text"] for seg in raw_speech_segments])
-        corrected_transcript = summary_service.correct_transcript(raw_transcript)
-        logger.info("텍스트 보정 완료")
-
-        # 3. 보정된 텍스트를 기반으로 요약 생성
-        summary = summary_service.generate_summary(corrected_transcript)
-        logger.info("레슨 내용 요약 완료")
-        
-        # 4. 클라이언트에 필요한 모든 정보를 담아 응답
-        return JSONResponse(content={
-            "speech_segments": raw_speech_segments,  # 원본 STT 결과
-            "corrected_transcript": corrected_transcript, # 보정된 전체 텍스트
-            "summary": summary # 요약
-        })
-        
-        return JSONResponse(content=test_data)
-        
-    except Exception as e:
+        with job_queue.reserve() as submit:
+            audio_path = await _spool_upload(file)
+            # 작업 큐 워커에서 처리하고 끝날 때까지 기다림 (임시 파일은 작업이 끝나면 삭제)
+            job = submit(in_context(_run_lesson_job), audio_path, score_id=score_id, title=title,
+                         score=score_data, part_id=part_id, submitted_at=time.time())
+    except QueueFullError as e:
+        raise HTTPException(503, str(e), headers={"Retry-After": "30"})
+    await asyncio.wrap_future(job.future)
+    logger.info("레슨 요약 완료")
+    if job.status == "failed":
         return JSONResponse(
             status_code=500,
-            content={"message": f"처리 실패: {str(e)}"}
+            content={"message": f"처리 실패: {job.error}"}
         )
+    return JSONResponse(content=job.result)
+
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@app.post("/lesson-summary/stream")
+async def stream_lesson(file: UploadFile = File(...), score_id: Optional[str] = Form(None),
+                        title: Optional[str] = Form(None), score: Optional[UploadFile] = File(None),
+                        part_id: Optional[str] = Form(None)):
+    """
+    레슨 처리 중간 결과를 Server-Sent Events로 스트리밍합니다.
+    이벤트: stage(단계/진행률), segment(STT 구간), correction(보정 청크), summary(요약 토큰),
+    그리고 마지막으로 /lesson-summary와 같은 형태의 result 또는 error.
+    """
+    if not file.content_type.startswith("audio/"):
+        raise HTTPException(400, "Only audio files allowed")
+    score_data = await _read_score(score, part_id)
+
+    loop = asyncio.get_running_loop()
+    events: asyncio.Queue = asyncio.Queue()
+
+    def emit(event: str, data):
+        # 파이프라인은 작업 큐 워커에서 실행되므로 이벤트 루프로 넘겨서 큐에 넣음
+        loop.call_soon_threadsafe(events.put_nowait, (event, data))
+
+    def finish(job):
+        if job.status == "done":
+            events.put_nowait(("result", job.result))
+        else:
+            events.put_nowait(("error", {"message": f"처리 실패: {job.error}"}))
+        events.put_nowait(None)
+
+    # /lesson-summary와 같은 작업 큐의 자리를 사용하므로, 자리가 없으면 업로드를 받기 전에 503
+    # (작업은 작업 큐가 끝까지 실행하므로 클라이언트 연결이 끊겨도 결과는 저장됨)
+    try:
+        with job_queue.reserve() as submit:
+            audio_path = await _spool_upload(file)
+            job = submit(in_context(_run_lesson_job), audio_path, score_id=score_id, title=title,
+                         score=score_data, part_id=part_id, submitted_at=time.time(), emit=emit)
+    except QueueFullError as e:
+        raise HTTPException(503, str(e), headers={"Retry-After": "30"})
+    job.future.add_done_callback(lambda _: loop.call_soon_threadsafe(finish, job))
+
+    async def event_stream():
+        while (item := await events.get()) is not None:
+            yield _sse(*item)
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+def _run_lesson_job(audio_path: str, progress=None, score_id: Optional[str] = None, title: Optional[str] = None,
+                    score: Optional[bytes] = None, part_id: Optional[str] = None,
+                    submitted_at: Optional[float] = None, emit=None):
+    """작업 큐 워커에서 실행되는 레슨 처리. 끝나면 임시 파일을 삭제합니다. (emit: 스트리밍 응답의 부분 결과 콜백)"""
+    try:
+        result = run_lesson_pipeline(audio_path, audio_processor, summary_service,
+                                     progress=progress, model_executor=model_executor, cache=result_cache,
+                                     score=score, part_id=part_id, scheduler=tier_scheduler,
+                                     submitted_at=submitted_at, emit=emit)
+        return _save_lesson(result, score_id, title)
+    finally:
+        os.remove(audio_path)
+
+@app.post("/lesson-summary/jobs", status_code=202)
+async def submit_lesson_job(file: UploadFile = File(...), score_id: Optional[str] = Form(None),
+                            title: Optional[str] = Form(None), score: Optional[UploadFile] = File(None),
+                            part_id: Optional[str] = Form(None)):
+    """레슨 처리 작업을 등록하고 즉시 job_id를 반환합니다. 결과는 GET /jobs/{job_id}로 조회합니다."""
+    if not file.content_type.startswith("audio/"):
+        raise HTTPException(400, "Only audio files allowed")
+    score_data = await _read_score(score, part_id)
+
+    # 대기 중인 작업이 메모리를 차지하지 않도록 업로드를 디스크에 저장
+    audio_path = await _spool_upload(file)
+
+    try:
+        job = job_queue.submit(_run_lesson_job, audio_path, score_id=score_id, title=title,
+                               score=score_data, part_id=part_id, submitted_at=time.time())
+    except QueueFullError as e:
+        os.remove(audio_path)
+        raise HTTPException(503, str(e), headers={"Retry-After": "30"})
+
+    logger.info(f"레슨 작업 등록: {job.id}")
+    return {"job_id": job.id, "status": job.status}
+
+@app.get("/jobs/{job_id}")
+async def get_job_status(job_id: str):
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(404, "Job not found")
+    return job.to_dict()
+
+# --- 이어 올리기 업로드 ---
+def _upload_status(upload: Upload) -> dict:
+    return {"upload_id": upload.id, "offset": upload.offset, "size": upload.info.size,
+            "complete": upload.complete, "job_id": upload.info.job_id}
+
+def _upload_response(upload: Upload, status_code: int = 200) -> JSONResponse:
+    return JSONResponse(status_code=status_code, content=_upload_status(upload),
+                        headers={"Upload-Offset": str(upload.offset)})
+
+def _require_upload(upload_id: str) -> Upload:
+    upload = upload_store.get(upload_id)
+    if upload is None:
+        raise HTTPException(404, "Upload not found")
+    return upload
+
+def _parse_content_range(value: str) -> Tuple[int, int, int]:
+    """Content-Range: bytes <start>-<end>/<size>"""
+    try:
+        unit, _, spec = value.strip().partition(" ")
+        byte_range, _, size = spec.partition("/")
+        start, _, end = byte_range.partition("-")
+        if unit != "bytes":
+            raise ValueError(unit)
+        return int(start), int(end), int(size)
+    except ValueError:
+        raise HTTPException(400, "Content-Range 헤더 형식이 올바르지 않습니다 (bytes <start>-<end>/<size>)")
+
+def _run_upload_job(upload: Upload, progressive: bool, progress=None, submitted_at: Optional[float] = None):
+    """
+    작업 큐 워커에서 실행되는 업로드 처리. progressive이면 받는 중인 파일을 받는 대로 디코딩하며 처리합니다.
+    STT가 끝난 구간은 업로드 디렉터리에 체크포인트로 남으므로, 중간에 실패하거나 서버가 재시작되어도
+    다시 시작한 작업은 남은 구간만 변환합니다. 성공하면 업로드를 삭제합니다.
+    """
+    source = upload.reader(settings.UPLOAD_STALL_SECONDS) if progressive else None
+    try:
+        result = run_lesson_pipeline(upload.data_path, audio_processor, summary_service,
+                                     progress=progress, model_executor=model_executor,
+                                     cache=None if progressive else result_cache,
+                                     source=source, checkpoint=upload if model_executor is None else None,
+                                     scheduler=tier_scheduler, submitted_at=submitted_at)
+        result = _save_lesson(result, upload.info.score_id, upload.info.title)
     finally:
-        logger.info("레슨 요약 완료")
+        if source is not None:
+            source.close()
+    upload_store.delete(upload.id)
+    return result
+
+def _start_upload_job(upload: Upload):
+    """
+    업로드 처리 작업이 없거나 실패했으면 새로 시작합니다.
+    받는 중에 처리할 수 있는 포맷이면 첫 바이트를 받은 뒤 바로, 아니면 모두 받은 뒤에 시작합니다.
+    (모델 단계를 다른 프로세스에서 실행하면 파일 객체를 넘길 수 없으므로 모두 받은 뒤에 시작)
+    """
+    job = job_queue.get(upload.info.job_id) if upload.info.job_id else None
+    if job is not None and job.status != "failed":
+        return
+    progressive = upload.progressive and model_executor is None and not upload.complete
+    if not (upload.complete or (progressive and upload.offset > 0)):
+        return
+    try:
+        job = job_queue.submit(_run_upload_job, upload, progressive, submitted_at=time.time())
+    except QueueFullError as e:
+        if not upload.complete:
+            # 다음 조각을 받을 때 다시 시도
+            return
+        raise HTTPException(503, str(e), headers={"Retry-After": "30"})
+    upload.info.job_id = job.id
+    upload.save_info()
+    logger.info(f"업로드 처리 작업 등록: {upload.id} -> {job.id} (progressive={progressive})")
+
+@app.post("/uploads", status_code=201)
+async def create_upload(size: int = Form(...), filename: str = Form(...), content_type: str = Form(...),
+                        score_id: Optional[str] = Form(None), title: Optional[str] = Form(None)):
+    """
+    이어 올리기 업로드를 만듭니다. 파일은 PUT /uploads/{upload_id}에 Content-Range와 함께 나눠 보내고,
+    연결이 끊기면 GET /uploads/{upload_id}의 offset부터 다시 보냅니다.
+    WAV/FLAC/OGG는 받는 중에 처리가 시작되며, 결과는 응답의 job_id로 GET /jobs/{job_id}에서 조회합니다.
+    """
+    if not content_type.startswith("audio/"):
+        raise HTTPException(400, "Only audio files allowed")
+    if size <= 0 or size > settings.UPLOAD_MAX_BYTES:
+        raise HTTPException(413, f"파일 크기는 1~{settings.UPLOAD_MAX_BYTES}바이트여야 합니다")
+    upload = await run_in_threadpool(upload_store.create, size, filename, content_type, score_id, title)
+    return _upload_response(upload, status_code=201)
+
+# PUT /uploads 본문을 파일에 쓰는 단위
+_UPLOAD_WRITE_BYTES = 1024 * 1024
+
+@app.put("/uploads/{upload_id}")
+async def append_upload(upload_id: str, request: Request):
+    """Content-Range: bytes <start>-<end>/<size> 범위의 바이트를 이어 붙입니다. start가 받은 위치와 다르면 409"""
+    upload = _require_upload(upload_id)
+    start, end, size = _parse_content_range(request.headers.get("content-range", ""))
+    if size != upload.info.size or end < start or end >= size:
+        raise HTTPException(400, "Content-Range가 업로드 크기와 맞지 않습니다")
+    buffer = bytearray()
+    try:
+        with upload.writing(start) as write:
+            async def flush():
+                data = bytes(buffer)
+                buffer.clear()
+                await run_in_threadpool(write, data)
+
+            started = False
+            try:
+                async for chunk in request.stream():
+                    buffer += chunk
+                    # 파일 쓰기는 스레드풀에서 1MB씩 모아서 (첫 조각은 바로 써서 받는 중 처리를 일찍 시작)
+                    if buffer and (not started or len(buffer) >= _UPLOAD_WRITE_BYTES):
+                        await flush()
+                        if not started:
+                            # 받는 중에 처리할 수 있으면 첫 조각을 받자마자 작업 시작
+                            _start_upload_job(upload)
+                            started = True
+            finally:
+                # 연결이 끊겨도 그때까지 받은 바이트는 남김
+                if buffer:
+                    await flush()
+    except UploadOffsetError as e:
+        return JSONResponse(status_code=409, content={"detail": str(e), "offset": e.offset},
+                            headers={"Upload-Offset": str(e.offset)})
+    except ClientDisconnect:
+        logger.info(f"업로드 연결 끊김: {upload_id} (받은 위치 {upload.offset})")
+    _start_upload_job(upload)
+    return _upload_response(upload)
+
+@app.get("/uploads/{upload_id}")
+async def get_upload(upload_id: str):
+    """받은 위치(offset)와 처리 작업을 반환합니다. 서버 재시작 등으로 작업이 없으면 다시 시작합니다."""
+    upload = _require_upload(upload_id)
+    _start_upload_job(upload)
+    return _upload_response(upload)
+
+@app.delete("/uploads/{upload_id}", status_code=204)
+async def delete_upload(upload_id: str):
+    _require_upload(upload_id)
+    await run_in_threadpool(upload_store.delete, upload_id)
+
+# --- 저장된 레슨 조회 (LESSON_STORE_PATH 설정 시, SQLite 호출은 스레드 풀에서 실행) ---
+def _require_store() -> LessonStore:
+    if lesson_store is None:
+        raise HTTPException(404, "레슨 저장소가 설정되어 있지 않습니다 (LESSON_STORE_PATH)")
+    return lesson_store
+
+@app.get("/lessons")
+async def list_lessons(score_id: Optional[str] = None, limit: int = Query(50, ge=1, le=500), offset: int = Query(0, ge=0)):
+    return {"lessons": await run_in_threadpool(_require_store().list_lessons, score_id, limit, offset)}
+
+@app.get("/lessons/search")
+async def search_lessons(q: str, score_id: Optional[str] = None, limit: int = Query(20, ge=1, le=200)):
+    """보정 스크립트와 요약 전문 검색"""
+    return {"lessons": await run_in_threadpool(_require_store().search, q, score_id, limit)}
+
+@app.get("/lessons/{lesson_id}")
+async def get_lesson(lesson_id: int):
+    lesson = await run_in_threadpool(_require_store().get_lesson, lesson_id)
+    if lesson is None:
+        raise HTTPException(404, "Lesson not found")
+    return lesson
+
+@app.delete("/lessons/{lesson_id}", status_code=204)
+async def delete_lesson(lesson_id: int):
+    if not await run_in_threadpool(_require_store().delete_lesson, lesson_id):
+        raise HTTPException(404, "Lesson not found")
+
+@app.get("/annotations")
+async def get_measure_annotations(measure: int, score_id: Optional[str] = None,
+                                  limit: int = Query(100, ge=1, le=1000)):
+    """여러 레슨에 걸친 특정 마디의 지시어 (예: 23마디에 대한 모든 피드백)"""
+    return {"annotations": await run_in_threadpool(_require_store().annotations_for_measure, measure, score_id, limit)}
 
 # --- API 요청/응답 Body를 위한 Pydantic 모델 ---
 class AnnotationRequest(BaseModel):
     text: str
 
-class AnnotationInfo(BaseModel):
-    measure: int
-    directive: str
-
 class AnnotationResponse(BaseModel):
     annotations: List[AnnotationInfo]
 
@@ -191,11 +580,210 @@ async def parse_directives_from_text(req: AnnotationRequest):
     # 이미 구현된 파싱 함수를 호출
     logger.info("주석 파싱 시작")
     # 1. score_annotator는 튜플 리스트를 반환 -> 예: [(5, "빠르게"), (20, "부드럽게")]
-    parsed_tuples: List[Tuple[int, str]] = parse_annotations(req.text)
+    #    (Okt는 블로킹이고 첫 호출 때 JVM을 띄우므로 이벤트 루프가 아닌 파서 스레드 풀에서 실행)
+    parsed_tuples: List[Tuple[int, str]] = await asyncio.get_running_loop().run_in_executor(
+        annotation_executor, in_context(parse_annotations), req.text)
     
     # 2. 튜플 리스트를 Pydantic 모델(AnnotationInfo) 객체 리스트로 변환
     #    - 각 튜플 (m, d)를 AnnotationInfo(measure=m, directive=d) 객체로 만듭니다.
     annotations_list = [AnnotationInfo(measure=m, directive=d) for m, d in parsed_tuples]
     logger.info("주석 파싱 완료")
     # 3. 최종적으로 Pydantic 모델로 감싸서 반환
-    return AnnotationResponse(annotations=annotations_list)
\ No newline at end of file
+    return AnnotationResponse(annotations=annotations_list)
+
+class BatchAnnotationRequest(BaseModel):
+    texts: List[str]
+
+class BatchAnnotationResponse(BaseModel):
+    results: List[AnnotationResponse]
+
+class JsonlAnnotationItem(BaseModel):
+    id: Optional[Union[str, int]] = None
+    text: str
+
+_JSONL_MEDIA_TYPES = ("application/x-ndjson", "application/jsonl", "application/x-jsonlines")
+
+def _annotation_dicts(parsed_tuples: List[Tuple[int, str]]) -> List[dict]:
+    # 항목이 수천 개인 배치에서는 AnnotationInfo 객체를 만들지 않고 같은 모양의 dict로 응답
+    return [{"measure": m, "directive": d} for m, d in parsed_tuples]
+
+def _parse_in_pool(text: str) -> List[Tuple[int, str]]:
+    return parse_annotations(text) if text else []
+
+async def _iter_request_lines(request: Request):
+    """요청 본문을 받는 대로 줄 단위로 나눕니다. (본문 전체를 메모리에 올리지 않음)"""
+    buffer = bytearray()
+    async for chunk in request.stream():
+        start = len(buffer)
+        buffer += chunk
+        # 새로 받은 조각에서만 줄바꿈을 찾고, 끝나지 않은 줄은 버퍼에 남김
+        end = buffer.rfind(b"\n", start)
+        if end < 0:
+            continue
+        for line in buffer[:end].split(b"\n"):
+            if line.strip():
+                yield line
+        del buffer[:end + 1]
+    if buffer.strip():
+        yield bytes(buffer)
+
+class _JsonlParses:
+    """
+    JSONL 줄의 파싱 작업. 워커 풀에는 입력 순서대로 최대 limit개까지만 넣고,
+    하나가 끝날 때마다 다음 줄을 넣습니다. (수십만 줄을 보내도 풀의 대기열이 한꺼번에 쌓이지 않음)
+    """
+
+    def __init__(self, limit: int):
+        self._limit = limit
+        self._loop = asyncio.get_running_loop()
+        self._entries = []  # [id, 텍스트 또는 예외, future(워커 풀에 넣은 뒤)]
+        self._next = 0
+        self._running = 0
+        self._closed = False
+
+    def __len__(self):
+        return len(self._entries)
+
+    def add(self, item_id, text: str):
+        self._entries.append([item_id, text, None])
+        self._fill()
+
+    def add_error(self, error: Exception):
+        self._entries.append([None, error, None])
+
+    def _fill(self):
+        while not self._closed and self._running < self._limit and self._next < len(self._entries):
+            entry = self._entries[self._next]
+            self._next += 1
+            if isinstance(entry[1], Exception):
+                continue
+            entry[2] = self._loop.run_in_executor(annotation_executor, in_context(_parse_in_pool), entry[1])
+            entry[1] = None
+            self._running += 1
+            entry[2].add_done_callback(self._done)
+
+    def _done(self, _future):
+        self._running -= 1
+        self._fill()
+
+    async def results(self):
+        """(index, id, 파싱 결과 또는 예외)를 입력 순서대로 돌려줍니다."""
+        for index, entry in enumerate(self._entries):
+            item_id, error, future = entry
+            if isinstance(error, Exception):
+                yield index, item_id, error
+                continue
+            if future is None:
+                # 앞의 파싱이 모두 끝났으면 이 줄도 이미 넣었어야 함 (완료 콜백보다 먼저 깨어난 경우 대비)
+                self._fill()
+                future = entry[2]
+            try:
+                yield index, item_id, await future
+            except Exception as e:
+                yield index, item_id, e
+            # 내보낸 결과는 바로 놓아 줌
+            self._entries[index] = [item_id, None, None]
+
+    def cancel(self):
+        """아직 시작하지 않은 파싱을 취소하고 더 넣지 않습니다."""
+        self._closed = True
+        for _, _, future in self._entries[:self._next]:
+            if future is not None:
+                future.cancel()
+
+async def _submit_jsonl_lines(request: Request) -> _JsonlParses:
+    """
+    JSONL 요청의 각 줄({"id": ..., "text": ...} 또는 문자열)을 받는 즉시 워커 풀에 넣습니다.
+    (StreamingResponse가 연결 종료 감지를 위해 receive()를 사용하므로 요청 본문은 응답 전에 모두 읽음)
+    동시에 풀에 넣는 줄은 워커 수의 두 배까지이며, 나머지는 앞의 파싱이 끝나는 대로 넣습니다.
+    """
+    parses = _JsonlParses(limit=2 * settings.ANNOTATION_WORKERS)
+    async for line in _iter_request_lines(request):
+        try:
+            value = json.loads(line)
+            item = JsonlAnnotationItem(text=value) if isinstance(value, str) else JsonlAnnotationItem.model_validate(value)
+        except (ValueError, ValidationError) as e:
+            parses.add_error(ValueError(f"잘못된 JSONL 줄: {e}"))
+        else:
+            parses.add(item.id, item.text)
+    return parses
+
+async def _stream_jsonl_annotations(parses: _JsonlParses):
+    """파싱 결과를 입력 순서대로 한 줄씩 내보냅니다. 잘못된 줄은 전체 요청을 실패시키지 않고 error를 담아 돌려줍니다."""
+    try:
+        async for index, item_id, parsed in parses.results():
+            result = {"index": index}
+            if item_id is not None:
+                result["id"] = item_id
+            if isinstance(parsed, Exception):
+                logger.error(f"주석 파싱 실패 (index={index}): {parsed}")
+                result["error"] = str(parsed)
+            else:
+                result["annotations"] = _annotation_dicts(parsed)
+            yield json.dumps(result, ensure_ascii=False) + "\n"
+    finally:
+        # 클라이언트가 중간에 연결을 끊으면 아직 시작하지 않은 파싱은 취소
+        parses.cancel()
+
+@app.post("/parse-directives/batch", response_model=BatchAnnotationResponse)
+async def parse_directives_batch(request: Request):
+    """
+    여러 텍스트의 지시어를 한 번에 파싱합니다.
+    - application/json: {"texts": [...]} -> {"results": [{"annotations": [...]}, ...]} (입력 순서 유지)
+    - application/x-ndjson (JSONL): 한 줄에 {"id": ..., "text": ...} -> 한 줄에 {"index", "id", "annotations"}
+      줄마다 받는 즉시 파싱을 시작하고, 결과는 입력 순서대로 스트리밍합니다.
+    빈 텍스트는 빈 annotations를 돌려줍니다.
+    """
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    if content_type in _JSONL_MEDIA_TYPES:
+        parses = await _submit_jsonl_lines(request)
+        logger.info(f"JSONL 주석 파싱: {len(parses)}줄")
+        return StreamingResponse(_stream_jsonl_annotations(parses), media_type="application/x-ndjson")
+
+    try:
+        req = BatchAnnotationRequest.model_validate_json(await request.body())
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=json.loads(e.json(include_url=False)))
+    if len(req.texts) > settings.ANNOTATION_BATCH_MAX_TEXTS:
+        raise HTTPException(status_code=413, detail=f"한 번에 최대 {settings.ANNOTATION_BATCH_MAX_TEXTS}개의 텍스트를 보낼 수 있습니다. JSONL 스트림을 사용하세요.")
+
+    logger.info(f"배치 주석 파싱 시작: {len(req.texts)}개")
+    loop = asyncio.get_running_loop()
+    parsed = await asyncio.gather(*(loop.run_in_executor(annotation_executor, in_context(_parse_in_pool), text)
+                                    for text in req.texts))
+    logger.info("배치 주석 파싱 완료")
+    return JSONResponse({"results": [{"annotations": _annotation_dicts(p)} for p in parsed]})
+
+_annotation_list = TypeAdapter(List[AnnotationInfo])
+
+@app.post("/scores/annotate")
+async def annotate_score_file(file: UploadFile = File(...), text: Optional[str] = Form(None),
+                              annotations: Optional[str] = Form(None), part_id: Optional[str] = Form(None)):
+    """
+    업로드한 악보(MXL 또는 MusicXML)에 지시어를 써 넣은 악보 파일을 돌려줍니다.
+    - text: 보정 스크립트. parse_annotations로 지시어를 추출해 사용
+    - annotations: /parse-directives 응답의 annotations 목록(JSON 문자열)을 그대로 사용
+    - part_id: 주석을 쓸 파트 (기본은 첫 번째 파트)
+    """
+    if annotations is not None:
+        try:
+            parsed_tuples = [(a.measure, a.directive) for a in _annotation_list.validate_json(annotations)]
+        except ValidationError as e:
+            raise HTTPException(status_code=422, detail=json.loads(e.json(include_url=False)))
+    elif text:
+        parsed_tuples = await asyncio.get_running_loop().run_in_executor(annotation_executor,
+                                                                         in_context(parse_annotations), text)
+    else:
+        raise HTTPException(status_code=400, detail="text 또는 annotations가 필요합니다.")
+
+    data = await file.read()
+    try:
+        content, media_type = await run_in_threadpool(annotate_score, data, parsed_tuples, part_id)
+    except ScoreFormatError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    logger.info(f"악보 주석 완료: {file.filename}, 지시어 {len(parsed_tuples)}개")
+
+    stem, ext = os.path.splitext(os.path.basename(file.filename or "score.mxl"))
+    filename = f"{stem}_annotated{ext or '.mxl'}"
+    return Response(content=content, media_type=media_type,
+                    headers={"Content-Disposition": f"attachment; filename*=UTF-8''{quote(filename)}"})
@@ -0,0 +1,177 @@
+"""
+레슨 파이프라인 계측.
+
+- Prometheus 지표: 단계별 처리 시간 히스토그램, 처리한 오디오 길이/구간 수, LLM 토큰/재시도, 작업 큐 길이
+  (GET /metrics, Prometheus 텍스트 형식)
+- 요청별 트레이스: 요청에서 실행된 단계를 순서대로 기록해 X-Debug-Trace 응답 헤더로 돌려줌
+
+단계는 stage() 컨텍스트 또는 @timed 데코레이터로 감싸며, 하나의 측정이 히스토그램과 트레이스에 함께 기록됩니다.
+prometheus_client가 설치되어 있지 않으면 지표는 기록하지 않고 트레이스만 동작합니다.
+"""
+import contextvars
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+try:
+    import prometheus_client
+except ImportError:
+    prometheus_client = None
+    logger.warning("prometheus_client가 없어 /metrics 지표를 수집하지 않습니다")
+
+# 초 단위 처리 시간 구간 (요청 하나의 짧은 형태소 분석부터 긴 녹음의 STT까지)
+STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+
+class _Unrecorded:
+    """prometheus_client가 없을 때 지표 자리에 쓰는 객체 (모든 기록을 무시)"""
+
+    def labels(self, *args, **kwargs):
+        return self
+
+    def observe(self, value):
+        pass
+
+    def inc(self, value=1):
+        pass
+
+    def dec(self, value=1):
+        pass
+
+    def set(self, value):
+        pass
+
+
+def _metric(kind: str, name: str, documentation: str, labelnames=(), **kwargs):
+    if prometheus_client is None:
+        return _Unrecorded()
+    return getattr(prometheus_client, kind)(name, documentation, labelnames, **kwargs)
+
+
+STAGE_SECONDS = _metric("Histogram", "lesson_stage_seconds", "레슨 처리 단계별 소요 시간(초)",
+                        ["stage"], buckets=STAGE_BUCKETS)
+AUDIO_SECONDS = _metric("Counter", "lesson_audio_seconds", "디코딩한 레슨 오디오 길이(초)")
+SPEECH_SEGMENTS = _metric("Counter", "lesson_speech_segments", "텍스트로 변환한 음성 구간 수")
+SEGMENT_LABELS = _metric("Counter", "lesson_segment_labels", "분류 라벨별 음성 구간 수", ["label"])
+YAMNET_FRAMES = _metric("Counter", "lesson_yamnet_frames", "무음 게이트 결과별 YAMNet 프레임 수 (analyzed/skipped)",
+                        ["gate"])
+LLM_TOKENS = _metric("Counter", "llm_tokens", "LLM 사용 토큰 수", ["kind"])
+LLM_RETRIES = _metric("Counter", "llm_retries", "재시도한 LLM 호출 수", ["error"])
+LLM_REJECTED = _metric("Counter", "llm_circuit_rejections", "서킷 브레이커가 열려 거절된 LLM 호출 수")
+WHISPER_TIER_JOBS = _metric("Counter", "lesson_whisper_tier_jobs", "모델 단계에 사용한 Whisper 티어별 레슨 수",
+                            ["tier"])
+JOB_QUEUE_DEPTH = _metric("Gauge", "lesson_job_queue_depth", "대기 중이거나 실행 중인 레슨 작업 수",
+                          multiprocess_mode="livesum")
+
+
+class Trace:
+    """한 요청에서 실행된 단계 목록. 여러 스레드(청크 병렬 보정 등)에서 함께 기록할 수 있습니다."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.spans: List[Dict] = []
+        self._lock = threading.Lock()
+
+    def add(self, name: str, start: float, seconds: float, error: bool = False):
+        span = {"stage": name, "start_ms": round((start - self.started) * 1000, 2), "ms": round(seconds * 1000, 2)}
+        if error:
+            span["error"] = True
+        with self._lock:
+            self.spans.append(span)
+
+    def to_header(self, max_spans: int = 64) -> str:
+        """응답 헤더에 넣을 JSON. 단계가 많으면(청크별 LLM 호출 등) 앞의 max_spans개와 단계별 합계만 남김"""
+        with self._lock:
+            # 시작 순서대로, 같은 시각에 시작했으면 바깥 단계(더 긴 단계)를 먼저
+            spans = sorted(self.spans, key=lambda span: (span["start_ms"], -span["ms"]))
+        totals: Dict[str, Dict] = {}
+        for span in spans:
+            total = totals.setdefault(span["stage"], {"count": 0, "ms": 0.0})
+            total["count"] += 1
+            total["ms"] = round(total["ms"] + span["ms"], 2)
+        trace = {"total_ms": round((time.perf_counter() - self.started) * 1000, 2),
+                 "stages": totals, "spans": spans[:max_spans]}
+        if len(spans) > max_spans:
+            trace["dropped_spans"] = len(spans) - max_spans
+        return json.dumps(trace, ensure_ascii=True, separators=(",", ":"))
+
+
+_current_trace: contextvars.ContextVar[Optional[Trace]] = contextvars.ContextVar("lesson_trace", default=None)
+
+
+@contextmanager
+def tracing():
+    """이 컨텍스트 안에서 실행된 단계를 기록하는 Trace를 시작합니다."""
+    trace = Trace()
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+
+
+@contextmanager
+def stage(name: str):
+    """단계 처리 시간을 히스토그램과 (진행 중인 경우) 현재 요청의 트레이스에 기록합니다."""
+    start = time.perf_counter()
+    error = False
+    try:
+        yield
+    except BaseException:
+        error = True
+        raise
+    finally:
+        seconds = time.perf_counter() - start
+        STAGE_SECONDS.labels(name).observe(seconds)
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.add(name, start, seconds, error)
+
+
+def timed(name: str) -> Callable:
+    """함수 호출 전체를 stage(name)으로 감싸는 데코레이터"""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def in_context(fn: Callable) -> Callable:
+    """
+    현재 컨텍스트(진행 중인 트레이스 포함)에서 fn을 실행하는 함수를 반환합니다.
+    ThreadPoolExecutor.submit은 contextvars를 넘기지 않으므로 작업을 제출할 때 감싸서 사용
+    """
+    return functools.partial(contextvars.copy_context().run, fn)
+
+
+def record_llm_usage(usage):
+    """OpenAI 응답의 usage(prompt_tokens, completion_tokens)를 토큰 카운터에 더합니다."""
+    for kind in ("prompt", "completion"):
+        tokens = getattr(usage, f"{kind}_tokens", None)
+        if isinstance(tokens, int):
+            LLM_TOKENS.labels(kind).inc(tokens)
+
+
+def render_latest():
+    """
+    Prometheus 텍스트 형식의 지표와 Content-Type을 반환합니다.
+    PROMETHEUS_MULTIPROC_DIR이 설정되어 있으면 여러 워커 프로세스의 지표를 합쳐서 반환합니다.
+    """
+    if prometheus_client is None:
+        return b"", "text/plain; version=0.0.4; charset=utf-8"
+    registry = prometheus_client.REGISTRY
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+        registry = prometheus_client.CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    return prometheus_client.generate_latest(registry), prometheus_client.CONTENT_TYPE_LATEST
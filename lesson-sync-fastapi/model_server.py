@@ -0,0 +1,147 @@
+"""
+공유 모델 서버.
+
+여러 uvicorn 워커가 각자 YAMNet/Whisper를 로드하면 워커 수만큼 가중치가 메모리에 올라갑니다.
+이 프로세스 하나가 모델을 로드하고, API 워커는 RemoteModelExecutor로 모델 단계를 요청합니다.
+오디오는 같은 호스트의 임시 파일 경로로 전달되므로 파형을 소켓으로 주고받지 않습니다.
+
+실행:
+    python model_server.py          # MODEL_SERVER_ADDRESS / MODEL_SERVER_AUTHKEY 설정 사용
+
+요청 인자는 pickle로 전달되므로 MODEL_SERVER_AUTHKEY 없이는 시작하지 않고,
+MODEL_OPERATIONS에 등록된 모델 단계만 실행하며, 기본적으로 루프백 주소에만 바인딩합니다.
+"""
+import ipaddress
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from multiprocessing.managers import BaseManager
+from typing import Tuple
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+
+# 모델 서버가 실행하는 모델 단계 (lesson_pipeline의 같은 이름 함수)
+MODEL_OPERATIONS = ("transcribe_in_worker",)
+
+
+class _ModelService:
+    """모델 서버 프로세스 안에서 등록된 모델 단계만 실행합니다."""
+
+    def __init__(self, max_concurrency: int):
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+
+    def transcribe_in_worker(self, *args, **kwargs):
+        import lesson_pipeline
+
+        with self._slots:
+            return lesson_pipeline.transcribe_in_worker(*args, **kwargs)
+
+
+class ModelServerManager(BaseManager):
+    pass
+
+
+ModelServerManager.register("model_service", exposed=MODEL_OPERATIONS)
+
+
+def parse_address(address: str) -> Tuple[str, int]:
+    host, _, port = address.rpartition(":")
+    return host or "127.0.0.1", int(port)
+
+
+def _is_loopback(host: str) -> bool:
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+def create_server(address: Tuple[str, int], authkey: bytes, max_concurrency: int = 1, allow_remote: bool = False):
+    """
+    모델 서버를 만듭니다. (serve_forever()로 실행)
+    모델 단계(lesson_pipeline.transcribe_in_worker)는 이 프로세스의 AudioProcessor를 사용합니다.
+    authkey가 비어 있거나, allow_remote 없이 루프백이 아닌 주소를 지정하면 ValueError
+    """
+    if not authkey:
+        raise ValueError("MODEL_SERVER_AUTHKEY를 설정해야 모델 서버를 시작할 수 있습니다")
+    if not _is_loopback(address[0]):
+        if not allow_remote:
+            raise ValueError(f"모델 서버는 루프백 주소에만 바인딩합니다 ({address[0]}). "
+                             "다른 호스트에서 접속해야 하면 MODEL_SERVER_ALLOW_REMOTE를 켜세요")
+        logger.warning(f"모델 서버가 루프백이 아닌 주소에 바인딩합니다: {address[0]} (신뢰할 수 있는 네트워크에서만 사용)")
+
+    from lesson_pipeline import init_model_worker
+
+    init_model_worker()
+    service = _ModelService(max_concurrency)
+
+    class _ServerManager(ModelServerManager):
+        pass
+
+    _ServerManager.register("model_service", callable=lambda: service, exposed=MODEL_OPERATIONS)
+    return _ServerManager(address=address, authkey=authkey).get_server()
+
+
+class RemoteModelExecutor:
+    """
+    모델 서버에 모델 단계를 요청하는 Executor.
+    ProcessPoolExecutor와 같은 submit()/shutdown() 인터페이스를 제공하므로 파이프라인은 둘을 구분하지 않습니다.
+    함수 대신 이름만 전달하므로 MODEL_OPERATIONS에 등록된 모델 단계만 요청할 수 있습니다. (인자는 pickle로 전달)
+    """
+
+    def __init__(self, address: Tuple[str, int], authkey: bytes, max_workers: int = 4):
+        if not authkey:
+            raise ValueError("모델 서버에 접속하려면 MODEL_SERVER_AUTHKEY를 설정해야 합니다")
+        self._address = address
+        self._authkey = authkey
+        self._service = None
+        self._lock = threading.Lock()
+        # 원격 호출 결과를 기다리는 스레드 (계산은 모델 서버에서 수행)
+        self._threads = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="model-client")
+
+    def _get_service(self):
+        with self._lock:
+            if self._service is None:
+                manager = ModelServerManager(address=self._address, authkey=self._authkey)
+                manager.connect()
+                self._service = manager.model_service()
+            return self._service
+
+    def _call(self, operation, args, kwargs):
+        try:
+            return getattr(self._get_service(), operation)(*args, **kwargs)
+        except (ConnectionError, EOFError):
+            # 모델 서버가 재시작된 경우 다음 요청에서 다시 연결
+            with self._lock:
+                self._service = None
+            raise
+
+    def submit(self, fn, *args, **kwargs) -> Future:
+        operation = getattr(fn, "__name__", None)
+        if operation not in MODEL_OPERATIONS:
+            raise ValueError(f"모델 서버에 등록되지 않은 모델 단계입니다: {operation}")
+        return self._threads.submit(self._call, operation, args, kwargs)
+
+    def shutdown(self, wait: bool = True):
+        self._threads.shutdown(wait=wait)
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    address = parse_address(settings.MODEL_SERVER_ADDRESS or "127.0.0.1:50055")
+    try:
+        server = create_server(address, settings.MODEL_SERVER_AUTHKEY.encode(), settings.MODEL_SERVER_CONCURRENCY,
+                               allow_remote=settings.MODEL_SERVER_ALLOW_REMOTE)
+    except ValueError as e:
+        raise SystemExit(str(e))
+    logger.info(f"모델 서버 시작: {server.address}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+from typing import Any, Optional
+
+logger = logging.getLogger(__name__)
+
+# 한도를 넘으면 이 비율까지 줄여, 가득 찬 상태에서도 저장할 때마다 디렉터리를 훑지 않도록 함
+_EVICT_TO_RATIO = 0.9
+
+
+def file_digest(path: str, chunk_size: int = 1024 * 1024) -> str:
+    """파일 내용의 SHA-256 해시 (메모리에 전체를 올리지 않고 계산)"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(chunk_size):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def cache_key(*parts: str) -> str:
+    """여러 구성 요소(이전 단계 키, 모델/프롬프트 버전 등)를 하나의 캐시 키로 합칩니다."""
+    return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """
+    처리 단계별 결과를 JSON 파일로 저장하는 디스크 캐시.
+    파일 수정 시각을 마지막 사용 시각으로 사용하며, 전체 크기가 max_bytes를 넘으면
+    가장 오래 사용되지 않은 항목부터 삭제합니다(LRU).
+    여러 워커 프로세스가 같은 디렉터리를 공유할 수 있도록 파일 교체는 원자적으로 수행합니다.
+    전체 크기는 저장할 때마다 더해 가는 추정값으로 확인하고, 추정값이 max_bytes를 넘을 때만 디렉터리를 훑어
+    max_bytes의 90%까지 지운 뒤 실제 크기로 다시 맞춥니다. (다른 프로세스가 저장한 만큼은 다음에 훑을 때 반영됨)
+    """
+
+    def __init__(self, root: str, max_bytes: int):
+        self.root = root
+        self.max_bytes = max_bytes
+        os.makedirs(root, exist_ok=True)
+        self._estimated_bytes: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        # 모델 워커/모델 서버로 넘길 때는 위치와 한도만 보내고, 크기 추정값은 받는 쪽에서 다시 계산
+        return {"root": self.root, "max_bytes": self.max_bytes}
+
+    def __setstate__(self, state):
+        self.root = state["root"]
+        self.max_bytes = state["max_bytes"]
+        self._estimated_bytes = None
+        self._lock = threading.Lock()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], f"{key}.json")
+
+    def get(self, key: str) -> Optional[Any]:
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                value = json.load(f)
+            os.utime(path)
+            return value
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"캐시 항목을 읽을 수 없습니다 ({key}): {e}")
+            return None
+
+    def put(self, key: str, value: Any):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(value, f, ensure_ascii=False)
+            size = os.path.getsize(tmp_path)
+            replaced = _file_size(path)
+            os.replace(tmp_path, path)
+        except Exception:
+            os.remove(tmp_path)
+            raise
+        with self._lock:
+            if self._estimated_bytes is None:
+                self._estimated_bytes = self._scan()[1]
+            else:
+                self._estimated_bytes += size - replaced
+            if self._estimated_bytes > self.max_bytes:
+                self._estimated_bytes = self._evict()
+
+    def _scan(self):
+        """(마지막 사용 시각, 크기, 경로) 목록과 전체 크기"""
+        entries = []
+        total = 0
+        for dirpath, _, filenames in os.walk(self.root):
+            for name in filenames:
+                if not name.endswith(".json"):
+                    continue
+                try:
+                    stat = os.stat(os.path.join(dirpath, name))
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, os.path.join(dirpath, name)))
+                total += stat.st_size
+        return entries, total
+
+    def _evict(self) -> int:
+        """한도를 넘었으면 가장 오래 사용되지 않은 항목부터 지워 한도의 90% 이하로 줄이고, 남은 전체 크기를 반환합니다."""
+        entries, total = self._scan()
+        if total <= self.max_bytes:
+            return total
+        for _, size, path in sorted(entries):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            if total <= self.max_bytes * _EVICT_TO_RATIO:
+                break
+        return total
+
+
+def _file_size(path: str) -> int:
+    try:
+        return os.path.getsize(path)
+    except FileNotFoundError:
+        return 0
@@ -0,0 +1,351 @@
+"""
+레슨 녹음과 악보 정렬 (연주 구간 -> 마디 범위).
+
+YAMNet이 찾은 말소리 구간 사이(music 라벨 구간 포함)를 연주 구간으로 보고,
+연주 구간 오디오의 크로마(12개 피치 클래스 에너지)를 업로드한 악보(MXL/MusicXML)의 음표로 그린 크로마에
+부분열(subsequence) DTW로 맞춰 연주 구간마다 악보의 마디 범위를 찾습니다.
+말소리 구간에는 그 구간이 속한 연주 구간, 없으면 바로 앞(없으면 바로 뒤) 연주 구간의 마디 범위를 붙입니다.
+(선생님은 보통 방금 연주한 부분을 이야기함)
+
+DTW는 다중 해상도로 계산합니다.
+  - 가장 거친 해상도(ALIGNMENT_FACTORS[0]배로 프레임을 평균)에서만 전체 비용 행렬을 계산하고
+  - 다음 해상도부터는 앞 해상도 경로 주변 띠(band) 안의 칸만 계산하므로
+시간과 메모리가 녹음 길이에 거의 비례합니다. 스텝을 (1,1), (1,2), (2,1)로 제한해(템포 비 0.5~2배)
+한 행의 값이 같은 행의 다른 칸에 의존하지 않으므로 행 단위로 벡터화됩니다.
+도돌이표는 펼치지 않고 악보에 적힌 순서대로 그립니다. (연주 구간마다 따로 맞추므로 반복 연습은 문제없음)
+"""
+import bisect
+import logging
+import re
+import xml.etree.ElementTree as ET
+from contextlib import nullcontext
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import librosa
+import numpy as np
+
+from audio_stream import decode_to_spool
+from score_writer import ScoreFormatError, read_musicxml
+
+logger = logging.getLogger(__name__)
+
+# 결과 캐시 키에 포함 (정렬 방식이 바뀌면 올림)
+ALIGNMENT_VERSION = "1"
+
+FEATURE_RATE = 10                   # 크로마 프레임 수/초 (악보와 오디오 모두)
+N_FFT = 4096                        # 16kHz에서 약 4Hz 간격 (낮은 음의 피치 클래스 구분)
+ALIGNMENT_FACTORS = (16, 4, 1)      # 다중 해상도 DTW의 프레임 평균 배수 (앞 배수가 뒤 배수의 배수여야 함)
+BAND_RADIUS = 8                     # 앞 해상도 경로 주변으로 더 계산하는 칸 수
+MIN_PLAYING_SECONDS = 3.0           # 이보다 짧은 연주 구간은 정렬하지 않음
+MIN_VOICED_RATIO = 0.5              # 소리가 있는 프레임이 이 비율보다 적으면(쉬는 시간 등) 정렬하지 않음
+SILENCE_RMS = 1e-3                  # 이보다 작은 프레임은 무음
+SPEECH_CONTEXT_SECONDS = 30.0       # 말소리 구간과 이 시간 안에 있는 연주 구간의 마디를 붙임
+DEFAULT_TEMPO = 120.0               # 악보에 템포 표시가 없을 때 (4분음표/분)
+
+_BLOCK_SECONDS = 60                 # 오디오 크로마를 나눠 계산하는 단위 (STFT 메모리 제한)
+_MIN_LEVEL_FRAMES = 8               # 이보다 짧아지는 거친 해상도는 건너뜀
+_STEP_NAMES = {"C": 0, "D": 2, "E": 4, "F": 5, "G": 7, "A": 9, "B": 11}
+# 악기 소리의 배음이 크로마에 남기는 에너지: (반음 차이, 가중치) - 기음, 3배음(완전5도), 5배음(장3도)
+_HARMONICS = ((0, 1.0), (7, 0.3), (4, 0.15))
+# DTW 스텝 번호 -> (녹음 프레임 이동, 악보 프레임 이동). 0은 시작
+_STEPS = {1: (1, 1), 2: (1, 2), 3: (2, 1)}
+
+
+@dataclass
+class ScoreChroma:
+    """악보를 FEATURE_RATE로 그린 크로마. 캐시되어 공유되므로 읽기 전용으로 사용"""
+    chroma: np.ndarray          # (프레임 수, 12), 프레임별 L2 정규화
+    measures: List[int]         # 마디 번호 (악보 순서)
+    frame_measures: np.ndarray  # 프레임별 measures 인덱스
+
+
+def _measure_number(number: str, ordinal: int) -> int:
+    # 못갖춘마디 등 숫자가 아닌 번호("X1")는 순서 번호로 대신함
+    match = re.match(r"\d+", number or "")
+    return int(match.group()) if match else ordinal
+
+
+def _read_part(part: ET.Element):
+    """
+    파트 하나를 읽어 (음표 [(시작, 길이, 피치 클래스)], 마디 [(번호, 시작)], 템포 [(위치, BPM)], 끝 위치)를 반환합니다.
+    위치와 길이는 4분음표 단위입니다.
+    """
+    notes, measures, tempos = [], [], []
+    divisions = 1.0
+    cursor = 0.0
+    for ordinal, measure in enumerate(part.findall("measure"), start=1):
+        start = furthest = onset = cursor
+        for element in measure:
+            if element.tag == "attributes":
+                divisions = float(element.findtext("divisions") or divisions)
+            elif element.tag == "note" and element.find("grace") is None:
+                duration = float(element.findtext("duration") or 0) / divisions
+                # 화음(<chord/>)은 앞 음표와 같은 시점에서 시작하고 시간을 진행시키지 않음
+                if element.find("chord") is None:
+                    onset = cursor
+                    cursor += duration
+                pitch = element.find("pitch")
+                step = _STEP_NAMES.get((pitch.findtext("step") or "").strip()) if pitch is not None else None
+                if step is not None and duration > 0:
+                    alter = round(float(pitch.findtext("alter") or 0))
+                    notes.append((onset, duration, (step + alter) % 12))
+            elif element.tag in ("backup", "forward"):
+                duration = float(element.findtext("duration") or 0) / divisions
+                cursor += duration if element.tag == "forward" else -duration
+            if element.tag in ("direction", "sound"):
+                sound = element if element.tag == "sound" else element.find("sound")
+                if sound is not None and sound.get("tempo"):
+                    tempos.append((cursor, float(sound.get("tempo"))))
+            furthest = max(furthest, cursor)
+        measures.append((_measure_number(measure.get("number", ""), ordinal), start))
+        cursor = furthest
+    return notes, measures, tempos, cursor
+
+
+def _to_seconds(positions: np.ndarray, tempos: List[Tuple[float, float]]) -> np.ndarray:
+    """4분음표 위치를 템포 변화를 반영한 초로 바꿉니다. 첫 템포 표시 앞은 첫 템포를 사용"""
+    tempos = sorted(tempos) or [(0.0, DEFAULT_TEMPO)]
+    breaks = np.array([0.0] + [position for position, _ in tempos[1:]])
+    bpm = np.array([max(tempo, 1.0) for _, tempo in tempos])
+    starts = np.concatenate([[0.0], np.cumsum(np.diff(breaks) * 60.0 / bpm[:-1])])
+    index = np.clip(np.searchsorted(breaks, positions, side="right") - 1, 0, len(breaks) - 1)
+    return starts[index] + (positions - breaks[index]) * 60.0 / bpm[index]
+
+
+def _normalize(chroma: np.ndarray) -> np.ndarray:
+    """프레임(행)별로 L2 정규화합니다. 소리가 없는 프레임은 모든 피치 클래스가 같은 벡터로 둡니다."""
+    chroma = np.array(chroma, dtype=np.float32)
+    norms = np.linalg.norm(chroma, axis=1)
+    silent = norms < 1e-6
+    chroma[silent] = 1.0
+    norms[silent] = np.sqrt(chroma.shape[1])
+    return chroma / norms[:, None]
+
+
+@lru_cache(maxsize=8)
+def score_chroma(data: bytes, part_id: Optional[str] = None) -> ScoreChroma:
+    """
+    악보(MXL 또는 MusicXML)의 음표를 크로마로 그립니다. part_id를 지정하지 않으면 모든 파트를 합칩니다.
+    템포 표시(<sound tempo>)는 모든 파트에서 읽습니다. 같은 악보를 다시 정렬할 때는 캐시된 결과를 사용합니다.
+    """
+    try:
+        root = ET.fromstring(read_musicxml(data))
+    except ET.ParseError as e:
+        raise ScoreFormatError(f"MusicXML 파싱 실패: {e}") from e
+    if root.tag != "score-partwise":
+        raise ScoreFormatError(f"score-partwise 형식만 지원합니다: <{root.tag}>")
+    parts = root.findall("part")
+    if not parts:
+        raise ScoreFormatError("악보에 파트가 없습니다.")
+    try:
+        read = {part.get("id"): _read_part(part) for part in parts}
+    except ValueError as e:
+        raise ScoreFormatError(f"악보의 길이나 템포 값이 올바르지 않습니다: {e}") from e
+    if part_id is not None and part_id not in read:
+        raise ScoreFormatError(f"파트를 찾을 수 없습니다: {part_id}")
+    selected = [read[part_id]] if part_id is not None else list(read.values())
+    tempos = [tempo for part in read.values() for tempo in part[2]]
+
+    notes = np.array([note for part in selected for note in part[0]], dtype=np.float64).reshape(-1, 3)
+    end = _to_seconds(np.array([max(part[3] for part in selected)]), tempos)[0]
+    chroma = np.zeros((max(1, int(np.ceil(end * FEATURE_RATE))), 12), dtype=np.float32)
+    onsets = np.floor(_to_seconds(notes[:, 0], tempos) * FEATURE_RATE).astype(int)
+    offsets = np.maximum(onsets + 1, np.ceil(_to_seconds(notes[:, 0] + notes[:, 1], tempos) * FEATURE_RATE)).astype(int)
+    for onset, offset, pitch_class in zip(onsets, offsets, notes[:, 2].astype(int)):
+        for shift, weight in _HARMONICS:
+            chroma[onset:offset, (pitch_class + shift) % 12] += weight
+
+    measures = selected[0][1]
+    measure_frames = np.floor(_to_seconds(np.array([start for _, start in measures]), tempos) * FEATURE_RATE)
+    frame_measures = np.searchsorted(measure_frames, np.arange(len(chroma)), side="right") - 1
+    return ScoreChroma(_normalize(chroma), [number for number, _ in measures],
+                       np.clip(frame_measures, 0, max(len(measures) - 1, 0)))
+
+
+def audio_chroma(waveform, start: int, end: int, sr: int) -> Tuple[np.ndarray, float]:
+    """
+    파형의 [start, end) 샘플 구간 크로마 (프레임 수, 12)와 소리가 있는 프레임 비율을 반환합니다.
+    _BLOCK_SECONDS 단위로 나눠 계산하므로 구간 길이와 관계없이 STFT 메모리가 일정합니다.
+    """
+    hop = sr // FEATURE_RATE
+    half = N_FFT // 2
+    block = hop * FEATURE_RATE * _BLOCK_SECONDS
+    chromas, rms = [], []
+    for block_start in range(start, end, block):
+        frames = -(-(min(block_start + block, end) - block_start) // hop)
+        # 프레임 중심이 block_start + k * hop이 되도록 앞뒤로 half만큼 더 읽음 (파형 밖은 0)
+        first = block_start - half
+        y = waveform[max(first, 0):block_start + (frames - 1) * hop + half]
+        y = np.pad(y, (max(-first, 0), 0))
+        y = np.pad(y, (0, max((frames - 1) * hop + N_FFT - len(y), 0)))
+        magnitude = np.abs(librosa.stft(y, n_fft=N_FFT, hop_length=hop, center=False))
+        chromas.append(librosa.feature.chroma_stft(S=magnitude ** 2, sr=sr, n_fft=N_FFT, tuning=0.0).T)
+        rms.append(librosa.feature.rms(S=magnitude, frame_length=N_FFT)[0])
+    if not chromas:
+        return np.zeros((0, 12), dtype=np.float32), 0.0
+    chroma, rms = np.concatenate(chromas), np.concatenate(rms)
+    voiced = rms >= SILENCE_RMS
+    # chroma_stft는 프레임마다 정규화하므로 무음 프레임의 잡음이 커지지 않도록 지움
+    chroma[~voiced] = 0.0
+    return _normalize(chroma), float(voiced.mean())
+
+
+def _downsample(chroma: np.ndarray, factor: int) -> np.ndarray:
+    if factor == 1:
+        return chroma
+    padded = np.pad(chroma, ((0, -len(chroma) % factor), (0, 0)), mode="edge")
+    return _normalize(padded.reshape(-1, factor, chroma.shape[1]).mean(axis=1))
+
+
+def _window(row: np.ndarray, row_lo: int, start: int, width: int) -> np.ndarray:
+    """row_lo열부터 시작하는 row에서 start..start+width열 값을 꺼냅니다. 범위 밖은 inf"""
+    out = np.full(width, np.inf)
+    a, b = max(start, row_lo), min(start + width, row_lo + len(row))
+    if a < b:
+        out[a - start:b - start] = row[a - row_lo:b - row_lo]
+    return out
+
+
+def _dtw(query: np.ndarray, reference: np.ndarray, lo: np.ndarray, hi: np.ndarray):
+    """
+    query 프레임 i를 reference의 [lo[i], hi[i]) 열 안에서만 맞추는 부분열 DTW.
+    첫 프레임은 창 안 어디서든 시작하고 마지막 프레임은 창 안 어디서든 끝날 수 있습니다.
+    (2,1) 스텝은 비용을 두 번 더하므로 모든 경로가 녹음 프레임마다 한 번씩 비용을 더해 끝 위치끼리 비교할 수 있습니다.
+    반환: (경로 [(i, j)] 배열, 프레임당 평균 비용). 창 안에 경로가 없으면 None
+    """
+    n = len(query)
+    steps = []
+    previous = before = None
+    for i in range(n):
+        width = hi[i] - lo[i]
+        cost = 1.0 - reference[lo[i]:hi[i]] @ query[i]
+        if i == 0:
+            row, step = cost.astype(np.float64), np.zeros(width, dtype=np.int8)
+        else:
+            candidates = np.stack([
+                _window(previous, lo[i - 1], lo[i] - 1, width) + cost,
+                _window(previous, lo[i - 1], lo[i] - 2, width) + cost,
+                (_window(before, lo[i - 2], lo[i] - 1, width) + 2 * cost) if i >= 2 else np.full(width, np.inf),
+            ])
+            choice = np.argmin(candidates, axis=0)
+            row, step = candidates[choice, np.arange(width)], (choice + 1).astype(np.int8)
+        steps.append(step)
+        before, previous = previous, row
+    if not np.isfinite(previous).any():
+        return None
+
+    i, j = n - 1, lo[n - 1] + int(np.argmin(previous))
+    total = float(previous.min())
+    path = [(i, j)]
+    while (step := steps[i][j - lo[i]]) != 0:
+        di, dj = _STEPS[int(step)]
+        i, j = i - di, j - dj
+        path.append((i, j))
+    return np.array(path[::-1]), total / n
+
+
+def _band(path: np.ndarray, scale: int, n: int, m: int, radius: int) -> Tuple[np.ndarray, np.ndarray]:
+    """거친 해상도 경로를 scale배 촘촘한 해상도의 행별 열 범위 [lo, hi)로 옮기고 radius만큼 넓힙니다."""
+    rows = path[:, 0].max() + 1
+    row_lo, row_hi = np.full(rows, np.iinfo(np.int64).max), np.full(rows, -1)
+    np.minimum.at(row_lo, path[:, 0], path[:, 1])
+    np.maximum.at(row_hi, path[:, 0], path[:, 1])
+    # (2,1) 스텝으로 건너뛴 행은 앞뒤 행의 범위를 합쳐서 채움 (경로는 첫 행과 마지막 행을 항상 지나감)
+    skipped = np.flatnonzero(row_hi < 0)
+    row_lo[skipped] = np.minimum(row_lo[skipped - 1], row_lo[skipped + 1])
+    row_hi[skipped] = np.maximum(row_hi[skipped - 1], row_hi[skipped + 1])
+    coarse = np.minimum(np.arange(n) // scale, rows - 1)
+    lo = np.clip(row_lo[coarse] * scale - radius, 0, m)
+    hi = np.clip((row_hi[coarse] + 1) * scale + radius, 0, m)
+    return lo, np.maximum(hi, lo + 1).clip(max=m)
+
+
+def align_chroma(query: np.ndarray, reference: np.ndarray, factors: Iterable[int] = ALIGNMENT_FACTORS,
+                 radius: int = BAND_RADIUS):
+    """
+    녹음 크로마 query (n, 12)가 악보 크로마 reference (m, 12)의 어느 부분과 맞는지 다중 해상도 DTW로 찾습니다.
+    반환: (경로 [(녹음 프레임, 악보 프레임)] 배열, 프레임당 평균 비용(0~1, 코사인 거리)). 맞출 수 없으면 None
+    """
+    n, m = len(query), len(reference)
+    if n == 0 or m == 0:
+        return None
+    levels = [f for f in factors if f > 1 and n // f >= _MIN_LEVEL_FRAMES and m // f >= _MIN_LEVEL_FRAMES] + [1]
+    result = None
+    for index, factor in enumerate(levels):
+        q, r = _downsample(query, factor), _downsample(reference, factor)
+        if result is None:
+            lo, hi = np.zeros(len(q), dtype=np.int64), np.full(len(q), len(r))
+        else:
+            lo, hi = _band(result[0], levels[index - 1] // factor, len(q), len(r), radius)
+        refined = _dtw(q, r, lo, hi)
+        if refined is None and result is not None:
+            # 띠 안에서 경로를 찾지 못하면 거친 경로를 늘려서 사용
+            scale = levels[index - 1] // factor
+            path = np.repeat(result[0] * scale, scale, axis=0) + np.tile(np.arange(scale), len(result[0]))[:, None]
+            refined = (np.minimum(path, [len(q) - 1, len(r) - 1]), result[1])
+        result = refined
+        if result is None:
+            return None
+    return result
+
+
+def playing_regions(speech_segments: List[Dict], duration: float,
+                    min_seconds: float = MIN_PLAYING_SECONDS) -> List[Tuple[float, float]]:
+    """말소리 구간(music 라벨 제외) 사이에서 min_seconds 이상인 구간을 연주 구간 (시작, 끝) 초로 반환합니다."""
+    regions, cursor = [], 0.0
+    for seg in sorted((s for s in speech_segments if s.get("label") != "music"), key=lambda s: s["start"]):
+        if seg["start"] - cursor >= min_seconds:
+            regions.append((cursor, seg["start"]))
+        cursor = max(cursor, seg["end"])
+    if duration - cursor >= min_seconds:
+        regions.append((cursor, duration))
+    return regions
+
+
+def align_lesson(audio_path: str, speech_segments: List[Dict], score: bytes,
+                 part_id: Optional[str] = None, waveform=None) -> List[Dict]:
+    """
+    녹음의 연주 구간을 악보에 맞춰 [{"start", "end", "measures": [첫 마디, 끝 마디], "cost"}]를 반환합니다.
+    소리가 거의 없거나 악보와 맞출 수 없는 구간은 빠집니다.
+    waveform(이미 디코딩된 SpooledWaveform)이 주어지면 audio_path를 다시 디코딩하지 않습니다. (닫지 않음)
+    """
+    reference = score_chroma(score, part_id)
+    playing = []
+    with (decode_to_spool(audio_path) if waveform is None else nullcontext(waveform)) as waveform:
+        for start, end in playing_regions(speech_segments, waveform.duration):
+            chroma, voiced = audio_chroma(waveform, int(start * waveform.sr), int(end * waveform.sr), waveform.sr)
+            if voiced < MIN_VOICED_RATIO:
+                continue
+            aligned = align_chroma(chroma, reference.chroma)
+            if aligned is None:
+                continue
+            path, cost = aligned
+            first, last = reference.frame_measures[path[[0, -1], 1]]
+            playing.append({"start": float(start), "end": float(end),
+                            "measures": [reference.measures[first], reference.measures[last]],
+                            "cost": round(cost, 3)})
+    logger.info(f"악보 정렬 완료: 연주 구간 {len(playing)}개")
+    return playing
+
+
+def assign_measures(speech_segments: List[Dict], playing_segments: List[Dict],
+                    context_seconds: float = SPEECH_CONTEXT_SECONDS):
+    """
+    말소리 구간마다 measures를 붙입니다. 구간이 속한 연주 구간이 있으면 그 마디 범위를,
+    없으면 context_seconds 안에서 바로 앞, 그 다음으로 바로 뒤 연주 구간의 마디 범위를 사용합니다.
+    """
+    starts = [p["start"] for p in playing_segments]
+    for seg in speech_segments:
+        k = bisect.bisect_right(starts, seg["start"]) - 1
+        current = playing_segments[k] if k >= 0 else None
+        following = playing_segments[k + 1] if k + 1 < len(playing_segments) else None
+        # 속한 연주 구간이면 시작 시각 차이가 음수
+        if current is not None and seg["start"] - current["end"] <= context_seconds:
+            chosen = current
+        elif following is not None and following["start"] - seg["end"] <= context_seconds:
+            chosen = following
+        else:
+            continue
+        seg["measures"] = list(chosen["measures"])
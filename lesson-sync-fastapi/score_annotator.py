@@ -1,69 +1,243 @@
+import bisect
+import logging
 import re
-from typing import List, Tuple
-from konlpy.tag import Okt
+import threading
+from functools import lru_cache
+from typing import List, Optional, Tuple
 
-# Okt 형태소 분석기 초기화
-okt = Okt()
+from pydantic import BaseModel
 
-def _convert_korean_to_int(word: str) -> int:
-    """한글 또는 숫자로 된 문자열을 정수로 변환합니다. (수정된 최종본)"""
-    word = word.strip().replace(' ', '')
+from metrics import timed
+
+logger = logging.getLogger(__name__)
+
+class AnnotationInfo(BaseModel):
+    """마디 번호와 지시어 하나 (/parse-directives 응답, 구조화 LLM 응답 검증에 함께 사용)"""
+    measure: int
+    directive: str
+
+# 지시어로 남길 품사 ('강조' 같은 단어를 포함하도록 명사도 포함)
+_DIRECTIVE_POS = {'Noun', 'Adjective', 'Verb', 'Adverb'}
+
+# Okt 형태소 분석기는 JVM을 띄우므로 처음 사용할 때 초기화
+_okt = None
+_okt_lock = threading.Lock()
+
+def _get_okt():
+    global _okt
+    with _okt_lock:
+        if _okt is None:
+            from konlpy.tag import Okt
+            if threading.current_thread() is not threading.main_thread():
+                # 워커 스레드에서 JVM을 시작하면 종료 시 DestroyJavaVM이 끝나지 않으므로 정리 단계를 생략
+                # (Okt는 Java 쪽에 정리할 자원이 없음)
+                import jpype.config
+                jpype.config.destroy_jvm = False
+            _okt = Okt()
+        return _okt
+
+# open-korean-text의 Java API(Okt 내부 클래스)를 직접 호출해도 되는 konlpy 버전
+_TOKEN_API_KONLPY_VERSIONS = ("0.5.", "0.6.")
+
+@lru_cache(maxsize=1)
+def _okt_processor():
+    """
+    Okt가 내부에서 쓰는 OpenKoreanTextProcessorJava 클래스. konlpy의 공개 API가 아니므로
+    확인된 버전이 아니거나 클래스가 없으면 None (구간마다 pos()로 분석하는 방식을 사용)
+    """
+    _get_okt()
+    import konlpy
+    import jpype
+    if not konlpy.__version__.startswith(_TOKEN_API_KONLPY_VERSIONS):
+        logger.warning(f"konlpy {konlpy.__version__}: 전체 텍스트 형태소 분석을 사용하지 않습니다 (확인되지 않은 버전)")
+        return None
+    try:
+        return jpype.JClass('org.openkoreantext.processor.OpenKoreanTextProcessorJava')
+    except TypeError:
+        logger.warning("OpenKoreanTextProcessorJava를 찾을 수 없어 전체 텍스트 형태소 분석을 사용하지 않습니다")
+        return None
+
+def warm_up():
+    """JVM 시작과 사전 로드(첫 형태소 분석)를 미리 수행합니다. 첫 요청이 수 초씩 걸리지 않도록 배치 처리 전에 호출"""
+    _tokenize_with_offsets("1마디를 부드럽게 연주해 주세요.")
+
+# --- 마디 번호 인식 ---
+# 한자어 수사: [일~구]천 [일~구]백 [일~구]십 [일~구] (각 자리는 생략 가능, 예: 이십삼, 백오, 천이백)
+_SINO_DIGITS = {'일': 1, '이': 2, '삼': 3, '사': 4, '오': 5, '육': 6, '칠': 7, '팔': 8, '구': 9}
+_SINO_UNITS = {'십': 10, '백': 100, '천': 1000}
+# 고유어 수사: [열~아흔] [하나~아홉] (예: 열다섯, 스물한, 서른두)
+_NATIVE_TENS = {'열': 10, '스물': 20, '스무': 20, '서른': 30, '마흔': 40, '쉰': 50,
+                '예순': 60, '일흔': 70, '여든': 80, '아흔': 90}
+_NATIVE_UNITS = {'하나': 1, '한': 1, '둘': 2, '두': 2, '셋': 3, '세': 3, '넷': 4, '네': 4,
+                 '다섯': 5, '여섯': 6, '일곱': 7, '여덟': 8, '아홉': 9}
+
+def _alternation(words) -> str:
+    # 긴 단어를 먼저 시도하도록 정렬 ('하나'가 '한'보다, '일흔'이 '일'보다 먼저)
+    return '|'.join(sorted(words, key=len, reverse=True))
+
+_SINO_DIGIT = f"[{''.join(_SINO_DIGITS)}]"
+_SINO_NUMBER = rf"(?=[{''.join(_SINO_DIGITS)}{''.join(_SINO_UNITS)}])(?:{_SINO_DIGIT}?천)?(?:{_SINO_DIGIT}?백)?(?:{_SINO_DIGIT}?십)?{_SINO_DIGIT}?"
+_NATIVE_NUMBER = rf"(?:{_alternation(_NATIVE_TENS)})(?:{_alternation(_NATIVE_UNITS)})?|{_alternation(_NATIVE_UNITS)}"
+# 자리마다 올 수 있는 글자가 정해져 있어 한 위치에서의 시도는 숫자 길이 안에서 끝남 (전체는 입력 길이에 선형)
+_NUMBER = rf"(?:\d+|{_NATIVE_NUMBER}|{_SINO_NUMBER})"
+_NUMBER_RE = re.compile(_NUMBER)
+
+# '마디 N' 형태에서 숫자 뒤에 올 수 있는 조사 ('마디 이제', '마디 일단'의 '이', '일'을 마디 번호로 읽지 않도록)
+_PARTICLES = ['에서', '에게', '에', '은', '는', '을', '를', '이', '가', '의', '부터', '까지',
+              '와', '과', '도', '만', '으로', '로', '이랑', '랑', '하고', '처럼']
+_HANGUL = "[가-힣]"
+_AFTER_NUMBER = rf"(?=(?:{_alternation(_PARTICLES)})*(?!{_HANGUL}))"
+
+_MEASURE = r"\s*(?:번째\s*)?마디"
+# 언급을 시작하는 한글 수사는 단어 중간이 아니어야 함 ('사이마디'의 '이', '오이마디'의 '이'를 마디 번호로 읽지 않도록)
+_LEADING_NUMBER = rf"(?:\d+|(?<!{_HANGUL})(?:{_NATIVE_NUMBER}|{_SINO_NUMBER}))"
+# 한 번의 finditer로 범위 / 'N마디' / '마디 N'을 모두 찾음 (범위를 먼저 시도)
+# 숫자 중간에서 매칭을 다시 시작하지 않도록 앞이 숫자인 위치는 건너뜀 (긴 숫자열에서도 선형 시간)
+_MEASURE_RE = re.compile(
+    rf"(?<!\d)(?:(?P<range_start>{_LEADING_NUMBER}){_MEASURE}\s*(?:부터|에서)\s*(?P<range_end>{_NUMBER})(?:{_MEASURE})?\s*까지"
+    rf"|(?P<span_start>{_LEADING_NUMBER})\s*[~\-]\s*(?P<span_end>{_NUMBER}){_MEASURE}"
+    rf"|(?P<prefix>{_LEADING_NUMBER}){_MEASURE})"
+    rf"|마디\s*(?P<suffix>{_NUMBER}){_AFTER_NUMBER}"
+)
+
+# 한 번에 펼칠 수 있는 범위의 최대 마디 수 (STT 오류로 '1마디부터 100마디까지' 같은 범위가 생기는 경우 대비)
+MAX_RANGE_MEASURES = 32
+# 마디 번호의 최댓값 (이보다 큰 숫자는 STT 오류로 보고 버림)
+MAX_MEASURE = 9999
+
+def _number_value(word: str) -> int:
+    """_NUMBER 패턴에 맞는 문자열의 값을 계산합니다."""
     if word.isdigit():
         return int(word)
+    for tens, tens_value in _NATIVE_TENS.items():
+        if word.startswith(tens) and (word == tens or word[len(tens):] in _NATIVE_UNITS):
+            return tens_value + _NATIVE_UNITS.get(word[len(tens):], 0)
+    if word in _NATIVE_UNITS:
+        return _NATIVE_UNITS[word]
 
-    # 모든 한글 숫자 단어를 포함하는 사전
-    korean_num_dict = {
-        '한': 1, '두': 2, '세': 3, '네': 4, '다섯': 5, '여섯': 6, '일곱': 7, '여덟': 8, '아홉': 9, '열': 10,
-        '열한': 11, '열두': 12, '열세': 13, '열네': 14, '열다섯': 15, '열여섯': 16, '열일곱': 17, '열여덟': 18, '열아홉': 19,
-        '스무': 20, '서른': 30, '마흔': 40, '쉰': 50,
-        '일': 1, '이': 2, '삼': 3, '사': 4, '오': 5, '육': 6, '칠': 7, '팔': 8, '구': 9, '십': 10,
-        '이십': 20, '삼십': 30, '사십': 40, '오십': 50, '육십': 60, '칠십': 70, '팔십': 80, '구십': 90
-    }
-
-    # 단일 단어로 바로 변환되는 경우 (예: '열두', '스무')
-    if word in korean_num_dict:
-        return korean_num_dict[word]
-
-    # '십'이 포함된 복합어 처리 (예: '이십삼', '삼십오')
-    total = 0
-    if '십' in word:
-        parts = word.split('십')
-        head = parts[0]
-        tail = parts[1]
-        
-        if head: # '이'십, '삼'십 ...
-            if head in korean_num_dict:
-                total += korean_num_dict[head] * 10
-        else: # '십'삼, '십'오 ...
-            total += 10
-        
-        if tail: # ...'삼', ...'오'
-            if tail in korean_num_dict:
-                total += korean_num_dict[tail]
-        return total
-    
-    return 0 # 변환할 수 없는 경우
-
-# --- 정규식 및 파싱 로직 수정 ---
-_KOREAN_NUMBER_WORDS = ['한', '두', '세', '네', '다섯', '여섯', '일곱', '여덟', '아홉', '열', '스무', '서른', '마흔', '쉰', '일', '이', '삼', '사', '오', '육', '칠', '팔', '구', '십', '백', '천']
-_KOREAN_NUMBER_REGEX = '|'.join(_KOREAN_NUMBER_WORDS)
-_MEASURE_RE = re.compile(rf"(?:((?:\d+|{_KOREAN_NUMBER_REGEX})+)\s*(?:번째\s*)?마디|마디\s*((?:\d+|{_KOREAN_NUMBER_REGEX})+))")
+    total, digit = 0, 0
+    for ch in word:
+        if ch in _SINO_UNITS:
+            total += (digit or 1) * _SINO_UNITS[ch]
+            digit = 0
+        else:
+            digit = _SINO_DIGITS[ch]
+    return total + digit
+
+def _convert_korean_to_int(word: str) -> int:
+    """한글 또는 숫자로 된 문자열을 정수로 변환합니다. 숫자가 아니면 0을 반환합니다."""
+    word = word.strip().replace(' ', '')
+    if not word or not _NUMBER_RE.fullmatch(word):
+        return 0
+    return _number_value(word)
+
+def _measure_value(word: str) -> int:
+    """마디 번호로 쓸 수 있는 값 (0 또는 MAX_MEASURE보다 크면 0, 긴 숫자열은 정수로 바꾸지 않음)"""
+    if word.isdigit() and len(word.lstrip('0')) > len(str(MAX_MEASURE)):
+        return 0
+    value = _number_value(word)
+    return value if value <= MAX_MEASURE else 0
+
+def _is_demonstrative(match: re.Match, group: str) -> bool:
+    """'이 마디를'처럼 띄어 쓴 '이'는 마디 번호(2)가 아니라 지시 관형사로 봄"""
+    return match.group(group) == '이' and match.string[match.end(group)].isspace()
+
+def _match_measures(match: re.Match) -> List[int]:
+    """마디 언급 하나가 가리키는 마디 번호 목록 (범위면 여러 개, 잘못 인식된 언급이면 빈 목록)"""
+    if match.group('suffix') is not None:
+        number = match.group('suffix')
+        # '마디 사이'처럼 한 글자 수사 바로 뒤에 한글이 이어지면 숫자가 아닌 단어의 일부로 봄
+        if len(number) == 1 and not number.isdigit() and re.match(_HANGUL, match.string[match.end():match.end() + 1]):
+            return []
+        measure = _measure_value(number)
+        return [measure] if measure > 0 else []
+    if match.group('prefix') is not None:
+        if _is_demonstrative(match, 'prefix'):
+            return []
+        measure = _measure_value(match.group('prefix'))
+        return [measure] if measure > 0 else []
+
+    if match.group('range_start') is not None and _is_demonstrative(match, 'range_start'):
+        return []
+    first = _measure_value(match.group('range_start') or match.group('span_start'))
+    last = _measure_value(match.group('range_end') or match.group('span_end'))
+    if 0 < first <= last < first + MAX_RANGE_MEASURES:
+        return list(range(first, last + 1))
+    return [measure for measure in (first, last) if measure > 0]
 
+@lru_cache(maxsize=4096)
+def _directive_words(candidate: str) -> str:
+    """지시어 후보 하나를 형태소 분석합니다. 자주 반복되는 지시어('부드럽게' 등)는 JVM 호출 없이 재사용"""
+    pos_result = _get_okt().pos(candidate, norm=True, stem=True)
+    return ' '.join(word for word, pos in pos_result if pos in _DIRECTIVE_POS).strip()
+
+def _tokenize_with_offsets(text: str, boundaries=()) -> Optional[Tuple[List[int], List[str]]]:
+    """
+    텍스트 전체를 한 번에 형태소 분석하여 지시어 품사 토큰의 (시작 위치 목록, 원형 목록)을 반환합니다.
+    konlpy의 pos()는 위치 정보를 주지 않으므로 Okt가 사용하는 open-korean-text API를 직접 호출합니다.
+    pos(norm=True)와 같도록 boundaries(마디 언급의 시작/끝 위치)로 나눈 구간마다 정규화한 뒤 분석하며,
+    정규화로 길이가 바뀌어도 토큰 위치는 원문 위치로 바꿔 돌려줍니다.
+    Java 문자열 위치와 파이썬 문자열 위치가 다른 경우(BMP 밖의 문자 포함)나 Java API를 쓸 수 없으면 None을 반환합니다.
+    """
+    if len(text.encode('utf-16-le')) != 2 * len(text):
+        return None
+    processor = _okt_processor()
+    if processor is None:
+        return None
+    cuts = [0, *sorted({b for b in boundaries if 0 < b < len(text)}), len(text)]
+    parts, part_starts, position = [], [], 0
+    for start, end in zip(cuts, cuts[1:]):
+        part = str(processor.normalize(text[start:end]))
+        parts.append(part)
+        part_starts.append(position)
+        position += len(part)
+    normalized = ''.join(parts)
+    if len(normalized.encode('utf-16-le')) != 2 * len(normalized):
+        return None
+    offsets, words = [], []
+    for token in processor.tokensToJavaKoreanTokenList(processor.tokenize(normalized)):
+        if str(token.getPos()) in _DIRECTIVE_POS:
+            # 정규화된 위치 -> 같은 구간의 원문 위치 (구간 밖으로 나가지 않도록 구간 길이로 제한)
+            offset = int(token.getOffset())
+            i = bisect.bisect_right(part_starts, offset) - 1
+            offsets.append(cuts[i] + max(min(offset - part_starts[i], cuts[i + 1] - cuts[i] - 1), 0))
+            words.append(str(token.getStem()) or str(token.getText()))
+    return offsets, words
+
+@timed("annotation")
 def parse_annotations(text: str) -> List[Tuple[int, str]]:
     """
     전체 텍스트에서 '마디' 키워드를 찾고, 그 다음에 나오는 내용을 지시어로 파싱합니다.
+    같은 텍스트에 대한 결과는 캐시되며, 반환값은 호출마다 새 리스트입니다.
     """
+    return list(_parse_annotations_cached(text))
+
+@lru_cache(maxsize=256)
+def _parse_annotations_cached(text: str) -> Tuple[Tuple[int, str], ...]:
+    return tuple(_parse_annotations(text))
+
+def _parse_annotations(text: str) -> List[Tuple[int, str]]:
     annotations = []
-    # 1. 텍스트 전체에서 '마디'와 관련된 모든 부분을 찾음
-    matches = list(_MEASURE_RE.finditer(text))
+    annotated = set()
+    # 1. 텍스트 전체에서 '마디'와 관련된 모든 부분(범위 포함)을 한 번에 찾고, 마디 번호로 변환
+    matches, measures_list = [], []
+    for match in _MEASURE_RE.finditer(text):
+        measures = _match_measures(match)
+        if measures:
+            matches.append(match)
+            measures_list.append(measures)
     if not matches:
         return []
 
+    # 마디 언급이 여러 개면 텍스트 전체를 한 번만 형태소 분석하고 위치로 나눠 사용
+    # (구간마다 따로 분석하는 것보다 JVM 호출이 적고, 앞뒤 문맥 덕분에 '를', '부터' 같은 조사도 정확히 걸러짐)
+    boundaries = [position for match in matches for position in match.span()]
+    tokens = _tokenize_with_offsets(text, boundaries) if len(matches) > 1 else None
+
     for i, match in enumerate(matches):
-        # 2. 마디 번호 추출 및 변환
-        number_word = match.group(1) or match.group(2)
-        measure = _convert_korean_to_int(number_word)
-        if measure == 0 or any(ann[0] == measure for ann in annotations):
+        # 2. 이미 지시어가 붙은 마디는 건너뜀
+        measures = [measure for measure in measures_list[i] if measure not in annotated]
+        if not measures:
             continue
 
         # 3. 지시어 탐색 범위를 현재 마디와 다음 마디 사이로 설정
@@ -75,13 +249,15 @@ def parse_annotations(text: str) -> List[Tuple[int, str]]:
         if not directive_candidate:
             continue
             
-        pos_result = okt.pos(directive_candidate, norm=True, stem=True)
-        
-        # [수정] 품사 필터에 'Noun'(명사)를 추가하여 '강조' 같은 단어를 포함시킵니다.
-        directive_words = [word for word, pos in pos_result if pos in ['Noun', 'Adjective', 'Verb', 'Adverb']]
-        
-        final_directive = ' '.join(directive_words).strip()
+        if tokens is not None:
+            offsets, words = tokens
+            final_directive = ' '.join(words[bisect.bisect_left(offsets, directive_start):
+                                             bisect.bisect_left(offsets, directive_end)])
+        else:
+            final_directive = _directive_words(directive_candidate)
         if final_directive:
-            annotations.append((measure, final_directive))
+            for measure in measures:
+                annotations.append((measure, final_directive))
+                annotated.add(measure)
             
     return annotations
\ No newline at end of file
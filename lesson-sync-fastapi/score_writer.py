@@ -0,0 +1,213 @@
+"""
+MusicXML / MXL 악보에 parse_annotations 결과(마디 번호, 지시어)를 써 넣습니다.
+
+악보 전체를 DOM으로 읽어 다시 직렬화하지 않고,
+1. 스트리밍 파서로 한 번 훑어 '파트 -> 마디 번호 -> 지시어를 넣을 바이트 위치' 색인을 만들고 (악보별로 캐시)
+2. 원본 바이트의 해당 위치에 <direction> 요소만 끼워 넣습니다.
+원본의 서식, 주석, DOCTYPE은 그대로 유지됩니다.
+"""
+import io
+import logging
+import re
+import xml.etree.ElementTree as ET
+import zipfile
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from xml.parsers import expat
+from xml.sax.saxutils import escape
+
+logger = logging.getLogger(__name__)
+
+MXL_MEDIA_TYPE = "application/vnd.recordare.musicxml"
+MUSICXML_MEDIA_TYPE = "application/vnd.recordare.musicxml+xml"
+_CONTAINER_PATH = "META-INF/container.xml"
+
+# 앱에서 붙이던 주석과 같은 모양 (sampleFile/Spring-Four_seasons_vivaldi_annotated.mxl 참고)
+DIRECTION_COLOR = "#0000FF"
+
+# 마디 안에서 시간이 흐르는 요소. 지시어는 그 중 첫 요소 앞(마디 첫 박)에 넣음
+_TIMED_ELEMENTS = {"note", "forward", "backup"}
+_ENCODING_RE = re.compile(rb"""^\s*<\?xml[^>]*encoding\s*=\s*["']([A-Za-z0-9._-]+)["']""")
+
+
+class ScoreFormatError(ValueError):
+    """지원하지 않거나 잘못된 형식의 악보일 때 발생합니다."""
+
+
+@dataclass
+class MeasureIndex:
+    """파트별 '마디 번호(number 속성) -> 지시어를 넣을 바이트 위치'. 캐시되어 공유되므로 읽기 전용으로 사용"""
+    parts: Dict[str, Dict[str, int]] = field(default_factory=dict)
+    # 빈 마디(<measure .../>)의 '/>' 위치. 여기에 넣을 때는 태그를 열고 닫아야 함
+    self_closing: Set[int] = field(default_factory=set)
+
+    @property
+    def part_ids(self) -> List[str]:
+        return list(self.parts)
+
+
+@lru_cache(maxsize=32)
+def measure_index(xml: bytes) -> MeasureIndex:
+    """
+    score-partwise MusicXML을 expat으로 한 번 훑어 마디 색인을 만듭니다.
+    (ElementTree.iterparse와 같은 파서지만 요소의 바이트 위치를 알려주므로 직접 사용)
+    같은 악보를 다시 주석 처리할 때는 캐시된 색인을 사용합니다.
+    """
+    _check_encoding(xml)
+    index = MeasureIndex()
+    parser = expat.ParserCreate()
+    depth = 0
+    measures: Optional[Dict[str, int]] = None
+    measure_number: Optional[str] = None
+
+    def start(name, attrs):
+        nonlocal depth, measures, measure_number
+        depth += 1
+        if depth == 1:
+            if name != "score-partwise":
+                raise ScoreFormatError(f"score-partwise 형식만 지원합니다: <{name}>")
+        elif depth == 2 and name == "part":
+            measures = index.parts.setdefault(attrs.get("id", f"P{len(index.parts) + 1}"), {})
+        elif depth == 3 and name == "measure" and measures is not None:
+            number = attrs.get("number", "")
+            # 같은 번호가 반복되면(못갖춘마디 등) 처음 나온 마디를 사용
+            measure_number = number if number not in measures else None
+        elif depth == 4 and name in _TIMED_ELEMENTS and measure_number is not None:
+            measures[measure_number] = parser.CurrentByteIndex
+            measure_number = None
+
+    def end(name):
+        nonlocal depth, measures, measure_number
+        if depth == 3 and name == "measure" and measure_number is not None:
+            # 음표가 없는 마디는 </measure> 앞에 넣음
+            offset = parser.CurrentByteIndex
+            if not xml.startswith(b"</", offset):
+                # 빈 요소(<measure .../>)는 끝 이벤트 위치가 '/>' 바로 뒤
+                offset -= 2
+                index.self_closing.add(offset)
+            measures[measure_number] = offset
+            measure_number = None
+        elif depth == 2 and name == "part":
+            measures = None
+        depth -= 1
+
+    parser.StartElementHandler = start
+    parser.EndElementHandler = end
+    try:
+        parser.Parse(xml, True)
+    except expat.ExpatError as e:
+        raise ScoreFormatError(f"MusicXML 파싱 실패: {e}") from e
+    return index
+
+
+def _check_encoding(xml: bytes):
+    # 바이트 위치에 그대로 UTF-8 지시어를 끼워 넣으므로 UTF-8(ASCII) 문서만 지원
+    if xml.startswith((b"\xff\xfe", b"\xfe\xff")):
+        raise ScoreFormatError("UTF-16 MusicXML은 지원하지 않습니다.")
+    declared = _ENCODING_RE.match(xml)
+    if declared and declared.group(1).lower() not in (b"utf-8", b"utf8", b"us-ascii", b"ascii"):
+        raise ScoreFormatError(f"지원하지 않는 인코딩입니다: {declared.group(1).decode()}")
+
+
+def _direction_xml(directive: str, indent: bytes) -> bytes:
+    words = escape(directive, {'"': "&quot;"})
+    return (f'<direction><direction-type><words color="{DIRECTION_COLOR}" enclosure="none">'
+            f'{words}</words></direction-type></direction>').encode("utf-8") + b"\n" + indent
+
+
+def _indent_before(xml: bytes, offset: int) -> bytes:
+    """끼워 넣을 위치 앞의 들여쓰기(줄 시작부터 공백만 있을 때)를 돌려줍니다."""
+    line_start = xml.rfind(b"\n", 0, offset) + 1
+    prefix = xml[line_start:offset]
+    return prefix if not prefix.strip() else b""
+
+
+def annotate_musicxml(xml: bytes, annotations: Iterable[Tuple[int, str]],
+                      part_id: Optional[str] = None) -> bytes:
+    """
+    MusicXML 바이트에 (마디 번호, 지시어) 목록을 <direction>으로 써 넣은 새 바이트를 반환합니다.
+    part_id를 지정하지 않으면 첫 번째 파트에 씁니다. 악보에 없는 마디는 건너뜁니다.
+    """
+    index = measure_index(xml)
+    if not index.parts:
+        raise ScoreFormatError("악보에 파트가 없습니다.")
+    part_id = part_id or index.part_ids[0]
+    if part_id not in index.parts:
+        raise ScoreFormatError(f"파트를 찾을 수 없습니다: {part_id}")
+    measures = index.parts[part_id]
+
+    inserts: Dict[int, List[bytes]] = {}
+    for measure, directive in annotations:
+        offset = measures.get(str(measure))
+        if offset is None:
+            logger.warning(f"악보에 {measure}마디가 없어 지시어를 건너뜁니다: {directive}")
+            continue
+        inserts.setdefault(offset, []).append(_direction_xml(directive, _indent_before(xml, offset)))
+
+    # 원본을 위치 순서대로 잘라 이어 붙임 (요소 단위 재직렬화 없이 한 번 복사)
+    pieces, last = [], 0
+    for offset in sorted(inserts):
+        pieces.append(xml[last:offset])
+        if offset in index.self_closing:
+            pieces.extend([b">", *inserts[offset], b"</measure>"])
+            last = offset + 2
+        else:
+            pieces.extend(inserts[offset])
+            last = offset
+    pieces.append(xml[last:])
+    return b"".join(pieces)
+
+
+def _rootfile_path(archive: zipfile.ZipFile) -> str:
+    try:
+        container = ET.fromstring(archive.read(_CONTAINER_PATH))
+    except (KeyError, ET.ParseError):
+        container = None
+    if container is not None:
+        for rootfile in container.iter():
+            if rootfile.tag.rsplit("}", 1)[-1] == "rootfile" and rootfile.get("full-path"):
+                return rootfile.get("full-path")
+    # container.xml이 없으면 META-INF 밖의 첫 .xml / .musicxml 파일 (앱의 JsBridge와 같은 규칙)
+    for name in archive.namelist():
+        if not name.startswith("META-INF/") and name.lower().endswith((".xml", ".musicxml")):
+            return name
+    raise ScoreFormatError("MXL 안에서 MusicXML 파일을 찾을 수 없습니다.")
+
+
+def read_musicxml(data: bytes) -> bytes:
+    """업로드된 악보(MXL 또는 MusicXML)에서 MusicXML 바이트를 꺼냅니다."""
+    if not data.startswith(b"PK"):
+        return data
+    try:
+        archive = zipfile.ZipFile(io.BytesIO(data))
+    except zipfile.BadZipFile as e:
+        raise ScoreFormatError(f"MXL 파일을 열 수 없습니다: {e}") from e
+    with archive:
+        return archive.read(_rootfile_path(archive))
+
+
+def annotate_mxl(data: bytes, annotations: Iterable[Tuple[int, str]],
+                 part_id: Optional[str] = None) -> bytes:
+    """MXL(압축 MusicXML)의 악보 파일에 주석을 쓰고, 나머지 항목은 순서와 압축 방식을 유지해 다시 묶습니다."""
+    try:
+        archive = zipfile.ZipFile(io.BytesIO(data))
+    except zipfile.BadZipFile as e:
+        raise ScoreFormatError(f"MXL 파일을 열 수 없습니다: {e}") from e
+    output = io.BytesIO()
+    with archive, zipfile.ZipFile(output, "w") as result:
+        rootfile = _rootfile_path(archive)
+        for info in archive.infolist():
+            content = archive.read(info)
+            if info.filename == rootfile:
+                content = annotate_musicxml(content, annotations, part_id)
+            result.writestr(info, content, compress_type=info.compress_type)
+    return output.getvalue()
+
+
+def annotate_score(data: bytes, annotations: Iterable[Tuple[int, str]],
+                   part_id: Optional[str] = None) -> Tuple[bytes, str]:
+    """업로드된 악보(MXL 또는 MusicXML)에 주석을 쓰고 (결과 바이트, 미디어 타입)을 반환합니다."""
+    if data.startswith(b"PK"):
+        return annotate_mxl(data, annotations, part_id), MXL_MEDIA_TYPE
+    return annotate_musicxml(data, annotations, part_id), MUSICXML_MEDIA_TYPE
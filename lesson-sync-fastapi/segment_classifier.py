@@ -0,0 +1,112 @@
+"""
+음성 구간 분류.
+
+YAMNet이 음성 구간 검출을 위해 이미 계산한 프레임별 클래스 점수(521개)와 임베딩(1024차원)으로
+각 구간을 다음 중 하나로 분류합니다. 추가 모델은 사용하지 않습니다.
+  - teacher_speech: 말소리 (가장 오래 말한 화자)
+  - student_speech: 말소리 (다른 화자)
+  - mixed:          말소리와 악기 소리가 함께 들리는 구간 (연주 중 지시 등)
+  - music:          Speech 점수가 유지 기준을 넘었지만 대부분 연주인 구간
+
+화자 구분은 구간별 평균 임베딩을 녹음 순서대로 최대 두 개의 묶음으로 온라인 군집화하고,
+지금까지 누적 발화 시간이 긴 묶음을 선생님으로 봅니다. (1:1 레슨 가정)
+구간이 검출되는 대로 분류하므로 STT와 겹쳐 실행하는 파이프라인에서도 사용할 수 있습니다.
+"""
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+TEACHER_SPEECH = "teacher_speech"
+STUDENT_SPEECH = "student_speech"
+MIXED = "mixed"
+MUSIC = "music"
+LABELS = (TEACHER_SPEECH, STUDENT_SPEECH, MIXED, MUSIC)
+
+# 분류에 사용하는 YAMNet(AudioSet) 클래스. 클래스 맵에 없는 이름은 무시
+SPEECH_CLASSES = ("Speech", "Child speech, kid speaking", "Conversation", "Narration, monologue",
+                  "Male speech, man speaking", "Female speech, woman speaking")
+MUSIC_CLASSES = ("Music", "Musical instrument", "Plucked string instrument", "Guitar", "Piano",
+                 "Keyboard (musical)", "Bowed string instrument", "String section", "Violin, fiddle",
+                 "Pizzicato", "Cello", "Double bass", "Orchestra", "Wind instrument, woodwind instrument",
+                 "Flute", "Clarinet", "Brass instrument", "Trumpet", "Saxophone", "Harp", "Classical music",
+                 "Singing", "Choir")
+
+MUSIC_FRAME_RATIO = 0.6      # 음악 점수가 말소리 점수보다 높은 프레임이 이 비율 이상이면 music
+MIXED_MUSIC_SCORE = 0.2      # 구간 평균 음악 점수가 이 이상이면 (말소리가 우세해도) mixed
+# 구간 평균 임베딩의 코사인 거리가 이보다 크면 다른 화자로 봄 (YAMNet 임베딩은 화자 인식용이 아니므로 보수적으로 설정)
+SPEAKER_DISTANCE = 0.15
+
+
+class _SpeakerTracker:
+    """구간 평균 임베딩을 최대 두 화자로 온라인 군집화합니다."""
+
+    def __init__(self, max_speakers: int = 2):
+        self.max_speakers = max_speakers
+        self.centroids: List[np.ndarray] = []
+        self.durations: List[float] = []
+
+    def assign(self, embedding: np.ndarray, duration: float) -> int:
+        embedding = embedding / (np.linalg.norm(embedding) + 1e-9)
+        if self.centroids:
+            distances = [1 - float(np.dot(embedding, c) / (np.linalg.norm(c) + 1e-9)) for c in self.centroids]
+            nearest = int(np.argmin(distances))
+            if distances[nearest] <= SPEAKER_DISTANCE or len(self.centroids) >= self.max_speakers:
+                # 발화 시간으로 가중한 평균으로 중심을 갱신
+                self.centroids[nearest] = self.centroids[nearest] + duration * embedding
+                self.durations[nearest] += duration
+                return nearest
+        self.centroids.append(duration * embedding)
+        self.durations.append(duration)
+        return len(self.centroids) - 1
+
+    def is_main_speaker(self, speaker: int) -> bool:
+        return speaker == int(np.argmax(self.durations))
+
+
+class SegmentClassifier:
+    """
+    녹음 한 건의 구간을 분류합니다. 화자 묶음 상태를 유지하므로 녹음마다 새로 만들어 사용합니다.
+    frame_features()로 창마다 프레임 특징을 줄여 두고, classify()에 구간의 프레임 범위를 넘깁니다.
+    """
+
+    def __init__(self, class_names: Sequence[str]):
+        index = {name: i for i, name in enumerate(class_names)}
+        self._speech = [index[name] for name in SPEECH_CLASSES if name in index]
+        self._music = [index[name] for name in MUSIC_CLASSES if name in index]
+        self._speakers = _SpeakerTracker()
+
+    def frame_features(self, scores: np.ndarray, embeddings: Optional[np.ndarray]) -> Dict[str, np.ndarray]:
+        """창의 프레임별 (말소리 점수, 음악 점수, 임베딩). 전체 점수(521개)를 보관하지 않도록 줄여서 반환"""
+        features = {
+            "speech": scores[:, self._speech].max(axis=1) if self._speech else np.zeros(len(scores)),
+            "music": scores[:, self._music].max(axis=1) if self._music else np.zeros(len(scores)),
+        }
+        if embeddings is not None:
+            features["embedding"] = np.asarray(embeddings, dtype=np.float16)
+        return features
+
+    def classify(self, speech: np.ndarray, music: np.ndarray, embeddings: Optional[np.ndarray],
+                 duration: float) -> str:
+        """구간 프레임들의 말소리/음악 점수와 임베딩으로 라벨을 정합니다."""
+        if speech is None or len(speech) == 0:
+            return TEACHER_SPEECH
+        if np.mean(music > speech) >= MUSIC_FRAME_RATIO:
+            return MUSIC
+        if float(np.mean(music)) >= MIXED_MUSIC_SCORE:
+            return MIXED
+        if embeddings is None or len(embeddings) == 0:
+            return TEACHER_SPEECH
+        # 말소리가 우세한 프레임만 평균해 악기 소리의 영향을 줄임
+        voiced = speech >= music
+        embedding = np.asarray(embeddings[voiced] if voiced.any() else embeddings, dtype=np.float32).mean(axis=0)
+        speaker = self._speakers.assign(embedding, duration)
+        return TEACHER_SPEECH if self._speakers.is_main_speaker(speaker) else STUDENT_SPEECH
+
+
+def parse_labels(value: str) -> frozenset:
+    """설정값("music,student_speech")을 라벨 집합으로 바꿉니다. 알 수 없는 라벨은 ValueError"""
+    labels = frozenset(label.strip() for label in value.split(",") if label.strip())
+    unknown = labels - set(LABELS)
+    if unknown:
+        raise ValueError(f"알 수 없는 구간 라벨: {', '.join(sorted(unknown))}")
+    return labels
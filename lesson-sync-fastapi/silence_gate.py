@@ -0,0 +1,72 @@
+"""
+YAMNet 앞단의 무음 게이트.
+
+레슨 녹음에는 준비 시간, 쉬는 시간처럼 소리가 거의 없는 긴 구간이 많습니다.
+YAMNet 프레임(0.975초 창, 0.48초 간격)마다 그 안의 짧은 프레임(32ms, 20ms 간격)의 RMS와
+대역 에너지 증가량(spectral flux)을 numpy로 한 번에 계산해 다음 프레임을 무음으로 판단합니다.
+  - 가장 큰 RMS가 floor_dbfs보다 작은 프레임 (무음)
+  - 가장 큰 RMS가 LOUD_DBFS보다 작고 가장 큰 flux도 FLUX_DB보다 작은 프레임 (잔잔한 배경 소음)
+말소리는 음절마다 대역 에너지가 크게 바뀌므로 작게 녹음되어도 flux 조건으로 남습니다.
+AudioProcessor는 무음 프레임에 YAMNet을 실행하지 않고 무음 파형에 대한 YAMNet 출력으로 채웁니다.
+"""
+import numpy as np
+import scipy.fft
+
+# YAMNet 프레임 (16kHz 기준, audio_processor와 같은 값)
+_FRAME_HOP_SAMPLES = 7680
+_FRAME_WINDOW_SAMPLES = 15600
+
+LOUD_DBFS = -40.0   # 이보다 큰 소리는 변화가 없어도(긴 음 등) 활성
+FLUX_DB = 3.0       # 짧은 프레임 사이 대역 에너지 증가량의 평균(dB)이 이보다 크면 활성
+
+_SHORT_WINDOW = 512
+_SHORT_HOP = 320                                        # YAMNet 프레임 간격의 1/24
+_SHORTS_PER_HOP = _FRAME_HOP_SAMPLES // _SHORT_HOP
+_BANDS = 16
+_EPS = 1e-10
+
+
+def _short_frame_rms(block: np.ndarray) -> np.ndarray:
+    """짧은 프레임별 RMS (dBFS). 누적합으로 계산하므로 FFT 없이 샘플 수에 비례"""
+    energy = np.concatenate([[0.0], np.cumsum(block.astype(np.float64) ** 2)])
+    starts = np.arange(0, len(block) - _SHORT_WINDOW + 1, _SHORT_HOP)
+    return 10 * np.log10((energy[starts + _SHORT_WINDOW] - energy[starts]) / _SHORT_WINDOW + _EPS)
+
+
+def _short_frame_flux(block: np.ndarray) -> np.ndarray:
+    """짧은 프레임별 대역 에너지 증가량 (dB, 대역 평균)"""
+    frames = np.lib.stride_tricks.sliding_window_view(block, _SHORT_WINDOW)[::_SHORT_HOP]
+    power = np.abs(scipy.fft.rfft(frames * np.hanning(_SHORT_WINDOW).astype(np.float32), axis=1)) ** 2
+    bands = 10 * np.log10(power[:, 1:].reshape(len(frames), _BANDS, -1).sum(axis=2) + _EPS)
+    return np.concatenate([[0.0], np.maximum(np.diff(bands, axis=0), 0).mean(axis=1)])
+
+
+def _frame_max(values: np.ndarray, count: int) -> np.ndarray:
+    """짧은 프레임 값을 YAMNet 프레임 count개로 모은 최댓값 (프레임 k는 간격 k, k+1에 시작하는 짧은 프레임)"""
+    chunks = -(-len(values) // _SHORTS_PER_HOP)
+    padded = np.full(max(chunks, count + 1) * _SHORTS_PER_HOP, -np.inf)
+    padded[:len(values)] = values
+    per_hop = padded.reshape(-1, _SHORTS_PER_HOP).max(axis=1)
+    return np.maximum(per_hop[:count], per_hop[1:count + 1])
+
+
+def active_frames(block: np.ndarray, count: int, floor_dbfs: float) -> np.ndarray:
+    """
+    block(첫 YAMNet 프레임 시작에 맞춘 파형)의 YAMNet 프레임 count개가 각각 YAMNet을 실행해야 하는지(bool 배열)
+    flux는 RMS만으로 정할 수 없는(floor_dbfs 이상 LOUD_DBFS 미만) 프레임이 있는 범위에서만 계산합니다.
+    """
+    block = np.asarray(block, dtype=np.float32)
+    if len(block) < _SHORT_WINDOW:
+        block = np.pad(block, (0, _SHORT_WINDOW - len(block)))
+    rms = _frame_max(_short_frame_rms(block), count)
+    active = rms >= LOUD_DBFS
+    uncertain = np.flatnonzero((rms >= floor_dbfs) & ~active)
+    if len(uncertain):
+        first, last = uncertain[0], uncertain[-1]
+        # 프레임 first~last가 쓰는 짧은 프레임: 간격 first ~ last + 1 (+ flux의 이전 프레임 하나)
+        offset = max(first * _FRAME_HOP_SAMPLES - _SHORT_HOP, 0)
+        part = block[offset:(last + 2) * _FRAME_HOP_SAMPLES + _SHORT_WINDOW]
+        flux = _short_frame_flux(part)[(first * _FRAME_HOP_SAMPLES - offset) // _SHORT_HOP:]
+        flux = _frame_max(flux, last - first + 1)
+        active[uncertain] = flux[uncertain - first] >= FLUX_DB
+    return active
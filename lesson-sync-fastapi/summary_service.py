@@ -1,92 +1,409 @@
-from openai import OpenAI, RateLimitError
+from openai import OpenAI, AsyncOpenAI
 from config import settings
-import time
+from llm_client import (
+    RetryPolicy, CircuitBreaker, ConcurrencyLimiter, StreamInterruptedError, call_with_retry, acall_with_retry,
+    retry_policy, circuit_breaker, llm_limiter,
+)
+from transcript_chunker import chunk_segments, count_tokens, split_text
+from metrics import in_context, record_llm_usage, stage, timed
+from score_annotator import AnnotationInfo
+from pydantic import BaseModel, ValidationError
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Callable, Dict, List, Optional
+import asyncio
+import httpx
+import logging
+
+logger = logging.getLogger(__name__)
+
+MODEL_NAME = "gpt-3.5-turbo"  # 또는 gpt-4-turbo
+
+SUMMARY_SYSTEM_PROMPT = (
+    "당신은 음악 레슨 내용을 전문적으로 요약하는 AI 어시스턴트입니다.\n\n"
+    "입력되는 텍스트는 실제 레슨 현장에서 녹음된 음성을 변환한 스크립트입니다. "
+    "따라서 일부 단어가 부정확하거나 문맥에 맞지 않을 수 있습니다. "
+    "당신은 전체 대화가 '음악 레슨' 상황이라는 점을 반드시 인지하고, 대화의 본래 의도를 유추하며 요약해야 합니다.\n\n"
+    "주어진 스크립트에서 다음의 규칙을 엄격히 준수하여 결과를 생성해주세요:\n"
+    "1. 내용 선별: 오직 음악 레슨과 직접적으로 관련된 내용만 요약합니다. "
+    "예를 들어, 연주 기술에 대한 피드백, 교사의 지시 사항, 연습 과제, 그리고 스타카토, 포르테, 포지션 이동과 같은 음악 전문 용어만 선별해야 합니다. "
+    "일상적인 대화나 레슨과 무관한 잡담은 요약에서 완전히 제외합니다.\n"
+    "2. 구조화: 요약 내용은 사용자가 쉽게 파악할 수 있도록 '총평 및 피드백 요약', '연주 기술 점검', '마디별 주의사항'과 같은 명확한 소제목으로 나누어 구조화해주세요.\n"
+    "3. 언어: 최종 결과물은 반드시 한국어로 작성되어야 합니다."
+)
+
+# 텍스트 보정을 위한 별도의 시스템 프롬프트
+CORRECTION_SYSTEM_PROMPT = (
+    "당신은 한국어 교정 전문가입니다. "
+    "입력되는 텍스트는 음악 레슨 대화의 음성인식(STT) 결과입니다. "
+    "이로 인해 오타, 띄어쓰기 오류, 문맥에 맞지 않는 단어(예: '사마디' -> '4마디', '비바블라토' -> '비브라토', '이맛이' -> '2마디')가 포함되어 있습니다. "
+    "내용을 요약하거나 변경하지 말고, 오직 문법과 문맥에 맞게 오타와 오류만 수정하여 자연스러운 문장으로 된 전체 텍스트를 반환해 주세요. "
+    "원문의 내용 중 음악 레슨과 관련 없는 내용은 생략합니다."
+)
+
+# 긴 레슨을 나눠 요약할 때 각 부분에 사용하는 시스템 프롬프트 (부분 요약끼리 다시 합칠 때도 사용)
+CHUNK_SUMMARY_SYSTEM_PROMPT = (
+    "당신은 음악 레슨 녹음 스크립트를 정리하는 AI 어시스턴트입니다. "
+    "입력되는 텍스트는 긴 레슨 스크립트의 일부이거나, 여러 부분을 정리한 메모입니다. "
+    "교사의 피드백, 지시 사항, 연습 과제, 마디 번호와 음악 용어를 빠짐없이 간결한 목록으로 정리해주세요. "
+    "마디 번호 같은 구체적인 정보는 그대로 유지하고, 레슨과 무관한 잡담은 제외하며, 한국어로 작성합니다."
+)
+
+# 보정, 요약, 마디별 지시어를 한 번의 호출로 받을 때 사용하는 시스템 프롬프트 (JSON 응답)
+STRUCTURED_SYSTEM_PROMPT = (
+    "당신은 음악 레슨 녹음 스크립트를 교정하고 정리하는 AI 어시스턴트입니다. "
+    "입력되는 텍스트는 음악 레슨 대화의 음성인식(STT) 결과라서 오타, 띄어쓰기 오류, 문맥에 맞지 않는 단어"
+    "(예: '사마디' -> '4마디', '비바블라토' -> '비브라토', '이맛이' -> '2마디')가 포함되어 있습니다.\n\n"
+    "다음 세 가지를 만들어 JSON 객체 하나로만 응답해주세요:\n"
+    "1. corrected_transcript: 내용을 요약하거나 바꾸지 말고 오타와 오류만 수정한 전체 스크립트 "
+    "(음악 레슨과 관련 없는 내용은 생략)\n"
+    "2. summary_sections: 교정한 스크립트의 레슨 내용 요약. 연주 기술 피드백, 교사의 지시 사항, 연습 과제, 음악 용어만 선별하고 "
+    "'총평 및 피드백 요약', '연주 기술 점검', '마디별 주의사항'과 같은 소제목별로 "
+    "{\"title\": 소제목, \"content\": 내용} 목록으로 작성\n"
+    "3. annotations: 교사가 특정 마디에 대해 지시한 내용의 {\"measure\": 마디 번호(정수), "
+    "\"directive\": 지시어(예: '부드럽게', '강조')} 목록. 범위('2마디부터 4마디까지')는 마디마다 하나씩 작성\n\n"
+    "응답 형식: {\"corrected_transcript\": \"...\", \"summary_sections\": [...], \"annotations\": [...]}\n"
+    "모든 텍스트는 한국어로 작성합니다."
+)
+
+# 계층적 요약의 최대 단계 수 (부분 요약이 줄어들지 않는 경우에 대비)
+MAX_SUMMARY_LEVELS = 4
+
+def _summary_messages(corrected_script, partial=False):
+    #texts = [seg["text"] for seg in segments if seg.get("text")]
+    #transcript = "\n".join(texts)
+    user_prompt = (
+        ("[음악 레슨 부분 요약]\n\n" if partial else "[음악 레슨 스크립트]\n\n")
+        + f"{corrected_script}"
+    )
+    return [
+        {"role": "system", "content": SUMMARY_SYSTEM_PROMPT},
+        {"role": "user", "content": user_prompt}
+    ]
+
+def _chunk_summary_messages(text):
+    return [
+        {"role": "system", "content": CHUNK_SUMMARY_SYSTEM_PROMPT},
+        {"role": "user", "content": f"[음악 레슨 스크립트 일부]\n\n{text}"}
+    ]
+
+def _correction_messages(transcript):
+    user_prompt = (
+        "[원본 스크립트]\n\n"
+        f"{transcript}"
+    )
+    return [
+        {"role": "system", "content": CORRECTION_SYSTEM_PROMPT},
+        {"role": "user", "content": user_prompt}
+    ]
+
+def _correction_chunks(transcript: str, segments: Optional[List[Dict]]) -> List[str]:
+    """보정 단위: STT 구간이 주어지면 구간 경계를 따라, 없으면 문단/문장 경계를 따라 나눔"""
+    if segments:
+        return [chunk["text"] for chunk in chunk_segments(segments, settings.LLM_CHUNK_MAX_TOKENS)]
+    return split_text(transcript, settings.LLM_CHUNK_MAX_TOKENS)
+
+def _needs_reduction(text: str, level: int) -> bool:
+    return level < MAX_SUMMARY_LEVELS and count_tokens(text) > settings.LLM_SUMMARY_MAX_INPUT_TOKENS
+
+def _structured_messages(transcript):
+    return [
+        {"role": "system", "content": STRUCTURED_SYSTEM_PROMPT},
+        {"role": "user", "content": f"[원본 스크립트]\n\n{transcript}"}
+    ]
+
+class SummarySection(BaseModel):
+    title: str
+    content: str
+
+class StructuredLesson(BaseModel):
+    """STRUCTURED_SYSTEM_PROMPT 응답 형식. 지시어는 /parse-directives와 같은 AnnotationInfo로 검증"""
+    corrected_transcript: str
+    summary_sections: List[SummarySection]
+    annotations: List[AnnotationInfo]
+
+def _structured_result(content: Optional[str]) -> Optional[Dict[str, Any]]:
+    """
+    구조화 응답을 검증해 {corrected_transcript, summary, annotations} dict로 바꿉니다.
+    JSON이 아니거나 형식이 맞지 않거나 보정 스크립트가 비어 있으면 None.
+    요약은 소제목별 섹션을 마크다운 텍스트 하나로 합치고, 마디 번호가 0 이하이거나 빈 지시어는 버립니다.
+    """
+    try:
+        lesson = StructuredLesson.model_validate_json(content or "")
+    except ValidationError as e:
+        logger.warning(f"Structured lesson response is invalid ({e.error_count()} errors)")
+        return None
+    if not lesson.corrected_transcript.strip():
+        return None
+    return {
+        "corrected_transcript": lesson.corrected_transcript,
+        "summary": "\n\n".join(f"## {section.title}\n{section.content}" for section in lesson.summary_sections),
+        "annotations": [{"measure": a.measure, "directive": a.directive.strip()}
+                        for a in lesson.annotations if a.measure > 0 and a.directive.strip()],
+    }
+
+def _fits_single_call(transcript: str) -> bool:
+    return bool(transcript.strip()) and count_tokens(transcript) <= settings.LLM_SUMMARY_MAX_INPUT_TOKENS
+
+class SummaryStreamInterrupted(StreamInterruptedError):
+    """요약 토큰을 일부 내보낸 뒤 스트림이 끊긴 경우. 같은 토큰이 중복 전송되지 않도록 재시도하지 않습니다."""
+
+# 더 사실에 가깝게 보정하도록 temperature 조정
+CORRECTION_TEMPERATURE = 0.2
 
 class SummaryService:
     def __init__(self):
-        self.client = OpenAI(api_key=settings.OPENAI_API_KEY)
-
-    def generate_summary(self, corrected_script):
-        #texts = [seg["text"] for seg in segments if seg.get("text")]
-        #transcript = "\n".join(texts)
-        
-        system_prompt = (
-            "당신은 음악 레슨 내용을 전문적으로 요약하는 AI 어시스턴트입니다.\n\n"
-            "입력되는 텍스트는 실제 레슨 현장에서 녹음된 음성을 변환한 스크립트입니다. "
-            "따라서 일부 단어가 부정확하거나 문맥에 맞지 않을 수 있습니다. "
-            "당신은 전체 대화가 '음악 레슨' 상황이라는 점을 반드시 인지하고, 대화의 본래 의도를 유추하며 요약해야 합니다.\n\n"
-            "주어진 스크립트에서 다음의 규칙을 엄격히 준수하여 결과를 생성해주세요:\n"
-            "1. 내용 선별: 오직 음악 레슨과 직접적으로 관련된 내용만 요약합니다. "
-            "예를 들어, 연주 기술에 대한 피드백, 교사의 지시 사항, 연습 과제, 그리고 스타카토, 포르테, 포지션 이동과 같은 음악 전문 용어만 선별해야 합니다. "
-            "일상적인 대화나 레슨과 무관한 잡담은 요약에서 완전히 제외합니다.\n"
-            "2. 구조화: 요약 내용은 사용자가 쉽게 파악할 수 있도록 '총평 및 피드백 요약', '연주 기술 점검', '마디별 주의사항'과 같은 명확한 소제목으로 나누어 구조화해주세요.\n"
-            "3. 언어: 최종 결과물은 반드시 한국어로 작성되어야 합니다."
-        )
+        # 재시도는 공통 정책(llm_client)에서 처리하므로 SDK 자체 재시도는 끔
+        self.client = OpenAI(api_key=settings.OPENAI_API_KEY, base_url=settings.OPENAI_BASE_URL,
+                             timeout=settings.LLM_TIMEOUT_SECONDS, max_retries=0)
 
-        user_prompt = (
-            "[음악 레슨 스크립트]\n\n"
-            f"{corrected_script}"
-        )
+    def _complete(self, messages, **kwargs):
+        def create():
+            with llm_limiter:
+                return self.client.chat.completions.create(model=MODEL_NAME, messages=messages, **kwargs)
+        with stage("llm_request"):
+            response = call_with_retry(create, retry_policy, circuit_breaker)
+        record_llm_usage(getattr(response, "usage", None))
+        return response.choices[0].message.content
 
-        max_retries = 5
-        base_delay = 1  # 초
-
-        for attempt in range(max_retries):
-            try:
-                response = self.client.chat.completions.create(
-                    model="gpt-3.5-turbo", # 또는 gpt-4-turbo
-                    messages=[
-                        {"role": "system", "content": system_prompt},
-                        {"role": "user", "content": user_prompt}
-                    ]
-                )
-                return response.choices[0].message.content
-            
-            except RateLimitError as e:
-                # 속도 제한 오류가 발생했을 때
-                if attempt < max_retries - 1:
-                    # 대기 시간을 점차 늘림 (1초, 2초, 4초, ...)
-                    delay = base_delay * (2 ** attempt)
-                    print(f"Rate limit exceeded. Retrying in {delay} seconds... (Attempt {attempt + 1}/{max_retries})")
-                    time.sleep(delay)
-                else:
-                    # 최대 재시도 횟수를 초과하면 최종적으로 오류를 발생시킴
-                    print("Max retries reached. Failing.")
-                    raise e
-            except Exception as e:
-                # 다른 종류의 오류는 즉시 발생시킴
-                raise e
+    def _complete_stream(self, messages, on_token: Callable[[str], None]) -> str:
+        """응답을 스트리밍으로 받아 토큰이 도착할 때마다 on_token을 호출하고 전체 텍스트를 반환합니다."""
+        def create():
+            parts = []
+            with llm_limiter:
+                stream = self.client.chat.completions.create(model=MODEL_NAME, messages=messages, stream=True,
+                                                             stream_options={"include_usage": True})
+                try:
+                    for event in stream:
+                        # 사용량은 마지막 이벤트(choices가 빈 이벤트)에 담겨 옴
+                        record_llm_usage(getattr(event, "usage", None))
+                        delta = event.choices[0].delta.content if event.choices else None
+                        if delta:
+                            parts.append(delta)
+                            on_token(delta)
+                except Exception as e:
+                    if parts:
+                        raise SummaryStreamInterrupted(str(e)) from e
+                    raise
+            return "".join(parts)
+        with stage("llm_request"):
+            return call_with_retry(create, retry_policy, circuit_breaker)
+
+    def _map(self, fn, items, on_result=None):
+        # 청크별 호출을 병렬로 실행 (전체 동시 호출 수는 llm_limiter가 제한)
+        # on_result(index, result)는 완료되는 순서대로 호출되고, 반환값은 입력 순서를 유지
+        if len(items) == 1:
+            results = [fn(items[0])]
+            if on_result is not None:
+                on_result(0, results[0])
+            return results
+        results = [None] * len(items)
+        with ThreadPoolExecutor(max_workers=min(len(items), settings.LLM_MAX_CONCURRENCY)) as pool:
+            # 요청 트레이스가 청크 호출까지 이어지도록 현재 컨텍스트에서 실행
+            futures = {pool.submit(in_context(fn), item): i for i, item in enumerate(items)}
+            for future in as_completed(futures):
+                i = futures[future]
+                results[i] = future.result()
+                if on_result is not None:
+                    on_result(i, results[i])
+        return results
+
+    @timed("summary")
+    def generate_summary(self, corrected_script, on_token: Optional[Callable[[str], None]] = None):
+        """
+        보정된 스크립트를 요약합니다.
+        스크립트가 LLM_SUMMARY_MAX_INPUT_TOKENS보다 길면 청크별 부분 요약을 병렬로 만들고,
+        부분 요약을 이어 붙인 결과가 충분히 짧아질 때까지 반복한 뒤 최종 요약을 생성합니다.
+        on_token이 주어지면 최종 요약을 스트리밍으로 받아 토큰 단위로 전달합니다.
+        """
+        text, level = corrected_script, 0
+        while _needs_reduction(text, level):
+            chunks = split_text(text, settings.LLM_CHUNK_MAX_TOKENS)
+            partials = self._map(lambda chunk: self._complete(_chunk_summary_messages(chunk)), chunks)
+            text, level = "\n\n".join(partials), level + 1
+            logger.info(f"부분 요약 {level}단계 완료 ({len(chunks)}개 청크)")
+        messages = _summary_messages(text, partial=level > 0)
+        if on_token is not None:
+            return self._complete_stream(messages, on_token)
+        return self._complete(messages)
+
+    def _correct_chunk(self, chunk: str) -> str:
+        try:
+            return self._complete(_correction_messages(chunk), temperature=CORRECTION_TEMPERATURE) or chunk
+        except Exception as e:
+            logger.warning(f"Transcript correction failed: {e}")
+            # 보정 실패 시 원본 텍스트를 그대로 반환
+            return chunk
             
-    def correct_transcript(self, transcript: str) -> str:
+    @timed("correction")
+    def correct_transcript(self, transcript: str, segments: Optional[List[Dict]] = None,
+                           on_chunk: Optional[Callable[[int, int, str], None]] = None) -> str:
         """
         ChatGPT API를 사용하여 STT로 변환된 텍스트의 오타와 문맥을 보정합니다.
+        긴 스크립트는 LLM_CHUNK_MAX_TOKENS 단위로 나눠 병렬로 보정한 뒤 순서대로 이어 붙입니다.
+        segments(STT 구간)를 함께 주면 구간 중간에서 문장이 잘리지 않도록 구간 경계를 따라 나눕니다.
+        on_chunk(index, total, text)는 청크 보정이 끝나는 순서대로 호출됩니다.
         """
-        # 텍스트 보정을 위한 별도의 시스템 프롬프트
-        correction_system_prompt = (
-            "당신은 한국어 교정 전문가입니다. "
-            "입력되는 텍스트는 음악 레슨 대화의 음성인식(STT) 결과입니다. "
-            "이로 인해 오타, 띄어쓰기 오류, 문맥에 맞지 않는 단어(예: '사마디' -> '4마디', '비바블라토' -> '비브라토', '이맛이' -> '2마디')가 포함되어 있습니다. "
-            "내용을 요약하거나 변경하지 말고, 오직 문법과 문맥에 맞게 오타와 오류만 수정하여 자연스러운 문장으로 된 전체 텍스트를 반환해 주세요. "
-            "원문의 내용 중 음악 레슨과 관련 없는 내용은 생략합니다."
-        )
+        chunks = _correction_chunks(transcript, segments)
+        on_result = None
+        if on_chunk is not None:
+            on_result = lambda i, text: on_chunk(i, max(len(chunks), 1), text)
+        if len(chunks) <= 1:
+            return self._map(self._correct_chunk, [transcript], on_result)[0]
+        logger.info(f"스크립트를 {len(chunks)}개 청크로 나눠 보정합니다")
+        return " ".join(self._map(self._correct_chunk, chunks, on_result))
+
+    @timed("structured")
+    def structured_lesson(self, transcript: str) -> Optional[Dict[str, Any]]:
+        """
+        스크립트를 한 번만 보내 보정 스크립트, 요약, 마디별 지시어를 JSON 응답 하나로 받습니다.
+        반환값: {"corrected_transcript": str, "summary": str, "annotations": [{"measure", "directive"}]}
+        스크립트가 LLM_SUMMARY_MAX_INPUT_TOKENS보다 길거나, 호출이 실패하거나, 응답 형식이 맞지 않으면 None을 반환하므로
+        호출하는 쪽은 기존 방식(correct_transcript, generate_summary, parse_annotations)으로 처리합니다.
+        """
+        if not _fits_single_call(transcript):
+            return None
+        try:
+            content = self._complete(_structured_messages(transcript), temperature=CORRECTION_TEMPERATURE,
+                                     response_format={"type": "json_object"})
+        except Exception as e:
+            logger.warning(f"Structured lesson call failed: {e}")
+            return None
+        return _structured_result(content)
+
+
+class AsyncSummaryService:
+    """
+    AsyncOpenAI 기반 비동기 SummaryService.
+    커넥션 풀을 공유하는 클라이언트 하나로 여러 레슨을 동시에 처리하며,
+    재시도/서킷 브레이커/동시 호출 제한은 동기 버전과 같은 프로세스 공통 객체를 사용합니다.
+    (LLM_MAX_CONCURRENCY는 동기/비동기 호출을 합친 수. max_concurrency를 주면 이 인스턴스만 따로 제한)
+    """
 
-        user_prompt = (
-            "[원본 스크립트]\n\n"
-            f"{transcript}"
+    def __init__(self, max_concurrency: int = None, policy: RetryPolicy = None,
+                 breaker: CircuitBreaker = None, base_url: str = None):
+        self.policy = policy or retry_policy
+        self.breaker = breaker or circuit_breaker
+        self._limiter = ConcurrencyLimiter(max_concurrency) if max_concurrency else llm_limiter
+        max_concurrency = max_concurrency or settings.LLM_MAX_CONCURRENCY
+        self.client = AsyncOpenAI(
+            api_key=settings.OPENAI_API_KEY,
+            base_url=base_url or settings.OPENAI_BASE_URL,
+            timeout=settings.LLM_TIMEOUT_SECONDS,
+            max_retries=0,
+            http_client=httpx.AsyncClient(limits=httpx.Limits(max_connections=max_concurrency,
+                                                              max_keepalive_connections=max_concurrency)),
         )
-        
-        # 재시도 로직은 간소화 (필요시 generate_summary와 동일하게 적용 가능)
+
+    async def _complete(self, messages, **kwargs):
+        async def create():
+            async with self._limiter:
+                return await self.client.chat.completions.create(model=MODEL_NAME, messages=messages, **kwargs)
+        with stage("llm_request"):
+            response = await acall_with_retry(create, self.policy, self.breaker)
+        record_llm_usage(getattr(response, "usage", None))
+        return response.choices[0].message.content
+
+    async def _complete_stream(self, messages, on_token: Callable[[str], None]) -> str:
+        """SummaryService._complete_stream과 같은 스트리밍 호출 (토큰 일부를 보낸 뒤 끊기면 SummaryStreamInterrupted)"""
+        async def create():
+            parts = []
+            async with self._limiter:
+                stream = await self.client.chat.completions.create(model=MODEL_NAME, messages=messages, stream=True,
+                                                                   stream_options={"include_usage": True})
+                try:
+                    async for event in stream:
+                        record_llm_usage(getattr(event, "usage", None))
+                        delta = event.choices[0].delta.content if event.choices else None
+                        if delta:
+                            parts.append(delta)
+                            on_token(delta)
+                except Exception as e:
+                    if parts:
+                        raise SummaryStreamInterrupted(str(e)) from e
+                    raise
+            return "".join(parts)
+        with stage("llm_request"):
+            return await acall_with_retry(create, self.policy, self.breaker)
+
+    async def generate_summary(self, corrected_script, on_token: Optional[Callable[[str], None]] = None):
+        """
+        SummaryService.generate_summary와 같은 계층적 요약 (부분 요약은 asyncio.gather로 병렬 실행)
+        on_token이 주어지면 최종 요약을 스트리밍으로 받아 토큰 단위로 전달합니다.
+        """
+        text, level = corrected_script, 0
+        while _needs_reduction(text, level):
+            chunks = split_text(text, settings.LLM_CHUNK_MAX_TOKENS)
+            partials = await asyncio.gather(*(self._complete(_chunk_summary_messages(chunk)) for chunk in chunks))
+            text, level = "\n\n".join(partials), level + 1
+        messages = _summary_messages(text, partial=level > 0)
+        if on_token is not None:
+            return await self._complete_stream(messages, on_token)
+        return await self._complete(messages)
+
+    async def _correct_chunk(self, chunk: str) -> str:
         try:
-            response = self.client.chat.completions.create(
-                model="gpt-3.5-turbo", # 또는 gpt-4-turbo
-                messages=[
-                    {"role": "system", "content": correction_system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
-                temperature=0.2 # 더 사실에 가깝게 보정하도록 temperature 조정
-            )
-            return response.choices[0].message.content or transcript
+            return await self._complete(_correction_messages(chunk), temperature=CORRECTION_TEMPERATURE) or chunk
         except Exception as e:
-            print(f"Transcript correction failed: {e}")
-            # 보정 실패 시 원본 텍스트를 그대로 반환
-            return transcript
\ No newline at end of file
+            logger.warning(f"Transcript correction failed: {e}")
+            return chunk
+
+    async def correct_transcript(self, transcript: str, segments: Optional[List[Dict]] = None,
+                                 on_chunk: Optional[Callable[[int, int, str], None]] = None) -> str:
+        """SummaryService.correct_transcript와 같은 청크 단위 보정 (on_chunk는 청크 보정이 끝나는 순서대로 호출)"""
+        chunks = _correction_chunks(transcript, segments)
+        if len(chunks) <= 1:
+            chunks = [transcript]
+
+        async def correct(index: int, chunk: str) -> str:
+            text = await self._correct_chunk(chunk)
+            if on_chunk is not None:
+                on_chunk(index, len(chunks), text)
+            return text
+
+        return " ".join(await asyncio.gather(*(correct(i, chunk) for i, chunk in enumerate(chunks))))
+
+    async def structured_lesson(self, transcript: str) -> Optional[Dict[str, Any]]:
+        """SummaryService.structured_lesson과 같은 한 번의 구조화 호출 (실패하면 None)"""
+        if not _fits_single_call(transcript):
+            return None
+        try:
+            content = await self._complete(_structured_messages(transcript), temperature=CORRECTION_TEMPERATURE,
+                                           response_format={"type": "json_object"})
+        except Exception as e:
+            logger.warning(f"Structured lesson call failed: {e}")
+            return None
+        return _structured_result(content)
+
+    async def aclose(self):
+        await self.client.close()
+
+
+class LoopSummaryService:
+    """
+    AsyncSummaryService를 이벤트 루프에서 실행하는 동기 인터페이스 (SummaryService와 같은 메서드).
+    레슨 파이프라인은 스레드(스레드풀, 작업 큐 워커)에서 실행되므로 LLM 호출만 API 서버의 이벤트 루프로 넘겨,
+    동시에 처리 중인 모든 레슨이 AsyncOpenAI 클라이언트와 커넥션 풀 하나를 함께 사용합니다.
+    호출한 스레드의 컨텍스트(요청 트레이스)에서 실행되며, 콜백(on_chunk, on_token)은 이벤트 루프 스레드에서 호출됩니다.
+    이벤트 루프 스레드에서 호출하면 교착되므로 반드시 다른 스레드에서 호출해야 합니다.
+    """
+
+    def __init__(self, service: AsyncSummaryService, loop: asyncio.AbstractEventLoop):
+        self.service = service
+        self._loop = loop
+
+    def _run(self, coro):
+        # run_coroutine_threadsafe는 호출한 스레드의 contextvars를 복사해 태스크를 만듦
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+    @timed("summary")
+    def generate_summary(self, corrected_script, on_token: Optional[Callable[[str], None]] = None):
+        return self._run(self.service.generate_summary(corrected_script, on_token=on_token))
+
+    @timed("correction")
+    def correct_transcript(self, transcript: str, segments: Optional[List[Dict]] = None,
+                           on_chunk: Optional[Callable[[int, int, str], None]] = None) -> str:
+        return self._run(self.service.correct_transcript(transcript, segments=segments, on_chunk=on_chunk))
+
+    @timed("structured")
+    def structured_lesson(self, transcript: str) -> Optional[Dict[str, Any]]:
+        return self._run(self.service.structured_lesson(transcript))
@@ -0,0 +1,150 @@
+"""
+테스트용 OpenAI 호환 가짜 서버.
+
+POST /v1/chat/completions 요청에 미리 정해 둔 응답(상태 코드, 헤더, 지연 시간)을 순서대로 돌려주고,
+받은 요청과 최대 동시 처리 수를 기록합니다. 실제 HTTP를 사용하므로 SDK의 오류 변환,
+Retry-After 처리, 커넥션 풀 동작까지 그대로 검증할 수 있습니다.
+stream=True 요청에는 tokens를 SSE 청크로 보내며, disconnect_after가 주어지면 그만큼 보낸 뒤 연결을 끊습니다.
+"""
+import json
+import threading
+import time
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+
+@dataclass
+class FakeResponse:
+    status: int = 200
+    content: str = "ok"
+    headers: Dict[str, str] = field(default_factory=dict)
+    delay: float = 0.0
+    tokens: Optional[List[str]] = None          # 스트리밍 응답의 토큰 (없으면 content 하나)
+    disconnect_after: Optional[int] = None      # 스트리밍 중 이 수만큼 토큰을 보낸 뒤 연결을 끊음
+
+
+class FakeOpenAIServer:
+    def __init__(self, default: Optional[FakeResponse] = None):
+        self.default = default or FakeResponse()
+        self.requests: List[dict] = []
+        self.max_in_flight = 0
+        self._script: List[FakeResponse] = []
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address
+        return f"http://{host}:{port}/v1"
+
+    def script(self, *responses: FakeResponse):
+        """다음 요청들에 순서대로 돌려줄 응답. 모두 사용하면 default 응답을 돌려줍니다."""
+        with self._lock:
+            self._script.extend(responses)
+
+    def _next_response(self, body: dict) -> FakeResponse:
+        with self._lock:
+            self.requests.append(body)
+            self._in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self._in_flight)
+            return self._script.pop(0) if self._script else self.default
+
+    def _done(self):
+        with self._lock:
+            self._in_flight -= 1
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                body = json.loads(self.rfile.read(length) or b"{}")
+                response = server._next_response(body)
+                try:
+                    if response.delay:
+                        time.sleep(response.delay)
+                    if response.status == 200 and body.get("stream"):
+                        self._stream(body.get("model", ""), response)
+                        return
+                    if response.status == 200:
+                        payload = _completion(body.get("model", ""), response.content)
+                    else:
+                        payload = {"error": {"message": response.content, "type": "fake_error", "code": None}}
+                    data = json.dumps(payload).encode("utf-8")
+                    self.send_response(response.status)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(data)))
+                    for name, value in response.headers.items():
+                        self.send_header(name, value)
+                    self.end_headers()
+                    self.wfile.write(data)
+                finally:
+                    server._done()
+
+            def _stream(self, model, response):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                tokens = response.tokens if response.tokens is not None else [response.content]
+                for i, token in enumerate(tokens):
+                    if i == response.disconnect_after:
+                        # 다 보내지 못한 청크를 남기고 연결 종료
+                        self.wfile.write(b"ff\r\ndata: ")
+                        self.wfile.flush()
+                        self.close_connection = True
+                        return
+                    self._chunk(_stream_event(model, token))
+                self._chunk(b"data: [DONE]\n\n")
+                self.wfile.write(b"0\r\n\r\n")
+
+            def _chunk(self, data: bytes):
+                self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+                self.wfile.flush()
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self) -> "FakeOpenAIServer":
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def _completion(model: str, content: str) -> dict:
+    return {
+        "id": "chatcmpl-fake",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": content},
+            "finish_reason": "stop",
+        }],
+        "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+    }
+
+
+def _stream_event(model: str, token: str) -> bytes:
+    event = {"id": "chatcmpl-fake", "object": "chat.completion.chunk", "created": int(time.time()), "model": model,
+             "choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}]}
+    return f"data: {json.dumps(event)}\n\n".encode("utf-8")
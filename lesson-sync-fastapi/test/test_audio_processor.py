@@ -29,8 +29,8 @@ def test_process_scores_logic():
     
     frame_hop = 0.48 # 원본 코드의 값
     
-    # Act
-    segments = processor._process_scores(scores, sr=16000)
+    # Act (병합/최소 길이 필터 없이 구간 경계만 확인)
+    segments = processor._process_scores(scores, sr=16000, min_gap=0, min_duration=0)
     
     # Assert
     # 예상 결과: (0s-0.96s), (1.44s-2.4s)
@@ -40,6 +40,44 @@ def test_process_scores_logic():
     ]
     assert segments == expected_segments
 
+def _speech_frames(pattern, speech_score=None):
+    """'S'(Speech), 'M'(Music) 문자열로 프레임 점수를 만듭니다. speech_score로 Music 프레임의 Speech 점수 지정"""
+    scores = np.zeros((len(pattern), 3))
+    for i, ch in enumerate(pattern):
+        if ch == "S":
+            scores[i, 1] = 0.9
+        else:
+            scores[i, 0] = 0.9
+            scores[i, 1] = speech_score[i] if speech_score else 0.0
+    return scores
+
+
+def test_process_scores_merges_short_gaps_and_drops_short_segments():
+    """짧은 간격은 합치고 1초 미만 구간은 만들지 않는지 테스트"""
+    processor = AudioProcessor.__new__(AudioProcessor)
+    processor.class_names = ["Music", "Speech", "Silence"]
+
+    # SSS M SSS MMMMM SS MMMM S  -> 간격 1프레임(0.48초)은 병합, 2프레임짜리(0.96초)와 1프레임 구간은 버림
+    scores = _speech_frames("SSSMSSSMMMMMSSMMMMS")
+    segments = processor._process_scores(scores, sr=16000)
+
+    assert segments == [{"start": 0.0, "end": 7 * 0.48}]
+
+
+def test_process_scores_hysteresis_keeps_speech_under_music():
+    """Speech가 최상위가 아니어도 점수가 유지 기준 이상이면 구간이 이어지는지 테스트"""
+    processor = AudioProcessor.__new__(AudioProcessor)
+    processor.class_names = ["Music", "Speech", "Silence"]
+
+    # 프레임 3~5는 Music이 최상위지만 Speech 점수가 0.4 → 구간 유지
+    # 프레임 0은 Speech 점수 0.4지만 시작 조건(최상위 Speech)을 만족하지 않으므로 포함되지 않음
+    pattern = "MSSMMMSSMMMMMMM"
+    speech = [0.4, 0, 0, 0.4, 0.4, 0.4, 0, 0, 0.1, 0.1, 0.1, 0.1, 0.1, 0.1, 0.1]
+    segments = processor._process_scores(_speech_frames(pattern, speech), sr=16000, min_gap=0)
+
+    assert segments == [{"start": 1 * 0.48, "end": 8 * 0.48}]
+
+
 def test_transcribe_segments(mocker):
     """음성 구간을 STT로 변환하는 기능 테스트"""
     # Arrange
@@ -62,4 +100,279 @@ def test_transcribe_segments(mocker):
     assert mock_whisper_model.transcribe.call_count == 2
     assert len(results) == 2
     assert results[0]['text'] == 'transcribed text'
-    assert results[1]['start'] == 3.0
\ No newline at end of file
+    assert results[1]['start'] == 3.0
+
+class _FakeYamnet:
+    """YAMNet과 같은 방식으로 패딩/프레임을 나누고, 프레임 에너지로 Speech 점수를 만드는 모의 모델"""
+
+    def __call__(self, waveform):
+        waveform = np.asarray(waveform, dtype=np.float32)
+        window, hop = 15600, 7680
+        n = len(waveform)
+        padded_len = max(n, window)
+        padded_len = window + -(-(padded_len - window) // hop) * hop
+        padded = np.zeros(padded_len, dtype=np.float32)
+        padded[:n] = waveform
+        num_frames = 1 + (padded_len - window) // hop
+        scores = np.zeros((num_frames, 3), dtype=np.float32)
+        for i in range(num_frames):
+            energy = np.abs(padded[i * hop:i * hop + window]).mean()
+            scores[i, 1] = energy          # Speech
+            scores[i, 0] = 0.25            # Music
+        return MagicMock(numpy=lambda: scores), None, None
+
+
+def test_extract_speech_segments_stream_matches_full_pass():
+    """창 단위로 나눠 실행한 결과가 전체 파형을 한 번에 처리한 결과와 같은지 테스트"""
+    processor = AudioProcessor.__new__(AudioProcessor)
+    processor.class_names = ["Music", "Speech", "Silence"]
+    processor.yamnet_model = _FakeYamnet()
+
+    sr = 16000
+    rng = np.random.default_rng(0)
+    waveform = np.zeros(int(37.3 * sr), dtype=np.float32)
+    # 말소리 대신 큰 진폭 구간을 여러 곳에 배치 (창 경계를 걸치도록)
+    for start, end in [(1.0, 4.2), (9.5, 10.7), (19.0, 26.0), (35.0, 37.3)]:
+        waveform[int(start * sr):int(end * sr)] = rng.uniform(-1, 1, int(end * sr) - int(start * sr))
+
+    full_scores, _, _ = processor.yamnet_model(waveform)
+    expected = processor._process_scores(full_scores.numpy(), sr)
+
+    segments = processor.extract_speech_segments_stream(waveform, sr, window_seconds=5.0)
+
+    assert segments == expected
+    assert len(segments) == 4
+
+
+@pytest.mark.parametrize("window_seconds", [2.0, 5.0, 60.0])
+def test_iter_speech_segments_stream_matches_full_pass_on_random_patterns(window_seconds):
+    """검출되는 대로 내보낸 구간이 녹음 전체의 프레임으로 계산한 구간과 같은지 테스트"""
+    processor = AudioProcessor.__new__(AudioProcessor)
+    processor.class_names = ["Music", "Speech", "Silence"]
+    processor.yamnet_model = _FakeYamnet()
+
+    sr = 16000
+    rng = np.random.default_rng(1)
+    for _ in range(5):
+        waveform = np.zeros(int(60 * sr), dtype=np.float32)
+        # 짧은 말소리와 짧은 간격을 섞어 병합/최소 길이 규칙이 창 경계에 걸치도록 함
+        cursor = 0.0
+        while cursor < 58:
+            length, gap = rng.uniform(0.3, 4.0), rng.uniform(0.2, 3.0)
+            start, end = int(cursor * sr), int(min(cursor + length, 60) * sr)
+            waveform[start:end] = rng.uniform(-1, 1, end - start)
+            cursor += length + gap
+
+        full_scores, _, _ = processor.yamnet_model(waveform)
+        expected = processor._process_scores(full_scores.numpy(), sr)
+
+        assert list(processor.iter_speech_segments_stream(waveform, sr, window_seconds)) == expected
+
+
+def test_iter_speech_segments_stream_yields_before_scanning_everything():
+    """앞부분 구간은 나머지 녹음을 검출하기 전에 내보내는지 테스트"""
+    processor = AudioProcessor.__new__(AudioProcessor)
+    processor.class_names = ["Music", "Speech", "Silence"]
+    yamnet = _FakeYamnet()
+    processor.yamnet_model = MagicMock(side_effect=yamnet)
+
+    sr = 16000
+    waveform = np.zeros(int(40 * sr), dtype=np.float32)
+    waveform[int(1 * sr):int(4 * sr)] = 0.9
+
+    segments = processor.iter_speech_segments_stream(waveform, sr, window_seconds=5.0)
+    first = next(segments)
+
+    assert first["start"] < 1.5 and first["end"] > 3.5
+    assert processor.yamnet_model.call_count <= 2
+    assert list(segments) == []
+
+
+def test_iter_speech_segments_stream_labels_segments():
+    """classify=True이면 같은 구간에 분류 라벨을 붙이는지 테스트"""
+    processor = AudioProcessor.__new__(AudioProcessor)
+    processor.class_names = ["Music", "Speech", "Silence"]
+    processor.yamnet_model = _FakeYamnet()
+
+    sr = 16000
+    waveform = np.zeros(int(20 * sr), dtype=np.float32)
+    waveform[int(1 * sr):int(4 * sr)] = 0.9
+    waveform[int(10 * sr):int(12 * sr)] = 0.9
+
+    plain = list(processor.iter_speech_segments_stream(waveform, sr, window_seconds=5.0))
+    labeled = list(processor.iter_speech_segments_stream(waveform, sr, window_seconds=5.0, classify=True))
+
+    assert [{k: v for k, v in seg.items() if k != "label"} for seg in labeled] == plain
+    # 모의 모델은 모든 프레임의 Music 점수가 0.25이므로 말소리가 우세해도 악기 소리가 섞인 구간
+    assert [seg["label"] for seg in labeled] == ["mixed", "mixed"]
+
+
+def test_transcribe_segments_accepts_generator(mocker):
+    """한 번만 순회할 수 있는 구간 입력도 순서대로 변환하는지 테스트"""
+    processor = AudioProcessor.__new__(AudioProcessor)
+    processor.whisper_model = MagicMock()
+    processor.whisper_model.transcribe.return_value = {'text': 'text'}
+    sr = 16000
+    waveform = np.random.randn(10 * sr)
+    segments = [{'start': 0.0, 'end': 2.0}, {'start': 3.0, 'end': 3.5}, {'start': 5.0, 'end': 8.0}]
+
+    results = processor.transcribe_segments((dict(seg) for seg in segments), waveform, sr)
+
+    assert [(seg['start'], seg['text']) for seg in results] == [(0.0, 'text'), (5.0, 'text')]
+
+
+def _make_whisper_stub(decode_result):
+    """whisper.transcribe()를 그대로 실행할 수 있도록 decode 결과만 고정한 모의 Whisper 모델"""
+    import torch
+    import whisper
+
+    class _StubWhisper:
+        device = torch.device("cpu")
+        dims = whisper.ModelDimensions(n_mels=80, n_audio_ctx=1500, n_audio_state=1, n_audio_head=1,
+                                       n_audio_layer=1, n_vocab=51865, n_text_ctx=448, n_text_state=1,
+                                       n_text_head=1, n_text_layer=1)
+        is_multilingual = True
+        num_languages = 99
+
+        def decode(self, mel, options):
+            return decode_result
+
+        def transcribe(self, audio, **kwargs):
+            return whisper.transcribe(self, audio, **kwargs)
+
+    return _StubWhisper()
+
+
+def _decoding_result(tokens, avg_logprob=-0.2, no_speech_prob=0.1, compression_ratio=1.2):
+    from whisper import DecodingResult
+    return DecodingResult(audio_features=None, language="ko", tokens=tokens, avg_logprob=avg_logprob,
+                          no_speech_prob=no_speech_prob, compression_ratio=compression_ratio, temperature=0.0)
+
+
+def _tokenizer():
+    from whisper.tokenizer import get_tokenizer
+    return get_tokenizer(True, num_languages=99, language="ko", task="transcribe")
+
+
+@pytest.mark.parametrize("case", ["no_timestamps", "single_ending", "double_ending", "unfinished",
+                                  "needs_fallback", "no_speech"])
+def test_batched_transcription_matches_transcribe(case, mocker):
+    """배치 STT 결과가 구간별 whisper.transcribe() 결과와 같은지 테스트"""
+    tok = _tokenizer()
+    tb = tok.timestamp_begin
+    first, second = tok.encode(" 1마디부터 해볼게요"), tok.encode(" 부드럽게")
+    tokens = {
+        "no_timestamps": first + second,
+        "single_ending": [tb] + first + [tb + 50, tb + 50] + second + [tb + 100],
+        "double_ending": [tb] + first + [tb + 50, tb + 50] + second + [tb + 100, tb + 100],
+        "unfinished": [tb] + first + [tb + 50, tb + 50] + second,
+        "needs_fallback": first,
+        "no_speech": first,
+    }[case]
+    kwargs = {"needs_fallback": {"avg_logprob": -1.5},
+              "no_speech": {"avg_logprob": -1.5, "no_speech_prob": 0.9}}.get(case, {})
+    result = _decoding_result(tokens, **kwargs)
+
+    sr = 16000
+    waveform = np.zeros(8 * sr, dtype=np.float32)
+    segments = [{"start": 0.0, "end": 4.0}, {"start": 4.5, "end": 8.0}]
+
+    processor = AudioProcessor.__new__(AudioProcessor)
+    processor.whisper_model = _make_whisper_stub(result)
+    expected = processor.transcribe_segments([dict(s) for s in segments], waveform, sr)
+
+    mock_decode = mocker.patch('whisper.decode', return_value=[result, result])
+    actual = processor.transcribe_segments([dict(s) for s in segments], waveform, sr, batch_size=4)
+
+    assert actual == expected
+    # 두 구간을 한 번의 배치 디코딩으로 처리해야 함
+    mock_decode.assert_called_once()
+    assert mock_decode.call_args.args[1].shape[0] == 2
+
+
+def test_models_are_loaded_lazily_and_shared(mocker):
+    """생성 시에는 모델을 로드하지 않고, 처음 사용할 때 프로세스당 한 번만 로드하는지 테스트"""
+    import audio_processor
+    audio_processor._load_whisper.cache_clear()
+    load_model = mocker.patch('whisper.load_model', return_value=MagicMock())
+
+    first, second = AudioProcessor(), AudioProcessor()
+    load_model.assert_not_called()
+
+    assert first.whisper_model is second.whisper_model
+    load_model.assert_called_once()
+    audio_processor._load_whisper.cache_clear()
+
+
+def test_model_dir_is_used_for_local_models(tmp_path, monkeypatch):
+    import audio_processor
+    monkeypatch.setattr(audio_processor.settings, "MODEL_DIR", str(tmp_path))
+
+    # 로컬 YAMNet이 없으면 TF Hub 주소로 대체
+    assert audio_processor.yamnet_handle() == audio_processor.YAMNET_HANDLE
+    (tmp_path / "yamnet").mkdir()
+    assert audio_processor.yamnet_handle() == str(tmp_path / "yamnet")
+    assert audio_processor.whisper_download_root() == str(tmp_path / "whisper")
+
+
+def test_silence_gate_runs_yamnet_only_on_active_frames(monkeypatch):
+    """무음 게이트가 소리 있는 프레임만 YAMNet에 넘기고, 그 프레임 점수와 구간은 게이트 없이 실행한 결과와 같은지 테스트"""
+    import audio_processor
+    sr = 16000
+    rng = np.random.default_rng(2)
+    waveform = (1e-4 * rng.standard_normal(int(60 * sr))).astype(np.float32)
+    for start, end in [(3.1, 6.0), (6.9, 7.5), (30.2, 41.0), (58.0, 60.0)]:
+        waveform[int(start * sr):int(end * sr)] = rng.uniform(-1, 1, int(end * sr) - int(start * sr))
+
+    results = {}
+    for gate in (False, True):
+        monkeypatch.setattr(audio_processor.settings, "SILENCE_GATE", gate)
+        processor = AudioProcessor.__new__(AudioProcessor)
+        processor.class_names = ["Music", "Speech", "Silence"]
+        yamnet = _FakeYamnet()
+        processor.yamnet_model = MagicMock(side_effect=yamnet)
+        segments = list(processor.iter_speech_segments_stream(waveform, sr, window_seconds=20.0))
+        samples = sum(len(call.args[0]) for call in processor.yamnet_model.call_args_list)
+        count = 1 + -(-(len(waveform) - 15600) // 7680)
+        scores, _ = processor._gated_yamnet(waveform, count)
+        results[gate] = segments, samples, scores
+
+    assert results[True][0] == results[False][0] and len(results[True][0]) == 3
+    # 소리가 있는 18초 남짓과 구간 경계, 무음 출력 계산분만 YAMNet을 실행
+    assert results[True][1] < 0.45 * results[False][1]
+    active = results[True][2][:, 1] > 0
+    np.testing.assert_array_equal(results[True][2][active], results[False][2][active])
+    assert np.all(results[False][2][~active, 1] < 1e-3)
+
+
+def test_whisper_tier_models_are_loaded_on_demand(mocker):
+    """whisper_model 인자로 고른 티어 모델은 처음 사용할 때 로드되고, 기본 모델과 따로 유지되는지 테스트"""
+    import audio_processor
+    audio_processor._load_whisper.cache_clear()
+    models = {"tiny": MagicMock(), "small": MagicMock()}
+    for name, model in models.items():
+        model.transcribe.return_value = {"text": name}
+    load_model = mocker.patch('whisper.load_model', side_effect=lambda name, **kwargs: models[name])
+    mocker.patch.object(audio_processor.settings, "WHISPER_MODEL", "tiny")
+
+    processor = AudioProcessor()
+    waveform, sr = np.zeros(32000, dtype=np.float32), 16000
+    segments = [{"start": 0.0, "end": 2.0}]
+    assert processor.transcribe_segments([dict(s) for s in segments], waveform, sr)[0]["text"] == "tiny"
+    assert processor.transcribe_segments([dict(s) for s in segments], waveform, sr,
+                                         whisper_model="small")[0]["text"] == "small"
+    processor.transcribe_segments([dict(s) for s in segments], waveform, sr, whisper_model="small")
+    assert [c.args[0] for c in load_model.call_args_list] == ["tiny", "small"]
+    audio_processor._load_whisper.cache_clear()
+
+
+def test_import_does_not_load_model_libraries():
+    """audio_processor를 임포트해도 torch/whisper/TensorFlow/pandas를 불러오지 않는지 테스트 (처음 사용할 때 임포트)"""
+    import os
+    import subprocess
+    import sys
+    code = ("import sys, audio_processor; "
+            "print(','.join(m for m in ('torch', 'whisper', 'tensorflow', 'tensorflow_hub', 'pandas') if m in sys.modules))")
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    output = subprocess.run([sys.executable, "-c", code], cwd=root, capture_output=True, text=True, check=True)
+    assert output.stdout.strip() == ""
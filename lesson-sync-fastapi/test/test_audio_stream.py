@@ -0,0 +1,129 @@
+import numpy as np
+import pytest
+import soundfile as sf
+import librosa
+from audio_stream import decode_progressively, decode_to_spool, SpooledWaveform
+
+
+@pytest.fixture
+def wav_44k(tmp_path):
+    """44.1kHz 스테레오 테스트용 WAV 파일 (3초)"""
+    sr = 44100
+    t = np.arange(3 * sr) / sr
+    tone = 0.3 * np.sin(2 * np.pi * 440 * t)
+    path = tmp_path / "lesson.wav"
+    sf.write(path, np.stack([tone, tone * 0.5], axis=1), sr)
+    return str(path)
+
+
+def test_decode_to_spool_matches_librosa_load(wav_44k):
+    """블록 단위 디코딩 결과가 librosa.load 전체 디코딩 결과와 같은지 테스트"""
+    expected, _ = librosa.load(wav_44k, sr=16000, mono=True)
+
+    # 블록 경계가 여러 번 생기도록 작은 블록 크기를 사용
+    with decode_to_spool(wav_44k, block_seconds=0.37) as waveform:
+        assert waveform.sr == 16000
+        assert abs(len(waveform) - len(expected)) <= 1
+        n = min(len(waveform), len(expected))
+        np.testing.assert_allclose(waveform[0:n], expected[:n], atol=1e-3)
+
+
+def test_spooled_waveform_slicing_and_windows(tmp_path):
+    """슬라이스 접근과 겹침 창 순회가 올바른 구간을 반환하는지 테스트"""
+    data = np.arange(100, dtype=np.float32)
+    path = tmp_path / "wave.f32"
+    data.tofile(path)
+    waveform = SpooledWaveform(str(path))
+
+    assert len(waveform) == 100
+    np.testing.assert_array_equal(waveform[10:20], data[10:20])
+    assert len(waveform[95:200]) == 5
+
+    windows = list(waveform.iter_windows(40, overlap_samples=5))
+    assert [start for start, _ in windows] == [0, 40, 80]
+    np.testing.assert_array_equal(windows[1][1], data[40:85])
+
+    waveform.close()
+    assert not path.exists()
+
+
+def test_decode_to_spool_removes_spool_on_failure(tmp_path, mocker):
+    """디코딩에 실패하면 임시 파일을 남기지 않는지 테스트"""
+    bad = tmp_path / "broken.wav"
+    bad.write_bytes(b"not audio")
+    spool_dir = tmp_path / "spool"
+    spool_dir.mkdir()
+    mocker.patch('tempfile.tempdir', str(spool_dir))
+    mocker.patch('audio_stream.librosa.load', side_effect=Exception("decode error"))
+
+    with pytest.raises(Exception, match="decode error"):
+        decode_to_spool(str(bad))
+    assert list(spool_dir.iterdir()) == []
+
+
+def test_decode_progressively_matches_decode_to_spool(wav_44k):
+    """백그라운드 디코딩 결과가 decode_to_spool과 같고, 디코딩 중인 구간은 기다렸다가 읽는지 테스트"""
+    with decode_to_spool(wav_44k) as expected:
+        waveform = decode_progressively(wav_44k, block_seconds=0.2)
+        np.testing.assert_allclose(waveform[0:len(expected)], expected[0:len(expected)], atol=1e-6)
+        assert waveform.wait_for(len(expected) * 2) == len(expected)
+        np.testing.assert_allclose(waveform[len(expected) - 10:], expected[len(expected) - 10:], atol=1e-6)
+        waveform.close()
+
+
+def test_decode_progressively_reports_error_to_reader(tmp_path):
+    """디코딩 오류가 파형을 읽는 쪽에서 발생하는지 테스트"""
+    bad = tmp_path / "broken.wav"
+    bad.write_bytes(b"not audio")
+    waveform = decode_progressively(str(bad))
+    with pytest.raises(Exception):
+        waveform.wait_for(1)
+    waveform.close()
+
+
+def _read_ref(ref):
+    waveform = ref.open()
+    data = np.array(waveform[0:len(waveform)])
+    waveform.close()
+    return data
+
+
+def test_waveform_ref_is_read_without_copy_in_worker_process(wav_44k):
+    """다른 프로세스는 설명자로 같은 스풀 파일을 열어 읽고, 파일은 소유한 쪽만 지우는지 테스트"""
+    import multiprocessing
+    import os
+    from concurrent.futures import ProcessPoolExecutor
+    from concurrent.futures.process import BrokenProcessPool
+
+    with decode_to_spool(wav_44k) as waveform:
+        view = waveform[100:1100]
+        assert not view.flags.owndata and view.base is not None
+        ref = waveform.ref(100, 1100)
+        assert (ref.offset, ref.length) == (100, 1000)
+
+        with ProcessPoolExecutor(1, mp_context=multiprocessing.get_context("fork")) as pool:
+            np.testing.assert_array_equal(pool.submit(_read_ref, ref).result(), view)
+            # 워커가 비정상 종료되어도 스풀 파일은 남아 있고, 소유한 쪽이 계속 읽을 수 있음
+            with pytest.raises(BrokenProcessPool):
+                pool.submit(os._exit, 1).result()
+        assert os.path.exists(waveform.path)
+        np.testing.assert_array_equal(ref.open()[0:1000], view)
+    assert not os.path.exists(waveform.path)
+
+
+def test_purge_stale_spools_removes_files_of_exited_processes(tmp_path, mocker):
+    import os
+    import subprocess
+    import sys
+    from audio_stream import purge_stale_spools
+    mocker.patch('audio_stream.settings.WAVEFORM_SPOOL_DIR', str(tmp_path))
+    exited = subprocess.run([sys.executable, "-c", "import os; print(os.getpid())"],
+                            capture_output=True, text=True).stdout.strip()
+    stale = tmp_path / f"lesson-wave-{exited}-abc.f32"
+    live = tmp_path / f"lesson-wave-{os.getpid()}-abc.f32"
+    other = tmp_path / "other.f32"
+    for path in (stale, live, other):
+        path.write_bytes(b"\0" * 8)
+
+    assert purge_stale_spools() == 1
+    assert sorted(p.name for p in tmp_path.iterdir()) == sorted([live.name, other.name])
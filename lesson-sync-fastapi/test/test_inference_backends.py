@@ -0,0 +1,148 @@
+import copy
+
+import numpy as np
+import pytest
+import torch
+import whisper
+
+import audio_processor
+import inference_backends
+from audio_processor import AudioProcessor
+from inference_backends import quantize_whisper
+
+CLASS_NAMES = ["Music", "Speech", "Silence"]
+
+
+def _make_fake_yamnet(model_dir):
+    """
+    YAMNet과 입출력이 같은 작은 모델을 SavedModel(MODEL_DIR/yamnet)과 TFLite(MODEL_DIR/yamnet_tflite)로 저장합니다.
+    프레임 나누기는 YAMNet과 같고, 프레임 에너지를 Speech 점수로 사용합니다.
+    """
+    import tensorflow as tf
+
+    for name in ("yamnet", "yamnet_tflite"):
+        (model_dir / name).mkdir()
+    class_map = model_dir / "yamnet_tflite" / "yamnet_class_map.csv"
+    class_map.write_text("index,mid,display_name\n" + "".join(
+        f"{i},/m/{i},{name}\n" for i, name in enumerate(CLASS_NAMES)))
+
+    class FakeYamnet(tf.Module):
+        def __init__(self):
+            super().__init__()
+            self._class_map = tf.saved_model.Asset(str(class_map))
+            self._projection = tf.constant(np.random.default_rng(0).standard_normal((1, 1024)), tf.float32)
+
+        @tf.function(input_signature=[tf.TensorSpec([None], tf.float32)])
+        def __call__(self, waveform):
+            window, hop = 15600, 7680
+            n = tf.shape(waveform)[0]
+            padded_len = window + (tf.maximum(n, window) - window + hop - 1) // hop * hop
+            frames = tf.signal.frame(tf.pad(waveform, [[0, padded_len - n]]), window, hop)
+            energy = tf.reduce_mean(tf.abs(frames), axis=1, keepdims=True)
+            scores = tf.concat([tf.fill(tf.shape(energy), 0.25), energy, tf.zeros_like(energy)], axis=1)
+            return scores, tf.tanh(energy * self._projection), frames[:, :64]
+
+        @tf.function(input_signature=[])
+        def class_map_path(self):
+            return self._class_map.asset_path
+
+    model = FakeYamnet()
+    tf.saved_model.save(model, str(model_dir / "yamnet"))
+    converter = tf.lite.TFLiteConverter.from_concrete_functions([model.__call__.get_concrete_function()], model)
+    (model_dir / "yamnet_tflite" / "yamnet.tflite").write_bytes(converter.convert())
+
+
+@pytest.fixture(scope="module")
+def model_dir(tmp_path_factory):
+    model_dir = tmp_path_factory.mktemp("models")
+    _make_fake_yamnet(model_dir)
+    return model_dir
+
+
+def _processor_with(monkeypatch, **overrides):
+    for name, value in overrides.items():
+        monkeypatch.setattr(audio_processor.settings, name, value)
+    audio_processor._load_yamnet.cache_clear()
+    inference_backends.load_tflite_yamnet.cache_clear()
+    return AudioProcessor()
+
+
+def test_tflite_yamnet_matches_saved_model(model_dir, monkeypatch):
+    """TFLite 백엔드가 SavedModel 백엔드와 같은 점수, 구간, 라벨을 만드는지 테스트"""
+    sr = 16000
+    rng = np.random.default_rng(1)
+    waveform = np.zeros(int(23.7 * sr), dtype=np.float32)
+    for start, end in [(1.0, 4.2), (9.5, 12.7), (18.0, 23.7)]:
+        waveform[int(start * sr):int(end * sr)] = rng.uniform(-1, 1, int(end * sr) - int(start * sr))
+
+    results = {}
+    for backend in ("tf", "tflite"):
+        processor = _processor_with(monkeypatch, MODEL_DIR=str(model_dir), YAMNET_BACKEND=backend)
+        assert processor.class_names == CLASS_NAMES
+        scores, embeddings, _ = processor.yamnet_model(waveform)
+        segments = list(processor.iter_speech_segments_stream(waveform, sr, window_seconds=5.0, classify=True))
+        results[backend] = (audio_processor._as_numpy(scores), audio_processor._as_numpy(embeddings), segments)
+
+    np.testing.assert_allclose(results["tflite"][0], results["tf"][0], atol=1e-5)
+    np.testing.assert_allclose(results["tflite"][1], results["tf"][1], atol=1e-5)
+    assert results["tflite"][2] == results["tf"][2]
+    assert len(results["tf"][2]) == 3
+
+
+def test_missing_tflite_model_and_unknown_backend(tmp_path, monkeypatch):
+    processor = _processor_with(monkeypatch, MODEL_DIR=str(tmp_path), YAMNET_BACKEND="tflite")
+    with pytest.raises(FileNotFoundError, match="yamnet.tflite"):
+        processor.yamnet_model
+
+    processor = _processor_with(monkeypatch, WHISPER_BACKEND="onnx")
+    with pytest.raises(ValueError, match="onnx"):
+        processor.whisper_model
+
+
+@pytest.fixture(scope="module")
+def small_whisper():
+    """구조만 같은 작은 임의 가중치 Whisper (다국어 토크나이저를 쓰도록 어휘 수는 실제와 같음)"""
+    dims = whisper.ModelDimensions(n_mels=80, n_audio_ctx=1500, n_audio_state=64, n_audio_head=2,
+                                   n_audio_layer=2, n_vocab=51865, n_text_ctx=64, n_text_state=64,
+                                   n_text_head=2, n_text_layer=2)
+    torch.manual_seed(0)
+    model = whisper.model.Whisper(dims).eval()
+    # 디코더 위치 임베딩은 torch.empty로 만들어지므로 (체크포인트에서 덮어씀) 직접 초기화
+    torch.nn.init.normal_(model.decoder.positional_embedding, std=0.01)
+    return model
+
+
+def test_int8_whisper_matches_float_model(small_whisper):
+    """int8 동적 양자화 모델의 인코더 출력과 다음 토큰 분포가 원래 모델과 거의 같은지 테스트"""
+    model = small_whisper
+    quantized = quantize_whisper(copy.deepcopy(model))
+    assert not any(isinstance(m, torch.nn.Linear) for m in quantized.modules())
+    assert sum(isinstance(m, torch.ao.nn.quantized.dynamic.Linear) for m in quantized.modules()) == 32
+
+    audio = (0.1 * np.random.default_rng(0).standard_normal(16000 * 5)).astype(np.float32)
+    mel = whisper.log_mel_spectrogram(whisper.pad_or_trim(audio)).unsqueeze(0)
+    tokens = torch.tensor([list(whisper.tokenizer.get_tokenizer(True, language="ko").sot_sequence)])
+    with torch.no_grad():
+        features, quantized_features = model.encoder(mel), quantized.encoder(mel)
+        logits = model.decoder(tokens, features)[0, -1]
+        quantized_logits = quantized.decoder(tokens, quantized_features)[0, -1]
+
+    cosine = torch.nn.functional.cosine_similarity
+    assert cosine(features.flatten(), quantized_features.flatten(), dim=0) > 0.99
+    assert cosine(logits.softmax(-1), quantized_logits.softmax(-1), dim=0) > 0.99
+
+
+def test_int8_whisper_supports_batched_decoding(small_whisper):
+    """
+    양자화 모델로 배치 디코딩(kv-cache 사용)한 결과가 한 구간씩 디코딩한 결과와 같은지 테스트.
+    동적 양자화는 활성값 범위를 배치 전체로 정하므로 같은 mel을 반복한 배치로 비교 (임의 가중치라 온도 0만 사용)
+    """
+    quantized = quantize_whisper(copy.deepcopy(small_whisper))
+    audio = (0.1 * np.random.default_rng(2).standard_normal(16000 * 3)).astype(np.float32)
+    mel = whisper.log_mel_spectrogram(whisper.pad_or_trim(audio))
+    options = whisper.DecodingOptions(language="ko", temperature=0.0, fp16=False)
+
+    single = whisper.decode(quantized, mel.unsqueeze(0), options)[0]
+    batched = whisper.decode(quantized, torch.stack([mel, mel, mel]), options)
+    assert single.tokens
+    assert [result.tokens for result in batched] == [single.tokens] * 3
@@ -0,0 +1,110 @@
+import threading
+import pytest
+from job_queue import JobQueue, QueueFullError
+
+
+def _wait_until_finished(queue, job_id, timeout=5.0):
+    import time
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = queue.get(job_id)
+        if job.status in ("done", "failed"):
+            return job
+        time.sleep(0.01)
+    raise AssertionError("작업이 제한 시간 안에 끝나지 않았습니다")
+
+
+def test_job_runs_and_reports_progress():
+    """작업이 실행되고 진행 상황과 결과가 기록되는지 테스트"""
+    queue = JobQueue(max_workers=1, max_pending=2)
+    stages = []
+
+    def work(value, progress=None):
+        progress("transcribing", 0.5)
+        stages.append("transcribing")
+        return {"value": value}
+
+    job = queue.submit(work, 42)
+    finished = _wait_until_finished(queue, job.id)
+
+    assert stages == ["transcribing"]
+    assert finished.status == "done"
+    assert finished.progress == 1.0
+    assert finished.to_dict()["result"] == {"value": 42}
+    assert queue.pending_count() == 0
+    queue.shutdown()
+
+
+def test_failed_job_keeps_error_message():
+    """작업 중 예외가 발생하면 failed 상태와 오류 메시지가 남는지 테스트"""
+    queue = JobQueue(max_workers=1, max_pending=1)
+
+    def work(progress=None):
+        raise ValueError("decode error")
+
+    job = queue.submit(work)
+    finished = _wait_until_finished(queue, job.id)
+
+    assert finished.status == "failed"
+    assert finished.error == "decode error"
+    queue.shutdown()
+
+
+def test_admission_control_rejects_when_full():
+    """대기 작업 수가 최대치를 넘으면 새 작업을 거절하는지 테스트"""
+    queue = JobQueue(max_workers=1, max_pending=2)
+    release = threading.Event()
+
+    def work(progress=None):
+        release.wait(5)
+        return {}
+
+    first = queue.submit(work)
+    queue.submit(work)
+    with pytest.raises(QueueFullError):
+        queue.submit(work)
+
+    release.set()
+    _wait_until_finished(queue, first.id)
+    queue.shutdown()
+    # 작업이 끝나면 슬롯이 반환되어 다시 제출할 수 있어야 함
+    assert queue.pending_count() == 0
+
+
+def test_queued_ages_lists_only_jobs_not_started():
+    """실행을 시작하지 않은 작업만 기다린 시간과 함께 알려주는지 테스트 (Whisper 티어 스케줄러가 부하로 사용)"""
+    queue = JobQueue(max_workers=1, max_pending=3)
+    started, release = threading.Event(), threading.Event()
+
+    def work(progress=None):
+        started.set()
+        release.wait(5)
+        return {}
+
+    first = queue.submit(work)
+    started.wait(5)
+    queue.submit(work)
+    ages = queue.queued_ages()
+    assert len(ages) == 1 and 0 <= ages[0] < 5
+
+    release.set()
+    _wait_until_finished(queue, first.id)
+    queue.shutdown()
+    assert queue.queued_ages() == []
+
+
+def test_reserve_holds_slot_until_submit_or_exit():
+    """확보한 자리는 작업을 넣기 전에도 대기 작업 수에 포함되고, 넣지 않고 나가면 반환되는지 테스트"""
+    queue = JobQueue(max_workers=1, max_pending=1)
+
+    with queue.reserve():
+        with pytest.raises(QueueFullError):
+            queue.submit(lambda progress=None: {})
+    # 작업을 넣지 않고 나가면 자리가 반환됨
+    with queue.reserve() as submit:
+        job = submit(lambda progress=None: {"ok": True})
+    job.future.result(timeout=5)
+
+    assert queue.get(job.id).result == {"ok": True}
+    queue.shutdown()
+    assert queue.pending_count() == 0
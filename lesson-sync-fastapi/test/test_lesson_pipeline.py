@@ -0,0 +1,314 @@
+import threading
+import time
+
+import pytest
+from unittest.mock import MagicMock
+
+import lesson_pipeline
+from lesson_pipeline import run_lesson_pipeline
+from result_cache import ResultCache
+from upload_store import UploadStore
+
+
+@pytest.fixture
+def audio_file(tmp_path):
+    path = tmp_path / "lesson.wav"
+    path.write_bytes(b"fake audio data")
+    return str(path)
+
+
+@pytest.fixture
+def services(mocker):
+    mocker.patch('lesson_pipeline.decode_to_spool', return_value=MagicMock(sr=16000))
+    audio_processor = MagicMock()
+    audio_processor.extract_speech_segments_stream.return_value = [{"start": 0.0, "end": 2.0}]
+    audio_processor.transcribe_segments.return_value = [{"start": 0.0, "end": 2.0, "text": "1마디 부드럽게"}]
+    summary_service = MagicMock()
+    summary_service.correct_transcript.return_value = "1마디 부드럽게."
+    summary_service.generate_summary.return_value = "## 마디별 주의사항"
+    return audio_processor, summary_service
+
+
+def test_repeat_run_reuses_all_stages(audio_file, services, tmp_path):
+    """같은 오디오를 다시 처리하면 모든 단계를 캐시에서 가져오는지 테스트"""
+    audio_processor, summary_service = services
+    cache = ResultCache(str(tmp_path / "cache"), max_bytes=1024 * 1024)
+
+    first = run_lesson_pipeline(audio_file, audio_processor, summary_service, cache=cache)
+    second = run_lesson_pipeline(audio_file, audio_processor, summary_service, cache=cache)
+
+    assert first == second
+    assert audio_processor.transcribe_segments.call_count == 1
+    assert summary_service.correct_transcript.call_count == 1
+    assert summary_service.generate_summary.call_count == 1
+
+
+def test_summary_prompt_change_reuses_earlier_stages(audio_file, services, tmp_path, mocker):
+    """요약 프롬프트만 바뀌면 STT와 보정 결과는 재사용하고 요약만 다시 생성하는지 테스트"""
+    audio_processor, summary_service = services
+    cache = ResultCache(str(tmp_path / "cache"), max_bytes=1024 * 1024)
+
+    run_lesson_pipeline(audio_file, audio_processor, summary_service, cache=cache)
+    mocker.patch.object(lesson_pipeline, 'SUMMARY_SYSTEM_PROMPT', "새 요약 프롬프트")
+    run_lesson_pipeline(audio_file, audio_processor, summary_service, cache=cache)
+
+    assert audio_processor.transcribe_segments.call_count == 1
+    assert summary_service.correct_transcript.call_count == 1
+    assert summary_service.generate_summary.call_count == 2
+
+
+def test_failed_correction_is_not_cached(audio_file, services, tmp_path):
+    """보정 실패(원본 그대로 반환)는 캐시에 저장하지 않는지 테스트"""
+    audio_processor, summary_service = services
+    summary_service.correct_transcript.side_effect = lambda transcript, segments=None: transcript
+    cache = ResultCache(str(tmp_path / "cache"), max_bytes=1024 * 1024)
+
+    run_lesson_pipeline(audio_file, audio_processor, summary_service, cache=cache)
+    run_lesson_pipeline(audio_file, audio_processor, summary_service, cache=cache)
+
+    assert summary_service.correct_transcript.call_count == 2
+
+
+def test_structured_output_replaces_correction_and_summary_calls(audio_file, services, tmp_path, monkeypatch):
+    """구조화 응답 하나로 보정/요약/지시어를 만들고, 실패(None)하면 보정 -> 요약 두 번 호출로 처리하는지 테스트"""
+    monkeypatch.setattr(lesson_pipeline.settings, "LLM_STRUCTURED_OUTPUT", True)
+    audio_processor, summary_service = services
+    summary_service.structured_lesson.return_value = {
+        "corrected_transcript": "1마디 부드럽게.", "summary": "## 마디별 주의사항\n- 1마디",
+        "annotations": [{"measure": 1, "directive": "부드럽게"}]}
+    cache = ResultCache(str(tmp_path / "cache"), max_bytes=1024 * 1024)
+    events = []
+
+    first = run_lesson_pipeline(audio_file, audio_processor, summary_service, cache=cache,
+                                emit=lambda event, data: events.append((event, data)))
+    second = run_lesson_pipeline(audio_file, audio_processor, summary_service, cache=cache)
+
+    assert first == second
+    assert first["annotations"] == [{"measure": 1, "directive": "부드럽게"}]
+    assert first["summary"] == "## 마디별 주의사항\n- 1마디"
+    summary_service.structured_lesson.assert_called_once_with("1마디 부드럽게")
+    summary_service.correct_transcript.assert_not_called()
+    summary_service.generate_summary.assert_not_called()
+    assert ("correction", {"index": 0, "total": 1, "text": "1마디 부드럽게."}) in events
+    assert ("summary", {"delta": "## 마디별 주의사항\n- 1마디"}) in events
+
+    summary_service.structured_lesson.return_value = None
+    fallback = run_lesson_pipeline(audio_file, audio_processor, summary_service)
+
+    assert "annotations" not in fallback
+    assert fallback["summary"] == "## 마디별 주의사항"
+    assert summary_service.correct_transcript.call_count == 1
+
+
+class _SlowDetector:
+    """검출 사이에 지연을 두고 구간을 내보내며 검출/STT 시점을 기록하는 모의 AudioProcessor"""
+
+    def __init__(self, segments, fail_after=None):
+        self.segments = segments
+        self.fail_after = fail_after
+        self.events = []
+        self.detector_thread = None
+
+    def iter_speech_segments_stream(self, waveform, sr, classify=False):
+        self.detector_thread = threading.current_thread()
+        for i, seg in enumerate(self.segments):
+            if i == self.fail_after:
+                raise RuntimeError("YAMNet 실패")
+            time.sleep(0.05)
+            self.events.append(("detected", i))
+            yield dict(seg)
+
+    def transcribe_segments(self, segments, waveform, sr, batch_size=1, on_segment=None):
+        results = []
+        for i, seg in enumerate(segments):
+            self.events.append(("transcribing", seg["start"]))
+            time.sleep(0.05)
+            seg["text"] = f"구간 {seg['start']:g}"
+            results.append(seg)
+            if on_segment is not None:
+                on_segment(seg)
+        return results
+
+
+@pytest.fixture
+def waveform(mocker):
+    waveform = MagicMock(sr=16000)
+    waveform.__len__.return_value = 16000
+    mocker.patch('lesson_pipeline.decode_to_spool', return_value=waveform)
+    return waveform
+
+
+def test_transcription_overlaps_speech_detection(audio_file, waveform, tmp_path):
+    """첫 구간의 STT가 나머지 구간 검출이 끝나기 전에 시작되고, 검출 결과(텍스트 제외)는 캐시에 저장되는지 테스트"""
+    processor = _SlowDetector([{"start": float(i), "end": i + 0.5} for i in range(4)])
+    cache = ResultCache(str(tmp_path / "cache"), max_bytes=1024 * 1024)
+    keys = lesson_pipeline.StageKeys.for_audio("digest")
+
+    results = lesson_pipeline.transcribe_audio(audio_file, processor, cache=cache, keys=keys)
+
+    assert [seg["text"] for seg in results] == ["구간 0", "구간 1", "구간 2", "구간 3"]
+    assert processor.events.index(("transcribing", 0.0)) < processor.events.index(("detected", 3))
+    assert processor.detector_thread is not threading.main_thread()
+    assert cache.get(keys.segments) == [{"start": float(i), "end": i + 0.5} for i in range(4)]
+    waveform.close.assert_called_once()
+
+
+def test_speech_detection_error_stops_transcription(audio_file, waveform):
+    """검출 중 예외가 나면 STT를 멈추고 같은 예외가 전달되는지 테스트"""
+    processor = _SlowDetector([{"start": float(i), "end": i + 0.5} for i in range(4)], fail_after=2)
+
+    with pytest.raises(RuntimeError, match="YAMNet"):
+        lesson_pipeline.transcribe_audio(audio_file, processor)
+
+    assert ("transcribing", 2.0) not in processor.events
+    waveform.close.assert_called_once()
+
+
+def test_model_worker_receives_waveform_ref_and_alignment_reuses_decode(tmp_path, mocker):
+    """파형은 한 번만 디코딩해 워커에는 설명자만 넘기고, 워커가 실패해도 스풀 파일은 지워지는지 테스트"""
+    import os
+    import numpy as np
+    import soundfile as sf
+    from concurrent.futures import Future
+    from concurrent.futures.process import BrokenProcessPool
+    from audio_stream import WaveformRef
+
+    path = tmp_path / "lesson.wav"
+    sf.write(path, np.zeros(16000, dtype=np.float32), 16000)
+    decode = mocker.patch('lesson_pipeline.decode_to_spool', wraps=lesson_pipeline.decode_to_spool)
+    align = mocker.patch('lesson_pipeline.align_lesson', return_value=[])
+    submitted = []
+
+    class _Executor:
+        def __init__(self, error=None):
+            self.error = error
+
+        def submit(self, fn, ref, cache, keys):
+            submitted.append((fn, ref, os.path.exists(ref.path)))
+            future = Future()
+            if self.error is not None:
+                future.set_exception(self.error)
+            else:
+                future.set_result([{"start": 0.0, "end": 1.0, "text": "speech"}])
+            return future
+
+    summary_service = MagicMock()
+    summary_service.correct_transcript.return_value = "corrected"
+    summary_service.generate_summary.return_value = "summary"
+    run_lesson_pipeline(str(path), None, summary_service, model_executor=_Executor(), score=b"<score/>")
+
+    fn, ref, existed = submitted[0]
+    assert fn is lesson_pipeline.transcribe_in_worker and isinstance(ref, WaveformRef) and existed
+    assert (ref.offset, ref.length, ref.sr) == (0, 16000, 16000)
+    assert decode.call_count == 1
+    assert align.call_args.kwargs["waveform"].path == ref.path
+    assert not os.path.exists(ref.path)
+
+    with pytest.raises(BrokenProcessPool):
+        run_lesson_pipeline(str(path), None, summary_service, model_executor=_Executor(BrokenProcessPool("crash")))
+    assert not os.path.exists(submitted[1][1].path)
+
+
+class _WorkerProcessor:
+    """spawn 모델 워커 안에서 쓰는 모의 AudioProcessor (모델 없이 구간 하나를 검출/변환)"""
+
+    def iter_speech_segments_stream(self, waveform, sr, classify=False):
+        yield {"start": 0.0, "end": 1.0}
+
+    def transcribe_segments(self, segments, waveform, sr, batch_size=1, on_segment=None):
+        return [dict(seg, text="worker") for seg in segments]
+
+
+def _init_fake_model_worker():
+    lesson_pipeline._worker_audio_processor = _WorkerProcessor()
+
+
+def test_cache_is_passed_to_spawned_model_worker(tmp_path):
+    """캐시를 켠 채 spawn 프로세스 풀로 모델 단계를 실행하면 캐시가 pickle되어 워커에서도 쓰이는지 테스트"""
+    import multiprocessing
+    import numpy as np
+    import soundfile as sf
+    from concurrent.futures import ProcessPoolExecutor
+
+    path = tmp_path / "lesson.wav"
+    sf.write(path, np.zeros(16000, dtype=np.float32), 16000)
+    cache = ResultCache(str(tmp_path / "cache"), max_bytes=1024 * 1024)
+    summary_service = MagicMock()
+    summary_service.correct_transcript.return_value = "corrected"
+    summary_service.generate_summary.return_value = "summary"
+
+    with ProcessPoolExecutor(1, mp_context=multiprocessing.get_context("spawn"),
+                             initializer=_init_fake_model_worker) as pool:
+        result = run_lesson_pipeline(str(path), None, summary_service, cache=cache, model_executor=pool)
+
+    assert [seg["text"] for seg in result["speech_segments"]] == ["worker"]
+    # 음성 구간 검출 결과는 워커가 저장한 것
+    keys = lesson_pipeline.StageKeys.for_audio(lesson_pipeline.file_digest(str(path)))
+    assert cache.get(keys.segments) == [{"start": 0.0, "end": 1.0}]
+
+
+def test_speech_queue_size_zero_detects_everything_first(audio_file, waveform, mocker):
+    """SPEECH_QUEUE_SIZE=0이면 검출을 모두 마친 뒤 STT를 시작하는지 테스트"""
+    mocker.patch.object(lesson_pipeline.settings, 'SPEECH_QUEUE_SIZE', 0)
+    processor = _SlowDetector([{"start": float(i), "end": i + 0.5} for i in range(3)])
+
+    lesson_pipeline.transcribe_audio(audio_file, processor)
+
+    assert processor.events == [("detected", 0), ("detected", 1), ("detected", 2),
+                                ("transcribing", 0.0), ("transcribing", 1.0), ("transcribing", 2.0)]
+
+
+def test_segment_labels_skip_music_and_defer_student_speech(audio_file, waveform):
+    """연주 구간은 STT하지 않고, 학생 발화는 마지막에 변환하되 결과는 녹음 순서와 라벨을 유지하는지 테스트"""
+    labels = ["teacher_speech", "music", "student_speech", "mixed", "teacher_speech"]
+    processor = _SlowDetector([{"start": float(i), "end": i + 0.5, "label": label} for i, label in enumerate(labels)])
+
+    results = lesson_pipeline.transcribe_audio(audio_file, processor)
+
+    transcribed = [start for event, start in processor.events if event == "transcribing"]
+    assert transcribed == [0.0, 3.0, 4.0, 2.0]
+    assert [(seg["start"], seg["label"], seg["text"]) for seg in results] == [
+        (0.0, "teacher_speech", "구간 0"), (1.0, "music", ""), (2.0, "student_speech", "구간 2"),
+        (3.0, "mixed", "구간 3"), (4.0, "teacher_speech", "구간 4")]
+
+
+def test_checkpoint_skips_already_transcribed_segments(audio_file, waveform, tmp_path):
+    """체크포인트에 있는 구간은 STT를 건너뛰고, 새로 변환한 구간은 체크포인트에 저장하는지 테스트"""
+    upload = UploadStore(str(tmp_path / "uploads"), ttl_seconds=3600).create(10, filename="lesson.wav")
+    upload.save({"start": 1.0, "end": 1.5, "text": "이전 실행 결과"})
+    processor = _SlowDetector([{"start": float(i), "end": i + 0.5} for i in range(3)])
+
+    results = lesson_pipeline.transcribe_audio(audio_file, processor, checkpoint=upload)
+
+    assert [start for event, start in processor.events if event == "transcribing"] == [0.0, 2.0]
+    assert [seg["text"] for seg in results] == ["구간 0", "이전 실행 결과", "구간 2"]
+    assert upload.checkpointed_segments == 3
+    assert upload.get({"start": 2.0, "end": 2.5})["text"] == "구간 2"
+
+
+def test_tier_scheduler_picks_whisper_model_and_cache_key(audio_file, services, tmp_path, mocker):
+    """스케줄러가 고른 티어로 STT하고 응답과 캐시 키에 반영, 캐시된 티어가 있으면 가장 정확한 것을 그대로 사용"""
+    from tier_scheduler import TierScheduler, WhisperTier
+    mocker.patch('lesson_pipeline.decode_to_spool', return_value=MagicMock(sr=16000, duration=1800.0))
+    audio_processor, summary_service = services
+    cache = ResultCache(str(tmp_path / "cache"), max_bytes=1024 * 1024)
+    tiers = [WhisperTier("small", 0.6), WhisperTier("tiny", 0.1)]
+    # 대기 작업 3개: small이면 (4 x 1800) x 0.6초로 목표(600초)를 넘으므로 tiny
+    busy = TierScheduler(tiers, 600.0, queued=lambda: [0.0] * 3)
+
+    for _ in range(2):
+        result = run_lesson_pipeline(audio_file, audio_processor, summary_service, cache=cache, scheduler=busy)
+        assert result["whisper_model"] == "tiny"
+    assert audio_processor.transcribe_segments.call_count == 1
+    assert audio_processor.transcribe_segments.call_args.kwargs["whisper_model"] == "tiny"
+
+    # small로 변환한 결과가 생기면 바쁠 때도 그 결과를 사용
+    result = run_lesson_pipeline(audio_file, audio_processor, summary_service, cache=cache,
+                                 scheduler=TierScheduler(tiers[:1], 600.0))
+    assert result["whisper_model"] == "small"
+    result = run_lesson_pipeline(audio_file, audio_processor, summary_service, cache=cache, scheduler=busy)
+    assert result["whisper_model"] == "small"
+    assert audio_processor.transcribe_segments.call_count == 2
+
+    # 스케줄러가 없으면 WHISPER_MODEL로 변환하고 응답에 티어를 넣지 않음
+    assert "whisper_model" not in run_lesson_pipeline(audio_file, audio_processor, summary_service)
@@ -0,0 +1,101 @@
+import threading
+
+from lesson_store import LessonStore
+
+RESULT = {
+    "speech_segments": [{"start": 0.0, "end": 2.5, "text": "23마디는"}, {"start": 3.0, "end": 6.0, "text": "크레센도로"}],
+    "corrected_transcript": "23마디는 크레센도로 점점 크게 연주해요. 활을 길게 쓰세요.",
+    "summary": "## 마디별 주의사항:\n- 23마디: 크레센도",
+}
+
+
+def test_save_and_get_lesson_roundtrip(tmp_path):
+    store = LessonStore(str(tmp_path / "lessons.db"))
+    lesson_id = store.save_lesson(RESULT, [(23, "크레센도 점점 크게"), (5, "부드럽다")], score_id="spring", title="봄")
+
+    lesson = store.get_lesson(lesson_id)
+    assert lesson["score_id"] == "spring" and lesson["title"] == "봄"
+    assert lesson["speech_segments"] == RESULT["speech_segments"]
+    assert lesson["corrected_transcript"] == RESULT["corrected_transcript"]
+    assert lesson["annotations"] == [{"measure": 23, "directive": "크레센도 점점 크게"},
+                                     {"measure": 5, "directive": "부드럽다"}]
+    assert store.get_lesson(lesson_id + 1) is None
+    assert [l["id"] for l in store.list_lessons(score_id="spring")] == [lesson_id]
+
+
+def test_list_lessons_orders_by_id_using_index(tmp_path, monkeypatch):
+    """시계가 뒤로 가도 저장 순서(id) 역순으로 나열하고, 악보별 목록은 정렬 없이 인덱스로 읽음"""
+    import lesson_store
+    from types import SimpleNamespace
+    store = LessonStore(str(tmp_path / "lessons.db"))
+    clock = iter([200.0, 100.0, 150.0])
+    monkeypatch.setattr(lesson_store, "time", SimpleNamespace(time=lambda: next(clock)))
+    ids = [store.save_lesson(RESULT, score_id="spring") for _ in range(3)]
+
+    assert [l["id"] for l in store.list_lessons(score_id="spring")] == ids[::-1]
+    assert [l["id"] for l in store.list_lessons(limit=2, offset=1)] == ids[1::-1]
+    plan = " ".join(row[3] for row in store._connect().execute(
+        "EXPLAIN QUERY PLAN SELECT id FROM lessons WHERE score_id = ? ORDER BY id DESC", ("spring",)))
+    assert "USING COVERING INDEX lessons_score_id" in plan or "USING INDEX lessons_score_id" in plan
+    assert "TEMP B-TREE" not in plan
+
+
+def test_annotations_for_measure_across_lessons(tmp_path):
+    store = LessonStore(str(tmp_path / "lessons.db"))
+    first = store.save_lesson(RESULT, [(23, "크레센도")], score_id="spring")
+    store.save_lesson(RESULT, [(24, "여리게")], score_id="spring")
+    third = store.save_lesson(RESULT, [(23, "가볍게")], score_id="winter")
+
+    assert [(a["lesson_id"], a["directive"]) for a in store.annotations_for_measure(23)] == \
+        [(third, "가볍게"), (first, "크레센도")]
+    assert [a["directive"] for a in store.annotations_for_measure(23, score_id="spring")] == ["크레센도"]
+    # 마디 조회는 전체 테이블을 훑지 않고 인덱스를 사용
+    plan = " ".join(row[3] for row in store._connect().execute(
+        "EXPLAIN QUERY PLAN SELECT directive FROM annotations WHERE score_id = ? AND measure = ?", ("spring", 23)))
+    assert "USING INDEX annotations_score_measure" in plan
+
+
+def test_full_text_search_and_delete(tmp_path):
+    store = LessonStore(str(tmp_path / "lessons.db"))
+    lesson_id = store.save_lesson(RESULT, [(23, "크레센도")])
+    store.save_lesson({**RESULT, "corrected_transcript": "스타카토를 짧게", "summary": ""})
+
+    # 조사가 붙은 단어('크레센도로')도 부분 문자열로 검색됨
+    hits = store.search("크레센도")
+    assert [h["id"] for h in hits] == [lesson_id]
+    assert "[크레센도]" in hits[0]["snippet"]
+    assert [h["id"] for h in store.search("활을")] == [lesson_id]
+    assert store.search('" OR *') == [] and store.search("%") == []
+
+    assert store.delete_lesson(lesson_id)
+    assert store.search("크레센도") == [] and store.annotations_for_measure(23) == []
+    assert not store.delete_lesson(lesson_id)
+
+
+def test_connections_are_per_thread(tmp_path):
+    store = LessonStore(str(tmp_path / "lessons.db"))
+    errors = []
+
+    def save():
+        try:
+            store.save_lesson(RESULT, [(1, "크게")])
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=save) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert errors == []
+    assert len(store.list_lessons()) == 4
+
+
+def test_segment_labels_are_stored(tmp_path):
+    store = LessonStore(str(tmp_path / "lessons.db"))
+    segments = [{"start": 0.0, "end": 2.0, "text": "23마디는", "label": "teacher_speech"},
+                {"start": 3.0, "end": 9.0, "text": "", "label": "music"}]
+    lesson_id = store.save_lesson({**RESULT, "speech_segments": segments})
+
+    assert store.get_lesson(lesson_id)["speech_segments"] == segments
@@ -0,0 +1,115 @@
+import httpx
+import pytest
+from openai import BadRequestError, RateLimitError
+from llm_client import (CircuitBreaker, CircuitOpenError, ConcurrencyLimiter, RetryPolicy, StreamInterruptedError,
+                        call_with_retry)
+
+
+def _error(cls, status, headers=None):
+    request = httpx.Request("POST", "http://test/v1/chat/completions")
+    response = httpx.Response(status, headers=headers or {}, request=request)
+    return cls("error", response=response, body=None)
+
+
+def test_delay_uses_retry_after_header():
+    policy = RetryPolicy(base_delay=1.0, max_delay=30.0)
+
+    assert policy.delay_for(0, _error(RateLimitError, 429, {"retry-after": "3"})) == 3.0
+    assert policy.delay_for(0, _error(RateLimitError, 429, {"retry-after-ms": "250"})) == 0.25
+    # 서버가 알려준 값도 max_delay를 넘지 않음
+    assert policy.delay_for(0, _error(RateLimitError, 429, {"retry-after": "120"})) == 30.0
+    # 헤더가 없으면 0 ~ base * 2^attempt 사이의 지터
+    assert 0 <= policy.delay_for(2, _error(RateLimitError, 429)) <= 4.0
+
+
+def test_call_with_retry_does_not_retry_client_errors():
+    """400 같은 요청 오류는 재시도하지 않고 회로 실패로도 집계하지 않는지 테스트"""
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=60)
+    calls = []
+
+    def fn():
+        calls.append(1)
+        raise _error(BadRequestError, 400)
+
+    with pytest.raises(BadRequestError):
+        call_with_retry(fn, RetryPolicy(max_retries=3), breaker, sleep=lambda s: None)
+    assert len(calls) == 1
+    assert not breaker.is_open
+
+
+def test_interrupted_stream_is_not_retried_but_counts_as_failure():
+    """토큰을 일부 보낸 뒤 끊긴 스트림은 재시도하지 않지만 회로에는 실패로 반영되는지 테스트"""
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=60)
+    calls = []
+
+    def fn():
+        calls.append(1)
+        raise StreamInterruptedError("connection reset")
+
+    with pytest.raises(StreamInterruptedError):
+        call_with_retry(fn, RetryPolicy(max_retries=3), breaker, sleep=lambda s: None)
+    assert len(calls) == 1
+    assert breaker.is_open
+
+
+def test_circuit_breaker_half_open_probe(monkeypatch):
+    """차단 시간이 지나면 한 번의 시험 호출만 허용하고, 성공하면 회로가 닫히는지 테스트"""
+    now = [0.0]
+    monkeypatch.setattr("llm_client.time.monotonic", lambda: now[0])
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=10)
+
+    breaker.record_failure()
+    breaker.before_call()
+    breaker.record_failure()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    now[0] = 11.0
+    breaker.before_call()  # 시험 호출 허용
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()  # 시험 호출 중에는 다른 호출 차단
+    breaker.record_success()
+    assert not breaker.is_open
+    breaker.before_call()
+
+
+def test_retries_of_one_call_count_as_one_breaker_failure():
+    """재시도 횟수가 회로 차단 기준보다 많아도, 호출은 CircuitOpenError가 아닌 실제 오류로 끝나는지 테스트"""
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+    calls = []
+
+    def fn():
+        calls.append(1)
+        raise _error(RateLimitError, 429)
+
+    with pytest.raises(RateLimitError):
+        call_with_retry(fn, RetryPolicy(max_retries=5), breaker, sleep=lambda s: None)
+    assert len(calls) == 6
+    assert not breaker.is_open
+
+    with pytest.raises(RateLimitError):
+        call_with_retry(fn, RetryPolicy(max_retries=5), breaker, sleep=lambda s: None)
+    assert breaker.is_open
+    with pytest.raises(CircuitOpenError):
+        call_with_retry(fn, RetryPolicy(max_retries=5), breaker, sleep=lambda s: None)
+    assert len(calls) == 12
+
+
+def test_concurrency_limiter_hands_slot_to_cancelled_waiter_safely():
+    """기다리던 비동기 호출이 취소되어도 슬롯이 사라지지 않는지 테스트"""
+    import asyncio
+    limiter = ConcurrencyLimiter(1)
+
+    async def run():
+        await limiter.acquire_async()
+        waiter = asyncio.ensure_future(limiter.acquire_async())
+        await asyncio.sleep(0)
+        limiter.release()
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        # 취소된 호출에 넘어간 슬롯이 반환되어 다음 호출이 바로 진행됨
+        await asyncio.wait_for(limiter.acquire_async(), 1)
+        limiter.release()
+
+    asyncio.run(run())
@@ -1,4 +1,6 @@
 import pytest
+import json
+from concurrent.futures import ThreadPoolExecutor
 from unittest.mock import patch, MagicMock
 
 # 참고: conftest.py의 client fixture가 자동으로 주입됩니다.
@@ -6,12 +8,12 @@ from unittest.mock import patch, MagicMock
 # main.py에 정의된 인스턴스 변수(summary_service, audio_processor)를 직접 patch합니다.
 @patch('main.summary_service')
 @patch('main.audio_processor')
-@patch('librosa.load')
-def test_lesson_summary_flow(mock_librosa_load, mock_audio_processor, mock_summary_service, client):
+@patch('lesson_pipeline.decode_to_spool')
+def test_lesson_summary_flow(mock_decode_to_spool, mock_audio_processor, mock_summary_service, client):
     """오디오 파일 처리 및 요약 엔드포인트의 정상 흐름을 테스트합니다."""
     # Arrange: 각 서비스가 반환할 모의(mock) 데이터를 설정합니다.
-    mock_librosa_load.return_value = (MagicMock(), 16000)
-    mock_audio_processor.extract_speech_segments.return_value = "mock_segments"
+    mock_decode_to_spool.return_value = MagicMock(sr=16000)
+    mock_audio_processor.extract_speech_segments_stream.return_value = "mock_segments"
     mock_audio_processor.transcribe_segments.return_value = [{"text": "speech"}]
     
     mock_summary_service.correct_transcript.return_value = "corrected"
@@ -34,6 +36,21 @@ def test_lesson_summary_flow(mock_librosa_load, mock_audio_processor, mock_summa
     assert response.json() == expected_content
 
 
+def test_lesson_summary_rejects_when_job_queue_is_full(client):
+    """동기 엔드포인트도 작업 큐의 자리를 차지하며, 자리가 없으면 업로드를 받지 않고 503을 반환하는지 테스트"""
+    from job_queue import JobQueue
+    queue = JobQueue(max_workers=1, max_pending=1)
+
+    with patch('main.job_queue', queue), patch('main._spool_upload') as mock_spool:
+        with queue.reserve():
+            response = client.post("/lesson-summary", files={"file": ("test.wav", b"fake audio", "audio/wav")})
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "30"
+    mock_spool.assert_not_called()
+    queue.shutdown()
+
+
 @patch('main.librosa.load', side_effect=Exception("Test error"))
 def test_lesson_summary_processing_error(mock_librosa_load, client):
     """오디오 처리 중 예외 발생 시 500 에러 반환을 테스트합니다."""
@@ -45,4 +62,446 @@ def test_lesson_summary_processing_error(mock_librosa_load, client):
 
     # Assert: 서버 내부 오류(500)가 정상적으로 반환되는지 확인합니다.
     assert response.status_code == 500
-    assert "처리 실패: Test error" in response.json()["message"]
\ No newline at end of file
+    assert "처리 실패: Test error" in response.json()["message"]
+
+@patch('main.summary_service')
+@patch('main.audio_processor')
+@patch('lesson_pipeline.decode_to_spool')
+def test_lesson_job_submit_and_poll(mock_decode_to_spool, mock_audio_processor, mock_summary_service, client):
+    """작업 등록 후 job_id로 처리 결과를 조회하는 흐름을 테스트합니다."""
+    import time
+    mock_decode_to_spool.return_value = MagicMock(sr=16000)
+    mock_audio_processor.transcribe_segments.return_value = [{"text": "speech"}]
+    mock_summary_service.correct_transcript.return_value = "corrected"
+    mock_summary_service.generate_summary.return_value = "summary"
+
+    response = client.post(
+        "/lesson-summary/jobs",
+        files={"file": ("test.wav", b"fake audio data", "audio/wav")}
+    )
+    assert response.status_code == 202
+    job_id = response.json()["job_id"]
+
+    for _ in range(100):
+        status = client.get(f"/jobs/{job_id}").json()
+        if status["status"] in ("done", "failed"):
+            break
+        time.sleep(0.05)
+
+    assert status["status"] == "done"
+    assert status["result"]["summary"] == "summary"
+
+
+def test_unknown_job_returns_404(client):
+    response = client.get("/jobs/does-not-exist")
+    assert response.status_code == 404
+
+
+def _parse_sse(body: str):
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+@patch('main.summary_service')
+@patch('main.audio_processor')
+@patch('lesson_pipeline.decode_to_spool')
+def test_lesson_summary_stream_emits_partial_results(mock_decode_to_spool, mock_audio_processor,
+                                                     mock_summary_service, client):
+    """스트리밍 엔드포인트가 STT 구간, 보정 청크, 요약 토큰을 순서대로 보내고 마지막에 전체 결과를 보내는지 테스트"""
+    segments = [{"start": 0.0, "end": 2.0, "text": "1마디부터"}, {"start": 3.0, "end": 5.0, "text": "다시"}]
+
+    def transcribe_segments(segs, waveform, sr, batch_size=1, on_segment=None):
+        for seg in segments:
+            on_segment(seg)
+        return segments
+
+    def generate_summary(text, on_token=None):
+        for token in ["## ", "요약"]:
+            on_token(token)
+        return "## 요약"
+
+    mock_decode_to_spool.return_value = MagicMock(sr=16000)
+    mock_audio_processor.transcribe_segments.side_effect = transcribe_segments
+    mock_summary_service.correct_transcript.return_value = "1마디부터 다시."
+    mock_summary_service.generate_summary.side_effect = generate_summary
+
+    response = client.post(
+        "/lesson-summary/stream",
+        files={"file": ("test.wav", b"fake audio data", "audio/wav")}
+    )
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = [(name, data) for name, data in _parse_sse(response.text) if name != "stage"]
+    assert events == [
+        ("segment", segments[0]),
+        ("segment", segments[1]),
+        # 보정 서비스가 청크를 나눠 보내지 않으면 전체 보정 결과가 한 번에 전달됨
+        ("correction", {"index": 0, "total": 1, "text": "1마디부터 다시."}),
+        ("summary", {"delta": "## "}),
+        ("summary", {"delta": "요약"}),
+        ("result", {"speech_segments": segments, "corrected_transcript": "1마디부터 다시.",
+                    "summary": "## 요약"}),
+    ]
+
+
+@patch('lesson_pipeline.decode_to_spool', side_effect=Exception("Test error"))
+def test_lesson_summary_stream_reports_error(mock_decode_to_spool, client):
+    response = client.post(
+        "/lesson-summary/stream",
+        files={"file": ("test.wav", b"fake audio", "audio/wav")}
+    )
+
+    events = _parse_sse(response.text)
+    assert events[-1] == ("error", {"message": "처리 실패: Test error"})
+
+
+def test_lesson_summary_stream_rejects_when_job_queue_is_full(client):
+    """스트리밍 엔드포인트도 작업 큐의 자리가 없으면 업로드를 받지 않고 503을 반환하는지 테스트"""
+    from job_queue import JobQueue
+    queue = JobQueue(max_workers=1, max_pending=1)
+
+    with patch('main.job_queue', queue), patch('main._spool_upload') as mock_spool:
+        with queue.reserve():
+            response = client.post("/lesson-summary/stream",
+                                   files={"file": ("test.wav", b"fake audio", "audio/wav")})
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "30"
+    mock_spool.assert_not_called()
+    queue.shutdown()
+
+
+def _fake_parse(text):
+    return [(len(text), text.upper())]
+
+
+@patch('main.annotation_executor', ThreadPoolExecutor(max_workers=1, thread_name_prefix="annotator"))
+@patch('main.parse_annotations')
+def test_parse_directives_runs_parser_off_event_loop(mock_parse, client):
+    """단일 /parse-directives도 이벤트 루프가 아닌 파서 스레드 풀에서 파싱하는지 테스트"""
+    import threading
+    threads = []
+    mock_parse.side_effect = lambda text: threads.append(threading.current_thread().name) or _fake_parse(text)
+
+    response = client.post("/parse-directives", json={"text": "abc"})
+
+    assert response.status_code == 200
+    assert response.json() == {"annotations": [{"measure": 3, "directive": "ABC"}]}
+    assert len(threads) == 1 and threads[0].startswith("annotator")
+
+
+@patch('main.annotation_executor', ThreadPoolExecutor(max_workers=2))
+@patch('main.parse_annotations', side_effect=_fake_parse)
+def test_parse_directives_batch_keeps_input_order(mock_parse, client):
+    response = client.post("/parse-directives/batch", json={"texts": ["abc", "", "de"]})
+
+    assert response.status_code == 200
+    assert response.json() == {"results": [
+        {"annotations": [{"measure": 3, "directive": "ABC"}]},
+        {"annotations": []},
+        {"annotations": [{"measure": 2, "directive": "DE"}]},
+    ]}
+    # 빈 텍스트는 파서를 거치지 않음
+    assert mock_parse.call_count == 2
+
+
+def test_parse_directives_batch_rejects_invalid_body(client):
+    assert client.post("/parse-directives/batch", json={"text": "abc"}).status_code == 422
+    with patch('main.settings.ANNOTATION_BATCH_MAX_TEXTS', 2):
+        assert client.post("/parse-directives/batch", json={"texts": ["a", "b", "c"]}).status_code == 413
+
+
+@patch('main.annotation_executor', ThreadPoolExecutor(max_workers=2))
+@patch('main.parse_annotations', side_effect=_fake_parse)
+def test_parse_directives_batch_streams_jsonl(mock_parse, client):
+    lines = [json.dumps({"id": "lesson-1", "text": "abc"}), "not json", json.dumps("de"), "",
+             json.dumps({"id": 7, "text": "f"})]
+
+    response = client.post("/parse-directives/batch", content="\n".join(lines).encode(),
+                           headers={"Content-Type": "application/x-ndjson"})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    results = [json.loads(line) for line in response.text.splitlines()]
+    assert [r["index"] for r in results] == [0, 1, 2, 3]
+    assert results[0] == {"index": 0, "id": "lesson-1", "annotations": [{"measure": 3, "directive": "ABC"}]}
+    assert "error" in results[1]
+    assert results[2] == {"index": 2, "annotations": [{"measure": 2, "directive": "DE"}]}
+    assert results[3] == {"index": 3, "id": 7, "annotations": [{"measure": 1, "directive": "F"}]}
+
+
+
+def test_parse_directives_jsonl_bounds_in_flight_parses(client):
+    """JSONL 줄이 많아도 워커 풀에는 워커 수의 두 배까지만 넣어 둠"""
+    import main
+    executor = ThreadPoolExecutor(max_workers=1)
+    queued = []
+
+    def slow_parse(text):
+        queued.append(executor._work_queue.qsize())
+        return _fake_parse(text)
+
+    lines = [json.dumps({"id": i, "text": "ab"}) for i in range(50)]
+    with patch('main.annotation_executor', executor), patch('main.parse_annotations', side_effect=slow_parse), \
+            patch.object(main.settings, 'ANNOTATION_WORKERS', 1):
+        response = client.post("/parse-directives/batch", content="\n".join(lines).encode(),
+                               headers={"Content-Type": "application/x-ndjson"})
+
+    results = [json.loads(line) for line in response.text.splitlines()]
+    assert [r["id"] for r in results] == list(range(50))
+    assert len(queued) == 50 and max(queued) <= 1
+
+
+def test_iter_request_lines_joins_lines_split_across_chunks():
+    import asyncio
+    from main import _iter_request_lines
+
+    class _Request:
+        async def stream(self):
+            for chunk in (b'{"a"', b': 1}\n{"b": 2', b'}\n\n', b'', b'{"c": 3}'):
+                yield chunk
+
+    async def collect():
+        return [bytes(line) async for line in _iter_request_lines(_Request())]
+
+    assert asyncio.run(collect()) == [b'{"a": 1}', b'{"b": 2}', b'{"c": 3}']
+
+
+def test_annotator_thread_initializer_failure_keeps_pool_usable():
+    import main
+    with patch('main.warm_up_annotator', side_effect=RuntimeError("JVM 시작 실패")):
+        executor = ThreadPoolExecutor(max_workers=1, initializer=main._init_annotator_thread)
+        assert executor.submit(lambda: "ok").result(timeout=5) == "ok"
+        executor.shutdown()
+
+_SCORE = (b'<?xml version="1.0" encoding="UTF-8"?><score-partwise><part id="P1">'
+          b'<measure number="1"><note><rest/></note></measure><measure number="2"><note><rest/></note></measure>'
+          b'</part></score-partwise>')
+
+
+@patch('main.annotation_executor', ThreadPoolExecutor(max_workers=1))
+@patch('main.parse_annotations', return_value=[(2, "부드럽게")])
+def test_annotate_score_from_text(mock_parse, client):
+    response = client.post("/scores/annotate", data={"text": "2마디 부드럽게"},
+                           files={"file": ("연습곡.musicxml", _SCORE, "application/xml")})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/vnd.recordare.musicxml+xml"
+    assert "_annotated.musicxml" in response.headers["content-disposition"]
+    assert b'<measure number="2"><direction><direction-type><words color="#0000FF" enclosure="none">' \
+           b'\xeb\xb6\x80\xeb\x93\x9c\xeb\x9f\xbd\xea\xb2\x8c</words>' in response.content
+    mock_parse.assert_called_once_with("2마디 부드럽게")
+
+
+def test_annotate_score_with_annotations_and_errors(client):
+    annotations = json.dumps([{"measure": 1, "directive": "빠르게"}])
+    response = client.post("/scores/annotate", data={"annotations": annotations},
+                           files={"file": ("score.xml", _SCORE, "application/xml")})
+    assert response.status_code == 200
+    assert "빠르게".encode() in response.content
+
+    assert client.post("/scores/annotate", files={"file": ("score.xml", _SCORE)}).status_code == 400
+    assert client.post("/scores/annotate", data={"annotations": '[{"measure": "x"}]'},
+                       files={"file": ("score.xml", _SCORE)}).status_code == 422
+    assert client.post("/scores/annotate", data={"annotations": annotations},
+                       files={"file": ("score.xml", b"not xml")}).status_code == 400
+
+
+@patch('main.parse_annotations', return_value=[(23, "크레센도")])
+@patch('main.summary_service')
+@patch('main.audio_processor')
+@patch('lesson_pipeline.decode_to_spool')
+def test_lesson_summary_is_stored_and_queryable(mock_decode_to_spool, mock_audio_processor, mock_summary_service,
+                                                mock_parse, client, tmp_path):
+    from lesson_store import LessonStore
+    mock_decode_to_spool.return_value = MagicMock(sr=16000)
+    mock_audio_processor.transcribe_segments.return_value = [{"start": 0.0, "end": 1.0, "text": "speech"}]
+    mock_summary_service.correct_transcript.return_value = "23마디는 크레센도로"
+    mock_summary_service.generate_summary.return_value = "summary"
+
+    with patch('main.lesson_store', LessonStore(str(tmp_path / "lessons.db"))):
+        response = client.post("/lesson-summary", data={"score_id": "spring", "title": "봄"},
+                               files={"file": ("test.wav", b"fake audio data", "audio/wav")})
+        lesson_id = response.json()["lesson_id"]
+
+        lesson = client.get(f"/lessons/{lesson_id}").json()
+        assert lesson["summary"] == "summary" and lesson["annotations"] == [{"measure": 23, "directive": "크레센도"}]
+        assert client.get("/lessons", params={"score_id": "spring"}).json()["lessons"][0]["title"] == "봄"
+        assert client.get("/annotations", params={"measure": 23}).json()["annotations"][0]["lesson_id"] == lesson_id
+        assert client.get("/lessons/search", params={"q": "크레센도"}).json()["lessons"][0]["id"] == lesson_id
+        assert client.delete(f"/lessons/{lesson_id}").status_code == 204
+        assert client.get(f"/lessons/{lesson_id}").status_code == 404
+
+    assert client.get("/lessons").status_code == 404
+
+
+@patch('main.parse_annotations')
+@patch('main.summary_service')
+@patch('main.audio_processor')
+@patch('lesson_pipeline.decode_to_spool')
+def test_structured_lesson_annotations_are_stored_without_parsing(mock_decode_to_spool, mock_audio_processor,
+                                                                  mock_summary_service, mock_parse, client, tmp_path):
+    from lesson_store import LessonStore
+    mock_decode_to_spool.return_value = MagicMock(sr=16000)
+    mock_audio_processor.transcribe_segments.return_value = [{"start": 0.0, "end": 1.0, "text": "speech"}]
+    mock_summary_service.structured_lesson.return_value = {
+        "corrected_transcript": "23마디는 크레센도로", "summary": "summary",
+        "annotations": [{"measure": 23, "directive": "크레센도"}]}
+
+    with patch('main.lesson_store', LessonStore(str(tmp_path / "lessons.db"))), \
+            patch('lesson_pipeline.settings.LLM_STRUCTURED_OUTPUT', True):
+        response = client.post("/lesson-summary", files={"file": ("test.wav", b"fake audio data", "audio/wav")})
+        assert response.json()["annotations"] == [{"measure": 23, "directive": "크레센도"}]
+        lesson = client.get(f"/lessons/{response.json()['lesson_id']}").json()
+
+    assert lesson["annotations"] == [{"measure": 23, "directive": "크레센도"}]
+    mock_parse.assert_not_called()
+    mock_summary_service.correct_transcript.assert_not_called()
+
+
+@patch('main.summary_service')
+@patch('main.audio_processor')
+@patch('lesson_pipeline.decode_to_spool')
+def test_metrics_and_debug_trace(mock_decode_to_spool, mock_audio_processor, mock_summary_service, client):
+    mock_decode_to_spool.return_value = MagicMock(sr=16000)
+    mock_audio_processor.transcribe_segments.return_value = [{"start": 0.0, "end": 1.0, "text": "speech"}]
+    mock_summary_service.correct_transcript.return_value = "corrected"
+    mock_summary_service.generate_summary.return_value = "summary"
+    files = {"file": ("test.wav", b"fake audio data", "audio/wav")}
+
+    # DEBUG_TRACE가 꺼져 있으면 헤더를 보내도 트레이스를 돌려주지 않음
+    assert "x-debug-trace" not in client.post("/lesson-summary", files=files, headers={"X-Debug-Trace": "1"}).headers
+    with patch('main.settings.DEBUG_TRACE', True):
+        assert "x-debug-trace" not in client.post("/lesson-summary", files=files).headers
+        response = client.post("/lesson-summary", files=files, headers={"X-Debug-Trace": "1"})
+
+    trace = json.loads(response.headers["x-debug-trace"])
+    assert [span["stage"] for span in trace["spans"]] == ["pipeline", "decode"]
+    assert trace["stages"]["pipeline"]["count"] == 1
+
+    metrics = client.get("/metrics")
+    assert metrics.status_code == 200
+    assert metrics.headers["content-type"].startswith("text/plain")
+    assert 'lesson_stage_seconds_count{stage="pipeline"}' in metrics.text
+    assert "lesson_job_queue_depth 0.0" in metrics.text
+
+
+@patch('main.summary_service')
+@patch('main.audio_processor')
+def test_resumable_upload_is_processed_while_uploading(mock_audio_processor, mock_summary_service, client,
+                                                       tmp_path, mocker):
+    """조각 업로드, 잘못된 위치 거절(409), 이어 올리기 후 작업 결과 조회 흐름을 테스트합니다."""
+    import time
+    import numpy as np
+    import soundfile as sf
+    from upload_store import UploadStore
+
+    store = UploadStore(str(tmp_path / "uploads"), ttl_seconds=3600)
+    mocker.patch('main.upload_store', store)
+    sf.write(tmp_path / "lesson.wav", np.zeros(16000, dtype=np.float32), 16000)
+    data = (tmp_path / "lesson.wav").read_bytes()
+
+    def detect(waveform, sr, **kwargs):
+        # 실제 검출처럼 파형을 끝까지 읽은 뒤 구간을 반환
+        waveform.wait_for(len(data))
+        yield {"start": 0.0, "end": 1.0}
+
+    mock_audio_processor.iter_speech_segments_stream.side_effect = detect
+    mock_audio_processor.transcribe_segments.side_effect = \
+        lambda segments, *args, **kwargs: [{**seg, "text": "speech"} for seg in segments]
+    mock_summary_service.correct_transcript.return_value = "corrected"
+    mock_summary_service.generate_summary.return_value = "summary"
+
+    response = client.post("/uploads", data={"size": len(data), "filename": "lesson.wav",
+                                             "content_type": "audio/wav"})
+    assert response.status_code == 201
+    upload_id = response.json()["upload_id"]
+
+    half = len(data) // 2
+    response = client.put(f"/uploads/{upload_id}", content=data[:half],
+                          headers={"Content-Range": f"bytes 0-{half - 1}/{len(data)}"})
+    assert response.json()["offset"] == half
+    # WAV는 받는 중에 처리가 시작됨
+    job_id = response.json()["job_id"]
+    assert job_id is not None
+
+    response = client.put(f"/uploads/{upload_id}", content=data[:10],
+                          headers={"Content-Range": f"bytes 0-9/{len(data)}"})
+    assert response.status_code == 409
+    assert response.headers["Upload-Offset"] == str(half)
+
+    response = client.put(f"/uploads/{upload_id}", content=data[half:],
+                          headers={"Content-Range": f"bytes {half}-{len(data) - 1}/{len(data)}"})
+    assert response.json()["complete"] is True
+    assert response.json()["job_id"] == job_id
+
+    for _ in range(100):
+        status = client.get(f"/jobs/{job_id}").json()
+        if status["status"] in ("done", "failed"):
+            break
+        time.sleep(0.05)
+    assert status["status"] == "done"
+    assert status["result"]["speech_segments"] == [{"start": 0.0, "end": 1.0, "text": "speech"}]
+    # 처리가 끝난 업로드는 삭제됨
+    assert client.get(f"/uploads/{upload_id}").status_code == 404
+
+
+@patch('main._UPLOAD_WRITE_BYTES', 4)
+@patch('main._start_upload_job')
+def test_upload_chunks_are_batched_and_start_job_once(mock_start, client):
+    """본문 조각을 모아서 쓰고, 작업 시작은 첫 조각 뒤와 요청 끝에서만 시도하는지 테스트"""
+    import main
+    data = bytes(range(10))
+    upload_id = client.post("/uploads", data={"size": len(data), "filename": "lesson.wav",
+                                              "content_type": "audio/wav"}).json()["upload_id"]
+    on_first_write = []
+    mock_start.side_effect = lambda upload: on_first_write.append(upload.offset)
+
+    response = client.put(f"/uploads/{upload_id}", content=iter([data[:1], data[1:3], data[3:7], data[7:]]),
+                          headers={"Content-Range": f"bytes 0-{len(data) - 1}/{len(data)}"})
+
+    assert response.json()["offset"] == len(data)
+    # (테스트 클라이언트가 본문 조각을 합쳐 보낼 수 있으므로 첫 시도 위치는 첫 조각 이후 어디든 가능)
+    assert len(on_first_write) == 2 and on_first_write[0] > 0 and on_first_write[1] == len(data)
+    with open(main.upload_store.get(upload_id).data_path, "rb") as f:
+        assert f.read() == data
+    client.delete(f"/uploads/{upload_id}")
+
+
+def test_upload_rejects_bad_requests(client):
+    assert client.post("/uploads", data={"size": 10, "filename": "a.txt",
+                                         "content_type": "text/plain"}).status_code == 400
+    assert client.put("/uploads/unknown", content=b"x",
+                      headers={"Content-Range": "bytes 0-0/1"}).status_code == 404
+
+
+@patch('lesson_pipeline.align_lesson', return_value=[{"start": 0.0, "end": 4.0, "measures": [1, 2], "cost": 0.1}])
+@patch('main.summary_service')
+@patch('main.audio_processor')
+@patch('lesson_pipeline.decode_to_spool')
+def test_lesson_summary_aligns_uploaded_score(mock_decode_to_spool, mock_audio_processor, mock_summary_service,
+                                              mock_align, client):
+    """악보를 함께 올리면 연주 구간의 마디 범위와 말소리 구간의 measures가 붙는지, 잘못된 악보는 400인지 테스트"""
+    mock_decode_to_spool.return_value = MagicMock(sr=16000)
+    mock_audio_processor.transcribe_segments.return_value = [{"start": 5.0, "end": 7.0, "text": "speech"}]
+    mock_summary_service.correct_transcript.return_value = "corrected"
+    mock_summary_service.generate_summary.return_value = "summary"
+
+    response = client.post("/lesson-summary", data={"part_id": "P1"},
+                           files={"file": ("test.wav", b"fake audio data", "audio/wav"),
+                                  "score": ("score.xml", _SCORE, "application/xml")})
+    assert response.status_code == 200
+    assert response.json()["playing_segments"] == mock_align.return_value
+    assert response.json()["speech_segments"][0]["measures"] == [1, 2]
+    assert mock_align.call_args.args[2:] == (_SCORE, "P1")
+
+    for data, score in [({}, b"not xml"), ({"part_id": "P9"}, _SCORE)]:
+        response = client.post("/lesson-summary", data=data,
+                               files={"file": ("test.wav", b"fake audio data", "audio/wav"),
+                                      "score": ("score.xml", score, "application/xml")})
+        assert response.status_code == 400
+    assert mock_align.call_count == 1
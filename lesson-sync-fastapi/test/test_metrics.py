@@ -0,0 +1,101 @@
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import httpx
+import pytest
+from openai import RateLimitError
+from prometheus_client import REGISTRY
+
+from llm_client import CircuitBreaker, RetryPolicy, call_with_retry
+from metrics import Trace, in_context, record_llm_usage, stage, timed, tracing
+
+
+def _sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+def test_stage_records_histogram_and_trace():
+    before = _sample("lesson_stage_seconds_count", stage="test_stage")
+
+    with tracing() as trace:
+        with stage("test_stage"):
+            pass
+        with pytest.raises(ValueError):
+            with stage("test_stage"):
+                raise ValueError("실패")
+    # 트레이스가 끝난 뒤의 단계는 지표에만 기록
+    with stage("test_stage"):
+        pass
+
+    assert _sample("lesson_stage_seconds_count", stage="test_stage") == before + 3
+    assert [span["stage"] for span in trace.spans] == ["test_stage", "test_stage"]
+    assert trace.spans[1]["error"] is True
+
+
+def test_trace_follows_work_submitted_to_threads():
+    @timed("test_chunk")
+    def work(i):
+        return threading.current_thread().name
+
+    with tracing() as trace:
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            list(pool.map(lambda i: i, range(2)))  # 컨텍스트 없이 실행한 작업은 기록되지 않음
+            futures = [pool.submit(in_context(work), i) for i in range(4)]
+            [f.result() for f in futures]
+        # 제출하지 않은 스레드에서 실행하면 트레이스에 기록되지 않음
+        thread = threading.Thread(target=work, args=(0,))
+        thread.start()
+        thread.join()
+
+    header = json.loads(trace.to_header())
+    assert header["stages"]["test_chunk"]["count"] == 4
+
+
+def test_trace_header_keeps_totals_when_truncated():
+    trace = Trace()
+    for i in range(10):
+        trace.add("llm_request", trace.started + i, 0.5)
+
+    header = json.loads(trace.to_header(max_spans=3))
+    assert len(header["spans"]) == 3
+    assert header["dropped_spans"] == 7
+    assert header["stages"]["llm_request"] == {"count": 10, "ms": 5000.0}
+
+
+def test_llm_retries_and_tokens_are_counted():
+    request = httpx.Request("POST", "http://test/v1/chat/completions")
+    error = RateLimitError("error", response=httpx.Response(429, request=request), body=None)
+    retries_before = _sample("llm_retries_total", error="RateLimitError")
+    prompt_before = _sample("llm_tokens_total", kind="prompt")
+    attempts = iter([error, error, "ok"])
+
+    def fn():
+        result = next(attempts)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    assert call_with_retry(fn, RetryPolicy(max_retries=3), CircuitBreaker(), sleep=lambda s: None) == "ok"
+    record_llm_usage(SimpleNamespace(prompt_tokens=120, completion_tokens=30))
+    record_llm_usage(None)
+
+    assert _sample("llm_retries_total", error="RateLimitError") == retries_before + 2
+    assert _sample("llm_tokens_total", kind="prompt") == prompt_before + 120
+
+
+def test_job_queue_depth_follows_submitted_and_finished_jobs():
+    """/metrics를 읽지 않아도 작업을 넣고 끝낼 때마다 큐 길이 지표가 바뀜"""
+    from job_queue import JobQueue
+
+    queue = JobQueue(max_workers=1, max_pending=4)
+    before = _sample("lesson_job_queue_depth")
+    release = threading.Event()
+    jobs = [queue.submit(lambda progress=None: release.wait(5) and {}) for _ in range(3)]
+    assert _sample("lesson_job_queue_depth") == before + 3
+
+    release.set()
+    queue.shutdown(wait=True)
+    assert all(queue.get(job.id).status == "done" for job in jobs)
+    assert _sample("lesson_job_queue_depth") == before
@@ -0,0 +1,74 @@
+import threading
+import pytest
+import lesson_pipeline
+from model_server import RemoteModelExecutor, create_server
+
+transcribe_in_worker = lesson_pipeline.transcribe_in_worker
+
+
+def _add(a, b):
+    return a + b
+
+
+def _fake_transcribe(waveform, cache=None, keys=None, whisper_model=None):
+    if waveform is None:
+        raise ValueError("모델 단계 실패")
+    return [{"start": 0.0, "end": waveform, "text": whisper_model}]
+
+
+@pytest.fixture
+def model_server(monkeypatch):
+    # 서버는 같은 프로세스의 스레드에서 실행되므로 모델 단계를 가짜 함수로 바꿔 확인
+    monkeypatch.setattr(lesson_pipeline, "transcribe_in_worker", _fake_transcribe)
+    server = create_server(("127.0.0.1", 0), b"test-key")
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.stop_event.set()
+
+
+def test_remote_executor_runs_model_operations_in_model_server(model_server):
+    executor = RemoteModelExecutor(model_server.address, b"test-key")
+    try:
+        futures = [executor.submit(transcribe_in_worker, float(i), whisper_model="tiny") for i in range(4)]
+        assert [f.result(timeout=10)[0]["end"] for f in futures] == [0.0, 1.0, 2.0, 3.0]
+        assert futures[0].result()[0]["text"] == "tiny"
+
+        # 모델 서버에서 발생한 예외는 호출한 쪽으로 그대로 전달됨
+        with pytest.raises(ValueError, match="모델 단계 실패"):
+            executor.submit(transcribe_in_worker, None).result(timeout=10)
+    finally:
+        executor.shutdown()
+
+
+def test_remote_executor_rejects_unregistered_functions(model_server):
+    """등록된 모델 단계가 아닌 함수는 서버로 보내지 않고, 서버도 그 이름의 메서드를 노출하지 않음"""
+    executor = RemoteModelExecutor(model_server.address, b"test-key")
+    try:
+        with pytest.raises(ValueError, match="등록되지 않은"):
+            executor.submit(_add, 1, 2)
+        with pytest.raises(AttributeError):
+            executor._call("run", (_add, (1, 2), {}), {})
+    finally:
+        executor.shutdown()
+
+
+def test_remote_executor_rejects_wrong_authkey(model_server):
+    from multiprocessing import AuthenticationError
+    executor = RemoteModelExecutor(model_server.address, b"wrong-key")
+    try:
+        with pytest.raises(AuthenticationError):
+            executor.submit(transcribe_in_worker, 1.0).result(timeout=10)
+    finally:
+        executor.shutdown()
+
+
+def test_server_requires_authkey_and_loopback_address():
+    with pytest.raises(ValueError, match="MODEL_SERVER_AUTHKEY"):
+        create_server(("127.0.0.1", 0), b"")
+    with pytest.raises(ValueError, match="MODEL_SERVER_AUTHKEY"):
+        RemoteModelExecutor(("127.0.0.1", 50055), b"")
+    with pytest.raises(ValueError, match="루프백"):
+        create_server(("0.0.0.0", 0), b"test-key")
+    server = create_server(("0.0.0.0", 0), b"test-key", allow_remote=True)
+    server.listener.close()
@@ -0,0 +1,76 @@
+import os
+from result_cache import ResultCache, cache_key, file_digest
+
+
+def test_put_and_get_roundtrip(tmp_path):
+    cache = ResultCache(str(tmp_path), max_bytes=1024 * 1024)
+    key = cache_key("segments", "abc")
+
+    assert cache.get(key) is None
+    cache.put(key, [{"start": 0.0, "end": 1.5, "text": "1마디부터"}])
+    assert cache.get(key) == [{"start": 0.0, "end": 1.5, "text": "1마디부터"}]
+
+
+def test_evicts_least_recently_used_entries(tmp_path):
+    """전체 크기가 한도를 넘으면 가장 오래 사용되지 않은 항목부터 삭제되는지 테스트"""
+    cache = ResultCache(str(tmp_path), max_bytes=250)
+    value = "x" * 100
+    keys = [cache_key(str(i)) for i in range(3)]
+
+    cache.put(keys[0], value)
+    cache.put(keys[1], value)
+    # keys[0]을 keys[1]보다 최근에 사용한 것으로 표시
+    os.utime(cache._path(keys[1]), (1, 1))
+    os.utime(cache._path(keys[0]), (2, 2))
+    cache.put(keys[2], value)
+
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[0]) == value
+    assert cache.get(keys[2]) == value
+
+
+def test_file_digest_depends_only_on_content(tmp_path):
+    a, b = tmp_path / "a.wav", tmp_path / "b.wav"
+    a.write_bytes(b"audio" * 1000)
+    b.write_bytes(b"audio" * 1000)
+
+    assert file_digest(str(a)) == file_digest(str(b))
+    b.write_bytes(b"other")
+    assert file_digest(str(a)) != file_digest(str(b))
+
+
+def test_put_scans_directory_only_when_estimate_exceeds_limit(tmp_path, mocker):
+    """저장할 때마다 디렉터리 전체를 훑지 않고, 추정 크기가 한도를 넘을 때만 훑어 삭제하는지 테스트"""
+    cache = ResultCache(str(tmp_path), max_bytes=1000)
+    walk = mocker.spy(os, "walk")
+    keys = [cache_key(str(i)) for i in range(12)]
+    for key in keys[:8]:
+        cache.put(key, "x" * 100)
+    # 첫 저장에서 한 번만 훑음 (같은 키를 덮어쓰면 크기 차이만 반영)
+    cache.put(keys[0], "x" * 100)
+    assert walk.call_count == 1
+
+    # 한도를 넘으면 90%(8개)까지 지우므로, 가득 찬 뒤에도 한 번 훑으면 다음 저장은 훑지 않음
+    for key in keys[8:10]:
+        cache.put(key, "x" * 100)
+    assert walk.call_count == 2
+    assert sum(cache.get(key) is not None for key in keys) == 8
+    cache.put(keys[10], "x" * 100)
+    assert walk.call_count == 2
+
+
+def test_pickled_cache_shares_entries_and_rescans_size(tmp_path):
+    """모델 워커로 넘길 수 있도록 pickle되며, 받은 쪽은 같은 디렉터리를 쓰고 크기 추정값을 다시 계산하는지 테스트"""
+    import pickle
+
+    cache = ResultCache(str(tmp_path), max_bytes=1024 * 1024)
+    key = cache_key("segments", "abc")
+    cache.put(key, [1, 2, 3])
+
+    restored = pickle.loads(pickle.dumps(cache))
+
+    assert (restored.root, restored.max_bytes) == (cache.root, cache.max_bytes)
+    assert restored._estimated_bytes is None
+    assert restored.get(key) == [1, 2, 3]
+    restored.put(cache_key("other"), "x")
+    assert restored._estimated_bytes > 0
@@ -0,0 +1,107 @@
+import os
+
+import numpy as np
+import pytest
+import soundfile as sf
+
+from score_alignment import (_normalize, align_chroma, align_lesson, assign_measures, playing_regions,
+                             score_chroma)
+from score_writer import ScoreFormatError
+
+SAMPLE_MXL = os.path.join(os.path.dirname(__file__), "..", "sampleFile", "Spring-Four_seasons_vivaldi.mxl")
+SR = 16000
+_MIDI = {"C": 60, "D": 62, "E": 64, "F": 65, "G": 67, "A": 69, "B": 71}
+
+
+def _make_score(measures: int, tempo: int = 90, seed: int = 0):
+    """마디마다 임의의 4분음표 4개로 된 MusicXML과 마디별 음 이름 목록"""
+    rng = np.random.default_rng(seed)
+    pitches, body = [], []
+    for number in range(1, measures + 1):
+        steps = [str(s) for s in rng.choice(list(_MIDI), 4)]
+        pitches.append(steps)
+        head = (f'<attributes><divisions>2</divisions></attributes><direction><sound tempo="{tempo}"/></direction>'
+                if number == 1 else "")
+        notes = "".join(f"<note><pitch><step>{s}</step><octave>4</octave></pitch><duration>2</duration></note>"
+                        for s in steps)
+        body.append(f'<measure number="{number}">{head}{notes}</measure>')
+    xml = ('<?xml version="1.0" encoding="UTF-8"?><score-partwise version="4.0"><part-list>'
+           '<score-part id="P1"><part-name>Violin</part-name></score-part></part-list>'
+           f'<part id="P1">{"".join(body)}</part></score-partwise>')
+    return xml.encode(), pitches
+
+
+def _play(pitches, first: int, last: int, seconds_per_beat: float) -> np.ndarray:
+    """first~last 마디를 한 박에 seconds_per_beat초로 연주한 파형 (2배음 포함 사인파)"""
+    notes = []
+    t = np.arange(int(seconds_per_beat * SR)) / SR
+    envelope = np.minimum(1.0, np.minimum(t, t[-1] - t) / 0.02)
+    for measure in pitches[first - 1:last]:
+        for step in measure:
+            freq = 440 * 2 ** ((_MIDI[step] - 69) / 12)
+            notes.append(0.3 * envelope * (np.sin(2 * np.pi * freq * t) + 0.3 * np.sin(4 * np.pi * freq * t)))
+    return np.concatenate(notes).astype(np.float32)
+
+
+def test_score_chroma_reads_measures_and_tempo():
+    with open(SAMPLE_MXL, "rb") as f:
+        chroma = score_chroma(f.read())
+    assert chroma.measures[:3] == [1, 2, 3] and len(chroma.measures) == 74
+    np.testing.assert_allclose(np.linalg.norm(chroma.chroma, axis=1), 1.0, atol=1e-5)
+    assert np.all(np.diff(chroma.frame_measures) >= 0) and chroma.frame_measures[-1] == 73
+
+    xml, _ = _make_score(4, tempo=60)
+    chroma = score_chroma(xml)
+    # 4/4박 4마디를 60BPM으로 그리면 16초
+    assert chroma.chroma.shape == (160, 12)
+    assert list(chroma.frame_measures[[0, 39, 40, 159]]) == [0, 0, 1, 3]
+    with pytest.raises(ScoreFormatError):
+        score_chroma(xml, "P9")
+    with pytest.raises(ScoreFormatError):
+        score_chroma(b"<score-timewise/>")
+
+
+def test_multiscale_alignment_matches_full_dtw():
+    """다중 해상도 DTW가 전체 DTW와 같은 위치를 찾는지 (악보 일부를 1.3배 느리게 연주한 크로마)"""
+    with open(SAMPLE_MXL, "rb") as f:
+        reference = score_chroma(f.read()).chroma
+    rng = np.random.default_rng(0)
+    frames = 300 + (np.arange(int(400 * 1.3)) / 1.3).astype(int)
+    query = _normalize(reference[frames] + 0.2 * rng.random((len(frames), 12)))
+
+    path, cost = align_chroma(query, reference)
+    full_path, full_cost = align_chroma(query, reference, factors=(1,))
+    assert abs(path[0, 1] - 300) <= 10 and abs(path[-1, 1] - 699) <= 10
+    assert abs(path[0, 1] - full_path[0, 1]) <= 2 and abs(path[-1, 1] - full_path[-1, 1]) <= 2
+    assert cost == pytest.approx(full_cost, abs=0.01)
+    # 녹음 프레임 순서대로 악보 위치가 앞으로만 가는 경로
+    assert np.all(np.diff(path, axis=0) >= 0)
+    # 악보보다 두 배 넘게 긴 연주는 맞출 수 없음
+    assert align_chroma(query, reference[:200]) is None
+
+
+def test_playing_regions_exclude_speech():
+    segments = [{"start": 2.0, "end": 5.0}, {"start": 6.0, "end": 8.0},
+                {"start": 12.0, "end": 20.0, "label": "music"}, {"start": 30.0, "end": 31.0}]
+    assert playing_regions(segments, 40.0) == [(8.0, 30.0), (31.0, 40.0)]
+
+
+def test_align_lesson_maps_segments_to_measures(tmp_path):
+    xml, pitches = _make_score(24)
+    rng = np.random.default_rng(1)
+    parts = [0.1 * rng.standard_normal(5 * SR), _play(pitches, 3, 8, 0.8),
+             0.1 * rng.standard_normal(4 * SR), _play(pitches, 12, 20, 0.55),
+             0.1 * rng.standard_normal(3 * SR), np.zeros(5 * SR)]
+    bounds = np.cumsum([len(p) / SR for p in parts])
+    path = tmp_path / "lesson.wav"
+    sf.write(path, np.concatenate(parts).astype(np.float32), SR)
+    speech = [{"start": 0.0, "end": bounds[0]}, {"start": bounds[1], "end": bounds[2]},
+              {"start": bounds[3], "end": bounds[4]}]
+
+    playing = align_lesson(str(path), speech, xml)
+    # 마지막 무음 구간은 정렬하지 않음
+    assert [(p["start"], p["end"]) for p in playing] == [(bounds[0], bounds[1]), (bounds[2], bounds[3])]
+    assert [p["measures"] for p in playing] == [[3, 8], [12, 20]]
+
+    assign_measures(speech, playing)
+    assert [seg["measures"] for seg in speech] == [[3, 8], [3, 8], [12, 20]]
@@ -11,6 +11,12 @@ from score_annotator import parse_annotations, _convert_korean_to_int
     ("5", 5),
     ("123", 123),
     ("없는숫자", 0),
+    ("백", 100),
+    ("백오", 105),
+    ("천이백삼십사", 1234),
+    ("스물한", 21),
+    ("일흔셋", 73),
+    ("이제", 0),
 ])
 def test_convert_korean_to_int(korean_number, expected_int):
     assert _convert_korean_to_int(korean_number) == expected_int
@@ -26,4 +32,104 @@ def test_parse_annotations_korean_numbers():
     assert 20 in result_dict
     assert "강조" in result_dict[15]
     # [수정] '여리게'의 원형인 '여리다'를 확인하도록 변경
-    assert "여리다" in result_dict[20]
\ No newline at end of file
+    assert "여리다" in result_dict[20]
+
+def test_import_does_not_start_jvm():
+    """모듈 임포트만으로는 JVM(Okt)을 띄우지 않는지 테스트"""
+    import subprocess
+    import sys
+    code = "import jpype, score_annotator; print(jpype.isJVMStarted())"
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    assert out.stdout.strip() == "False"
+
+
+def test_whole_text_tokenization_drops_particles_after_measure():
+    """여러 마디를 한 번에 분석하면 마디 뒤의 조사가 지시어에서 빠지는지 테스트"""
+    from score_annotator import _directive_words
+
+    text = "3마디는 크레센도로 연주하고 5마디 부드럽게 해주세요. 7마디부터 점점 빠르게"
+    result = parse_annotations(text)
+
+    # 구간만 따로 분석하면 '는', '부터'가 각각 '늘다', '부터'(명사)로 잘못 분석됨
+    assert _directive_words("는 크레센도로 연주하고") == "늘다 크레센도 연주"
+    assert _directive_words("부터 점점 빠르게") == "부터 점점 빠르다"
+    assert result == [(3, "크레센도 연주"), (5, _directive_words("부드럽게 해주세요.")), (7, "점점 빠르다")]
+
+
+def test_parse_annotations_memoizes_repeated_text(mocker):
+    import score_annotator
+    text = "9마디 스타카토 짧게, 10마디 레가토"
+    first = parse_annotations(text)
+    spy = mocker.spy(score_annotator, "_tokenize_with_offsets")
+
+    assert parse_annotations(text) == first
+    spy.assert_not_called()
+
+
+@pytest.mark.parametrize("text, expected", [
+    # '이제', '일단', '사이'의 첫 글자를 마디 번호로 읽지 않음
+    ("3마디를 크게. 그 마디 이제 다시", [3]),
+    ("마디 일단 천천히", []),
+    ("3마디와 5마디 사이를 부드럽게", [5]),
+    ("마디 스무에서는 여리게", [20]),
+    ("백이십 마디는 강하게", [120]),
+    # 단어 중간의 한글 수사('사이마디'의 '이')와 띄어 쓴 지시 관형사 '이'는 마디 번호가 아님
+    ("사이마디 크게", []),
+    ("오이마디 크게", []),
+    ("이 마디를 크게", []),
+    ("이 마디부터 5마디까지 크게", []),
+    ("이마디 크게", [2]),
+    ("제3마디 크게", [3]),
+    # 마디 번호는 MAX_MEASURE(9999)까지만 인정
+    ("9999마디 크게", [9999]),
+    ("12345마디 크게, 3마디 작게", [3]),
+    ("마디 12345 크게", []),
+    ("1" * 5000 + "마디 크게", []),
+])
+def test_measure_mentions_avoid_false_hits(text, expected):
+    assert [measure for measure, _ in parse_annotations(text)] == expected
+
+
+def test_parse_annotations_expands_measure_ranges():
+    """'26마디부터 30마디까지' 같은 범위는 범위 뒤의 지시어를 각 마디에 붙임"""
+    result = parse_annotations("26마디부터 30마디까지 점점 소리를 키워가게 해주세요. 31마디는 가볍게")
+
+    assert [measure for measure, _ in result] == [26, 27, 28, 29, 30, 31]
+    assert len({directive for measure, directive in result if measure <= 30}) == 1
+    assert "소리" in dict(result)[26]
+    assert dict(parse_annotations("10~12마디 레가토로"))[12] == dict(parse_annotations("10~12마디 레가토로"))[10]
+
+
+def test_implausible_range_keeps_only_endpoints():
+    result = parse_annotations("1마디부터 200마디까지 조용하게")
+    assert [measure for measure, _ in result] == [1, 200]
+
+
+def test_repeated_mentions_keep_first_directive():
+    result = parse_annotations("4마디 크게, 5마디 작게, 4마디 다시 부드럽게")
+    assert [measure for measure, _ in result] == [4, 5]
+    assert "크" in dict(result)[4] and "부드럽" not in dict(result)[4]
+
+
+def test_whole_text_tokenization_normalizes_like_per_span_path():
+    """정규화로 길이가 바뀌는 구간('좋아욬ㅋㅋ' -> '좋아요ㅋㅋ')도 구간별 pos(norm=True)와 같은 지시어를 얻음"""
+    from score_annotator import _directive_words
+
+    result = parse_annotations("3마디 좋아욬ㅋㅋ 5마디 사랑햌ㅋㅋ 7마디 크게")
+    assert result == [(3, _directive_words("좋아욬ㅋㅋ")), (5, _directive_words("사랑햌ㅋㅋ")), (7, "크게")]
+    assert "좋아욬" not in result[0][1]
+
+
+def test_unsupported_konlpy_falls_back_to_per_span_tokenization(monkeypatch):
+    import konlpy
+    import score_annotator
+    from score_annotator import _directive_words
+
+    monkeypatch.setattr(konlpy, "__version__", "9.0.0")
+    score_annotator._okt_processor.cache_clear()
+    try:
+        text = "11마디 스타카토 짧게, 12마디 레가토"
+        assert score_annotator._tokenize_with_offsets(text) is None
+        assert parse_annotations(text) == [(11, _directive_words("스타카토 짧게,")), (12, _directive_words("레가토"))]
+    finally:
+        score_annotator._okt_processor.cache_clear()
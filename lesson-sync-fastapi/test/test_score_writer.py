@@ -0,0 +1,85 @@
+import io
+import os
+import zipfile
+import xml.etree.ElementTree as ET
+
+import pytest
+
+from score_writer import ScoreFormatError, annotate_musicxml, annotate_score, measure_index
+
+SAMPLE_MXL = os.path.join(os.path.dirname(__file__), "..", "sampleFile", "Spring-Four_seasons_vivaldi.mxl")
+
+SCORE = b"""<?xml version="1.0" encoding="UTF-8"?>
+<!DOCTYPE score-partwise PUBLIC "-//Recordare//DTD MusicXML 4.0 Partwise//EN" "http://www.musicxml.org/dtds/partwise.dtd">
+<score-partwise version="4.0">
+  <part-list><score-part id="P1"><part-name>Violin</part-name></score-part></part-list>
+  <!-- Part 1 -->
+  <part id="P1">
+    <measure number="1">
+      <attributes><divisions>1</divisions></attributes>
+      <note><rest/><duration>4</duration></note>
+    </measure>
+    <measure number="2">
+      <note><rest/><duration>4</duration></note>
+    </measure>
+    <measure number="3"/>
+  </part>
+  <part id="P2">
+    <measure number="1">
+      <note><rest/><duration>4</duration></note>
+    </measure>
+  </part>
+</score-partwise>
+"""
+
+
+def _words(xml: bytes, part_id: str = "P1"):
+    root = ET.fromstring(xml)
+    part = next(p for p in root.iter("part") if p.get("id") == part_id)
+    return {m.get("number"): [w.text for w in m.iter("words")] for m in part.iter("measure")}
+
+
+def test_annotate_musicxml_inserts_directions_before_first_note():
+    result = annotate_musicxml(SCORE, [(1, "빠르게"), (2, "부드럽게 <p> & \"dolce\""), (2, "레가토"), (3, "쉼"), (9, "없음")])
+
+    assert _words(result) == {"1": ["빠르게"], "2": ['부드럽게 <p> & "dolce"', "레가토"], "3": ["쉼"]}
+    assert _words(result, "P2") == {"1": []}
+    measure = ET.fromstring(result).find("part").find("measure")
+    assert [child.tag for child in measure] == ["attributes", "direction", "note"]
+    # 주석, DOCTYPE, 들여쓰기 등 나머지 바이트는 그대로 유지
+    assert result.replace(b"\n      <direction>", b"", 1).count(b"<!-- Part 1 -->") == 1
+    assert result.startswith(SCORE[:SCORE.index(b'<measure number="1">')])
+
+
+def test_annotate_musicxml_selects_part_and_caches_index():
+    measure_index.cache_clear()
+    annotate_musicxml(SCORE, [(1, "크게")])
+    result = annotate_musicxml(SCORE, [(1, "작게")], part_id="P2")
+
+    assert _words(result, "P2") == {"1": ["작게"]}
+    assert measure_index.cache_info().hits == 1
+    with pytest.raises(ScoreFormatError):
+        annotate_musicxml(SCORE, [(1, "x")], part_id="P9")
+
+
+def test_annotate_musicxml_rejects_unsupported_scores():
+    with pytest.raises(ScoreFormatError):
+        annotate_musicxml(b"<score-timewise><measure number='1'/></score-timewise>", [])
+    with pytest.raises(ScoreFormatError):
+        annotate_musicxml(b"<score-partwise><part>", [])
+    with pytest.raises(ScoreFormatError):
+        annotate_musicxml(b'<?xml version="1.0" encoding="ISO-8859-1"?><score-partwise/>', [])
+
+
+def test_annotate_score_rewrites_mxl_rootfile():
+    with open(SAMPLE_MXL, "rb") as f:
+        data = f.read()
+
+    result, media_type = annotate_score(data, [(1, "빠르게"), (2, "느리게")])
+
+    assert media_type == "application/vnd.recordare.musicxml"
+    original, annotated = zipfile.ZipFile(io.BytesIO(data)), zipfile.ZipFile(io.BytesIO(result))
+    assert annotated.namelist() == original.namelist()
+    words = _words(annotated.read("lg-55206251.xml"))
+    assert words["1"] == ["빠르게"] and words["2"] == ["느리게"]
+    assert annotated.read("META-INF/container.xml") == original.read("META-INF/container.xml")
@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+from segment_classifier import (MIXED, MUSIC, STUDENT_SPEECH, TEACHER_SPEECH, SegmentClassifier,
+                                parse_labels)
+
+CLASS_NAMES = ["Speech", "Child speech, kid speaking", "Music", "Violin, fiddle", "Silence"]
+
+
+def _frames(speech, music, count=10):
+    scores = np.zeros((count, len(CLASS_NAMES)), dtype=np.float32)
+    scores[:, 0] = speech
+    scores[:, 3] = music
+    return scores
+
+
+def _embedding(direction, count=10, seed=0):
+    rng = np.random.default_rng(seed)
+    base = np.zeros(1024, dtype=np.float32)
+    base[direction * 100:(direction + 1) * 100] = 1.0
+    return base + 0.05 * rng.standard_normal((count, 1024)).astype(np.float32)
+
+
+def _classify(classifier, scores, embeddings, duration=5.0):
+    features = classifier.frame_features(scores, embeddings)
+    return classifier.classify(features["speech"], features["music"], features.get("embedding"), duration)
+
+
+def test_music_and_mixed_segments():
+    """연주가 우세한 구간은 music, 말소리에 악기 소리가 섞이면 mixed로 분류하는지 테스트"""
+    classifier = SegmentClassifier(CLASS_NAMES)
+
+    assert _classify(classifier, _frames(0.3, 0.8), None) == MUSIC
+    assert _classify(classifier, _frames(0.8, 0.3), None) == MIXED
+    assert _classify(classifier, _frames(0.9, 0.05), None) == TEACHER_SPEECH
+
+
+def test_speakers_are_split_by_embedding_and_talk_time():
+    """임베딩이 다른 화자는 따로 묶고, 누적 발화 시간이 긴 화자를 선생님으로 보는지 테스트"""
+    classifier = SegmentClassifier(CLASS_NAMES)
+    speech = _frames(0.9, 0.0)
+
+    labels = [_classify(classifier, speech, _embedding(0, seed=1), duration=10.0),
+              _classify(classifier, speech, _embedding(1, seed=2), duration=3.0),
+              _classify(classifier, speech, _embedding(0, seed=3), duration=8.0),
+              _classify(classifier, speech, _embedding(1, seed=4), duration=2.0)]
+
+    assert labels == [TEACHER_SPEECH, STUDENT_SPEECH, TEACHER_SPEECH, STUDENT_SPEECH]
+
+
+def test_parse_labels():
+    assert parse_labels(" music, student_speech ,") == {MUSIC, STUDENT_SPEECH}
+    assert parse_labels("") == frozenset()
+    with pytest.raises(ValueError, match="chatter"):
+        parse_labels("music,chatter")
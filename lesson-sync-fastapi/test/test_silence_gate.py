@@ -0,0 +1,34 @@
+import numpy as np
+
+from silence_gate import active_frames
+
+SR = 16000
+
+
+def _at_dbfs(signal: np.ndarray, dbfs: float) -> np.ndarray:
+    return (signal / np.sqrt(np.mean(signal ** 2)) * 10 ** (dbfs / 20)).astype(np.float32)
+
+
+def test_active_frames_skip_silence_and_steady_background():
+    rng = np.random.default_rng(0)
+    t = np.arange(10 * SR) / SR
+    count = 1 + -(-(len(t) - 15600) // 7680)
+    hum = np.sin(2 * np.pi * 60 * t) + 0.1 * rng.standard_normal(len(t))
+    # 음절처럼 초당 4번 켜졌다 꺼지는 소리
+    syllables = rng.standard_normal(len(t)) * (np.sin(2 * np.pi * 4 * t) > 0)
+
+    assert not active_frames(np.zeros(len(t), dtype=np.float32), count, -55.0).any()
+    assert not active_frames(_at_dbfs(hum, -45), count, -55.0).any()
+    assert active_frames(_at_dbfs(hum, -30), count, -55.0).all()
+    assert active_frames(_at_dbfs(syllables, -45), count, -55.0).all()
+
+
+def test_active_frames_cover_short_sounds_in_silence():
+    """짧은 소리는 그 소리를 창 안에 포함하는 YAMNet 프레임(최대 3개)을 모두 활성으로 만듦"""
+    block = np.zeros(20 * SR, dtype=np.float32)
+    block[int(10.0 * SR):int(10.05 * SR)] = 0.5
+    count = 1 + -(-(len(block) - 15600) // 7680)
+    active = active_frames(block, count, -55.0)
+    frames = np.arange(count)
+    expected = (frames * 7680 < int(10.05 * SR)) & (frames * 7680 + 15600 > int(10.0 * SR))
+    assert np.all(active[expected]) and active.sum() <= expected.sum() + 1
@@ -54,4 +54,319 @@ def test_correct_transcript_success(mock_openai_client):
     mock_openai_client.chat.completions.create.assert_called_once()
     call_args = mock_openai_client.chat.completions.create.call_args
     assert "한국어 교정 전문가입니다" in call_args.kwargs['messages'][0]['content']
-    assert transcript in call_args.kwargs['messages'][1]['content']
\ No newline at end of file
+    assert transcript in call_args.kwargs['messages'][1]['content']
+
+# --- 공통 재시도 정책 / 비동기 클라이언트 (가짜 OpenAI 호환 서버 사용) ---
+import asyncio
+from fake_openai_server import FakeOpenAIServer, FakeResponse
+from openai import InternalServerError
+from llm_client import CircuitBreaker, CircuitOpenError, RetryPolicy
+from summary_service import AsyncSummaryService
+
+
+@pytest.fixture
+def fake_openai():
+    with FakeOpenAIServer() as server:
+        yield server
+
+
+def _async_service(server, **kwargs):
+    kwargs.setdefault("policy", RetryPolicy(max_retries=3, base_delay=0.01, max_delay=0.05))
+    kwargs.setdefault("breaker", CircuitBreaker(failure_threshold=5, reset_timeout=60))
+    return AsyncSummaryService(base_url=server.base_url, **kwargs)
+
+
+def test_async_summary_retries_after_rate_limit(fake_openai):
+    """429 응답의 Retry-After를 따른 뒤 재시도하여 성공하는지 테스트"""
+    fake_openai.script(FakeResponse(status=429, headers={"retry-after-ms": "20"}),
+                       FakeResponse(content="요약 결과"))
+
+    async def run():
+        service = _async_service(fake_openai)
+        try:
+            return await service.generate_summary("레슨 스크립트")
+        finally:
+            await service.aclose()
+
+    assert asyncio.run(run()) == "요약 결과"
+    assert len(fake_openai.requests) == 2
+    assert "레슨 스크립트" in fake_openai.requests[1]["messages"][1]["content"]
+
+
+def test_async_circuit_breaker_opens_after_repeated_failures(fake_openai):
+    """
+    재시도를 모두 실패한 호출이 연속되면 회로가 열려 서버에 요청하지 않고 즉시 실패하는지 테스트
+    (호출 하나의 재시도는 회로에 한 번의 실패로 반영되므로 그 호출은 실제 오류로 끝남)
+    """
+    fake_openai.default = FakeResponse(status=500, content="boom")
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+
+    async def run():
+        service = _async_service(fake_openai, breaker=breaker)
+        try:
+            with pytest.raises(InternalServerError):
+                await service.generate_summary("레슨 스크립트")
+            assert not breaker.is_open
+            # 보정은 실패해도 원본을 돌려줌
+            assert await service.correct_transcript("원본") == "원본"
+            with pytest.raises(CircuitOpenError):
+                await service.generate_summary("레슨 스크립트")
+        finally:
+            await service.aclose()
+
+    asyncio.run(run())
+    assert breaker.is_open
+    # 호출 두 번 x (처음 + 재시도 3번)
+    assert len(fake_openai.requests) == 8
+
+
+def test_async_limiter_caps_in_flight_requests(fake_openai):
+    """동시에 많은 요청을 보내도 서버에서 동시에 처리되는 요청 수가 제한되는지 테스트"""
+    fake_openai.default = FakeResponse(content="ok", delay=0.05)
+
+    async def run():
+        service = _async_service(fake_openai, max_concurrency=2)
+        try:
+            return await asyncio.gather(*(service.correct_transcript(f"문장 {i}") for i in range(8)))
+        finally:
+            await service.aclose()
+
+    assert asyncio.run(run()) == ["ok"] * 8
+    assert len(fake_openai.requests) == 8
+    assert fake_openai.max_in_flight == 2
+
+
+def test_sync_and_async_calls_share_process_limit(fake_openai, monkeypatch):
+    """동기 서비스(스레드)와 비동기 서비스의 호출을 합친 동시 요청 수가 LLM_MAX_CONCURRENCY를 넘지 않는지 테스트"""
+    import threading
+    import llm_client
+    import summary_service
+    from llm_client import ConcurrencyLimiter
+    monkeypatch.setattr(summary_service, "llm_limiter", ConcurrencyLimiter(2))
+    monkeypatch.setattr(summary_service.settings, "OPENAI_BASE_URL", fake_openai.base_url)
+    fake_openai.default = FakeResponse(content="ok", delay=0.05)
+
+    sync_service = SummaryService()
+    threads = [threading.Thread(target=sync_service.correct_transcript, args=(f"동기 {i}",)) for i in range(4)]
+
+    async def run():
+        service = _async_service(fake_openai)
+        try:
+            for thread in threads:
+                thread.start()
+            return await asyncio.gather(*(service.correct_transcript(f"비동기 {i}") for i in range(4)))
+        finally:
+            await service.aclose()
+
+    assert asyncio.run(run()) == ["ok"] * 4
+    for thread in threads:
+        thread.join()
+    assert len(fake_openai.requests) == 8
+    assert fake_openai.max_in_flight == 2
+
+
+def test_loop_service_runs_calls_from_threads_on_one_event_loop(fake_openai):
+    """여러 스레드의 동기 호출이 이벤트 루프 하나의 비동기 클라이언트로 동시에 처리되고, 호출한 스레드의 트레이스에 기록되는지 테스트"""
+    import threading
+    from metrics import tracing
+    from summary_service import LoopSummaryService
+    fake_openai.default = FakeResponse(content="ok", delay=0.05)
+
+    loop = asyncio.new_event_loop()
+    loop_thread = threading.Thread(target=loop.run_forever, daemon=True)
+    loop_thread.start()
+    service = LoopSummaryService(_async_service(fake_openai), loop)
+    results, stages = [], []
+
+    def call(i):
+        with tracing() as trace:
+            results.append(service.correct_transcript(f"문장 {i}"))
+        stages.append([span["stage"] for span in trace.spans])
+
+    try:
+        threads = [threading.Thread(target=call, args=(i,)) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        asyncio.run_coroutine_threadsafe(service.service.aclose(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+        loop_thread.join()
+        loop.close()
+
+    assert results == ["ok"] * 4
+    assert fake_openai.max_in_flight > 1
+    assert stages == [["llm_request", "correction"]] * 4
+
+
+# --- 긴 스크립트의 청크 단위 보정 / 계층적 요약 ---
+from config import settings
+
+
+def _echo_completion(prefix):
+    """사용자 메시지의 본문 앞에 prefix를 붙여 돌려주는 응답 생성기"""
+    def create(model, messages, **kwargs):
+        response = MagicMock()
+        body = messages[1]["content"].split("\n\n", 1)[1]
+        response.choices[0].message.content = prefix(messages[0]["content"], body)
+        return response
+    return create
+
+
+def test_correct_transcript_corrects_chunks_in_parallel_and_keeps_order(mock_openai_client, monkeypatch):
+    monkeypatch.setattr(settings, "LLM_CHUNK_MAX_TOKENS", 20)
+    mock_openai_client.chat.completions.create.side_effect = _echo_completion(lambda system, body: body.upper())
+    segments = [{"start": float(i), "end": i + 0.5, "text": f"segment number {i} text"} for i in range(12)]
+    transcript = " ".join(seg["text"] for seg in segments)
+
+    corrected = SummaryService().correct_transcript(transcript, segments=segments)
+
+    assert corrected == transcript.upper()
+    assert mock_openai_client.chat.completions.create.call_count > 1
+    for call in mock_openai_client.chat.completions.create.call_args_list:
+        assert call.kwargs["temperature"] == 0.2
+
+
+def test_generate_summary_reduces_long_script_hierarchically(mock_openai_client, monkeypatch):
+    monkeypatch.setattr(settings, "LLM_CHUNK_MAX_TOKENS", 40)
+    monkeypatch.setattr(settings, "LLM_SUMMARY_MAX_INPUT_TOKENS", 60)
+    # 부분 요약은 입력의 첫 단어만 남겨 길이를 줄이고, 최종 요약은 "final"
+    mock_openai_client.chat.completions.create.side_effect = _echo_completion(
+        lambda system, body: "final" if "전문적으로 요약" in system else body.split()[0])
+    script = "\n\n".join(f"para{i} " + "word " * 20 for i in range(10))
+
+    summary = SummaryService().generate_summary(script)
+
+    assert summary == "final"
+    calls = mock_openai_client.chat.completions.create.call_args_list
+    final_messages = calls[-1].kwargs["messages"]
+    assert "[음악 레슨 부분 요약]" in final_messages[1]["content"]
+    assert "para0" in final_messages[1]["content"] and "para9" in final_messages[1]["content"]
+    assert len(calls) > 2
+
+
+def _stream_chunk(content):
+    chunk = MagicMock()
+    chunk.choices[0].delta.content = content
+    return chunk
+
+
+def test_generate_summary_streams_tokens(mock_openai_client):
+    """on_token이 주어지면 스트리밍 응답의 토큰을 순서대로 전달하고 전체 요약을 반환하는지 테스트"""
+    mock_openai_client.chat.completions.create.return_value = iter(
+        [_stream_chunk("## 총평"), _stream_chunk(None), _stream_chunk("\n- 좋음")])
+    tokens = []
+
+    summary = SummaryService().generate_summary("짧은 스크립트", on_token=tokens.append)
+
+    assert summary == "## 총평\n- 좋음"
+    assert tokens == ["## 총평", "\n- 좋음"]
+    assert mock_openai_client.chat.completions.create.call_args.kwargs["stream"] is True
+
+
+def test_correct_transcript_reports_each_chunk(mock_openai_client, monkeypatch):
+    monkeypatch.setattr(settings, "LLM_CHUNK_MAX_TOKENS", 20)
+    mock_openai_client.chat.completions.create.side_effect = _echo_completion(lambda system, body: body.upper())
+    segments = [{"start": float(i), "end": i + 0.5, "text": f"segment number {i} text"} for i in range(6)]
+    received = []
+
+    corrected = SummaryService().correct_transcript("", segments=segments,
+                                                    on_chunk=lambda i, total, text: received.append((i, total, text)))
+
+    assert len(received) > 1
+    assert all(total == len(received) for _, total, _ in received)
+    assert " ".join(text for _, _, text in sorted(received)) == corrected
+
+
+# --- 보정/요약/지시어 한 번에 받기 (구조화 JSON 응답) ---
+import json
+
+
+def _completion(content):
+    response = MagicMock()
+    response.choices[0].message.content = content
+    return response
+
+
+def test_structured_lesson_validates_single_json_response(mock_openai_client):
+    mock_openai_client.chat.completions.create.return_value = _completion(json.dumps({
+        "corrected_transcript": "2마디를 부드럽게 연주하세요.",
+        "summary_sections": [{"title": "총평", "content": "좋아요"}, {"title": "마디별 주의사항", "content": "- 2마디"}],
+        "annotations": [{"measure": 2, "directive": " 부드럽게 "}, {"measure": 0, "directive": "잘못"},
+                        {"measure": 3, "directive": ""}],
+    }, ensure_ascii=False))
+
+    result = SummaryService().structured_lesson("이맛이를 부드럽게 연주하세요")
+
+    assert result == {"corrected_transcript": "2마디를 부드럽게 연주하세요.",
+                      "summary": "## 총평\n좋아요\n\n## 마디별 주의사항\n- 2마디",
+                      "annotations": [{"measure": 2, "directive": "부드럽게"}]}
+    mock_openai_client.chat.completions.create.assert_called_once()
+    kwargs = mock_openai_client.chat.completions.create.call_args.kwargs
+    assert kwargs["response_format"] == {"type": "json_object"}
+    assert "이맛이를 부드럽게" in kwargs["messages"][1]["content"]
+
+
+@pytest.mark.parametrize("content", [
+    "JSON이 아닌 응답",
+    json.dumps({"corrected_transcript": "보정", "summary_sections": []}),
+    json.dumps({"corrected_transcript": "보정", "summary_sections": [],
+                "annotations": [{"measure": "두 번째", "directive": "강조"}]}),
+    json.dumps({"corrected_transcript": " ", "summary_sections": [], "annotations": []}),
+])
+def test_structured_lesson_returns_none_for_invalid_response(mock_openai_client, content):
+    mock_openai_client.chat.completions.create.return_value = _completion(content)
+    assert SummaryService().structured_lesson("스크립트") is None
+
+
+def test_structured_lesson_skips_long_transcript(mock_openai_client, monkeypatch):
+    monkeypatch.setattr(settings, "LLM_SUMMARY_MAX_INPUT_TOKENS", 10)
+    assert SummaryService().structured_lesson("word " * 50) is None
+    mock_openai_client.chat.completions.create.assert_not_called()
+
+
+def test_async_summary_streams_tokens_and_interrupted_stream_opens_circuit(fake_openai):
+    """
+    비동기 요약도 on_token으로 토큰을 전달하고, 토큰 일부를 보낸 뒤 끊긴 스트림은
+    재시도하지 않고 SummaryStreamInterrupted로 끝나며 회로에는 실패로 반영되는지 테스트
+    """
+    from summary_service import SummaryStreamInterrupted
+    fake_openai.script(FakeResponse(tokens=["## 총평", "\n- 좋음"]),
+                       FakeResponse(tokens=["## 총", "평"], disconnect_after=1))
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=60)
+    tokens, chunks = [], []
+
+    async def run():
+        service = _async_service(fake_openai, breaker=breaker)
+        try:
+            summary = await service.generate_summary("스크립트", on_token=tokens.append)
+            assert not breaker.is_open
+            with pytest.raises(SummaryStreamInterrupted):
+                await service.generate_summary("스크립트", on_token=tokens.append)
+            return summary
+        finally:
+            await service.aclose()
+
+    assert asyncio.run(run()) == "## 총평\n- 좋음"
+    assert tokens == ["## 총평", "\n- 좋음", "## 총"]
+    assert len(fake_openai.requests) == 2
+    assert breaker.is_open
+
+
+def test_async_correct_transcript_reports_each_chunk(fake_openai, monkeypatch):
+    monkeypatch.setattr(settings, "LLM_CHUNK_MAX_TOKENS", 20)
+    segments = [{"start": float(i), "end": i + 0.5, "text": f"segment number {i} text"} for i in range(6)]
+    received = []
+
+    async def run():
+        service = _async_service(fake_openai)
+        try:
+            return await service.correct_transcript("", segments=segments,
+                                                    on_chunk=lambda i, total, text: received.append((i, total)))
+        finally:
+            await service.aclose()
+
+    corrected = asyncio.run(run())
+    assert len(received) > 1 and corrected == " ".join(["ok"] * len(received))
+    assert sorted(received) == [(i, len(received)) for i in range(len(received))]
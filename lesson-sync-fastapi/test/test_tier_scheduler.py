@@ -0,0 +1,116 @@
+import pytest
+
+from tier_scheduler import TierScheduler, WhisperTier, parse_tiers
+
+TIERS = [WhisperTier("small", 0.6), WhisperTier("base", 0.25), WhisperTier("tiny", 0.1)]
+TARGET = 1800.0
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def _simulate(arrivals, fixed=None, actual_factors=None):
+    """
+    작업 큐 워커 하나가 [(도착 시각, 레슨 길이)]를 FIFO로 처리하는 과정을 가상 시계로 시뮬레이션합니다.
+    fixed가 주어지면 스케줄러 대신 항상 그 티어를 쓰고, actual_factors는 실제 처리 비율(기본은 설정값)입니다.
+    반환: [(티어, 도착부터 모델 단계가 끝나기까지의 지연)]
+    """
+    clock = _Clock()
+    current = 0
+
+    def queued():
+        return [clock.now - arrival for arrival, _ in arrivals[current + 1:] if arrival <= clock.now]
+
+    scheduler = TierScheduler(TIERS, TARGET, queued=queued, clock=clock)
+    factors = actual_factors or {tier.name: tier.realtime_factor for tier in TIERS}
+    results, free_at = [], 0.0
+    for current, (arrival, seconds) in enumerate(arrivals):
+        clock.now = max(arrival, free_at)
+        with scheduler.acquire(seconds, waited=clock.now - arrival) as lease:
+            tier = fixed or lease.tier.name
+            clock.now += seconds * factors[tier]
+        free_at = clock.now
+        results.append((tier, free_at - arrival))
+    return results, scheduler
+
+
+def test_parse_tiers():
+    assert parse_tiers(" small:0.6, tiny:0.1 ,") == [WhisperTier("small", 0.6), WhisperTier("tiny", 0.1)]
+    assert parse_tiers("") == []
+    for value in ("small", "small:fast", ":0.5", "tiny:0"):
+        with pytest.raises(ValueError):
+            parse_tiers(value)
+
+
+def test_idle_arrivals_use_most_accurate_tier():
+    """한 시간에 30분 레슨 하나씩 도착하면 모두 가장 정확한 티어로 처리"""
+    results, _ = _simulate([(i * 3600.0, 1800.0) for i in range(6)])
+    assert [tier for tier, _ in results] == ["small"] * 6
+    assert max(latency for _, latency in results) <= TARGET
+
+
+def test_burst_degrades_to_faster_tiers_within_target():
+    """30분 레슨 8개가 한꺼번에 도착하면 빠른 티어로 바꿔 모두 목표 시간 안에 끝냄 (항상 small이면 2시간 넘게 걸림)"""
+    arrivals = [(0.0, 1800.0)] * 8
+    results, _ = _simulate(arrivals)
+    assert results[0][0] == "tiny"
+    assert max(latency for _, latency in results) <= TARGET
+
+    fixed, _ = _simulate(arrivals, fixed="small")
+    assert max(latency for _, latency in fixed) > 4 * TARGET
+
+
+def test_sustained_load_mixes_tiers_and_recovers():
+    """
+    한가한 시간 -> 1분 간격으로 몰림 -> 다시 한가한 시간.
+    몰릴 때만 빠른 티어를 쓰고, 대기열이 비면 다시 정확한 티어로 돌아감
+    """
+    arrivals = ([(i * 3600.0, 1800.0) for i in range(3)] + [(10800.0 + i * 60, 1800.0) for i in range(6)]
+                + [(20000.0 + i * 3600, 1800.0) for i in range(3)])
+    results, _ = _simulate(arrivals)
+    tiers = [tier for tier, _ in results]
+    assert tiers[:3] == ["small"] * 3 and tiers[-3:] == ["small"] * 3
+    assert "tiny" in tiers[3:9]
+    assert max(latency for _, latency in results) <= TARGET
+
+    # small이 따라가지 못하는 도착 간격(15분)이 계속되면 일부를 base로 처리해 지연이 쌓이지 않음
+    steady = [(i * 900.0, 1800.0) for i in range(20)]
+    results, _ = _simulate(steady)
+    assert {"small", "base"} == {tier for tier, _ in results}
+    assert max(latency for _, latency in results) <= TARGET
+    fixed, _ = _simulate(steady, fixed="small")
+    assert max(latency for _, latency in fixed) > 2 * TARGET
+
+
+def test_realtime_factor_is_calibrated_from_observed_time():
+    """설정한 처리 비율보다 실제로 두 배 느리면 관측값으로 보정해, 한가할 때도 목표를 넘는 티어는 피함"""
+    slow = {"small": 1.2, "base": 0.5, "tiny": 0.2}
+    results, scheduler = _simulate([(i * 7200.0, 1800.0) for i in range(10)], actual_factors=slow)
+    assert scheduler.realtime_factor("small") > 1.0
+    # 처음에는 설정값대로 small(실제 2160초)을 쓰지만, 보정된 뒤에는 목표 안에 드는 base를 씀
+    assert results[0][0] == "small" and results[-1][0] == "base"
+    assert results[-1][1] <= TARGET
+
+
+def test_running_leases_count_as_backlog():
+    """동시에 실행 중인 레슨의 남은 처리 시간도 부하로 봄 (실패한 레슨은 처리 비율 보정에 쓰지 않음)"""
+    clock = _Clock()
+    scheduler = TierScheduler(TIERS, TARGET, clock=clock)
+    first = scheduler.acquire(1800.0)
+    second = scheduler.acquire(1800.0)
+    assert (first.tier.name, second.tier.name) == ("small", "base")
+    assert scheduler.expected_seconds(TIERS[0], 1800.0) > TARGET
+
+    clock.now = 600.0
+    with pytest.raises(RuntimeError):
+        with second:
+            raise RuntimeError("STT 실패")
+    first.release()
+    assert scheduler.realtime_factor("small") < 0.6
+    assert scheduler.realtime_factor("base") == 0.25
+    assert scheduler.acquire(1800.0).tier.name == "small"
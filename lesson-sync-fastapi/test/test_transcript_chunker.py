@@ -0,0 +1,49 @@
+from transcript_chunker import chunk_segments, count_tokens, split_text
+
+
+def _words(text):
+    # 테스트에서는 공백 단위 단어 수를 토큰 수로 사용
+    return len(text.split())
+
+
+def test_chunk_segments_follows_segment_boundaries():
+    segments = [
+        {"start": 0.0, "end": 2.0, "text": "1마디부터 다시"},
+        {"start": 3.0, "end": 5.0, "text": "활을 길게 쓰세요"},
+        {"start": 6.0, "end": 7.0, "text": ""},
+        {"start": 8.0, "end": 9.0, "text": "좋아요"},
+        {"start": 10.0, "end": 12.0, "text": "4마디 스타카토 짧게"},
+    ]
+
+    chunks = chunk_segments(segments, max_tokens=6, count=_words)
+
+    assert [c["text"] for c in chunks] == ["1마디부터 다시 활을 길게 쓰세요", "좋아요 4마디 스타카토 짧게"]
+    assert [(c["start"], c["end"]) for c in chunks] == [(0.0, 5.0), (8.0, 12.0)]
+    assert all(_words(c["text"]) <= 6 for c in chunks)
+
+
+def test_long_segment_is_split_at_sentence_boundaries():
+    text = "첫 번째 문장입니다. 두 번째 문장은 조금 더 깁니다. 세 번째."
+    segments = [{"start": 0.0, "end": 30.0, "text": text}]
+
+    chunks = chunk_segments(segments, max_tokens=6, count=_words)
+
+    assert [c["text"] for c in chunks] == ["첫 번째 문장입니다.", "두 번째 문장은 조금 더 깁니다.", "세 번째."]
+    assert all((c["start"], c["end"]) == (0.0, 30.0) for c in chunks)
+
+
+def test_split_text_packs_paragraphs_and_keeps_all_words():
+    paragraphs = [" ".join(f"p{i}w{j}" for j in range(n)) for i, n in enumerate([3, 4, 9, 2])]
+    text = "\n\n".join(paragraphs)
+
+    pieces = split_text(text, max_tokens=8, count=_words)
+
+    assert all(_words(p) <= 8 for p in pieces)
+    assert " ".join(pieces).split() == text.split()
+    # 작은 문단끼리는 하나로 묶임
+    assert pieces[0] == "\n\n".join(paragraphs[:2])
+
+
+def test_count_tokens_is_positive_for_korean():
+    assert count_tokens("") == 0
+    assert count_tokens("3마디부터 크레센도") > 0
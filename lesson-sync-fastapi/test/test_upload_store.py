@@ -0,0 +1,122 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+import soundfile as sf
+
+from audio_stream import decode_progressively, decode_to_spool
+from upload_store import UploadOffsetError, UploadStalledError, UploadStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    return UploadStore(str(tmp_path / "uploads"), ttl_seconds=3600)
+
+
+@pytest.fixture
+def wav_bytes(tmp_path):
+    """22.05kHz 모노 테스트용 WAV 파일 (2초)"""
+    sr = 22050
+    t = np.arange(2 * sr) / sr
+    path = tmp_path / "lesson.wav"
+    sf.write(path, 0.3 * np.sin(2 * np.pi * 440 * t), sr)
+    return path.read_bytes()
+
+
+def test_append_checks_offset_and_survives_restart(store):
+    """받은 위치와 다른 범위는 거절하고, 저장소를 다시 열어도 받은 위치부터 이어 올릴 수 있는지 테스트"""
+    upload = store.create(10, filename="lesson.wav", content_type="audio/wav", score_id="s1")
+    assert upload.append(0, [b"abc", b"de"]) == 5
+
+    with pytest.raises(UploadOffsetError) as exc_info:
+        upload.append(3, [b"xyz"])
+    assert exc_info.value.offset == 5
+    with pytest.raises(UploadOffsetError):
+        upload.append(5, [b"too much data"])
+
+    reopened = UploadStore(store.root, ttl_seconds=3600).get(upload.id)
+    assert reopened.offset == 5
+    assert reopened.info.score_id == "s1"
+    assert not reopened.complete
+    reopened.append(5, [b"fghij"])
+    assert reopened.complete
+    with open(reopened.data_path, "rb") as f:
+        assert f.read() == b"abcdefghij"
+
+    assert store.get("unknown") is None
+    store.delete(upload.id)
+    assert UploadStore(store.root, ttl_seconds=3600).get(upload.id) is None
+
+
+def test_purge_expired_uploads(store):
+    upload = store.create(10, filename="lesson.wav")
+    store.ttl_seconds = -1
+    store.purge_expired()
+    assert store.get(upload.id) is None
+
+
+def test_progressive_decode_while_uploading(store, wav_bytes, tmp_path):
+    """업로드가 끝나기 전에 디코딩을 시작해도 전체 파일을 디코딩한 결과와 같은지 테스트"""
+    upload = store.create(len(wav_bytes), filename="lesson.wav")
+    reader = upload.reader(stall_seconds=5)
+    waveform = decode_progressively(reader, block_seconds=0.25)
+
+    def send():
+        for start in range(0, len(wav_bytes), 4096):
+            upload.append(start, [wav_bytes[start:start + 4096]])
+            time.sleep(0.002)
+
+    sender = threading.Thread(target=send)
+    sender.start()
+    # 앞부분은 업로드가 끝나기 전에 읽을 수 있음
+    first = waveform[0:1600]
+    sender.join()
+
+    with decode_to_spool(str(tmp_path / "lesson.wav")) as expected:
+        assert waveform.wait_for(len(expected) + 1) == len(expected)
+        np.testing.assert_allclose(first, expected[0:1600], atol=1e-6)
+        np.testing.assert_allclose(waveform[0:len(expected)], expected[0:len(expected)], atol=1e-6)
+    waveform.close()
+    reader.close()
+
+
+def test_stalled_upload_fails_progressive_decode(store, wav_bytes):
+    """업로드가 멈추면 파형을 읽는 쪽에서 UploadStalledError가 발생하는지 테스트"""
+    upload = store.create(len(wav_bytes), filename="lesson.wav")
+    upload.append(0, [wav_bytes[:len(wav_bytes) // 2]])
+    reader = upload.reader(stall_seconds=0.1)
+    waveform = decode_progressively(reader, block_seconds=0.25)
+
+    with pytest.raises(UploadStalledError):
+        waveform.wait_for(len(wav_bytes))
+    waveform.close()
+    reader.close()
+
+
+def test_empty_chunk_does_not_count_as_stall(store):
+    """빈 조각(요청 본문의 마지막 조각)을 써도 기다리는 쪽이 멈춘 업로드로 판단하지 않는지 테스트"""
+    upload = store.create(10, filename="lesson.wav")
+    upload.append(0, [b"abcde"])
+    waited = []
+    waiter = threading.Thread(target=lambda: waited.append(upload.wait_for(10, timeout=1.0)))
+    waiter.start()
+    time.sleep(0.05)
+    upload.append(5, [b""])
+    time.sleep(0.05)
+    upload.append(5, [b"fghij"])
+    waiter.join()
+    assert waited == [True]
+
+
+def test_checkpoint_restores_saved_segments(store):
+    """변환한 구간을 다시 열어도 찾을 수 있고, 기록 도중 잘린 마지막 줄은 무시하는지 테스트"""
+    upload = store.create(10, filename="lesson.wav")
+    upload.save({"start": 0.0, "end": 1.5, "text": "첫 구간"})
+    with open(upload._checkpoint_path, "a", encoding="utf-8") as f:
+        f.write('{"start": 2.0, "end"')
+
+    reopened = UploadStore(store.root, ttl_seconds=3600).get(upload.id)
+    assert reopened.get({"start": 0.0, "end": 1.5}) == {"start": 0.0, "end": 1.5, "text": "첫 구간"}
+    assert reopened.get({"start": 2.0, "end": 3.0}) is None
+    assert reopened.checkpointed_segments == 1
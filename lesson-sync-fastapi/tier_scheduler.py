@@ -0,0 +1,156 @@
+"""
+부하에 따라 레슨마다 Whisper 모델 티어를 고르는 스케줄러.
+
+WHISPER_TIERS에 정확한 모델부터 "모델:처리 비율"(오디오 1초의 모델 단계를 처리하는 데 걸리는 초)을 나열하면,
+모델 단계를 시작할 때마다 이 레슨과 대기 중인 작업의 예상 지연이 LATENCY_TARGET_SECONDS 안에 드는 가장 정확한 티어를 고릅니다.
+  대기열을 비우는 시간 = (실행 중인 레슨의 남은 시간 + (이 레슨 + 대기 작업 수 x 평균 레슨 길이) x 비율) / 동시 실행 수
+  예상 지연 = max(이 레슨이 기다린 시간 + 이 레슨 x 비율, 가장 오래 기다린 작업의 대기 시간 + 대기열을 비우는 시간)
+한가할 때는 큰 모델로 정확하게, 작업이 몰려 대기열이 길어지면 작은 모델로 빠르게 처리하며
+어느 티어도 목표를 맞출 수 없으면 가장 빠른 티어를 씁니다.
+티어별 비율은 실제로 걸린 시간으로 계속 보정하고(지수 이동 평균), 모델은 처음 선택될 때 로드되어 프로세스 안에 유지됩니다.
+부하는 이 API 프로세스의 작업만 보므로, 여러 API 워커가 모델 서버를 함께 쓰면 워커마다 따로 판단합니다.
+"""
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+
+from config import settings
+from metrics import WHISPER_TIER_JOBS
+
+_EWMA_ALPHA = 0.2
+_MIN_OBSERVED_SECONDS = 30.0       # 이보다 짧은 레슨은 처리 비율 보정에 쓰지 않음 (모델 로드 등 고정 비용이 큼)
+_DEFAULT_AUDIO_SECONDS = 1800.0    # 첫 레슨 전, 길이를 모르는 레슨(받는 중인 업로드)의 길이 추정값
+
+
+@dataclass(frozen=True)
+class WhisperTier:
+    name: str
+    realtime_factor: float  # 오디오 1초의 모델 단계(음성 구간 검출 + STT)를 처리하는 데 걸리는 초
+
+
+def parse_tiers(value: str) -> List[WhisperTier]:
+    """설정값("small:0.6,base:0.25,tiny:0.1")을 티어 목록으로 바꿉니다. 형식이 잘못되면 ValueError"""
+    tiers = []
+    for item in value.split(","):
+        if not item.strip():
+            continue
+        name, _, factor = item.partition(":")
+        try:
+            tier = WhisperTier(name.strip(), float(factor))
+        except ValueError:
+            tier = None
+        if tier is None or not tier.name or tier.realtime_factor <= 0:
+            raise ValueError(f"Whisper 티어 형식이 올바르지 않습니다 (모델:처리 비율): {item.strip()}")
+        tiers.append(tier)
+    return tiers
+
+
+def model_parallelism() -> int:
+    """모델 단계를 동시에 실행하는 수 (model_executor 설정과 같은 기준)"""
+    if settings.MODEL_SERVER_ADDRESS:
+        return max(settings.MODEL_SERVER_CONCURRENCY, 1)
+    # 스레드에서 실행하면 모델 연산이 CPU를 나눠 쓰므로 하나로 봄
+    return max(settings.MODEL_WORKER_PROCESSES, 1)
+
+
+class TierLease:
+    """레슨 하나에 배정된 티어. 모델 단계가 끝나면 release()(또는 with 블록 종료)로 예약한 시간을 돌려줍니다."""
+
+    def __init__(self, scheduler: "TierScheduler", tier: WhisperTier, audio_seconds: Optional[float],
+                 estimate: float, started: float):
+        self.tier = tier
+        self.audio_seconds = audio_seconds
+        self.estimate = estimate
+        self.started = started
+        self._scheduler = scheduler
+
+    def remaining(self, now: float) -> float:
+        return max(self.estimate - (now - self.started), 0.0)
+
+    def release(self, succeeded: bool = True):
+        self._scheduler._release(self, succeeded)
+
+    def __enter__(self) -> "TierLease":
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        self.release(succeeded=exc_type is None)
+
+
+class TierScheduler:
+    """
+    tiers는 정확한 것부터 나열합니다. queued는 아직 시작하지 않은 작업들이 기다린 시간(초) 목록을 돌려주는 함수,
+    clock은 시뮬레이션 테스트에서 바꿔 끼울 수 있는 시계입니다.
+    """
+
+    def __init__(self, tiers: List[WhisperTier], target_seconds: float, parallelism: int = 1,
+                 queued: Callable[[], List[float]] = list, clock: Callable[[], float] = time.monotonic):
+        if not tiers:
+            raise ValueError("Whisper 티어가 하나 이상 필요합니다")
+        self.tiers = list(tiers)
+        self._target = target_seconds
+        self._parallelism = parallelism
+        self._queued = queued
+        self._clock = clock
+        self._factors: Dict[str, float] = {tier.name: tier.realtime_factor for tier in tiers}
+        self._mean_audio_seconds = _DEFAULT_AUDIO_SECONDS
+        self._active: List[TierLease] = []
+        self._lock = threading.Lock()
+
+    def realtime_factor(self, name: str) -> float:
+        """보정된 티어의 처리 비율"""
+        with self._lock:
+            return self._factors[name]
+
+    def expected_seconds(self, tier: WhisperTier, audio_seconds: Optional[float] = None, waited: float = 0.0) -> float:
+        """지금 tier로 시작할 때 이 레슨과 대기 중인 작업의 예상 지연"""
+        with self._lock:
+            return self._expected_seconds(tier, audio_seconds or self._mean_audio_seconds, waited,
+                                          self._backlog(self._clock()), self._queued())
+
+    def acquire(self, audio_seconds: Optional[float] = None, waited: float = 0.0) -> TierLease:
+        """
+        audio_seconds초 레슨의 티어를 고르고 그 처리 시간을 예약합니다. (길이를 모르면 None)
+        waited는 이 레슨이 접수된 뒤 모델 단계를 시작하기까지 기다린 시간(초)입니다.
+        """
+        with self._lock:
+            now = self._clock()
+            seconds = audio_seconds or self._mean_audio_seconds
+            backlog, waiting = self._backlog(now), self._queued()
+            tier = next((tier for tier in self.tiers
+                         if self._expected_seconds(tier, seconds, waited, backlog, waiting) <= self._target),
+                        self.tiers[-1])
+            lease = TierLease(self, tier, audio_seconds, seconds * self._factors[tier.name], now)
+            self._active.append(lease)
+            if audio_seconds:
+                self._mean_audio_seconds += _EWMA_ALPHA * (audio_seconds - self._mean_audio_seconds)
+        WHISPER_TIER_JOBS.labels(tier.name).inc()
+        return lease
+
+    def _backlog(self, now: float) -> float:
+        return sum(lease.remaining(now) for lease in self._active)
+
+    def _expected_seconds(self, tier: WhisperTier, seconds: float, waited: float, backlog: float,
+                          waiting: List[float]) -> float:
+        factor = self._factors[tier.name]
+        drained = (backlog + (seconds + len(waiting) * self._mean_audio_seconds) * factor) / self._parallelism
+        return max(waited + seconds * factor, max(waiting, default=0.0) + drained)
+
+    def _release(self, lease: TierLease, succeeded: bool):
+        with self._lock:
+            if lease not in self._active:
+                return
+            self._active.remove(lease)
+            if succeeded and lease.audio_seconds and lease.audio_seconds >= _MIN_OBSERVED_SECONDS:
+                observed = (self._clock() - lease.started) / lease.audio_seconds
+                factor = self._factors[lease.tier.name]
+                self._factors[lease.tier.name] = factor + _EWMA_ALPHA * (observed - factor)
+
+
+def create_tier_scheduler(queued: Callable[[], List[float]] = list) -> Optional[TierScheduler]:
+    """WHISPER_TIERS가 설정된 경우에만 TierScheduler를 만듭니다."""
+    tiers = parse_tiers(settings.WHISPER_TIERS)
+    if not tiers:
+        return None
+    return TierScheduler(tiers, settings.LATENCY_TARGET_SECONDS, model_parallelism(), queued)
@@ -0,0 +1,96 @@
+import logging
+import re
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# 큰 단위부터 차례로 시도하는 분할 기준: 문단 -> 문장 -> 공백
+_SPLIT_PATTERNS = (r"\n\s*\n", r"(?<=[.?!。])\s+", r"\s+")
+
+
+@lru_cache(maxsize=None)
+def _encoding(model: str):
+    try:
+        import tiktoken
+        return tiktoken.encoding_for_model(model)
+    except Exception as e:
+        # tiktoken이 없거나 인코딩 파일을 내려받을 수 없는 환경에서는 근사치를 사용
+        logger.warning(f"tiktoken 인코딩을 불러올 수 없어 토큰 수를 근사합니다: {e}")
+        return None
+
+
+def count_tokens(text: str, model: str = "gpt-3.5-turbo") -> int:
+    """
+    프롬프트 토큰 수. tiktoken을 사용할 수 없으면 UTF-8 바이트 수 / 3으로 근사합니다.
+    (한글 한 글자 = 3바이트 ≈ 1토큰이므로 한국어 스크립트에서는 약간 크게 잡히는 쪽)
+    """
+    encoding = _encoding(model)
+    if encoding is None:
+        return (len(text.encode("utf-8")) + 2) // 3
+    return len(encoding.encode(text))
+
+
+def split_text(text: str, max_tokens: int, count: Callable[[str], int] = count_tokens,
+               _level: int = 0) -> List[str]:
+    """
+    텍스트를 max_tokens 이하의 조각으로 나눕니다.
+    문단, 문장, 공백 순으로 경계를 찾아 가능한 한 큰 단위를 유지하며 앞에서부터 채웁니다.
+    """
+    text = text.strip()
+    if not text:
+        return []
+    if count(text) <= max_tokens:
+        return [text]
+    if _level == len(_SPLIT_PATTERNS):
+        # 공백 없이 긴 문자열은 글자 수로 자름
+        size = max(1, len(text) * max_tokens // count(text))
+        return [text[i:i + size] for i in range(0, len(text), size)]
+
+    separator = "\n\n" if _level == 0 else " "
+    units = []
+    for part in re.split(_SPLIT_PATTERNS[_level], text):
+        units.extend(split_text(part, max_tokens, count, _level + 1))
+    return _pack(units, max_tokens, count, separator)
+
+
+def _pack(units: List[str], max_tokens: int, count: Callable[[str], int], separator: str) -> List[str]:
+    # 토큰 수는 조각별 합(+구분자 1토큰)으로 누적해 긴 텍스트도 선형 시간에 묶음
+    pieces, current, current_tokens = [], "", 0
+    for unit in units:
+        tokens = count(unit)
+        if current and current_tokens + 1 + tokens > max_tokens:
+            pieces.append(current)
+            current, current_tokens = "", 0
+        current = f"{current}{separator}{unit}" if current else unit
+        current_tokens += tokens + (1 if current_tokens else 0)
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def chunk_segments(segments: List[Dict], max_tokens: int,
+                   count: Callable[[str], int] = count_tokens) -> List[Dict]:
+    """
+    STT 결과(speech_segments)를 구간 경계를 따라 max_tokens 이하의 청크로 묶습니다.
+    각 청크는 포함된 구간들의 시작/끝 시각과 이어 붙인 텍스트를 가집니다.
+    한 구간이 max_tokens를 넘으면 그 구간만 split_text로 나눕니다.
+    """
+    chunks: List[Dict] = []
+    current: Optional[Dict] = None
+    current_tokens = 0
+    for seg in segments:
+        text = seg.get("text", "").strip()
+        if not text:
+            continue
+        for piece in split_text(text, max_tokens, count):
+            tokens = count(piece)
+            if current is not None and current_tokens + 1 + tokens <= max_tokens:
+                current["text"] = f"{current['text']} {piece}"
+                current["end"] = seg["end"]
+                current_tokens += 1 + tokens
+                continue
+            current = {"start": seg["start"], "end": seg["end"], "text": piece}
+            current_tokens = tokens
+            chunks.append(current)
+    return chunks
@@ -0,0 +1,271 @@
+"""
+이어 올리기(resumable) 업로드 저장소.
+
+모바일 네트워크에서 긴 레슨 녹음을 올리다 연결이 끊겨도 처음부터 다시 올리지 않도록,
+업로드를 바이트 범위(Content-Range) 단위로 받아 디스크에 이어 붙입니다.
+  UPLOAD_DIR/<upload_id>/meta.json       파일 크기, 이름, score_id 등
+  UPLOAD_DIR/<upload_id>/data            지금까지 받은 바이트 (파일 크기 = 받은 위치)
+  UPLOAD_DIR/<upload_id>/segments.jsonl  STT가 끝난 구간 체크포인트 (서버가 재시작되면 이어서 처리)
+모든 상태가 디스크에 있으므로 서버가 재시작되어도 업로드와 처리를 이어갈 수 있습니다.
+"""
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from typing import Callable, Dict, Iterable, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+# 받는 중에도 디코딩하며 처리할 수 있는 포맷 (soundfile이 앞에서부터 순서대로 읽을 수 있는 포맷)
+PROGRESSIVE_EXTENSIONS = {".wav", ".flac", ".ogg", ".oga"}
+
+
+def _extension(filename: str) -> str:
+    ext = os.path.splitext(filename)[1].lower()
+    return ext if ext[1:].isalnum() else ""
+
+
+class UploadOffsetError(Exception):
+    """요청한 바이트 범위가 서버가 받은 위치와 맞지 않을 때 발생합니다. offset은 서버가 받은 위치"""
+
+    def __init__(self, offset: int, message: str):
+        super().__init__(message)
+        self.offset = offset
+
+
+class UploadStalledError(Exception):
+    """업로드 중인 파일을 읽다가 일정 시간 동안 새 데이터가 오지 않았을 때 발생합니다."""
+
+
+@dataclass
+class UploadInfo:
+    id: str
+    size: int
+    filename: str = ""
+    content_type: str = ""
+    score_id: Optional[str] = None
+    title: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    job_id: Optional[str] = None
+
+
+class Upload:
+    """업로드 하나. 바이트 이어 붙이기, 받는 중인 파일 읽기, 구간 체크포인트를 담당합니다."""
+
+    def __init__(self, root: str, info: UploadInfo):
+        self.root = root
+        self.info = info
+        # 확장자로 포맷을 판단하는 디코더를 위해 원래 파일의 확장자를 유지
+        self.data_path = os.path.join(root, "data" + _extension(info.filename))
+        self._checkpoint_path = os.path.join(root, "segments.jsonl")
+        self._cond = threading.Condition()
+        self._offset = os.path.getsize(self.data_path) if os.path.exists(self.data_path) else 0
+        self._writing = False
+        self._checkpoint: Optional[Dict] = None
+
+    @property
+    def id(self) -> str:
+        return self.info.id
+
+    @property
+    def offset(self) -> int:
+        return self._offset
+
+    @property
+    def complete(self) -> bool:
+        return self._offset >= self.info.size
+
+    @property
+    def progressive(self) -> bool:
+        """다 받기 전에 처리를 시작할 수 있는 포맷인지"""
+        return _extension(self.info.filename) in PROGRESSIVE_EXTENSIONS
+
+    def save_info(self):
+        tmp_path = os.path.join(self.root, "meta.json.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(asdict(self.info), f, ensure_ascii=False)
+        os.replace(tmp_path, os.path.join(self.root, "meta.json"))
+
+    @contextmanager
+    def writing(self, start: int) -> Iterator[Callable[[bytes], None]]:
+        """
+        start 위치부터 이어 쓰는 함수를 제공합니다. 쓴 바이트는 즉시 받은 위치에 반영되므로
+        중간에 연결이 끊겨도 그때까지 받은 바이트는 남고, 클라이언트는 offset부터 다시 보내면 됩니다.
+        """
+        with self._cond:
+            if self._writing:
+                raise UploadOffsetError(self._offset, "같은 업로드에 다른 요청이 쓰는 중입니다")
+            if start != self._offset:
+                raise UploadOffsetError(self._offset, f"업로드 위치가 맞지 않습니다 (요청 {start}, 서버 {self._offset})")
+            self._writing = True
+        try:
+            with open(self.data_path, "ab") as f:
+                def write(chunk: bytes):
+                    if not chunk:
+                        return
+                    if self._offset + len(chunk) > self.info.size:
+                        raise UploadOffsetError(self._offset, "선언한 파일 크기를 넘는 데이터입니다")
+                    f.write(chunk)
+                    f.flush()
+                    with self._cond:
+                        self._offset += len(chunk)
+                        self._cond.notify_all()
+                yield write
+        finally:
+            with self._cond:
+                self._writing = False
+
+    def append(self, start: int, chunks: Iterable[bytes]) -> int:
+        """start 위치부터 chunks를 이어 붙이고 새 위치를 반환합니다."""
+        with self.writing(start) as write:
+            for chunk in chunks:
+                write(chunk)
+        return self._offset
+
+    def wait_for(self, offset: int, timeout: float) -> bool:
+        """offset 바이트까지 받을 때까지 기다립니다. timeout 동안 새 데이터가 하나도 오지 않으면 False"""
+        with self._cond:
+            before, deadline = self._offset, time.monotonic() + timeout
+            while self._offset < min(offset, self.info.size):
+                if self._offset != before:
+                    before, deadline = self._offset, time.monotonic() + timeout
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+            return True
+
+    def reader(self, stall_seconds: float) -> "UploadReader":
+        return UploadReader(self, stall_seconds)
+
+    # --- 구간 체크포인트 (lesson_pipeline.transcribe_audio의 checkpoint) ---
+
+    def _load_checkpoint(self) -> Dict:
+        if self._checkpoint is None:
+            self._checkpoint = {}
+            if os.path.exists(self._checkpoint_path):
+                with open(self._checkpoint_path, encoding="utf-8") as f:
+                    for line in f:
+                        try:
+                            seg = json.loads(line)
+                        except ValueError:
+                            # 기록 도중 종료되어 잘린 마지막 줄
+                            continue
+                        self._checkpoint[(seg["start"], seg["end"])] = seg
+        return self._checkpoint
+
+    def get(self, seg: Dict) -> Optional[Dict]:
+        """같은 구간의 STT 결과가 체크포인트에 있으면 반환합니다."""
+        return self._load_checkpoint().get((seg["start"], seg["end"]))
+
+    def save(self, seg: Dict):
+        """STT가 끝난 구간을 체크포인트에 추가합니다."""
+        checkpoint = self._load_checkpoint()
+        with open(self._checkpoint_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(seg, ensure_ascii=False) + "\n")
+        checkpoint[(seg["start"], seg["end"])] = seg
+
+    @property
+    def checkpointed_segments(self) -> int:
+        return len(self._load_checkpoint())
+
+
+class UploadReader:
+    """
+    받는 중인 업로드 파일을 읽는 파일 객체. 아직 받지 않은 위치를 읽으면 데이터가 올 때까지 기다립니다.
+    파일 크기는 처음에 선언한 전체 크기로 보이므로 soundfile이 헤더를 정상적으로 읽을 수 있습니다.
+    stall_seconds 동안 데이터가 오지 않으면 빈 바이트를 반환하고 error에 UploadStalledError를 남깁니다.
+    (soundfile의 읽기 콜백에서는 예외를 전달할 수 없으므로 decode_progressively가 디코딩 후 확인)
+    """
+
+    def __init__(self, upload: Upload, stall_seconds: float):
+        self._upload = upload
+        self._stall_seconds = stall_seconds
+        self._file = open(upload.data_path, "rb")
+        self._pos = 0
+        self.error: Optional[Exception] = None
+
+    def read(self, size: int = -1) -> bytes:
+        total = self._upload.info.size
+        end = total if size is None or size < 0 else min(total, self._pos + size)
+        if self.error is not None or not self._upload.wait_for(end, self._stall_seconds):
+            self.error = self.error or UploadStalledError(
+                f"{self._stall_seconds:g}초 동안 업로드 데이터가 오지 않았습니다 (받은 위치 {self._upload.offset})")
+            return b""
+        self._file.seek(self._pos)
+        data = self._file.read(end - self._pos)
+        self._pos += len(data)
+        return data
+
+    def seek(self, offset: int, whence: int = os.SEEK_SET) -> int:
+        base = {os.SEEK_SET: 0, os.SEEK_CUR: self._pos, os.SEEK_END: self._upload.info.size}[whence]
+        self._pos = max(0, base + offset)
+        return self._pos
+
+    def tell(self) -> int:
+        return self._pos
+
+    def close(self):
+        self._file.close()
+
+
+class UploadStore:
+    """UPLOAD_DIR 아래의 업로드를 관리합니다. 같은 업로드에 대해 항상 같은 Upload 객체를 돌려줍니다."""
+
+    def __init__(self, root: str, ttl_seconds: float):
+        self.root = root
+        self.ttl_seconds = ttl_seconds
+        self._uploads: Dict[str, Upload] = {}
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def create(self, size: int, filename: str = "", content_type: str = "",
+               score_id: Optional[str] = None, title: Optional[str] = None) -> Upload:
+        self.purge_expired()
+        info = UploadInfo(id=uuid.uuid4().hex, size=size, filename=filename, content_type=content_type,
+                          score_id=score_id, title=title)
+        path = os.path.join(self.root, info.id)
+        os.makedirs(path)
+        upload = Upload(path, info)
+        open(upload.data_path, "wb").close()
+        upload.save_info()
+        with self._lock:
+            self._uploads[info.id] = upload
+        return upload
+
+    def get(self, upload_id: str) -> Optional[Upload]:
+        """메모리에 없으면 디스크에서 읽습니다. (서버 재시작 후 이어 올리기)"""
+        with self._lock:
+            upload = self._uploads.get(upload_id)
+            if upload is not None:
+                return upload
+            path = os.path.join(self.root, upload_id)
+            if not upload_id.isalnum() or not os.path.isfile(os.path.join(path, "meta.json")):
+                return None
+            with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+                upload = Upload(path, UploadInfo(**json.load(f)))
+            self._uploads[upload_id] = upload
+            return upload
+
+    def delete(self, upload_id: str):
+        with self._lock:
+            self._uploads.pop(upload_id, None)
+        shutil.rmtree(os.path.join(self.root, upload_id), ignore_errors=True)
+
+    def purge_expired(self):
+        """만든 지 ttl_seconds가 지난 업로드를 지웁니다."""
+        now = time.time()
+        for upload_id in os.listdir(self.root):
+            meta_path = os.path.join(self.root, upload_id, "meta.json")
+            try:
+                expired = now - os.path.getmtime(meta_path) > self.ttl_seconds
+            except OSError:
+                continue
+            if expired:
+                logger.info(f"만료된 업로드 삭제: {upload_id}")
+                self.delete(upload_id)